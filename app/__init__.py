@@ -4,15 +4,154 @@ Flask Application Factory
 This module is responsible for setting up and configuring the Flask application.
 It initializes the database, registers models, and sets up routes.
 Additionally, it ensures the database is properly initialized before the app starts.
+
+Importing the package builds no application. `create_app` builds one, and the
+default instance used by `run.py` and `asgi.py` (`from app import app`) is
+created on first access. Models, routes and Flask-Migrate are imported by the
+factory, so scripts that only need `db` or a helper do not pay for them.
 """
 
+import atexit
+import os
+import threading
+import time
+from contextlib import nullcontext
 from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app import metrics
 from config.config import Config
 
 # Initialize SQLAlchemy instance
 db = SQLAlchemy()
 
+_default_app_lock = threading.Lock()
+
+
+class StatelessSessionInterface(SecureCookieSessionInterface):
+    """
+    Session interface for an API that keeps no session state.
+
+    Flask's default builds a cookie signer for every request to look for a
+    session cookie; this one hands out the null session at once, which Flask
+    also skips saving.
+    """
+
+    def open_session(self, app, request):
+        return self.make_null_session(app)
+
+
+def is_memory_sqlite(url):
+    """
+    Check whether a database URL points at an in-memory SQLite database.
+
+    Args:
+        url (str | URL): The database URL.
+
+    Returns:
+        bool: True for in-memory SQLite, False otherwise.
+    """
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def build_engine_options(config):
+    """
+    Build the SQLAlchemy engine options for the configured connection pool.
+
+    In-memory SQLite databases live on a single shared connection, so pool
+    sizing options do not apply to them and are left out.
+
+    Args:
+        config (dict): The Flask application config.
+
+    Returns:
+        dict: Keyword arguments passed to `create_engine`.
+    """
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    if is_memory_sqlite(config["SQLALCHEMY_DATABASE_URI"]):
+        return options
+
+    options.setdefault("pool_size", config.get("DB_POOL_SIZE", 10))
+    options.setdefault("max_overflow", config.get("DB_MAX_OVERFLOW", 20))
+    options.setdefault("pool_pre_ping", config.get("DB_POOL_PRE_PING", True))
+    options.setdefault("pool_recycle", config.get("DB_POOL_RECYCLE", 1800))
+    return options
+
+
+def configure_sqlite(engine, config):
+    """
+    Apply journal, locking and durability pragmas to file-backed SQLite connections.
+
+    WAL lets readers in other worker processes proceed while one process writes,
+    and `busy_timeout` makes writers wait for the lock instead of failing at once.
+
+    pysqlite normally delays BEGIN until the first write, which lets the read in a
+    read-modify-write see a stale snapshot. BEGIN is emitted explicitly instead, as
+    `BEGIN IMMEDIATE` when the connection carries the `sqlite_begin_immediate`
+    execution option, which is SQLite's equivalent of `SELECT ... FOR UPDATE`.
+
+    The database file's directory is created if missing, so the default
+    `instance/atm.db` works on a fresh checkout.
+
+    Args:
+        engine (Engine): The application's database engine.
+        config (dict): The Flask application config.
+    """
+    if engine.url.get_backend_name() != "sqlite" or is_memory_sqlite(engine.url):
+        return
+
+    journal_mode = config.get("SQLITE_JOURNAL_MODE", "WAL")
+    busy_timeout = int(config.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    synchronous = config.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    os.makedirs(os.path.dirname(os.path.abspath(engine.url.database)), exist_ok=True)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None  # BEGIN is emitted by the listener below
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin_transaction(conn):
+        if conn.get_execution_options().get("sqlite_begin_immediate"):
+            started = time.perf_counter()
+            conn.exec_driver_sql("BEGIN IMMEDIATE")  # Waits up to busy_timeout for the write lock
+            metrics.note_begin_wait(time.perf_counter() - started)
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+
+def use_atomic_update(engine, config):
+    """
+    Decide whether balance changes use a single conditional UPDATE ... RETURNING.
+
+    With `ATOMIC_BALANCE_UPDATE` set to 'auto', the fast path is enabled on
+    PostgreSQL and on SQLite 3.35+, the first release supporting RETURNING.
+
+    Args:
+        engine (Engine): The application's database engine.
+        config (dict): The Flask application config.
+
+    Returns:
+        bool: True to use the single-statement path.
+    """
+    setting = str(config.get("ATOMIC_BALANCE_UPDATE", "auto")).lower()
+    if setting != "auto":
+        return setting == "true"
+    if engine.dialect.name == "postgresql":
+        return True
+    if engine.dialect.name == "sqlite":
+        return engine.dialect.dbapi.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
 def create_app(config_class=Config):
     """
     Create and configure the Flask application.
@@ -20,8 +159,9 @@ def create_app(config_class=Config):
     This function:
     - Initializes the Flask app with configuration settings.
     - Registers the database and models.
+    - Creates the app-scoped session factory used by the repository layer.
     - Registers application blueprints.
-    - Ensures the database is set up before the app starts.
+    - Ensures the database is set up before the app starts, unless `AUTO_INIT_DB` is off.
 
     Args:
         config_class (Config): The configuration class to use.
@@ -32,8 +172,73 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app.logging_config import configure_logging
+    configure_logging(app.config)
+    from app.json_provider import configure_json
+    configure_json(app)
+    app.session_interface = StatelessSessionInterface()
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = build_engine_options(app.config)
+
     # Initialize database with the Flask app
     db.init_app(app)
+    if os.environ.get("FLASK_RUN_FROM_CLI"):
+        # Alembic is the slowest import of a boot; only the `flask` command can run migrations
+        from flask_migrate import Migrate
+        Migrate(app, db, render_as_batch=True)  # SQLite needs batch mode to alter columns
+
+    # One session factory per app, bound to the pooled engine
+    with app.app_context():
+        configure_sqlite(db.engine, app.config)
+        metrics.instrument_engine(db.engine)
+        session_factory = scoped_session(sessionmaker(bind=db.engine, expire_on_commit=False))
+    app.extensions["session_factory"] = session_factory
+
+    # In-memory SQLite shares one connection between all threads, so database
+    # transactions cannot isolate concurrent writers; serialize them in-process
+    if is_memory_sqlite(app.config["SQLALCHEMY_DATABASE_URI"]):
+        app.extensions["write_lock"] = threading.Lock()
+    else:
+        app.extensions["write_lock"] = nullcontext()
+
+    with app.app_context():
+        app.extensions["atomic_update"] = use_atomic_update(db.engine, app.config)
+
+    if app.config.get("BALANCE_CACHE_ENABLED"):
+        from app.data_access.balance_cache import BalanceCache
+        app.extensions["balance_cache"] = BalanceCache(app.config["BALANCE_CACHE_SIZE"], app.config["BALANCE_CACHE_TTL"])
+    else:
+        app.extensions["balance_cache"] = None
+
+    if app.config.get("LOCK_MANAGER_ENABLED"):
+        from app.data_access.lock_manager import StripedLockManager
+        app.extensions["lock_manager"] = StripedLockManager(app.config["LOCK_MANAGER_STRIPES"])
+    else:
+        app.extensions["lock_manager"] = None
+
+    if app.config.get("WRITE_COMBINING_ACCOUNTS") or app.config.get("WRITE_COMBINING_THRESHOLD"):
+        from app.data_access.write_combiner import WriteCombiner
+        app.extensions["write_combiner"] = WriteCombiner(
+            app.config["WRITE_COMBINING_ACCOUNTS"],
+            app.config["WRITE_COMBINING_THRESHOLD"],
+            app.config["WRITE_COMBINING_MAX_BATCH"],
+        )
+    else:
+        app.extensions["write_combiner"] = None
+
+    from app.data_access.idempotency_cache import IdempotencyCache
+    app.extensions["idempotency_cache"] = IdempotencyCache(app.config["IDEMPOTENCY_CACHE_SIZE"], app.config["IDEMPOTENCY_KEY_TTL"])
+
+    # Always installed: both read their limits from app.config, so they can be switched on at runtime
+    from app.admission import ConcurrencyLimiter, RateLimiter
+    app.extensions["rate_limiter"] = RateLimiter(app.config)
+    app.extensions["write_limiter"] = ConcurrencyLimiter(app.config)
+
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        session_factory.remove()
+
+    if app.config.get("METRICS_ENABLED"):
+        metrics.instrument_app(app)
 
     # Import models to register them
     from app import models
@@ -42,12 +247,95 @@ def create_app(config_class=Config):
     from app.routes.account_routes import bp as account_bp
     app.register_blueprint(account_bp)
 
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+
+    if app.config.get("ARCHIVE_DIR"):
+        from app.data_access.transaction_archive import ArchiveStore
+        app.extensions["transaction_archive"] = ArchiveStore(
+            app.config["ARCHIVE_DIR"],
+            segment_rows=app.config["ARCHIVE_SEGMENT_ROWS"],
+            cache_segments=app.config["ARCHIVE_CACHE_SEGMENTS"],
+        )
+    else:
+        app.extensions["transaction_archive"] = None
+
+    # Read the ledger journal before touching the database, so restored accounts are not re-seeded
+    recovered = None
+    if app.config.get("LEDGER_DIR"):
+        from app.data_access.ledger_journal import LedgerJournal
+        app.extensions["ledger_journal"] = LedgerJournal(
+            app.config["LEDGER_DIR"],
+            fsync=app.config["LEDGER_FSYNC"],
+            group_commit_delay=app.config["LEDGER_GROUP_COMMIT_MS"] / 1000,
+            snapshot_every=app.config["LEDGER_SNAPSHOT_EVERY"],
+        )
+        recovered = app.extensions["ledger_journal"].recover()
+    else:
+        app.extensions["ledger_journal"] = None
+
     # Initialize the database automatically when the app starts
-    with app.app_context():
-        from db_setup import initialize_database
-        initialize_database()
+    if app.config.get("AUTO_INIT_DB", True):
+        with app.app_context():
+            from db_setup import initialize_database
+            initialize_database(seed=not (recovered and recovered["balances"]))
+
+    if recovered is not None:
+        from app.data_access.ledger_journal import open_journal
+        open_journal(app, recovered)
+        atexit.register(app.extensions["ledger_journal"].close)
+
+    if app.config.get("WITHDRAWAL_LIMITS_ENABLED"):
+        from app.data_access.withdrawal_limits import WithdrawalLimits, rebuild_limits
+        from app.utils import parse_cents
+        daily_limit_cents = parse_cents(app.config["WITHDRAWAL_DAILY_LIMIT"])
+        if daily_limit_cents is None:
+            raise ValueError(f"Invalid WITHDRAWAL_DAILY_LIMIT: {app.config['WITHDRAWAL_DAILY_LIMIT']!r}")
+        app.extensions["withdrawal_limits"] = WithdrawalLimits(daily_limit_cents, app.config["WITHDRAWAL_PER_MINUTE_LIMIT"])
+        with app.app_context():
+            rebuild_limits(app.extensions["withdrawal_limits"])
+    else:
+        app.extensions["withdrawal_limits"] = None
+
+    # Balance and account reads go to replicas that have caught up with the client's writes
+    if app.config.get("READ_REPLICA_URLS"):
+        if is_memory_sqlite(app.config["SQLALCHEMY_DATABASE_URI"]):
+            raise ValueError("READ_REPLICA_URLS requires a file-backed or server database")
+        from app.data_access.replicas import ReplicaRouter, ReplicaSyncer
+        with app.app_context():
+            router = ReplicaRouter(db.engine, session_factory, app.config["READ_REPLICA_URLS"], app.config)
+        app.extensions["replica_router"] = router
+        app.teardown_appcontext(lambda exception=None: router.remove_sessions())
+        if app.config.get("READ_REPLICA_SYNC_INTERVAL", 0) > 0:
+            router.sync()
+            app.extensions["replica_syncer"] = ReplicaSyncer(router, app.config["READ_REPLICA_SYNC_INTERVAL"])
+            app.extensions["replica_syncer"].start()
+    else:
+        app.extensions["replica_router"] = None
+
+    # Expire old idempotency keys in the background
+    if app.config.get("IDEMPOTENCY_SWEEP_INTERVAL", 0) > 0:
+        from app.data_access.idempotency_cache import IdempotencySweeper
+        app.extensions["idempotency_sweeper"] = IdempotencySweeper(app, app.config["IDEMPOTENCY_SWEEP_INTERVAL"])
+        app.extensions["idempotency_sweeper"].start()
 
     return app
 
-# Create the application instance
-app = create_app()
+
+def __getattr__(name):
+    """
+    Build the default application on first access of `app.app`.
+
+    Args:
+        name (str): The attribute looked up on the package.
+
+    Returns:
+        Flask: The application created with the default configuration.
+    """
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if "app" not in globals():
+            globals()["app"] = create_app()
+    return globals()["app"]
@@ -0,0 +1,179 @@
+"""
+Admission Control Module
+
+This module decides which requests the account blueprint serves when it is
+under more load than the database can absorb. Requests that cannot be served
+promptly are refused at once, so they do not pile up in the repository's
+lock-retry sleeps until the worker times out.
+
+- `RateLimiter` gives every client (ATM) a token bucket: `RATE_LIMIT_PER_SECOND`
+  requests per second, with bursts of up to `RATE_LIMIT_BURST`. A client over
+  its rate is refused with 429.
+- `ConcurrencyLimiter` lets at most `WRITE_CONCURRENCY_LIMIT` writes run at
+  once. Up to `WRITE_QUEUE_SIZE` more wait for a slot in arrival order, for at
+  most `WRITE_QUEUE_TIMEOUT_MS`. A write that finds the queue full, or waits
+  too long, is refused with 503.
+
+Both read their settings from the application config on every call, so the
+limits can be changed while the application runs. A limit of 0 disables it.
+Refusals carry the seconds a client should wait before retrying, which the
+routes send as a `Retry-After` header. The limits belong to one process.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from app import metrics
+
+HOLD_SMOOTHING = 0.1  # Weight of the newest sample in the average write duration
+
+
+class RateLimiter:
+    """
+    Per-client token buckets, kept for the most recently seen clients.
+
+    Attributes:
+        rejections (int): Requests refused for exceeding the rate.
+    """
+
+    def __init__(self, config, clock=time.monotonic):
+        self._config = config
+        self._clock = clock
+        self._buckets = OrderedDict()  # client_id -> [tokens, last refill], least recent first
+        self._lock = threading.Lock()
+        self.rejections = 0
+
+    def check(self, client_id):
+        """
+        Take one token from a client's bucket.
+
+        Args:
+            client_id (str): The ATM or client identifier.
+
+        Returns:
+            dict | None: None if the request is admitted, otherwise an error dict
+            with `retry_after` in whole seconds.
+        """
+        rate = self._config["RATE_LIMIT_PER_SECOND"]
+        if not rate:
+            return None
+        burst = self._config["RATE_LIMIT_BURST"] or rate
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = self._buckets[client_id] = [burst, now]
+                if len(self._buckets) > self._config["RATE_LIMIT_MAX_CLIENTS"]:
+                    self._buckets.popitem(last=False)  # A forgotten client starts again with a full bucket
+            else:
+                self._buckets.move_to_end(client_id)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return None
+            self.rejections += 1
+            wait = (1 - bucket[0]) / rate
+        metrics.RATE_LIMITED.inc()
+        return {"error": "Rate limit exceeded", "code": 429, "retry_after": max(1, math.ceil(wait))}
+
+    def stats(self):
+        """Return the number of tracked clients and rejections."""
+        with self._lock:
+            return {"clients": len(self._buckets), "rejections": self.rejections}
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds concurrent writes, with a bounded FIFO queue of writes waiting for a slot.
+
+    A released slot passes directly to the longest waiter, as with
+    `lock_manager.FairLock`, so a newcomer cannot overtake the queue.
+
+    Attributes:
+        active (int): Writes holding a slot.
+        admitted (int): Writes given a slot.
+        queued (int): Admitted writes that had to wait.
+        shed (int): Writes refused because the queue was full or the wait ran out.
+    """
+
+    def __init__(self, config):
+        self._config = config
+        self._mutex = threading.Lock()
+        self._waiters = deque()
+        self._hold_seconds = 0.0  # Moving average of how long a write holds its slot
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+
+    def acquire(self):
+        """
+        Take a write slot, waiting in the queue if every slot is held.
+
+        Returns:
+            dict | None: None once a slot is held, to be given back with `release`,
+            otherwise an error dict with `retry_after` in whole seconds.
+        """
+        limit = self._config["WRITE_CONCURRENCY_LIMIT"]
+        with self._mutex:
+            if not limit or (self.active < limit and not self._waiters):
+                self.active += 1
+                self.admitted += 1
+                return None
+            if len(self._waiters) >= self._config["WRITE_QUEUE_SIZE"]:
+                return self._refuse(metrics.WRITE_QUEUE_FULL, limit)
+            waiter = threading.Lock()
+            waiter.acquire()
+            self._waiters.append(waiter)
+        # Released by `release`, which has already counted the slot as ours
+        if waiter.acquire(timeout=self._config["WRITE_QUEUE_TIMEOUT_MS"] / 1000):
+            with self._mutex:
+                self.admitted += 1
+                self.queued += 1
+            return None
+        with self._mutex:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:  # Handed a slot just as the wait ran out
+                self.admitted += 1
+                self.queued += 1
+                return None
+            return self._refuse(metrics.WRITE_QUEUE_TIMEOUT, limit)
+
+    def _refuse(self, counter, limit):
+        """Count a refused write and build its error. Runs under the mutex."""
+        self.shed += 1
+        counter.inc()
+        # Roughly the time for the writes ahead of a retry to drain
+        wait = self._hold_seconds * (len(self._waiters) + 1) / limit
+        return {"error": "Server is busy, retry later", "code": 503, "retry_after": max(1, math.ceil(wait))}
+
+    def release(self, held_seconds):
+        """
+        Give back a slot taken by `acquire`.
+
+        Args:
+            held_seconds (float): How long the write held the slot.
+        """
+        limit = self._config["WRITE_CONCURRENCY_LIMIT"]
+        with self._mutex:
+            self._hold_seconds += HOLD_SMOOTHING * (held_seconds - self._hold_seconds)
+            self.active -= 1
+            # Usually hands the freed slot to one waiter; more if the limit was raised or removed
+            while self._waiters and (not limit or self.active < limit):
+                self.active += 1
+                self._waiters.popleft().release()
+
+    def stats(self):
+        """Return the slot and queue counters."""
+        with self._mutex:
+            return {
+                "active": self.active,
+                "waiting": len(self._waiters),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "shed": self.shed,
+                "average_write_ms": round(self._hold_seconds * 1000, 3),
+            }
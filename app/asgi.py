@@ -0,0 +1,162 @@
+"""
+ASGI Application Module
+
+This module wraps the Flask application for ASGI servers such as uvicorn.
+Balance reads, withdrawals and deposits are served by the async service
+layer on the event loop, so one worker can keep many of them in flight while
+they wait on the database. Every other request, and the ones that depend on
+thread-based machinery (idempotency keys, write combining, the ledger
+journal, withdrawal limits, admission control), is passed to the Flask
+application unchanged through `asgiref`'s WSGI adapter.
+
+In-memory SQLite cannot be shared with a second (async) engine, so with it
+all requests go through Flask.
+"""
+
+import json
+import logging
+import re
+import time
+from app import is_memory_sqlite, metrics
+from app.utils import format_error, format_response, parse_balance_change
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ASYNC_ROUTE = re.compile(r"^/accounts/(?P<account_number>[^/]+)/(?P<action>balance|withdraw|deposit)$")
+ASYNC_METHODS = {"balance": "GET", "withdraw": "POST", "deposit": "POST"}
+# Report async requests under the Flask endpoint that would otherwise have served them
+ASYNC_TIMERS = {
+    action: metrics.REQUEST_DURATION.labels(f"account.{'get_balance' if action == 'balance' else action}")
+    for action in ASYNC_METHODS
+}
+
+
+class AsyncATMApp:
+    """
+    ASGI application serving the hot account endpoints natively and the rest through Flask.
+
+    Attributes:
+        flask_app (Flask): The wrapped application.
+        async_enabled (bool): Whether the async service layer is in use.
+    """
+
+    def __init__(self, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.async_enabled = not is_memory_sqlite(flask_app.config["SQLALCHEMY_DATABASE_URI"])
+        if self.async_enabled:
+            from app.data_access.async_account_repository import create_async_lock_manager, create_async_session_factory
+            flask_app.extensions["async_session_factory"] = create_async_session_factory(flask_app.config)
+            flask_app.extensions["async_lock_manager"] = create_async_lock_manager(flask_app.config)
+        else:
+            logger.warning("In-memory SQLite cannot be shared with an async engine; serving every request through Flask")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http" and self.async_enabled:
+            match = ASYNC_ROUTE.match(scope["path"])
+            if match and self._serves(scope, match):
+                started = time.perf_counter()
+                try:
+                    return await self._handle(scope, match["account_number"], match["action"], receive, send)
+                finally:
+                    ASYNC_TIMERS[match["action"]].observe(time.perf_counter() - started)
+        await self.wsgi(scope, receive, send)
+
+    def _serves(self, scope, match):
+        """Decide whether a matched request can be served by the async layer."""
+        if scope["method"] != ASYNC_METHODS[match["action"]]:
+            return False
+        config = self.flask_app.config
+        # Flask carries the commit position that replica reads are routed by
+        if config["RATE_LIMIT_PER_SECOND"] or self.flask_app.extensions.get("replica_router") is not None:
+            return False
+        if match["action"] == "balance":
+            return True
+        if config["WRITE_CONCURRENCY_LIMIT"] or any(name == b"idempotency-key" for name, _ in scope["headers"]):
+            return False
+        extensions = self.flask_app.extensions
+        return all(extensions.get(name) is None for name in ("write_combiner", "ledger_journal", "withdrawal_limits"))
+
+    async def _handle(self, scope, account_number, action, receive, send):
+        from app.services.async_account_service import balance_change_service, get_balance_service
+
+        with self.flask_app.app_context():
+            logger.info("Received async %s request for account %s", action, account_number)
+            if action == "balance":
+                result = await get_balance_service(account_number)
+                error_code = result.get("code", 404)
+            else:
+                body, error = await self._read_body(scope, receive)
+                if error is None:
+                    command, error = parse_balance_change(action, account_number, body)
+                if error is not None:
+                    return await self._respond(send, format_response(format_error(error["error"], error["code"]), success=False, code=error["code"]), error["code"])
+                result = await balance_change_service(command)
+                error_code = result.get("code", 400)
+
+            if "error" in result:
+                return await self._respond(send, format_response(format_error(result["error"], error_code), success=False, code=error_code), error_code)
+            await self._respond(send, format_response(result), 200)
+
+    async def _read_body(self, scope, receive):
+        """
+        Read a JSON request body.
+
+        Returns:
+            tuple: (decoded body, or None if it is not valid JSON, None), or
+            (None, error dict) if the body is not JSON.
+        """
+        content_type = dict(scope["headers"]).get(b"content-type", b"").split(b";")[0].strip().lower()
+        if content_type != b"application/json" and not content_type.endswith(b"+json"):
+            return None, {"error": "Missing JSON body or incorrect Content-Type", "code": 415}
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(b"".join(chunks) or b"null"), None
+        except ValueError:
+            return None, None
+
+    async def _respond(self, send, payload, status):
+        """Send a JSON response encoded the same way as Flask's `jsonify`."""
+        body = self.flask_app.json.dumps(payload).encode() + b"\n"
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        """Dispose of the async engine when the server shuts down."""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                factory = self.flask_app.extensions.get("async_session_factory")
+                if factory is not None:
+                    await factory.kw["bind"].dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app):
+    """
+    Wrap a Flask application for serving under an ASGI server.
+
+    Args:
+        flask_app (Flask): The application created by `create_app`.
+
+    Returns:
+        AsyncATMApp: The ASGI application.
+    """
+    return AsyncATMApp(flask_app)
@@ -0,0 +1,140 @@
+"""
+Command Line Interface
+
+This module registers Flask CLI commands for operational tasks, run as
+`flask --app run.py <command>`.
+"""
+
+import click
+from flask.cli import with_appcontext
+
+
+@click.command("export-statement")
+@click.argument("account_numbers", nargs=-1, required=True)
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default="ndjson", show_default=True)
+@click.option("--from", "start", help="ISO 8601 start (inclusive).")
+@click.option("--to", "end", help="ISO 8601 end (exclusive).")
+@click.option("--output", type=click.File("w"), default="-", help="Output file (default: stdout).")
+@with_appcontext
+def export_statement(account_numbers, fmt, start, end, output):
+    """
+    Stream statements for one or more accounts, e.g. every account of a branch.
+
+    Rows are written as they are read, so memory stays constant whatever the
+    history length.
+    """
+    from app.services.account_service import statement_service
+
+    for position, account_number in enumerate(account_numbers):
+        result = statement_service(account_number, fmt=fmt, start=start, end=end, header=position == 0)
+        if "error" in result:
+            raise click.ClickException(f"{account_number}: {result['error']}")
+        for chunk in result["chunks"]:
+            output.write(chunk)
+
+
+@click.command("reconcile")
+@click.option("--checkpoint", type=click.Path(dir_okay=False), help="High-water mark file; runs are incremental once it exists.")
+@click.option("--full", is_flag=True, help="Ignore the checkpoint and read every transaction.")
+@click.option("--chunk-size", type=int, default=100_000, show_default=True, help="Transactions summed per chunk.")
+@with_appcontext
+def reconcile_command(checkpoint, full, chunk_size):
+    """
+    Check that every balance equals its opening balance plus its transactions.
+
+    Mismatched accounts are listed and the command exits with status 1.
+    """
+    from app.data_access.reconciliation import reconcile
+    from app.utils import format_cents
+
+    try:
+        result = reconcile(checkpoint=checkpoint, full=full, chunk_size=chunk_size)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for mismatch in result["mismatches"]:
+        click.echo(
+            f"MISMATCH {mismatch['account_number']}: balance {format_cents(mismatch['balance_cents']):.2f}, "
+            f"ledger {format_cents(mismatch['expected_cents']):.2f}, difference {format_cents(mismatch['difference_cents']):+.2f}"
+        )
+    click.echo(
+        f"{'Incremental' if result['incremental'] else 'Full'} reconciliation of {result['accounts']} accounts, "
+        f"{result['transactions']} transactions read up to id {result['high_water']} in {result['seconds']:.2f}s: "
+        f"{len(result['mismatches'])} mismatched"
+    )
+    if result["mismatches"]:
+        raise SystemExit(1)
+
+
+@click.command("provision-accounts")
+@click.argument("source", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "parquet"]), help="Input format (default: from the file extension).")
+@click.option("--chunk-size", type=int, help="Rows validated and inserted at a time.")
+@with_appcontext
+def provision_accounts_command(source, fmt, chunk_size):
+    """
+    Bulk-create accounts from a CSV or Parquet file with account_number and balance columns.
+
+    Invalid rows are listed and skipped, and the command exits with status 1 if there were any.
+    """
+    from app.services.account_service import provision_service
+
+    fmt = fmt or ("parquet" if source.endswith(".parquet") else "csv")
+    if fmt == "csv":
+        with click.open_file(source, "r", encoding="utf-8", newline="") as stream:
+            result = provision_service(stream, fmt="csv", chunk_size=chunk_size)
+    else:
+        result = provision_service(source, fmt="parquet", chunk_size=chunk_size)
+    if "error" in result:
+        raise click.ClickException(result["error"])
+    for error in result["errors"]:
+        click.echo(f"INVALID row {error['row']}: {error['reason']}")
+    click.echo(
+        f"Read {result['rows']} rows in {result['seconds']:.2f}s ({result['rows_per_second']:,.0f} rows/s): "
+        f"{result['inserted']} accounts created, {result['existing']} already existed, {result['invalid']} invalid"
+    )
+    if result["invalid"]:
+        raise SystemExit(1)
+
+
+@click.command("archive-transactions")
+@click.option("--before", help="First month to keep in the database, as YYYY-MM (default: from ARCHIVE_HOT_MONTHS).")
+@click.option("--chunk-size", type=int, default=100_000, show_default=True, help="Transactions read per round trip.")
+@with_appcontext
+def archive_transactions_command(before, chunk_size):
+    """
+    Move closed months of transactions from the database into the archive.
+
+    Safe to rerun: a run that stopped early finishes deleting what it archived.
+    """
+    from datetime import datetime
+    from flask import current_app
+    from app.data_access.transaction_archive import archive_transactions
+
+    store = current_app.extensions["transaction_archive"]
+    if store is None:
+        raise click.ClickException("ARCHIVE_DIR is not set")
+    try:
+        before = datetime.strptime(before, "%Y-%m") if before else None
+    except ValueError:
+        raise click.ClickException(f"Invalid --before: {before!r} (expected YYYY-MM)")
+    result = archive_transactions(
+        store, before=before, hot_months=current_app.config["ARCHIVE_HOT_MONTHS"], chunk_size=chunk_size,
+    )
+    click.echo(
+        f"Archived {result['archived']} transactions into {result['segments']} segments and deleted "
+        f"{result['deleted']} from the database in {result['seconds']:.2f}s; "
+        f"everything before {result['watermark'] or 'nothing'} is archived"
+    )
+
+
+def register_commands(app):
+    """
+    Attach the CLI commands to the Flask app.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.cli.add_command(export_statement)
+    app.cli.add_command(reconcile_command)
+    app.cli.add_command(provision_accounts_command)
+    app.cli.add_command(archive_transactions_command)
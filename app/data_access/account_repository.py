@@ -5,40 +5,76 @@ This module handles database interactions related to accounts and transactions.
 It provides functions to retrieve account details, update account balances with
 proper concurrency handling, and log transactions.
 
-It ensures safe database operations using SQLAlchemy,
-including row-level locking for balance updates to prevent race conditions.
+It ensures safe database operations using SQLAlchemy, either with a single
+conditional UPDATE or with row-level locking for balance updates, to prevent
+race conditions.
 """
 
 import logging
 import time
-import threading
 import random
-from sqlalchemy.orm import scoped_session, sessionmaker
-from sqlalchemy.exc import OperationalError, SQLAlchemyError
-from app import db
-from app.models import Account, Transaction
-from sqlalchemy.exc import OperationalError
-from my_app import get_session, logger
-
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from flask import current_app, g
+from sqlalchemy import case, delete, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+from app import metrics
+from app.models import Account, IdempotencyKey, Transaction
+from app.utils import parse_cents, format_cents
 
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+
+def write_retries():
+    """
+    Returns how many write transactions have been retried after "database is locked".
+
+    Returns:
+        int: The process-wide retry count.
+    """
+    return metrics.WRITE_RETRIES.value()
+
 def get_session():
     """
-    Creates and returns a new scoped session for database operations.
+    Returns a session from the app-scoped session factory.
+
+    The factory is created once per app in `create_app` and bound to the
+    pooled engine, so each call only checks out a thread-local session
+    instead of building a new `sessionmaker`.
+
+    Returns:
+        Session: A SQLAlchemy session bound to the application's database engine.
+    """
+    return current_app.extensions["session_factory"]()
+
+
+def get_read_session():
+    """
+    Returns a session for a read that may be served by a read replica.
+
+    With `READ_REPLICA_URLS` set, the session belongs to a replica that has
+    caught up with the commit position of the current client's last write
+    (sent back by the client), or to the primary if no replica has. Without
+    replicas it is `get_session()`.
 
     Returns:
-        scoped_session: A new SQLAlchemy session bound to the application's database engine.
+        Session: A session the caller must close.
     """
-    return scoped_session(sessionmaker(bind=db.engine))
+    router = current_app.extensions.get("replica_router")
+    if router is None:
+        return get_session()
+    return router.session(g.get("read_position", 0))
 
 
 def get_account(account_number, for_update=False):
     """
     Retrieves an account from the database by its account number.
 
+    Without `for_update` the account may be read from a replica; see `get_read_session`.
+
     Args:
         account_number (str): The unique identifier of the account.
         for_update (bool): If True, applies a row-level lock on the retrieved account.
@@ -46,7 +82,7 @@ def get_account(account_number, for_update=False):
     Returns:
         Account | None: The retrieved account object if found, otherwise None.
     """
-    session = get_session()
+    session = get_session() if for_update else get_read_session()
     try:
         query = session.query(Account).filter_by(account_number=account_number)
         if for_update:
@@ -56,48 +92,994 @@ def get_account(account_number, for_update=False):
         session.close()
 
 
+def _journal(session, account_number, transaction_type, amount, balance_cents):
+    """
+    Records a balance change for the app's ledger journal, if enabled, once the transaction commits.
+
+    Args:
+        session (Session): The session running the write transaction.
+        account_number (str): The account number.
+        transaction_type (str): The `Transaction` type.
+        amount (int): The signed amount applied, in cents.
+        balance_cents (int): The balance after the change, in cents.
+    """
+    entries = session.info.get("ledger_entries")
+    if entries is not None:
+        entries.append((account_number, transaction_type, amount, balance_cents))
+
+
+def _apply_locked_update(session, account_number, amount, transaction_type):
+    """
+    Applies a balance change by locking the row, checking funds in Python and flushing.
+
+    Args:
+        session (Session): The session with an open transaction.
+        account_number (str): The account number.
+        amount (int): The signed amount to apply, in cents.
+        transaction_type (str): 'withdraw' or 'deposit'.
+
+    Returns:
+        dict: The new balance in cents, version and ledger row id, or an error message.
+    """
+    # Update balance with row-level locking
+    account = session.query(Account).filter_by(account_number=account_number).with_for_update().first()
+    if not account:
+        return {"error": "Account not found"}
+    if amount < 0 and account.balance_cents < abs(amount):
+        return {"error": "Insufficient funds"}
+    account.balance_cents += amount
+    account.version += 1
+    # Create transaction
+    transaction = Transaction(account_id=account.id, type=transaction_type, amount_cents=abs(amount))
+    session.add(transaction)
+    session.flush()  # Assigns transaction.id
+    _journal(session, account_number, transaction_type, amount, account.balance_cents)
+    return {"new_balance_cents": account.balance_cents, "version": account.version, "transaction_id": transaction.id}
+
+
+def _apply_atomic_update(session, account_number, amount, transaction_type):
+    """
+    Applies a balance change with a single conditional UPDATE ... RETURNING.
+
+    The funds check happens inside the UPDATE's WHERE clause, so the row lock
+    is held only for the statement itself. A second query runs only when no
+    row matched, to tell a missing account from insufficient funds.
+
+    Args:
+        session (Session): The session with an open transaction.
+        account_number (str): The account number.
+        amount (int): The signed amount to apply, in cents.
+        transaction_type (str): 'withdraw' or 'deposit'.
+
+    Returns:
+        dict: The new balance in cents, version and ledger row id, or an error message.
+    """
+    row = session.execute(
+        update(Account)
+        .where(Account.account_number == account_number, Account.balance_cents + amount >= 0)
+        .values(balance_cents=Account.balance_cents + amount, version=Account.version + 1)
+        .returning(Account.id, Account.balance_cents, Account.version),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if row is None:
+        if session.query(Account.id).filter_by(account_number=account_number).first() is None:
+            return {"error": "Account not found"}
+        return {"error": "Insufficient funds"}
+    transaction_id = session.execute(
+        insert(Transaction).values(account_id=row.id, type=transaction_type, amount_cents=abs(amount)).returning(Transaction.id)
+    ).scalar()
+    _journal(session, account_number, transaction_type, amount, row.balance_cents)
+    return {"new_balance_cents": row.balance_cents, "version": row.version, "transaction_id": transaction_id}
+
+
+def _cache_balance(account_number, balance_cents, version):
+    """
+    Writes a committed balance through to the app's balance cache, if enabled.
+
+    Args:
+        account_number (str): The account number.
+        balance_cents (int): The committed balance in cents.
+        version (int): The account row's version after the change.
+    """
+    cache = current_app.extensions.get("balance_cache")
+    if cache is not None:
+        cache.put(account_number, balance_cents, version)
+
+
+def get_balance(account_number):
+    """
+    Retrieves an account balance, serving it from the balance cache when possible.
+
+    On a miss the balance and version are read with one indexed query, from
+    a replica when there are any (see `get_read_session`), and cached. With
+    `BALANCE_CACHE_VALIDATION = 'version'`, an expired entry is first checked
+    against the account's version column and kept if unchanged.
+
+    Args:
+        account_number (str): The unique identifier of the account.
+
+    Returns:
+        int | None: The balance in cents, or None if the account does not exist.
+    """
+    cache = current_app.extensions.get("balance_cache")
+    if cache is not None:
+        cached = cache.get(account_number)
+        if cached is not None:
+            balance_cents, version, fresh = cached
+            if fresh:
+                return balance_cents
+            if current_app.config.get("BALANCE_CACHE_VALIDATION") == "version":
+                session = get_read_session()
+                try:
+                    current = session.execute(
+                        select(Account.version).where(Account.account_number == account_number)
+                    ).scalar()
+                finally:
+                    session.close()
+                if current is not None and cache.renew(account_number, current):
+                    return balance_cents
+
+    session = get_read_session()
+    try:
+        row = session.execute(
+            select(Account.balance_cents, Account.version).where(Account.account_number == account_number)
+        ).first()
+    finally:
+        session.close()
+    if row is None:
+        if cache is not None:
+            cache.invalidate(account_number)
+        return None
+    if cache is not None:
+        cache.put(account_number, row.balance_cents, row.version)
+    return row.balance_cents
+
+
+class _RollbackBatch(Exception):
+    """Raised inside a write transaction to roll it back and return `result` to the caller."""
+
+    def __init__(self, result):
+        super().__init__("batch rolled back")
+        self.result = result
+
+
+def _run_write_transaction(work, label, max_retries=5, accounts=(), begin_immediate=False):
+    """
+    Runs `work(session)` in one write transaction, retrying on database contention.
+
+    When the app has a lock manager, the stripes of `accounts` are held across
+    every attempt, so writers to the same account in this process wait their
+    turn instead of colliding on the database lock and backing off.
+
+    The connection is checked out and the transaction begun before `work`
+    runs, so the time spent acquiring the session, waiting for locks and
+    committing is recorded separately in the app metrics.
+
+    With a ledger journal, the balance changes `work` records with `_journal`
+    are appended after the commit and the result is returned once they are
+    on disk.
+
+    Args:
+        work (callable): Applies the changes and returns a result dict.
+        label (str): Describes the operation in log messages.
+        max_retries (int): Maximum retry attempts for database contention.
+        accounts (Iterable[str]): Account numbers the work will write.
+        begin_immediate (bool): Take SQLite's write lock at BEGIN, for work that reads
+            rows before updating them (SQLite ignores FOR UPDATE).
+
+    Returns:
+        dict: The result of `work`, or an error message.
+    """
+    retry_delay = 0.05
+    lock_manager = current_app.extensions.get("lock_manager")
+    account_locks = lock_manager.hold(*accounts) if lock_manager is not None and accounts else nullcontext()
+    session = get_session()
+    write_lock = current_app.extensions["write_lock"]
+    journal = current_app.extensions.get("ledger_journal")
+    begin_options = {"sqlite_begin_immediate": True} if begin_immediate else None
+    ticket = None
+    try:
+        started = time.perf_counter()
+        with account_locks:
+            metrics.ACCOUNT_LOCK_WAIT.observe(time.perf_counter() - started)
+            for attempt in range(max_retries):
+                try:
+                    with write_lock:
+                        session.info["ledger_entries"] = [] if journal is not None else None
+                        with session.begin():
+                            started = time.perf_counter()
+                            session.connection(execution_options=begin_options)
+                            metrics.SESSION_ACQUIRE.observe(time.perf_counter() - started - metrics.take_begin_wait())
+                            result = work(session)
+                            started = time.perf_counter()
+                        metrics.COMMIT_DURATION.observe(time.perf_counter() - started)
+                        # Journal in commit order, before another writer to these accounts can commit
+                        if session.info["ledger_entries"]:
+                            ticket = journal.append(session.info["ledger_entries"])
+                    break
+                except _RollbackBatch as e:
+                    return e.result
+                except OperationalError as e:
+                    session.rollback()
+                    if "database is locked" in str(e).lower():
+                        metrics.DATABASE_LOCKED.inc()
+                        metrics.WRITE_RETRIES.inc()
+                        logger.warning("Database contention for %s, attempt %s/%s", label, attempt + 1, max_retries)
+                        time.sleep(retry_delay + random.uniform(0, 0.01))
+                        retry_delay *= 2
+                        continue
+                    return {"error": f"Database error: {e}"}
+                except SQLAlchemyError as e:
+                    session.rollback()
+                    logger.error("Transaction failed for %s: %s", label, e)
+                    return {"error": f"Transaction failed: {str(e)}"}
+            else:
+                return {"error": "Max retries exceeded due to database contention"}
+    finally:
+        session.info.pop("ledger_entries", None)
+        session.close()
+
+    # Wait for the fsync outside the locks, so concurrent writers share it
+    if ticket is not None:
+        try:
+            journal.wait(ticket)
+        except OSError as e:
+            return {"error": f"Ledger journal write failed: {e}"}
+    return result
+
 
+def get_idempotent_result(key):
+    """
+    Looks up the stored outcome of an idempotent request without locking any account row.
+
+    Recent keys are answered from the app's idempotency cache; otherwise the
+    `idempotency_keys` table is read by primary key and the cache is filled.
 
-def perform_transaction(account_number, amount, transaction_type, max_retries=5):
+    Args:
+        key (str): The idempotency key.
+
+    Returns:
+        dict | None: The request fingerprint and its result, or None for an unknown key.
+    """
+    cache = current_app.extensions.get("idempotency_cache")
+    if cache is not None:
+        record = cache.get(key)
+        if record is not None:
+            return record
+
+    session = get_session()
+    try:
+        row = session.execute(
+            select(
+                IdempotencyKey.account_number,
+                IdempotencyKey.type,
+                IdempotencyKey.amount_cents,
+                IdempotencyKey.new_balance_cents,
+            ).where(IdempotencyKey.key == key)
+        ).first()
+    finally:
+        session.close()
+    if row is None:
+        return None
+    record = dict(row._mapping)
+    if cache is not None:
+        cache.put(key, record)
+    return record
+
+
+def _replay(record, account_number, amount, transaction_type):
+    """
+    Builds the response for a retried request from its stored record.
+
+    Args:
+        record (dict): The stored record from `get_idempotent_result`.
+        account_number (str): The account number of the retry.
+        amount (int): The signed amount of the retry, in cents.
+        transaction_type (str): The transaction type of the retry.
+
+    Returns:
+        dict: The original result marked as replayed, or an error if the key was used for a different request.
+    """
+    if (record["account_number"], record["type"], record["amount_cents"]) != (account_number, transaction_type, abs(amount)):
+        return {"error": "Idempotency-Key was already used for a different request", "code": 422}
+    return {"success": True, "account_number": account_number, "new_balance_cents": record["new_balance_cents"], "replayed": True}
+
+
+def perform_transaction(account_number, amount, transaction_type, max_retries=5, idempotency_key=None):
     """
     Performs a transaction (withdrawal or deposit) atomically, updating Accounts and Transactions.
-    
+
+    Uses a single conditional UPDATE ... RETURNING when the app enables it
+    (SQLite 3.35+ and PostgreSQL by default), otherwise locks the row and
+    checks the balance in Python.
+
+    With an idempotency key, a key seen before replays the stored result
+    without touching the account. Otherwise the key is inserted in the same
+    commit as the ledger row; if a concurrent request claims it first, the
+    unique key rolls this transaction back and its result is replayed instead.
+
+    When the app's write combiner selects the account (and no idempotency key
+    is given), the operation is queued and committed in a micro-batch with
+    other concurrent writes to the same account.
+
+    With withdrawal limits enabled, a withdrawal is first reserved against the
+    account's daily cap and velocity limit, and the reservation is released
+    if the withdrawal does not commit or raises.
+
     Args:
         account_number (str): The account number.
-        amount (float): The amount to adjust (negative for withdrawal, positive for deposit).
+        amount (int): The amount to adjust in cents (negative for withdrawal, positive for deposit).
         transaction_type (str): 'withdraw' or 'deposit'.
         max_retries (int): Maximum retry attempts for database contention.
+        idempotency_key (str | None): Client-supplied key that makes retries safe.
     
     Returns:
-        dict: Success status, new balance, or error message.
+        dict: Success status, new balance in cents, or error message. Replays carry `replayed: True`.
     """
-    retry_delay = 0.05
+    if idempotency_key is not None:
+        record = get_idempotent_result(idempotency_key)
+        if record is not None:
+            return _replay(record, account_number, amount, transaction_type)
+
+    limits = current_app.extensions.get("withdrawal_limits")
+    if limits is None or transaction_type != "withdraw":
+        return _dispatch(account_number, amount, transaction_type, max_retries, idempotency_key)
+    reservation, error = limits.reserve(account_number, -amount)
+    if error is not None:
+        return error
+    try:
+        result = _dispatch(account_number, amount, transaction_type, max_retries, idempotency_key)
+    except Exception:
+        limits.release(reservation)
+        raise
+    if "error" in result or result.get("replayed"):
+        limits.release(reservation)
+    return result
+
+
+def _dispatch(account_number, amount, transaction_type, max_retries, idempotency_key):
+    """Applies a withdrawal or deposit on its own or through the write combiner; see `perform_transaction`."""
+    combiner = current_app.extensions.get("write_combiner")
+    if combiner is None or idempotency_key is not None:
+        return _perform_single(account_number, amount, transaction_type, max_retries, idempotency_key)
+    with combiner.tracking(account_number):
+        if combiner.should_combine(account_number):
+            return combiner.submit(
+                account_number, amount, transaction_type,
+                lambda number, ops: _perform_batch(
+                    [(number, op_amount, op_type) for op_amount, op_type in ops],
+                    atomic=False,
+                    chunk_size=len(ops),
+                    max_retries=max_retries,
+                )["results"],  # Already reserved against the withdrawal limits
+            )
+        return _perform_single(account_number, amount, transaction_type, max_retries)
+
+
+def _perform_single(account_number, amount, transaction_type, max_retries, idempotency_key=None):
+    """
+    Applies one withdrawal or deposit in its own transaction; see `perform_transaction`.
+
+    Args:
+        account_number (str): The account number.
+        amount (int): The signed amount to apply, in cents.
+        transaction_type (str): 'withdraw' or 'deposit'.
+        max_retries (int): Maximum retry attempts for database contention.
+        idempotency_key (str | None): Key to store in the same commit.
+
+    Returns:
+        dict: Success status, new balance in cents, or error message.
+    """
+    apply_update = _apply_atomic_update if current_app.extensions["atomic_update"] else _apply_locked_update
+
+    def work(session):
+        result = apply_update(session, account_number, amount, transaction_type)
+        if "error" in result or idempotency_key is None:
+            return result
+        try:
+            session.execute(insert(IdempotencyKey).values(
+                key=idempotency_key,
+                account_number=account_number,
+                type=transaction_type,
+                amount_cents=abs(amount),
+                new_balance_cents=result["new_balance_cents"],
+                transaction_id=result["transaction_id"],
+                created_at=datetime.utcnow(),
+            ))
+        except IntegrityError:
+            raise _RollbackBatch({"error": "Idempotency key claimed concurrently", "duplicate_key": True})
+        return result
+
+    result = _run_write_transaction(
+        work, f"account {account_number}", max_retries, accounts=(account_number,),
+        begin_immediate=apply_update is _apply_locked_update,
+    )
+    if result.get("duplicate_key"):
+        return _replay(get_idempotent_result(idempotency_key), account_number, amount, transaction_type)
+    if "error" in result:
+        if result["error"] == "Insufficient funds":
+            metrics.INSUFFICIENT_FUNDS.inc()
+        return result
+    _cache_balance(account_number, result["new_balance_cents"], result["version"])
+    if idempotency_key is not None:
+        cache = current_app.extensions.get("idempotency_cache")
+        if cache is not None:
+            cache.put(idempotency_key, {
+                "account_number": account_number,
+                "type": transaction_type,
+                "amount_cents": abs(amount),
+                "new_balance_cents": result["new_balance_cents"],
+            })
+    logger.info("Transaction %s of %s cents for account %s completed", transaction_type, abs(amount), account_number)
+    return {"success": True, "account_number": account_number, "new_balance_cents": result["new_balance_cents"]}
+
+
+def purge_idempotency_keys(ttl, batch_size=1000):
+    """
+    Deletes idempotency keys older than `ttl` seconds, in short transactions of `batch_size` rows.
+
+    Args:
+        ttl (float): Age in seconds after which a key expires.
+        batch_size (int): Keys deleted per transaction, to keep each write lock short.
+
+    Returns:
+        int: The number of keys deleted.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+    expired = (
+        select(IdempotencyKey.key)
+        .where(IdempotencyKey.created_at < cutoff)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    deleted = 0
+    while True:
+        result = _run_write_transaction(
+            lambda session: {"deleted": session.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired)),
+                execution_options={"synchronize_session": False},
+            ).rowcount},
+            "idempotency key sweep",
+        )
+        if "error" in result:
+            logger.error("Idempotency key sweep stopped: %s", result['error'])
+            return deleted
+        deleted += result["deleted"]
+        if result["deleted"] < batch_size:
+            break
+    if deleted:
+        logger.info("Purged %s expired idempotency keys", deleted)
+    return deleted
+
+
+def purge_archived_transactions(watermark, max_id, batch_size=5000):
+    """
+    Deletes transactions copied to the archive, in short transactions of `batch_size` rows.
+
+    Idempotency keys still pointing at a deleted transaction are deleted with it.
+
+    Args:
+        watermark (datetime): Every transaction before it is archived.
+        max_id (int): Highest archived transaction id; rows above it are never deleted.
+        batch_size (int): Transactions deleted per transaction, to keep each write lock short.
+
+    Returns:
+        int: The number of transactions deleted.
+    """
+    archived = (
+        select(Transaction.id)
+        .where(Transaction.timestamp < watermark, Transaction.id <= max_id)
+        .limit(batch_size)
+    )
+
+    def work(session):
+        ids = session.execute(archived).scalars().all()
+        if ids:
+            session.execute(delete(IdempotencyKey).where(IdempotencyKey.transaction_id.in_(ids)),
+                            execution_options={"synchronize_session": False})
+            session.execute(delete(Transaction).where(Transaction.id.in_(ids)),
+                            execution_options={"synchronize_session": False})
+        return {"deleted": len(ids)}
+
+    deleted = 0
+    while True:
+        result = _run_write_transaction(work, "archived transaction purge")
+        if "error" in result:
+            logger.error("Archived transaction purge stopped: %s", result['error'])
+            return deleted
+        deleted += result["deleted"]
+        if result["deleted"] < batch_size:
+            break
+    if deleted:
+        logger.info("Purged %s archived transactions", deleted)
+    return deleted
+
+
+def _apply_batch(session, operations, indices, atomic):
+    """
+    Applies a group of operations in the caller's transaction.
+
+    All affected rows are locked up front in account-number order, so two
+    batches touching the same accounts always lock them in the same order and
+    cannot deadlock. Operations on the same account are applied in submission
+    order, then balances are written with one executemany UPDATE and the ledger
+    with one executemany INSERT.
+
+    Args:
+        session (Session): The session with an open transaction.
+        operations (list[tuple]): (account_number, signed amount in cents, transaction_type) tuples.
+        indices (list[int]): Positions in `operations` to apply, sorted by account number.
+        atomic (bool): Roll back the whole group if any operation fails.
+
+    Returns:
+        dict: Per-operation results keyed by position.
+    """
+    numbers = sorted({operations[i][0] for i in indices})
+    rows = session.execute(
+        select(Account.id, Account.account_number, Account.balance_cents, Account.version)
+        .where(Account.account_number.in_(numbers))
+        .order_by(Account.account_number)
+        .with_for_update()
+    ).all()
+    balances = {row.account_number: [row.id, row.balance_cents, row.version, False] for row in rows}
+
+    results = {}
+    ledger = []
+    for i in indices:
+        account_number, amount, transaction_type = operations[i]
+        account = balances.get(account_number)
+        if account is None:
+            results[i] = {"error": "Account not found"}
+            continue
+        if account[1] + amount < 0:
+            results[i] = {"error": "Insufficient funds"}
+            continue
+        account[1] += amount
+        account[3] = True
+        ledger.append({"account_id": account[0], "type": transaction_type, "amount_cents": abs(amount)})
+        _journal(session, account_number, transaction_type, amount, account[1])
+        results[i] = {"new_balance_cents": account[1]}
+
+    failed = len(indices) - len(ledger)
+    if atomic and failed:
+        raise _RollbackBatch({"results": results, "rolled_back": True})
+
+    changed = {
+        account_number: {"id": account_id, "balance_cents": balance, "version": version + 1}
+        for account_number, (account_id, balance, version, dirty) in balances.items() if dirty
+    }
+    if changed:
+        session.execute(update(Account), list(changed.values()))
+        session.execute(insert(Transaction), ledger)
+    return {"results": results, "rolled_back": False, "changed": changed}
+
+
+def perform_batch(operations, atomic=False, chunk_size=500, max_retries=5):
+    """
+    Applies many withdrawals and deposits with group commit.
+
+    In atomic mode every operation shares one transaction and any failure rolls
+    all of them back. Otherwise operations are committed in chunks of
+    `chunk_size`, and a failed operation does not affect the others.
+
+    With withdrawal limits enabled, each withdrawal is first reserved as in
+    `perform_transaction`. A withdrawal over a limit fails on its own, or
+    rejects the whole batch in atomic mode; reservations of withdrawals that
+    do not commit are released.
+
+    Args:
+        operations (list[tuple]): (account_number, signed amount in cents, transaction_type) tuples.
+        atomic (bool): All-or-nothing semantics.
+        chunk_size (int): Operations per transaction in independent mode.
+        max_retries (int): Maximum retry attempts for database contention.
+
+    Returns:
+        dict: `committed` flag and a result per operation, in submission order.
+    """
+    limits = current_app.extensions.get("withdrawal_limits")
+    if limits is None:
+        return _perform_batch(operations, atomic, chunk_size, max_retries)
+    reservations = {}
+    refused = {}
+    for i, (account_number, amount, transaction_type) in enumerate(operations):
+        if transaction_type == "withdraw":
+            reservation, error = limits.reserve(account_number, -amount)
+            if error is None:
+                reservations[i] = reservation
+            else:
+                refused[i] = {"error": error["error"]}
+    if refused and atomic:
+        for reservation in reservations.values():
+            limits.release(reservation)
+        return {"committed": False, "results": [refused.get(i, {"error": "Batch rolled back"}) for i in range(len(operations))]}
+
+    allowed = [i for i in range(len(operations)) if i not in refused]
+    try:
+        outcome = _perform_batch([operations[i] for i in allowed], atomic, chunk_size, max_retries)
+    except Exception:
+        for reservation in reservations.values():
+            limits.release(reservation)
+        raise
+    results = dict(refused)
+    for i, result in zip(allowed, outcome["results"]):
+        results[i] = result
+        if "error" in result and i in reservations:
+            limits.release(reservations[i])
+    return {"committed": outcome["committed"], "results": [results[i] for i in range(len(operations))]}
+
+
+def _perform_batch(operations, atomic, chunk_size, max_retries):
+    """
+    Applies a batch without checking withdrawal limits; see `perform_batch`.
+
+    Args:
+        operations (list[tuple]): (account_number, signed amount in cents, transaction_type) tuples.
+        atomic (bool): All-or-nothing semantics.
+        chunk_size (int): Operations per transaction in independent mode.
+        max_retries (int): Maximum retry attempts for database contention.
+
+    Returns:
+        dict: `committed` flag and a result per operation, in submission order.
+    """
+    order = sorted(range(len(operations)), key=lambda i: operations[i][0])
+    chunks = [order] if atomic else [order[i:i + chunk_size] for i in range(0, len(order), chunk_size)]
+    results = [None] * len(operations)
+    committed = True
+
+    for chunk in chunks:
+        outcome = _run_write_transaction(
+            lambda session: _apply_batch(session, operations, chunk, atomic),
+            f"batch of {len(chunk)} operations",
+            max_retries,
+            accounts=[operations[i][0] for i in chunk],
+            begin_immediate=True,
+        )
+        if "error" in outcome:
+            committed = False
+            for i in chunk:
+                results[i] = {"error": outcome["error"]}
+            continue
+        committed = committed and not outcome["rolled_back"]
+        for i, result in outcome["results"].items():
+            if "error" in result:
+                if result["error"] == "Insufficient funds":
+                    metrics.INSUFFICIENT_FUNDS.inc()
+                results[i] = result
+            elif outcome["rolled_back"]:
+                results[i] = {"error": "Batch rolled back"}
+            else:
+                results[i] = {"success": True, "account_number": operations[i][0], "new_balance_cents": result["new_balance_cents"]}
+        for account_number, row in outcome.get("changed", {}).items():
+            _cache_balance(account_number, row["balance_cents"], row["version"])
+
+    logger.info("Batch of %s operations processed in %s transaction(s), committed=%s", len(operations), len(chunks), committed)
+    return {"committed": committed, "results": results}
+
+
+def _apply_transfer(session, from_account, to_account, amount, transfer_id):
+    """
+    Moves money between two accounts in the caller's transaction.
+
+    Both rows are locked in account-number order, whichever direction the
+    money flows, so opposing transfers (A to B and B to A) cannot deadlock.
+
+    Args:
+        session (Session): The session with an open transaction.
+        from_account (str): The account to debit.
+        to_account (str): The account to credit.
+        amount (int): The amount to move, in cents.
+        transfer_id (str): Identifier shared by both ledger rows.
+
+    Returns:
+        dict: Both new balances in cents, or an error message.
+    """
+    rows = session.execute(
+        select(Account.id, Account.account_number, Account.balance_cents, Account.version)
+        .where(Account.account_number.in_(sorted((from_account, to_account))))
+        .order_by(Account.account_number)
+        .with_for_update()
+    ).all()
+    accounts = {row.account_number: row for row in rows}
+    source = accounts.get(from_account)
+    destination = accounts.get(to_account)
+    if source is None:
+        return {"error": "Source account not found"}
+    if destination is None:
+        return {"error": "Destination account not found"}
+    if source.balance_cents < amount:
+        return {"error": "Insufficient funds"}
+
+    from_balance = source.balance_cents - amount
+    to_balance = destination.balance_cents + amount
+    session.execute(update(Account), [
+        {"id": source.id, "balance_cents": from_balance, "version": source.version + 1},
+        {"id": destination.id, "balance_cents": to_balance, "version": destination.version + 1},
+    ])
+    session.execute(insert(Transaction), [
+        {"account_id": source.id, "type": "transfer_out", "amount_cents": amount, "transfer_id": transfer_id},
+        {"account_id": destination.id, "type": "transfer_in", "amount_cents": amount, "transfer_id": transfer_id},
+    ])
+    _journal(session, from_account, "transfer_out", -amount, from_balance)
+    _journal(session, to_account, "transfer_in", amount, to_balance)
+    return {
+        "from_balance_cents": from_balance,
+        "to_balance_cents": to_balance,
+        "from_version": source.version + 1,
+        "to_version": destination.version + 1,
+    }
+
+
+def perform_transfer(from_account, to_account, amount, max_retries=5):
+    """
+    Transfers money between two accounts atomically.
+
+    The debit, the credit and both linked `Transaction` rows are written in a
+    single database transaction. With withdrawal limits enabled, the debit is
+    reserved against the source account's limits like a withdrawal.
+
+    Args:
+        from_account (str): The account to debit.
+        to_account (str): The account to credit.
+        amount (int): The amount to move, in cents.
+        max_retries (int): Maximum retry attempts for database contention.
+
+    Returns:
+        dict: Success status, transfer id and both new balances in cents, or an error message.
+    """
+    limits = current_app.extensions.get("withdrawal_limits")
+    reservation = None
+    if limits is not None:
+        reservation, error = limits.reserve(from_account, amount)
+        if error is not None:
+            return error
+    transfer_id = uuid.uuid4().hex
+    try:
+        result = _run_write_transaction(
+            lambda session: _apply_transfer(session, from_account, to_account, amount, transfer_id),
+            f"transfer {from_account} -> {to_account}",
+            max_retries,
+            accounts=(from_account, to_account),
+            begin_immediate=True,
+        )
+    except Exception:
+        if reservation is not None:
+            limits.release(reservation)
+        raise
+    if "error" in result:
+        if reservation is not None:
+            limits.release(reservation)
+        if result["error"] == "Insufficient funds":
+            metrics.INSUFFICIENT_FUNDS.inc()
+        return result
+    _cache_balance(from_account, result["from_balance_cents"], result["from_version"])
+    _cache_balance(to_account, result["to_balance_cents"], result["to_version"])
+    logger.info("Transfer %s of %s cents from %s to %s completed", transfer_id, amount, from_account, to_account)
+    return {
+        "success": True,
+        "transfer_id": transfer_id,
+        "from_account": from_account,
+        "to_account": to_account,
+        "from_balance_cents": result["from_balance_cents"],
+        "to_balance_cents": result["to_balance_cents"],
+    }
+
+
+def set_withdrawal_limits(account_number, daily_limit_cents, per_minute):
+    """
+    Stores an account's own withdrawal limits and applies them to the app's limits engine.
+
+    Args:
+        account_number (str): The account number.
+        daily_limit_cents (int | None): Daily withdrawal cap in cents; None for the default.
+        per_minute (int | None): Withdrawals allowed per minute; None for the default.
+
+    Returns:
+        dict: Success status or error message.
+    """
+    result = _run_write_transaction(
+        lambda session: {"updated": session.execute(
+            update(Account)
+            .where(Account.account_number == account_number)
+            .values(daily_withdrawal_limit_cents=daily_limit_cents, withdrawals_per_minute=per_minute),
+            execution_options={"synchronize_session": False},
+        ).rowcount},
+        f"limits of account {account_number}",
+        accounts=(account_number,),
+    )
+    if "error" in result:
+        return result
+    if not result["updated"]:
+        return {"error": "Account not found"}
+    limits = current_app.extensions.get("withdrawal_limits")
+    if limits is not None:
+        limits.set_limits(account_number, daily_limit_cents, per_minute)
+    return {"success": True}
+
+
+def _archive():
+    """Return the transaction archive, or None if `ARCHIVE_DIR` is not set."""
+    return current_app.extensions.get("transaction_archive")
+
+
+def get_transactions(account_number, limit, after=None, types=None, start=None, end=None):
+    """
+    Retrieves one page of an account's transactions, newest first.
+
+    Pages are addressed by keyset: `after` is the (timestamp, id) of the last
+    row of the previous page, so every page is a range scan on the
+    (account_id, timestamp, id) index however deep it is. When the table
+    does not fill the page, it continues with archived rows, which are all
+    older than the table's.
+
+    Args:
+        account_number (str): The account number.
+        limit (int): Maximum number of rows to return.
+        after (tuple | None): (timestamp, id) to continue after.
+        types (list[str] | None): Only return these transaction types.
+        start (datetime | None): Only return rows at or after this time.
+        end (datetime | None): Only return rows before this time.
+
+    Returns:
+        list[Transaction | ArchivedTransaction] | None: The rows, or None if the account does not exist.
+    """
+    archive = _archive()
     session = get_session()
-    for attempt in range(max_retries):
+    try:
+        account_id = session.execute(select(Account.id).where(Account.account_number == account_number)).scalar()
+        if account_id is None:
+            return None
+        while True:
+            index = archive.snapshot() if archive is not None else None
+            query = select(Transaction).where(Transaction.account_id == account_id)
+            if index is not None and index.watermark is not None:
+                query = query.where(Transaction.timestamp >= index.watermark)
+            if after is not None:
+                query = query.where(tuple_(Transaction.timestamp, Transaction.id) < tuple_(*after))
+            if types:
+                query = query.where(Transaction.type.in_(types))
+            if start is not None:
+                query = query.where(Transaction.timestamp >= start)
+            if end is not None:
+                query = query.where(Transaction.timestamp < end)
+            query = query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit)
+            rows = session.execute(query).scalars().all()
+            if index is None or index.watermark is None:
+                return rows
+            if len(rows) < limit and (start is None or start < index.watermark):
+                rows += archive.history(index, account_id, limit - len(rows), after=after, types=types, start=start, end=end)
+            # Under READ COMMITTED an archival run committing meanwhile may have purged rows
+            # the table query expected; SQLite's snapshot is already open, so this holds at once
+            if archive.snapshot() is index:
+                return rows
+    finally:
+        session.close()
+
+
+# Direction in which each transaction type moves the balance
+SIGNED_TYPES = {"deposit": 1, "transfer_in": 1, "withdraw": -1, "transfer_out": -1}
+
+
+def stream_statement(account_number, start=None, end=None, batch_size=1000):
+    """
+    Opens a streaming read of an account's ledger, oldest first.
+
+    The opening balance and the row stream come from one session, in one
+    transaction, so they describe the same snapshot (REPEATABLE READ on
+    PostgreSQL). Rows are fetched `batch_size` at a time through a server-side
+    cursor (`yield_per`), so memory does not grow with the history length.
+    The session is closed when the row generator is exhausted or closed.
+    Archived rows, all older than the table's, are streamed first.
+
+    Args:
+        account_number (str): The account number.
+        start (datetime | None): Only include rows at or after this time.
+        end (datetime | None): Only include rows before this time.
+        batch_size (int): Rows fetched per round trip.
+
+    Returns:
+        tuple | None: (opening balance in cents, generator of ledger rows), or None if
+        the account does not exist.
+    """
+    session = current_app.extensions["session_factory"].session_factory()
+    try:
+        if session.get_bind().dialect.name == "postgresql":
+            session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        account = session.execute(
+            select(Account.id, Account.balance_cents).where(Account.account_number == account_number)
+        ).first()
+        if account is None:
+            session.close()
+            return None
+
+        # Taken once the snapshot is open: rows an archival run deletes after it are still in the snapshot
+        archive = _archive()
+        index = archive.snapshot() if archive is not None else None
+        watermark = index.watermark if index is not None else None
+        # Table rows before the watermark are archived copies awaiting deletion
+        hot_start = max(start, watermark) if start is not None and watermark is not None else start or watermark
+
+        # Opening balance = current balance minus every signed change from `start` onwards
+        signed = case(SIGNED_TYPES, value=Transaction.type, else_=0) * Transaction.amount_cents
+        since = select(func.coalesce(func.sum(signed), 0)).where(Transaction.account_id == account.id)
+        if hot_start is not None:
+            since = since.where(Transaction.timestamp >= hot_start)
+        opening = account.balance_cents - session.execute(since).scalar()
+
+        query = (
+            select(Transaction.id, Transaction.timestamp, Transaction.type, Transaction.amount_cents, Transaction.transfer_id)
+            .where(Transaction.account_id == account.id)
+            .order_by(Transaction.timestamp, Transaction.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if hot_start is not None:
+            query = query.where(Transaction.timestamp >= hot_start)
+        if end is not None:
+            query = query.where(Transaction.timestamp < end)
+        result = session.execute(query)
+
+        archived = ()
+        if watermark is not None:
+            opening -= archive.signed_sum(index, account.id, start=start)
+            if start is None or start < watermark:
+                archived = archive.rows(index, account.id, start=start, end=min(end, watermark) if end else watermark)
+    except Exception:
+        session.close()
+        raise
+
+    def rows():
         try:
-            with session.begin():  # Single transaction for both operations
-                # Update balance with row-level locking
-                account = session.query(Account).filter_by(account_number=account_number).with_for_update().first()
-                if not account:
-                    return {"error": "Account not found"}
-                if amount < 0 and account.balance < abs(amount):
-                    return {"error": "Insufficient funds"}
-                account.balance += amount
-                # Create transaction
-                transaction = Transaction(account_id=account.id, type=transaction_type, amount=abs(amount))
-                session.add(transaction)
-            logger.info(f"Transaction {transaction_type} of {abs(amount)} for account {account_number} completed")
-            return {"success": True, "account_number": account_number, "new_balance": account.balance}
-        except OperationalError as e:
-            session.rollback()
-            if "database is locked" in str(e).lower():
-                logger.warning(f"Database contention for account {account_number}, attempt {attempt + 1}/{max_retries}")
-                time.sleep(retry_delay + random.uniform(0, 0.01))
-                retry_delay *= 2
-                continue
-            return {"error": f"Database error: {e}"}
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"Transaction failed for account {account_number}: {e}")
-            return {"error": f"Transaction failed: {str(e)}"}
-    return {"error": "Max retries exceeded due to database contention"}
+            yield from archived
+            yield from result
+        finally:
+            session.close()
+
+    return opening, rows()
+
+
+def update_account_balance(account_number, amount):
+    """
+    Adjusts an account balance by a signed amount and records the transaction.
+
+    Args:
+        account_number (str): The account number.
+        amount (float): Amount in currency units; positive to deposit, negative to withdraw.
+
+    Returns:
+        dict: Success status, new balance in currency units, or error message.
+    """
+    transaction_type = 'withdraw' if amount < 0 else 'deposit'
+    cents = parse_cents(abs(amount))
+    if cents is None:
+        return {"error": "Invalid amount"}
+    result = perform_transaction(account_number, -cents if amount < 0 else cents, transaction_type)
+    if "error" in result:
+        return result
+    return {"success": True, "account_number": account_number, "new_balance": format_cents(result["new_balance_cents"])}
+
+
+def create_transaction(account_number, transaction_type, amount):
+    """
+    Records a transaction for an account without changing its balance.
+
+    Args:
+        account_number (str): The account number.
+        transaction_type (str): 'withdraw' or 'deposit'.
+        amount (float): The transaction amount in currency units.
+
+    Returns:
+        dict: Success status or error message.
+    """
+    session = get_session()
+    try:
+        with session.begin():
+            account = session.query(Account).filter_by(account_number=account_number).first()
+            if not account:
+                return {"error": "Account not found"}
+            session.add(Transaction(account_id=account.id, type=transaction_type, amount=abs(amount)))
+        return {"success": True}
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error("Failed to record transaction for account %s: %s", account_number, e)
+        return {"error": f"Transaction failed: {str(e)}"}
+    finally:
+        session.close()
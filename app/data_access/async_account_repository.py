@@ -0,0 +1,269 @@
+"""
+Async Account Repository Module
+
+This module is the asyncio counterpart of `account_repository`, used by the
+ASGI serving mode. It runs on SQLAlchemy's `AsyncSession` with aiosqlite or
+asyncpg, so a request waiting on the database, or backing off after lock
+contention, yields the event loop instead of tying up a worker.
+
+Reads use the same balance cache as the synchronous layer, and balance changes
+use the same single-statement or row-locking update, so both layers can serve
+the same database side by side.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import nullcontext
+from flask import current_app
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from app import metrics
+from app.models import Account, Transaction
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_uri(url):
+    """
+    Translate the configured database URL to its async driver.
+
+    Args:
+        url (str | URL): The synchronous SQLAlchemy URL.
+
+    Returns:
+        URL: The same database addressed through aiosqlite or asyncpg.
+
+    Raises:
+        ValueError: If the backend has no supported async driver.
+    """
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for database backend '{url.get_backend_name()}'")
+    return url.set(drivername=driver)
+
+
+def create_async_lock_manager(config):
+    """
+    Build the async lock manager for an app, or None when it is disabled.
+
+    SQLite admits one writer at a time for the whole database, so there a
+    single stripe queues all of a process's writers on the event loop rather
+    than in SQLite's sleeping busy handler.
+
+    Args:
+        config (dict): The Flask application config.
+
+    Returns:
+        AsyncStripedLockManager | None: The lock manager.
+    """
+    from app.data_access.lock_manager import AsyncStripedLockManager
+
+    if not config.get("LOCK_MANAGER_ENABLED"):
+        return None
+    if make_url(config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() == "sqlite":
+        return AsyncStripedLockManager(1)
+    return AsyncStripedLockManager(config["LOCK_MANAGER_STRIPES"])
+
+
+def create_async_session_factory(config):
+    """
+    Build the async engine and session factory for an app's database.
+
+    The engine gets the same pool settings and SQLite pragmas as the
+    synchronous one.
+
+    Args:
+        config (dict): The Flask application config.
+
+    Returns:
+        async_sessionmaker: Factory for `AsyncSession` objects.
+    """
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from app import build_engine_options, configure_sqlite
+
+    engine = create_async_engine(async_database_uri(config["SQLALCHEMY_DATABASE_URI"]), **build_engine_options(config))
+    configure_sqlite(engine.sync_engine, config)
+    metrics.instrument_engine(engine.sync_engine)
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+def get_session():
+    """
+    Returns a new session from the app's async session factory.
+
+    Returns:
+        AsyncSession: A session bound to the async engine.
+    """
+    return current_app.extensions["async_session_factory"]()
+
+
+async def get_balance(account_number):
+    """
+    Retrieves an account balance, serving it from the balance cache when fresh.
+
+    Args:
+        account_number (str): The unique identifier of the account.
+
+    Returns:
+        int | None: The balance in cents, or None if the account does not exist.
+    """
+    cache = current_app.extensions.get("balance_cache")
+    if cache is not None:
+        cached = cache.get(account_number)
+        if cached is not None and cached[2]:
+            return cached[0]
+
+    async with get_session() as session:
+        row = (await session.execute(
+            select(Account.balance_cents, Account.version).where(Account.account_number == account_number)
+        )).first()
+    if row is None:
+        if cache is not None:
+            cache.invalidate(account_number)
+        return None
+    if cache is not None:
+        cache.put(account_number, row.balance_cents, row.version)
+    return row.balance_cents
+
+
+async def _apply_locked_update(session, account_number, amount, transaction_type):
+    """
+    Applies a balance change by locking the row and checking funds in Python.
+
+    Args:
+        session (AsyncSession): The session with an open transaction.
+        account_number (str): The account number.
+        amount (int): The signed amount to apply, in cents.
+        transaction_type (str): 'withdraw' or 'deposit'.
+
+    Returns:
+        dict: The new balance in cents and version, or an error message.
+    """
+    account = (await session.execute(
+        select(Account).filter_by(account_number=account_number).with_for_update()
+    )).scalar()
+    if not account:
+        return {"error": "Account not found"}
+    if amount < 0 and account.balance_cents < abs(amount):
+        return {"error": "Insufficient funds"}
+    account.balance_cents += amount
+    account.version += 1
+    session.add(Transaction(account_id=account.id, type=transaction_type, amount_cents=abs(amount)))
+    return {"new_balance_cents": account.balance_cents, "version": account.version}
+
+
+async def _apply_atomic_update(session, account_number, amount, transaction_type):
+    """
+    Applies a balance change with a single conditional UPDATE ... RETURNING.
+
+    Args:
+        session (AsyncSession): The session with an open transaction.
+        account_number (str): The account number.
+        amount (int): The signed amount to apply, in cents.
+        transaction_type (str): 'withdraw' or 'deposit'.
+
+    Returns:
+        dict: The new balance in cents and version, or an error message.
+    """
+    row = (await session.execute(
+        update(Account)
+        .where(Account.account_number == account_number, Account.balance_cents + amount >= 0)
+        .values(balance_cents=Account.balance_cents + amount, version=Account.version + 1)
+        .returning(Account.id, Account.balance_cents, Account.version),
+        execution_options={"synchronize_session": False},
+    )).first()
+    if row is None:
+        if (await session.execute(select(Account.id).filter_by(account_number=account_number))).first() is None:
+            return {"error": "Account not found"}
+        return {"error": "Insufficient funds"}
+    await session.execute(insert(Transaction).values(account_id=row.id, type=transaction_type, amount_cents=abs(amount)))
+    return {"new_balance_cents": row.balance_cents, "version": row.version}
+
+
+async def _run_write_transaction(work, label, max_retries=5, accounts=(), begin_immediate=False):
+    """
+    Runs `await work(session)` in one write transaction, retrying on database contention.
+
+    Writers first queue on the app's async lock manager, then backoff uses
+    `asyncio.sleep`, so other requests keep being served meanwhile. Lock wait,
+    session acquisition and commit times go to the same metrics as the
+    synchronous layer's.
+
+    Args:
+        work (callable): Coroutine function applying the changes and returning a result dict.
+        label (str): Describes the operation in log messages.
+        max_retries (int): Maximum retry attempts for database contention.
+        accounts (Iterable[str]): Account numbers the work will write.
+        begin_immediate (bool): Take SQLite's write lock at BEGIN.
+
+    Returns:
+        dict: The result of `work`, or an error message.
+    """
+    retry_delay = 0.05
+    lock_manager = current_app.extensions.get("async_lock_manager")
+    begin_options = {"sqlite_begin_immediate": True} if begin_immediate else None
+    started = time.perf_counter()
+    async with lock_manager.hold(*accounts) if lock_manager is not None else nullcontext(), get_session() as session:
+        metrics.ACCOUNT_LOCK_WAIT.observe(time.perf_counter() - started)
+        for attempt in range(max_retries):
+            try:
+                async with session.begin():
+                    started = time.perf_counter()
+                    await session.connection(execution_options=begin_options)
+                    metrics.SESSION_ACQUIRE.observe(time.perf_counter() - started - metrics.take_begin_wait())
+                    result = await work(session)
+                    started = time.perf_counter()
+                metrics.COMMIT_DURATION.observe(time.perf_counter() - started)
+                return result
+            except OperationalError as e:
+                if "database is locked" in str(e).lower():
+                    metrics.DATABASE_LOCKED.inc()
+                    metrics.WRITE_RETRIES.inc()
+                    logger.warning("Database contention for %s, attempt %s/%s", label, attempt + 1, max_retries)
+                    await asyncio.sleep(retry_delay + random.uniform(0, 0.01))
+                    retry_delay *= 2
+                    continue
+                return {"error": f"Database error: {e}"}
+            except SQLAlchemyError as e:
+                logger.error("Transaction failed for %s: %s", label, e)
+                return {"error": f"Transaction failed: {str(e)}"}
+    return {"error": "Max retries exceeded due to database contention"}
+
+
+async def perform_transaction(account_number, amount, transaction_type, max_retries=5):
+    """
+    Performs a withdrawal or deposit atomically, updating Accounts and Transactions.
+
+    Args:
+        account_number (str): The account number.
+        amount (int): The amount to adjust in cents (negative for withdrawal, positive for deposit).
+        transaction_type (str): 'withdraw' or 'deposit'.
+        max_retries (int): Maximum retry attempts for database contention.
+
+    Returns:
+        dict: Success status, new balance in cents, or error message.
+    """
+    apply_update = _apply_atomic_update if current_app.extensions["atomic_update"] else _apply_locked_update
+    result = await _run_write_transaction(
+        lambda session: apply_update(session, account_number, amount, transaction_type),
+        f"account {account_number}",
+        max_retries,
+        accounts=(account_number,),
+        begin_immediate=apply_update is _apply_locked_update,
+    )
+    if "error" in result:
+        if result["error"] == "Insufficient funds":
+            metrics.INSUFFICIENT_FUNDS.inc()
+        return result
+    cache = current_app.extensions.get("balance_cache")
+    if cache is not None:
+        cache.put(account_number, result["new_balance_cents"], result["version"])
+    logger.info("Transaction %s of %s cents for account %s completed", transaction_type, abs(amount), account_number)
+    return {"success": True, "account_number": account_number, "new_balance_cents": result["new_balance_cents"]}
@@ -0,0 +1,132 @@
+"""
+Balance Cache Module
+
+This module provides a bounded, in-process LRU cache of account balances with
+a per-entry TTL. The repository layer fills it on reads and updates it
+write-through after each committed balance change.
+
+Every entry carries the account's `version` column. A write only replaces an
+entry with a newer version, so concurrent writers that commit in one order
+and update the cache in another cannot leave an older balance behind.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class BalanceCache:
+    """
+    Thread-safe LRU/TTL cache mapping account numbers to balances in cents.
+
+    Attributes:
+        max_size (int): Maximum number of cached accounts.
+        ttl (float): Seconds an entry is served before it must be revalidated.
+        hits (int): Lookups answered from a fresh entry.
+        misses (int): Lookups that found no entry or only an expired one.
+        evictions (int): Entries dropped to stay within `max_size`.
+        revalidations (int): Expired entries renewed after a version check.
+    """
+
+    def __init__(self, max_size=100_000, ttl=5.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # account_number -> (balance_cents, version, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+    def get(self, account_number):
+        """
+        Look up a cached balance.
+
+        Args:
+            account_number (str): The account number.
+
+        Returns:
+            tuple | None: (balance_cents, version, fresh) if an entry exists, where
+            `fresh` is False once the TTL has passed, otherwise None.
+        """
+        with self._lock:
+            entry = self._entries.get(account_number)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(account_number)
+            fresh = entry[2] > self._clock()
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry[0], entry[1], fresh
+
+    def put(self, account_number, balance_cents, version):
+        """
+        Store a balance unless a newer version is already cached.
+
+        Args:
+            account_number (str): The account number.
+            balance_cents (int): The balance in cents.
+            version (int): The account row's version after the change.
+        """
+        with self._lock:
+            entry = self._entries.get(account_number)
+            if entry is not None and entry[1] > version:
+                return
+            self._entries[account_number] = (balance_cents, version, self._clock() + self.ttl)
+            self._entries.move_to_end(account_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def renew(self, account_number, version):
+        """
+        Extend an expired entry's TTL after confirming its version is current.
+
+        Args:
+            account_number (str): The account number.
+            version (int): The version currently stored in the database.
+
+        Returns:
+            bool: True if the entry was renewed.
+        """
+        with self._lock:
+            entry = self._entries.get(account_number)
+            if entry is None or entry[1] != version:
+                return False
+            self._entries[account_number] = (entry[0], version, self._clock() + self.ttl)
+            self.revalidations += 1
+            return True
+
+    def invalidate(self, account_number=None):
+        """
+        Drop one entry, or every entry when no account number is given.
+
+        Args:
+            account_number (str | None): The account to drop.
+        """
+        with self._lock:
+            if account_number is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(account_number, None)
+
+    def stats(self):
+        """
+        Snapshot of the cache counters.
+
+        Returns:
+            dict: Size, capacity and hit/miss/eviction/revalidation counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "revalidations": self.revalidations,
+            }
@@ -0,0 +1,129 @@
+"""
+Idempotency Cache Module
+
+This module keeps the outcome of recent idempotent withdrawals and deposits
+in a bounded, in-process LRU so that client retries are answered without
+touching the account row. The `idempotency_keys` table, written in the same
+commit as the ledger row, is the durable source of truth; this cache only
+fronts it.
+
+It also provides the background thread that deletes keys older than the
+configured TTL from that table.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyCache:
+    """
+    Thread-safe LRU/TTL cache mapping idempotency keys to stored results.
+
+    Attributes:
+        max_size (int): Maximum number of cached keys.
+        ttl (float): Seconds an entry is kept before it is dropped.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that found no live entry.
+        evictions (int): Entries dropped to stay within `max_size`.
+    """
+
+    def __init__(self, max_size=10_000, ttl=86_400.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (record, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Look up the stored result for an idempotency key.
+
+        Args:
+            key (str): The idempotency key.
+
+        Returns:
+            dict | None: The stored record, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, record):
+        """
+        Cache the stored result for an idempotency key.
+
+        Args:
+            key (str): The idempotency key.
+            record (dict): The request fingerprint and its result.
+        """
+        with self._lock:
+            self._entries[key] = (record, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Snapshot of the cache counters.
+
+        Returns:
+            dict: Size, capacity and hit/miss/eviction counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class IdempotencySweeper(threading.Thread):
+    """
+    Daemon thread that periodically deletes expired idempotency keys.
+
+    Attributes:
+        app (Flask): The application whose database is swept.
+        interval (float): Seconds between sweeps.
+    """
+
+    def __init__(self, app, interval):
+        super().__init__(name="idempotency-sweeper", daemon=True)
+        self.app = app
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        from app.data_access.account_repository import purge_idempotency_keys
+
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    purge_idempotency_keys(self.app.config["IDEMPOTENCY_KEY_TTL"])
+            except Exception as e:  # Keep sweeping after a transient failure
+                logger.error("Idempotency key sweep failed: %s", e)
+
+    def stop(self):
+        """Stop the sweeper after its current pass."""
+        self._stopped.set()
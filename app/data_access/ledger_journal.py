@@ -0,0 +1,423 @@
+"""
+Ledger Journal Module
+
+This module provides a durable, append-only journal of committed balance
+changes and periodic balance snapshots, so a database that does not survive a
+restart (the default in-memory SQLite) can be restored when the app starts.
+
+The journal directory holds:
+- `ledger-<first seq>.log` segments of frames. Each frame is one group commit:
+  a header (magic, record count, CRC32 of the payload) followed by fixed-size
+  records (sequence number, signed amount, balance after, type, account number).
+- `snapshot-<seq>.bin` files with every account's balance as of entry `seq`.
+
+Writers append their entries right after their database commit, while they
+still hold the write order for the accounts involved, then wait outside any
+lock for the flusher thread to write and fsync them. Entries that arrive
+while an fsync is in progress go out together in the next one (group commit),
+so a busy journal costs far fewer fsyncs than commits.
+
+Every `snapshot_every` entries the flusher also writes a snapshot and starts
+a new segment. `recover` loads the newest valid snapshot and replays only the
+segments written after it, so startup time follows the length of the tail,
+not of the whole history. A frame torn by a crash at the end of the last
+segment fails its checksum and is cut off.
+"""
+
+import glob
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+
+from app import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+FRAME = struct.Struct("<4sII")  # magic, record count, CRC32 of the payload
+FRAME_MAGIC = b"ATML"
+RECORD = struct.Struct("<QqqB20s")  # seq, signed amount in cents, balance after, type code, account number
+SNAPSHOT_HEADER = struct.Struct("<4sQQI")  # magic, seq, account count, CRC32 of the payload
+SNAPSHOT_MAGIC = b"ATMS"
+SNAPSHOT_RECORD = struct.Struct("<20sq")  # account number, balance in cents
+
+TYPE_CODES = {"open": 0, "deposit": 1, "withdraw": 2, "transfer_in": 3, "transfer_out": 4}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+SNAPSHOTS_KEPT = 2
+
+
+class LedgerCorrupted(Exception):
+    """Raised when a journal file is damaged somewhere a crash cannot explain."""
+
+
+def _segment_path(directory, first_seq):
+    return os.path.join(directory, f"ledger-{first_seq:020d}.log")
+
+
+def _snapshot_path(directory, seq):
+    return os.path.join(directory, f"snapshot-{seq:020d}.bin")
+
+
+def _numbered(directory, prefix):
+    """List (number, path) for files named `<prefix>-<number>.*`, in ascending order."""
+    found = []
+    for path in glob.glob(os.path.join(directory, f"{prefix}-*")):
+        try:
+            found.append((int(os.path.basename(path).split("-", 1)[1].split(".", 1)[0]), path))
+        except ValueError:
+            continue
+    return sorted(found)
+
+
+def _fsync_directory(directory):
+    """Make file creations and renames in `directory` durable."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_frames(path):
+    """
+    Yield the payload of each intact frame in a segment.
+
+    Stops at the first frame that is incomplete or fails its checksum.
+
+    Args:
+        path (str): The segment file.
+
+    Yields:
+        tuple: (offset of the frame, record count, payload bytes). After the last
+        intact frame, a final (offset, None, None) marks where the valid data ends.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            header = f.read(FRAME.size)
+            if len(header) < FRAME.size:
+                break
+            magic, count, crc = FRAME.unpack(header)
+            payload = f.read(count * RECORD.size) if magic == FRAME_MAGIC else b""
+            if magic != FRAME_MAGIC or len(payload) != count * RECORD.size or zlib.crc32(payload) != crc:
+                break
+            yield offset, count, payload
+            offset += FRAME.size + len(payload)
+    yield offset, None, None
+
+
+def iter_entries(directory, after_seq=0):
+    """
+    Yield every intact journal entry after `after_seq`, oldest first.
+
+    Args:
+        directory (str): The journal directory.
+        after_seq (int): Only yield entries with a higher sequence number.
+
+    Yields:
+        tuple: (seq, account number, type, signed amount in cents, balance after in cents)
+    """
+    for _, path in _numbered(directory, "ledger"):
+        for _, count, payload in read_frames(path):
+            if count is None:
+                break
+            for seq, amount, balance, code, account in RECORD.iter_unpack(payload):
+                if seq > after_seq:
+                    yield seq, account.rstrip(b"\0").decode(), TYPE_NAMES[code], amount, balance
+
+
+class LedgerJournal:
+    """
+    Append-only, group-committed journal of balance changes with snapshots.
+
+    Call `recover` once before appending; it also starts the flusher thread.
+
+    Attributes:
+        directory (str): Where segments and snapshots are kept.
+        fsync (bool): fsync every frame; without it a crash of the machine (not just the
+            process) can lose the most recent entries.
+        group_commit_delay (float): Seconds the flusher waits for more entries before writing.
+        snapshot_every (int): Entries between snapshots.
+    """
+
+    def __init__(self, directory, fsync=True, group_commit_delay=0.0, snapshot_every=100_000):
+        self.directory = directory
+        self.fsync = fsync
+        self.group_commit_delay = group_commit_delay
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)  # The flusher waits here for entries
+        self._durable = threading.Condition(self._lock)  # Writers wait here for their fsync
+        self._buffer = []
+        self._balances = {}  # Encoded account number -> balance after its latest entry
+        self._seq = 0
+        self._durable_seq = 0
+        self._since_snapshot = 0
+        self._error = None
+        self._closing = False
+        self._file = None
+        self._thread = None
+
+    def recover(self):
+        """
+        Rebuild balances from the newest snapshot and the entries written after it.
+
+        Returns:
+            dict: `balances` (account number -> cents), `snapshot_seq`, `replayed` entry count and `seq`.
+        """
+        started = time.perf_counter()
+        snapshot_seq, self._balances = self._load_snapshot()
+        self._seq = snapshot_seq
+        replayed = 0
+        segments = _numbered(self.directory, "ledger")
+        for i, (first_seq, path) in enumerate(segments):
+            following = segments[i + 1][0] if i + 1 < len(segments) else None
+            if following is not None and following - 1 <= snapshot_seq:
+                continue  # Entirely covered by the snapshot
+            for offset, count, payload in read_frames(path):
+                if count is None:
+                    self._cut_torn_tail(path, offset, following is not None)
+                    break
+                replayed += self._replay(payload, snapshot_seq)
+
+        self._durable_seq = self._seq
+        self._since_snapshot = replayed
+        self._open_segment(self._seq + 1)
+        self._thread = threading.Thread(target=self._run, name="ledger-journal", daemon=True)
+        self._thread.start()
+        balances = {account.rstrip(b"\0").decode(): balance for account, balance in self._balances.items()}
+        logger.info(
+            "Recovered %s accounts from snapshot %s and %s ledger entries in %.3fs",
+            len(balances), snapshot_seq, replayed, time.perf_counter() - started,
+        )
+        return {"balances": balances, "snapshot_seq": snapshot_seq, "replayed": replayed, "seq": self._seq}
+
+    def _replay(self, payload, snapshot_seq):
+        """Apply one frame's records newer than the snapshot; returns how many were applied."""
+        balances = self._balances
+        applied = 0
+        for seq, _, balance, _, account in RECORD.iter_unpack(payload):
+            if seq > snapshot_seq:
+                balances[account] = balance
+                applied += 1
+        if applied:
+            self._seq = seq
+        return applied
+
+    def _cut_torn_tail(self, path, offset, has_following):
+        """Truncate a segment after its last intact frame."""
+        size = os.path.getsize(path)
+        if size == offset:
+            return
+        if has_following:
+            raise LedgerCorrupted(f"{path} is damaged at byte {offset} and is not the last segment")
+        logger.warning("Discarding %s torn bytes at the end of %s", size - offset, path)
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+            os.fsync(f.fileno())
+
+    def _load_snapshot(self):
+        """Return (seq, balances) of the newest intact snapshot, or (0, {}) if there is none."""
+        for seq, path in reversed(_numbered(self.directory, "snapshot")):
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) >= SNAPSHOT_HEADER.size:
+                magic, snapshot_seq, count, crc = SNAPSHOT_HEADER.unpack_from(data)
+                payload = memoryview(data)[SNAPSHOT_HEADER.size:]
+                if magic == SNAPSHOT_MAGIC and len(payload) == count * SNAPSHOT_RECORD.size and zlib.crc32(payload) == crc:
+                    return snapshot_seq, dict(SNAPSHOT_RECORD.iter_unpack(payload))
+            logger.warning("Ignoring damaged snapshot %s", path)
+        return 0, {}
+
+    def _open_segment(self, first_seq):
+        if self._file is not None:
+            self._file.close()
+        path = _segment_path(self.directory, first_seq)
+        self._file = open(path, "ab")
+        _fsync_directory(self.directory)
+
+    def append(self, entries):
+        """
+        Queue committed balance changes for the journal.
+
+        Call it in commit order for the accounts involved, i.e. before
+        releasing whatever lock ordered the commits.
+
+        Args:
+            entries (Iterable[tuple]): (account number, type, signed amount in cents, balance after in cents).
+
+        Returns:
+            int: Ticket to pass to `wait`.
+        """
+        with self._lock:
+            seq = self._seq
+            for account_number, transaction_type, amount, balance in entries:
+                seq += 1
+                account = account_number.encode()
+                self._buffer.append(RECORD.pack(seq, amount, balance, TYPE_CODES[transaction_type], account))
+                self._balances[account.ljust(20, b"\0")] = balance
+            self._since_snapshot += seq - self._seq
+            self._seq = seq
+            self._work.notify()
+        return seq
+
+    def wait(self, ticket):
+        """
+        Block until the entries up to `ticket` are on disk.
+
+        Raises:
+            OSError: If the flusher failed to write the journal.
+        """
+        with self._lock:
+            while self._durable_seq < ticket:
+                if self._error is not None:
+                    raise self._error
+                self._durable.wait()
+
+    def _run(self):
+        """Flusher thread: write and fsync queued entries, one frame per pass."""
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closing:
+                    self._work.wait()
+                if not self._buffer:
+                    return
+            if self.group_commit_delay:
+                time.sleep(self.group_commit_delay)
+            with self._lock:
+                records, self._buffer = self._buffer, []
+                last_seq = self._seq
+                snapshot = None
+                if self._since_snapshot >= self.snapshot_every:
+                    snapshot = dict(self._balances)
+                    self._since_snapshot = 0
+            try:
+                started = time.perf_counter()
+                payload = b"".join(records)
+                self._file.write(FRAME.pack(FRAME_MAGIC, len(records), zlib.crc32(payload)) + payload)
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                metrics.LEDGER_FLUSH_DURATION.observe(time.perf_counter() - started)
+                metrics.LEDGER_ENTRIES.inc(len(records))
+                if snapshot is not None:
+                    self._write_snapshot(last_seq, snapshot)
+                    self._open_segment(last_seq + 1)
+            except OSError as e:
+                logger.error("Ledger journal write failed: %s", e)
+                with self._lock:
+                    self._error = e
+                    self._durable.notify_all()
+                return
+            with self._lock:
+                self._durable_seq = last_seq
+                self._durable.notify_all()
+
+    def _write_snapshot(self, seq, balances):
+        """Atomically write a snapshot, then drop all but the newest `SNAPSHOTS_KEPT`."""
+        payload = b"".join(SNAPSHOT_RECORD.pack(account, balance) for account, balance in balances.items())
+        path = _snapshot_path(self.directory, seq)
+        with open(path + ".tmp", "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, seq, len(balances), zlib.crc32(payload)))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        _fsync_directory(self.directory)
+        for _, old in _numbered(self.directory, "snapshot")[:-SNAPSHOTS_KEPT]:
+            os.remove(old)
+        logger.info("Wrote ledger snapshot of %s accounts at entry %s", len(balances), seq)
+
+    def snapshot(self):
+        """Make the flusher write a snapshot with its next frame, e.g. before a planned restart."""
+        with self._lock:
+            self._since_snapshot = max(self._since_snapshot, self.snapshot_every)
+
+    def close(self):
+        """Write every queued entry, stop the flusher and close the segment."""
+        with self._lock:
+            self._closing = True
+            self._work.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def restore_balances(balances):
+    """
+    Make the database's accounts match balances recovered from the journal.
+
+    Existing accounts are updated (and their version bumped, so cached balances
+    are revalidated); missing ones are created. Run it inside an app context.
+
+    Args:
+        balances (dict): Account number -> balance in cents.
+    """
+    from sqlalchemy import bindparam, insert, select, update
+    from app import db
+    from app.models import Account
+
+    if not balances:
+        return
+    existing = dict(db.session.execute(select(Account.account_number, Account.id)).all())
+    changed = [
+        {"account_id": existing[number], "new_balance_cents": balance}
+        for number, balance in balances.items() if number in existing
+    ]
+    created = [
+        {"account_number": number, "balance_cents": balance, "version": 0}
+        for number, balance in balances.items() if number not in existing
+    ]
+    # Versions only grow, so version-checked caches in other workers accept the restored balances
+    accounts = Account.__table__
+    bump = (
+        update(accounts)
+        .where(accounts.c.id == bindparam("account_id"))
+        .values(balance_cents=bindparam("new_balance_cents"), version=accounts.c.version + 1)
+    )
+    for start in range(0, max(len(changed), len(created)), 10_000):
+        if changed[start:start + 10_000]:
+            db.session.execute(bump, changed[start:start + 10_000])
+        if created[start:start + 10_000]:
+            db.session.execute(insert(Account), created[start:start + 10_000])
+    db.session.commit()
+    logger.info("Restored %s accounts from the ledger journal (%s created)", len(balances), len(created))
+
+
+def open_journal(app, recovered):
+    """
+    Finish opening an app's journal once the database is initialized.
+
+    Recovered balances are written to the database, and accounts the journal
+    has not seen yet (e.g. freshly seeded ones) are recorded as 'open' entries
+    so the next recovery includes them.
+
+    Args:
+        app (Flask): The application; `app.extensions["ledger_journal"]` must be set.
+        recovered (dict): The result of `LedgerJournal.recover`.
+    """
+    from sqlalchemy import select
+    from app import db
+    from app.models import Account
+
+    journal = app.extensions["ledger_journal"]
+    if app.extensions.get("lock_manager") is None and isinstance(app.extensions["write_lock"], nullcontext):
+        logger.warning("Without LOCK_MANAGER_ENABLED, journal entries for one account may be written out of commit order")
+    with app.app_context():
+        restore_balances(recovered["balances"])
+        unseen = [
+            (number, "open", balance, balance)
+            for number, balance in db.session.execute(select(Account.account_number, Account.balance_cents))
+            if number not in recovered["balances"]
+        ]
+        db.session.remove()
+    if unseen:
+        journal.wait(journal.append(unseen))
@@ -0,0 +1,285 @@
+"""
+Provisioning Module
+
+This module bulk-loads accounts from CSV or Parquet input with the columns
+`account_number` and `balance` (in currency units, like the API).
+
+Input is streamed in chunks. Each chunk is validated as NumPy string arrays:
+digits-only account numbers of at most 20 characters, and non-negative
+balances with at most two decimal places, parsed to cents without floats. The
+rules are the same as `validate_account_number` and `parse_cents`. Invalid
+rows and account numbers repeated within a chunk are reported and skipped.
+Valid rows are sorted, so the account-number index is filled in order, and
+inserted with one executemany per chunk. On PostgreSQL they are COPYed into a
+staging table and moved with one INSERT ... SELECT instead. Accounts that
+already exist, including ones from an earlier chunk of the same input, are
+left unchanged and counted.
+
+Each chunk is committed on its own, so an interrupted load keeps the chunks
+before the failure. Non-unique indexes on `accounts` are dropped for the load
+and rebuilt afterwards. The unique index on `account_number` stays, since it
+rejects duplicates. Parquet input needs pyarrow, which is imported only when
+Parquet is read.
+"""
+
+import csv
+import io
+import logging
+import time
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import insert
+from app import db
+from app.models import Account
+from app.utils import MAX_WHOLE_DIGITS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("account_number", "balance")
+MAX_ACCOUNT_DIGITS = 20
+MAX_REPORTED_ERRORS = 100
+
+
+class ProvisioningError(ValueError):
+    """Raised when the input cannot be read as accounts at all, e.g. a missing column."""
+
+
+def read_csv_chunks(stream, chunk_size):
+    """
+    Read a CSV with a header row in chunks of at most `chunk_size` rows.
+
+    Args:
+        stream (TextIO): The CSV text.
+        chunk_size (int): Rows per chunk.
+
+    Yields:
+        tuple: (list of account numbers, list of balances), both as strings.
+
+    Raises:
+        ProvisioningError: If a required column is missing.
+    """
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    if any(column not in header for column in COLUMNS):
+        raise ProvisioningError(f"CSV input needs the columns {', '.join(COLUMNS)}")
+    number_at, balance_at = header.index("account_number"), header.index("balance")
+    width = max(number_at, balance_at) + 1
+    numbers, balances = [], []
+    for row in reader:
+        if len(row) < width:
+            row = row + [""] * (width - len(row))  # Reported as invalid by the validator
+        numbers.append(row[number_at])
+        balances.append(row[balance_at])
+        if len(numbers) == chunk_size:
+            yield numbers, balances
+            numbers, balances = [], []
+    if numbers:
+        yield numbers, balances
+
+
+def read_parquet_chunks(source, chunk_size):
+    """
+    Read a Parquet file in record batches of at most `chunk_size` rows.
+
+    Both columns are cast to strings, so numeric balances are validated like
+    the CSV text of the same value.
+
+    Args:
+        source (str | BinaryIO): Path or seekable file object.
+        chunk_size (int): Rows per chunk.
+
+    Yields:
+        tuple: (list of account numbers, list of balances), both as strings.
+
+    Raises:
+        ProvisioningError: If a required column is missing.
+        RuntimeError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet input requires pyarrow: pip install pyarrow") from None
+    parquet = pq.ParquetFile(source)
+    if any(column not in parquet.schema_arrow.names for column in COLUMNS):
+        raise ProvisioningError(f"Parquet input needs the columns {', '.join(COLUMNS)}")
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=list(COLUMNS)):
+        numbers, balances = (batch.column(name).cast(pa.string()).fill_null("").to_pylist() for name in COLUMNS)
+        yield numbers, balances
+
+
+def _is_ascii(np, strings):
+    """Flag the elements of a str array made only of ASCII characters (isdigit alone accepts e.g. '²')."""
+    return (strings.view(np.uint32).reshape(len(strings), -1) < 128).all(axis=1)
+
+
+def validate_chunk(np, numbers, balances):
+    """
+    Validate one chunk of account numbers and balances.
+
+    Args:
+        np (module): NumPy.
+        numbers (list[str]): Account numbers.
+        balances (list[str]): Balances in currency units.
+
+    Returns:
+        tuple: (boolean array of valid rows, stripped account numbers, int64 array of
+        balances in cents, array of reasons with '' for valid rows).
+    """
+    numbers = np.char.strip(np.asarray(numbers, dtype=str))
+    balances = np.char.strip(np.asarray(balances, dtype=str))
+    reasons = np.full(len(numbers), "", dtype=object)
+
+    number_ok = _is_ascii(np, numbers) & np.char.isdigit(numbers) & (np.char.str_len(numbers) <= MAX_ACCOUNT_DIGITS)
+    reasons[~number_ok] = "Invalid account number"
+
+    parts = np.char.partition(balances, ".")
+    whole, dot, fraction = parts[:, 0], parts[:, 1], parts[:, 2]
+    trimmed = np.char.rstrip(fraction, "0")
+    balance_ok = (
+        _is_ascii(np, balances)
+        & np.char.isdigit(whole)
+        & (np.char.str_len(whole) <= MAX_WHOLE_DIGITS)
+        & ((dot == "") | np.char.isdigit(fraction))
+        & (np.char.str_len(trimmed) <= 2)
+    )
+    reasons[number_ok & ~balance_ok] = "Invalid balance"
+
+    valid = number_ok & balance_ok
+    cents = np.zeros(len(numbers), dtype=np.int64)
+    if valid.any():
+        cents[valid] = (
+            whole[valid].astype(np.int64) * 100
+            + np.char.ljust(trimmed[valid], 2, "0").astype(np.int64)
+        )
+    return valid, numbers, cents, reasons
+
+
+@contextmanager
+def _deferred_indexes(conn):
+    """Drop the non-unique indexes of `accounts` for the duration of a load."""
+    deferred = [index for index in Account.__table__.indexes if not index.unique]
+    for index in deferred:
+        index.drop(conn, checkfirst=True)
+    conn.commit()
+    try:
+        yield
+    finally:
+        for index in deferred:
+            index.create(conn, checkfirst=True)
+        conn.commit()
+
+
+def _insert_chunk(conn, rows, returning):
+    """
+    Insert validated rows, skipping account numbers that already exist.
+
+    Args:
+        conn (Connection): Connection with an open transaction.
+        rows (list[tuple]): (account number, balance in cents) sorted by account number.
+        returning (bool): Return the inserted rows rather than only their count.
+
+    Returns:
+        int | list[tuple]: Rows inserted, or the inserted (account number, balance) pairs.
+    """
+    if conn.dialect.name == "postgresql":
+        buffer = io.StringIO("".join(f"{number},{cents}\n" for number, cents in rows))
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE IF NOT EXISTS account_staging "
+            "(account_number VARCHAR(20), balance_cents BIGINT) ON COMMIT DELETE ROWS"
+        )
+        cursor = conn.connection.driver_connection.cursor()
+        cursor.copy_expert("COPY account_staging (account_number, balance_cents) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.close()
+        result = conn.exec_driver_sql(
+            "INSERT INTO accounts (account_number, balance_cents, opening_balance_cents, version) "
+            "SELECT account_number, balance_cents, balance_cents, 0 FROM account_staging "
+            "ON CONFLICT (account_number) DO NOTHING"
+            + (" RETURNING account_number, balance_cents" if returning else "")
+        )
+        return result.all() if returning else result.rowcount
+
+    if conn.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        statement = sqlite_insert(Account).on_conflict_do_nothing(index_elements=["account_number"])
+    else:
+        statement = insert(Account)
+    if returning:
+        params = [
+            {"account_number": number, "balance_cents": cents, "opening_balance_cents": cents, "version": 0}
+            for number, cents in rows
+        ]
+        return conn.execute(statement.returning(Account.account_number, Account.balance_cents), params).all()
+    # Compiled once and given plain tuples: per-row parameter processing would cost more than the insert
+    compiled = statement.compile(dialect=conn.dialect, column_keys=["account_number", "balance_cents", "opening_balance_cents", "version"])
+    numbers, cents = zip(*rows)
+    columns = {"account_number": numbers, "balance_cents": cents, "opening_balance_cents": cents, "version": [0] * len(rows)}
+    params = list(zip(*(columns[name] for name in compiled.positiontup)))
+    return conn.exec_driver_sql(str(compiled), params).rowcount
+
+
+def provision_accounts(chunks):
+    """
+    Validate and insert accounts chunk by chunk.
+
+    Must be called inside an app context. With the ledger journal enabled, new
+    accounts are journaled as 'open' entries so they survive a restart.
+
+    Args:
+        chunks (Iterable[tuple]): (account numbers, balances) chunks from `read_csv_chunks`
+            or `read_parquet_chunks`.
+
+    Returns:
+        dict: `rows` read, `inserted`, `existing` (already present), `invalid`, up to
+        `MAX_REPORTED_ERRORS` `errors` with their 1-based row and reason, `seconds`
+        and `rows_per_second`.
+
+    Raises:
+        RuntimeError: If NumPy is not installed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("Bulk provisioning requires NumPy: pip install numpy") from None
+
+    journal = current_app.extensions.get("ledger_journal")
+    started = time.perf_counter()
+    summary = {"rows": 0, "inserted": 0, "existing": 0, "invalid": 0, "errors": []}
+
+    with current_app.extensions["write_lock"], db.engine.connect() as conn, _deferred_indexes(conn):
+        for numbers, balances in chunks:
+            offset = summary["rows"]
+            summary["rows"] += len(numbers)
+            valid, numbers, cents, reasons = validate_chunk(np, numbers, balances)
+
+            candidates = np.nonzero(valid)[0]
+            order = candidates[np.argsort(numbers[candidates], kind="stable")]
+            repeated = np.zeros(len(order), dtype=bool)
+            repeated[1:] = numbers[order][1:] == numbers[order][:-1]
+            reasons[order[repeated]] = "Duplicate account number in input"
+            valid[order[repeated]] = False
+            keep = order[~repeated]
+            rows = list(zip(numbers[keep].tolist(), cents[keep].tolist()))
+            summary["invalid"] += int((~valid).sum())
+            for i in np.nonzero(~valid)[0][:MAX_REPORTED_ERRORS - len(summary["errors"])]:
+                summary["errors"].append({"row": offset + int(i) + 1, "reason": reasons[i]})
+            if not rows:
+                continue
+
+            with conn.begin():
+                inserted = _insert_chunk(conn, rows, returning=journal is not None)
+            if journal is not None:
+                if inserted:
+                    journal.wait(journal.append((number, "open", cents, cents) for number, cents in inserted))
+                inserted = len(inserted)
+            summary["inserted"] += inserted
+            summary["existing"] += len(rows) - inserted
+
+    summary["seconds"] = time.perf_counter() - started
+    summary["rows_per_second"] = summary["rows"] / summary["seconds"] if summary["seconds"] else 0.0
+    logger.info(
+        "Provisioned %s accounts from %s rows in %.2fs (%s existing, %s invalid)",
+        summary["inserted"], summary["rows"], summary["seconds"], summary["existing"], summary["invalid"],
+    )
+    return summary
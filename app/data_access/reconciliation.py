@@ -0,0 +1,224 @@
+"""
+Reconciliation Module
+
+This module proves that every account's balance equals its opening balance
+plus the signed sum of its `Transaction` rows.
+
+The transactions table is read as (account id, signed amount) pairs in
+primary-key ranges, each loaded straight into NumPy arrays and summed per
+account with `np.bincount` (or `np.add.at` when a chunk is too large for an
+exact floating-point sum). No query runs per account. NumPy is needed only
+here, so it is imported when reconciliation runs.
+
+A checkpoint file keeps the per-account totals and the highest transaction id
+they cover (the high-water mark), so an incremental run reads only newer
+transactions. All reads of a run share one database snapshot. With
+PostgreSQL sequences a row can commit after a row with a higher id, so
+accounts that do not match after an incremental run are summed again with SQL
+before they are reported, and the checkpoint is corrected.
+
+With a transaction archive, table rows before its watermark are skipped and
+the archive's per-account totals are added instead: the totals file it keeps
+on a full run, or only segments holding ids above the high-water mark on an
+incremental one.
+"""
+
+import logging
+import os
+import time
+from itertools import chain
+from flask import current_app
+from sqlalchemy import case, func, select
+from app import db
+from app.data_access.account_repository import SIGNED_TYPES
+from app.models import Account, Transaction
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Largest magnitude a float64 holds exactly; bincount sums with float weights
+EXACT_FLOAT_LIMIT = 2 ** 53
+RECHECK_BATCH = 500
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Reconciliation requires NumPy: pip install numpy") from None
+    return numpy
+
+
+def _accumulate(np, totals, account_ids, amounts):
+    """
+    Add one chunk of signed amounts to the per-account totals.
+
+    Args:
+        np (module): NumPy.
+        totals (ndarray): int64 totals indexed by account id; grown as needed.
+        account_ids (ndarray): int64 account ids of the chunk.
+        amounts (ndarray): int64 signed amounts in cents of the chunk.
+
+    Returns:
+        ndarray: The updated totals.
+    """
+    size = int(account_ids.max()) + 1
+    if size > len(totals):
+        totals = np.concatenate([totals, np.zeros(size - len(totals), dtype=np.int64)])
+    if int(np.abs(amounts).max()) * len(amounts) < EXACT_FLOAT_LIMIT:
+        totals[:size] += np.rint(np.bincount(account_ids, weights=amounts, minlength=size)).astype(np.int64)
+    else:
+        np.add.at(totals, account_ids, amounts)
+    return totals
+
+
+def load_checkpoint(path):
+    """
+    Read a reconciliation checkpoint.
+
+    Returns:
+        tuple: (high-water transaction id, int64 totals indexed by account id), or None if there is none.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    np = _import_numpy()
+    with np.load(path) as checkpoint:
+        return int(checkpoint["high_water"]), checkpoint["totals"].astype(np.int64)
+
+
+def save_checkpoint(path, high_water, totals):
+    """Atomically replace the checkpoint with a new high-water mark and totals."""
+    np = _import_numpy()
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, high_water=np.int64(high_water), totals=totals)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def _sum_accounts(conn, account_ids, archive=None, index=None):
+    """Sum the signed amounts of a few accounts with SQL and the archive; returns {account id: cents}."""
+    signed = case(SIGNED_TYPES, value=Transaction.type, else_=0) * Transaction.amount_cents
+    sums = dict.fromkeys(account_ids, 0)
+    for start in range(0, len(account_ids), RECHECK_BATCH):
+        query = (
+            select(Transaction.account_id, func.sum(signed))
+            .where(Transaction.account_id.in_(account_ids[start:start + RECHECK_BATCH]))
+            .group_by(Transaction.account_id)
+        )
+        if index is not None and index.watermark is not None:
+            query = query.where(Transaction.timestamp >= index.watermark)
+        sums.update(conn.execute(query).all())
+    if index is not None and index.watermark is not None:
+        for account_id in account_ids:
+            sums[account_id] += archive.signed_sum(index, account_id)
+    return sums
+
+
+def reconcile(checkpoint=None, full=False, chunk_size=100_000):
+    """
+    Compare every account's balance with its opening balance plus its ledger.
+
+    Must be called inside an app context. With an in-memory database, writes
+    wait until the run finishes.
+
+    Args:
+        checkpoint (str): Checkpoint file; the run is incremental when it exists, and it is updated afterwards.
+        full (bool): Ignore the checkpoint and read every transaction.
+        chunk_size (int): Transaction ids per range loaded into NumPy at a time.
+
+    Returns:
+        dict: `accounts` checked, `transactions` read, `high_water`, `incremental` flag,
+        `seconds`, and `mismatches` as dicts with the account number, balance,
+        expected balance and difference in cents.
+
+    Raises:
+        RuntimeError: If NumPy is not installed.
+    """
+    np = _import_numpy()
+    started = time.perf_counter()
+    state = None if full else load_checkpoint(checkpoint)
+    high_water, totals = state if state is not None else (0, np.zeros(0, dtype=np.int64))
+    signed = case(SIGNED_TYPES, value=Transaction.type, else_=0) * Transaction.amount_cents
+    archive = current_app.extensions.get("transaction_archive")
+    read = 0
+
+    with current_app.extensions["write_lock"], db.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            new_high_water = conn.scalar(select(func.coalesce(func.max(Transaction.id), 0)))
+            # After the first read, so the snapshot still holds whatever a newer archival run purges
+            index = archive.snapshot() if archive is not None else None
+            watermark = index.watermark if index is not None else None
+            if watermark is not None:
+                new_high_water = max(new_high_water, index.manifest["max_id"])
+            if new_high_water < high_water:
+                logger.warning("Checkpoint is ahead of the database (%s > %s); reading every transaction", high_water, new_high_water)
+                state, high_water, totals = None, 0, np.zeros(0, dtype=np.int64)
+
+            if watermark is not None:
+                archived = archive.totals(index, after_id=high_water)
+                if len(archived) > len(totals):
+                    totals = np.concatenate([totals, np.zeros(len(archived) - len(totals), dtype=np.int64)])
+                totals[:len(archived)] += archived
+
+            # Primary-key windows: each is an index range scan, fetched as plain tuples from the
+            # DBAPI cursor, since building Row objects would cost more than the summing
+            for low in range(high_water, new_high_water, chunk_size):
+                query = (
+                    select(Transaction.account_id, signed)
+                    .where(Transaction.id > low, Transaction.id <= min(low + chunk_size, new_high_water))
+                )
+                if watermark is not None:
+                    query = query.where(Transaction.timestamp >= watermark)
+                rows = conn.execute(query)
+                chunk = rows.cursor.fetchall()
+                rows.close()
+                if not chunk:
+                    continue
+                pairs = np.fromiter(chain.from_iterable(chunk), dtype=np.int64, count=2 * len(chunk)).reshape(-1, 2)
+                totals = _accumulate(np, totals, pairs[:, 0], pairs[:, 1])
+                read += len(chunk)
+
+            accounts = conn.execute(
+                select(Account.id, Account.account_number, Account.balance_cents, Account.opening_balance_cents)
+            ).all()
+            ids = np.fromiter((row[0] for row in accounts), dtype=np.int64, count=len(accounts))
+            balances = np.fromiter((row[2] for row in accounts), dtype=np.int64, count=len(accounts))
+            openings = np.fromiter((row[3] for row in accounts), dtype=np.int64, count=len(accounts))
+            if len(ids) and int(ids.max()) >= len(totals):
+                totals = np.concatenate([totals, np.zeros(int(ids.max()) + 1 - len(totals), dtype=np.int64)])
+            mismatched = np.nonzero(balances != openings + totals[ids])[0]
+
+            if state is not None and len(mismatched):
+                exact = _sum_accounts(conn, [int(ids[i]) for i in mismatched], archive, index)
+                for account_id, cents in exact.items():
+                    totals[account_id] = cents
+                mismatched = mismatched[balances[mismatched] != openings[mismatched] + totals[ids[mismatched]]]
+
+    if checkpoint:
+        save_checkpoint(checkpoint, new_high_water, totals)
+
+    mismatches = [
+        {
+            "account_number": accounts[i][1],
+            "balance_cents": int(balances[i]),
+            "expected_cents": int(openings[i] + totals[ids[i]]),
+            "difference_cents": int(balances[i] - openings[i] - totals[ids[i]]),
+        }
+        for i in mismatched
+    ]
+    seconds = time.perf_counter() - started
+    logger.info(
+        "Reconciled %s accounts against %s transactions in %.3fs: %s mismatched",
+        len(accounts), read, seconds, len(mismatches),
+    )
+    return {
+        "accounts": len(accounts),
+        "transactions": read,
+        "high_water": new_high_water,
+        "incremental": state is not None,
+        "seconds": seconds,
+        "mismatches": mismatches,
+    }
@@ -0,0 +1,247 @@
+"""
+Read Replica Module
+
+This module routes reads that tolerate replication lag to a pool of read
+replicas, while every write stays on the primary engine.
+
+Consistency is tracked with a commit position, a number that only grows as
+the primary commits: on PostgreSQL the WAL position (LSN); on SQLite the
+one-row `commit_position` counter. After every successful request that may
+have written, the primary's position is returned to the client in the
+`X-Commit-Position` header and cookie. On SQLite the counter is bumped in a
+transaction of its own after the request's writes have committed, so a
+replica copy holding that value was taken after them. When the client reads
+again, it is served by a replica whose position has reached that value, or
+by the primary if none has. A client therefore always sees its own writes,
+and sees other clients' writes after the replication lag. Positions observed
+on each replica are remembered, so a read costs an extra query only when the
+remembered position is too old.
+
+For local testing, replicas may be SQLite files copied from a file-backed
+SQLite primary. `ReplicaRouter.sync` copies the primary into each of them
+with SQLite's online backup API, and `ReplicaSyncer` does so every
+`READ_REPLICA_SYNC_INTERVAL` seconds, standing in for streaming replication.
+With PostgreSQL, replicas are hot standbys and replication is left to the
+database.
+"""
+
+import itertools
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COMMIT_POSITION_HEADER = "X-Commit-Position"
+COMMIT_POSITION_COOKIE = "atm_commit_position"
+
+# Moves the primary's position past the writes committed so far; WAL positions move by themselves
+ADVANCE_POSITION_SQL = {
+    "sqlite": (
+        "INSERT INTO commit_position (id, position) VALUES (1, 1) "
+        "ON CONFLICT (id) DO UPDATE SET position = position + 1"
+    ),
+    "postgresql": None,
+}
+# The primary's position after a commit, and how far a replica has replayed
+PRIMARY_POSITION_SQL = {
+    "sqlite": "SELECT COALESCE((SELECT position FROM commit_position WHERE id = 1), 0)",
+    "postgresql": "SELECT (pg_current_wal_lsn() - '0/0'::pg_lsn)::bigint",
+}
+REPLICA_POSITION_SQL = {
+    "sqlite": PRIMARY_POSITION_SQL["sqlite"],
+    # A standby reports its replay position; a primary standing in for one has none
+    "postgresql": "SELECT (COALESCE(pg_last_wal_replay_lsn(), pg_current_wal_lsn()) - '0/0'::pg_lsn)::bigint",
+}
+
+
+def parse_position(value):
+    """
+    Parse a commit position sent by a client.
+
+    Returns:
+        int: The position, or 0 if `value` is missing or malformed.
+    """
+    if value and value.isdigit() and len(value) <= 20:
+        return int(value)
+    return 0
+
+
+class ReplicaRouter:
+    """
+    Chooses a database session for each read, keeping track of how far each replica has replicated.
+
+    Attributes:
+        engines (list[Engine]): One engine per replica, in configuration order.
+    """
+
+    def __init__(self, primary_engine, primary_sessions, urls, config):
+        from app import build_engine_options, configure_sqlite
+
+        dialect = primary_engine.dialect.name
+        if dialect not in PRIMARY_POSITION_SQL:
+            raise ValueError(f"Read replicas are not supported on {dialect}")
+        self._primary_engine = primary_engine
+        self._primary_sessions = primary_sessions
+        self._advance_sql = text(ADVANCE_POSITION_SQL[dialect]) if ADVANCE_POSITION_SQL[dialect] else None
+        self._primary_sql = text(PRIMARY_POSITION_SQL[dialect])
+        self._replica_sql = text(REPLICA_POSITION_SQL[dialect])
+        self.engines = []
+        self._sessions = []
+        for url in urls:
+            engine = create_engine(url, **build_engine_options({**config, "SQLALCHEMY_DATABASE_URI": url}))
+            if engine.dialect.name != dialect:
+                raise ValueError(f"Replica {engine.url!r} is {engine.dialect.name}, but the primary is {dialect}")
+            configure_sqlite(engine, config)
+            metrics.instrument_engine(engine)
+            self.engines.append(engine)
+            self._sessions.append(scoped_session(sessionmaker(bind=engine, expire_on_commit=False)))
+        self._positions = [0] * len(self.engines)  # Last position seen on each replica
+        self._copied = False  # Positions are exact once `sync` copies the replicas itself
+        self._reads = [0] * len(self.engines)
+        self._primary_reads = 0
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def commit_position(self):
+        """
+        Advance and read the primary's commit position, after a request's writes have committed.
+
+        Returns:
+            int: The position to hand to the client.
+        """
+        with self._primary_engine.connect() as conn:
+            if self._advance_sql is not None:
+                conn.execution_options(sqlite_begin_immediate=True)
+            with conn.begin():
+                if self._advance_sql is not None:
+                    conn.execute(self._advance_sql)
+                return conn.execute(self._primary_sql).scalar()
+
+    def session(self, required=0):
+        """
+        Return a session for a read that must reflect at least commit position `required`.
+
+        Replicas already known to have reached it are tried first, in turn; then
+        the others are asked for their current position (unless `sync` copies
+        them, so their positions are already known); then the primary serves
+        the read. A replica's session is returned with its position query's
+        transaction still open, so the read sees what that query saw.
+
+        Args:
+            required (int): The client's last commit position; 0 for any replica.
+
+        Returns:
+            Session: A session the caller must close.
+        """
+        count = len(self.engines)
+        first = next(self._turn) % count
+        order = [(first + offset) % count for offset in range(count)]
+        for replica in order:
+            if self._positions[replica] >= required:
+                return self._replica_session(replica)
+        for replica in [] if self._copied else order:
+            session = self._sessions[replica]()
+            try:
+                position = session.execute(self._replica_sql).scalar() or 0
+            except Exception as e:
+                session.close()
+                logger.warning("Replica %s is unavailable: %s", replica, e)
+                continue
+            with self._lock:
+                self._positions[replica] = max(self._positions[replica], position)
+            if position >= required:
+                return self._replica_session(replica, session)
+            session.close()
+        with self._lock:
+            self._primary_reads += 1
+        metrics.REPLICA_READS.labels("primary").inc()
+        return self._primary_sessions()
+
+    def _replica_session(self, replica, session=None):
+        with self._lock:
+            self._reads[replica] += 1
+        metrics.REPLICA_READS.labels(str(replica)).inc()
+        return session if session is not None else self._sessions[replica]()
+
+    def sync(self):
+        """
+        Copy a file-backed SQLite primary into every SQLite replica file.
+
+        Uses SQLite's online backup API, so the copy is consistent while the
+        primary is written and replica readers wait for it rather than reading
+        a half-written file. Each copy's position is recorded, so reads that
+        no copy can serve go straight to the primary instead of asking every
+        replica first. Does nothing unless the primary is a SQLite file.
+
+        Returns:
+            int: The number of replicas copied.
+        """
+        source_path = self._primary_engine.url.database
+        if self._primary_engine.dialect.name != "sqlite" or not source_path or source_path == ":memory:":
+            return 0
+        copied = 0
+        busy_timeout = 30
+        with closing(sqlite3.connect(source_path, timeout=busy_timeout)) as source:
+            for replica, engine in enumerate(self.engines):
+                with closing(sqlite3.connect(engine.url.database, timeout=busy_timeout)) as target:
+                    source.backup(target)
+                    position = target.execute(PRIMARY_POSITION_SQL["sqlite"]).fetchone()[0]
+                with self._lock:
+                    self._positions[replica] = max(self._positions[replica], position)
+                    self._copied = True
+                copied += 1
+        return copied
+
+    def remove_sessions(self):
+        """Release the calling thread's replica sessions, at the end of a request."""
+        for sessions in self._sessions:
+            sessions.remove()
+
+    def stats(self):
+        """Return each replica's reads and last seen position, and the reads the primary served."""
+        with self._lock:
+            return {
+                "replicas": [
+                    {"url": engine.url.render_as_string(hide_password=True), "reads": reads, "position": position}
+                    for engine, reads, position in zip(self.engines, self._reads, self._positions)
+                ],
+                "primary_reads": self._primary_reads,
+            }
+
+    def dispose(self):
+        """Close every replica connection."""
+        for engine in self.engines:
+            engine.dispose()
+
+
+class ReplicaSyncer(threading.Thread):
+    """
+    Daemon thread that copies a SQLite primary into its replica files periodically.
+
+    Attributes:
+        router (ReplicaRouter): The router whose replicas are refreshed.
+        interval (float): Seconds between copies.
+    """
+
+    def __init__(self, router, interval):
+        super().__init__(name="replica-syncer", daemon=True)
+        self.router = router
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.router.sync()
+            except Exception as e:  # Keep replicating after a transient failure
+                logger.error("Replica sync failed: %s", e)
+
+    def stop(self):
+        """Stop the syncer after its current copy."""
+        self._stopped.set()
@@ -0,0 +1,620 @@
+"""
+Transaction Archive Module
+
+This module moves closed months of `transactions` rows out of the database
+into compressed, columnar, append-only segment files, and reads them back for
+history, statements and reconciliation.
+
+A segment is a NumPy `.npz` file (zlib-compressed) holding one array per
+column for up to `ARCHIVE_SEGMENT_ROWS` rows of one month, sorted by
+(account id, timestamp, id). An account's rows in a segment are therefore
+contiguous and found by binary search. `manifest.json` lists every segment
+with its min/max account id, timestamp and transaction id, so a query opens
+only the segments that can hold its account and time range. The manifest also
+records the watermark: every transaction before it lives in the archive, and
+every one at or after it lives in the database. Reads split on the watermark,
+so rows are never seen twice, not even while an archival run is deleting them
+from the table. `totals-*.npy` keeps each account's signed sum per archived
+month, so statement opening balances and reconciliation add whole months
+without opening their segments.
+
+An archival run writes new segment files, then atomically replaces the
+manifest (the commit point), then deletes the archived rows from the table in
+short transactions. A run that stops before the deletes finish leaves rows
+below the watermark in the table, where reads ignore them and the next run
+deletes them. Segment files are never rewritten, so a reader holding an older
+manifest can still open every file it lists. Other processes pick up a new
+manifest on their next read.
+
+NumPy is needed only when an archive is configured, so it is imported then.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app import db
+from app.models import Transaction
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+# Stored type codes are indexes into this tuple; new types must be appended
+TYPE_CODES = ("withdraw", "deposit", "transfer_out", "transfer_in")
+SIGNS = (-1, 1, -1, 1)
+EPOCH = datetime(1970, 1, 1)
+# A month is archived only once it has been closed this long, so late commits are included
+ARCHIVE_GRACE = timedelta(hours=1)
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("The transaction archive requires NumPy: pip install numpy") from None
+    return numpy
+
+
+def to_micros(value):
+    """Convert a UTC datetime to integer microseconds since the epoch."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(micros):
+    """Convert microseconds since the epoch back to a naive UTC datetime."""
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+def month_start(value, months_back=0):
+    """
+    Return the first instant of the month `months_back` months before `value`'s month.
+
+    Args:
+        value (datetime): Any time in the reference month.
+        months_back (int): Months to step back.
+
+    Returns:
+        datetime: Midnight on the first day of that month.
+    """
+    index = value.year * 12 + value.month - 1 - months_back
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Return the first instant of a "YYYY-MM" month and of the month after it."""
+    first = datetime.strptime(month, "%Y-%m")
+    return first, month_start(first, -1)
+
+
+def _fsync_directory(path):
+    """Make renames inside `path` durable."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ArchivedTransaction:
+    """
+    A transaction read back from the archive, with the attributes history serializes.
+
+    Attributes:
+        id (int): The original transaction id.
+        account_id (int): The account's primary key.
+        type (str): The transaction type.
+        amount_cents (int): The unsigned amount in cents.
+        timestamp (datetime): When the transaction was recorded (naive UTC).
+        transfer_id (str | None): Links the two legs of a transfer.
+    """
+
+    __slots__ = ("id", "account_id", "type", "amount_cents", "timestamp", "transfer_id")
+
+    def __init__(self, id, account_id, type, amount_cents, timestamp, transfer_id):
+        self.id = id
+        self.account_id = account_id
+        self.type = type
+        self.amount_cents = amount_cents
+        self.timestamp = timestamp
+        self.transfer_id = transfer_id
+
+
+class ArchiveIndex:
+    """
+    An immutable view of one version of the manifest.
+
+    Queries take the index once and use it throughout, so an archival run
+    committing meanwhile cannot make them miss or repeat rows.
+
+    Attributes:
+        watermark (datetime | None): Transactions before it are archived; None if nothing is.
+        segments (list[dict]): Segment entries, oldest month first.
+        months (list[str]): Archived months, as "YYYY-MM", in the order of the totals rows.
+        generation (int): Manifest version, incremented by every archival run.
+    """
+
+    def __init__(self, np, manifest):
+        self.manifest = manifest
+        self.watermark = datetime.fromisoformat(manifest["watermark"]) if manifest.get("watermark") else None
+        self.segments = manifest.get("segments", [])
+        self.months = manifest.get("months", [])
+        self.month_totals = None  # Memory-mapped on first use
+        self.generation = manifest.get("generation", 0)
+        # Column arrays over the segment entries, for pruning with one vectorized comparison
+        for key in ("min_account", "max_account", "min_time", "max_time", "min_id", "max_id"):
+            setattr(self, key, np.array([segment[key] for segment in self.segments], dtype=np.int64))
+
+    def candidates(self, np, account_id, start=None, end=None):
+        """
+        Indexes of the segments that may hold an account's rows in [start, end), oldest first.
+
+        Args:
+            np (module): NumPy.
+            account_id (int): The account's primary key.
+            start (int | None): Inclusive lower bound, microseconds since the epoch.
+            end (int | None): Exclusive upper bound, microseconds since the epoch.
+
+        Returns:
+            ndarray: Segment indexes.
+        """
+        mask = (self.min_account <= account_id) & (self.max_account >= account_id)
+        if start is not None:
+            mask &= self.max_time >= start
+        if end is not None:
+            mask &= self.min_time < end
+        return np.nonzero(mask)[0]
+
+
+class ArchiveStore:
+    """
+    Reads and appends to the segment files in one archive directory.
+
+    Attributes:
+        directory (str): Where the manifest and segments live.
+        segment_rows (int): Most rows written to one segment.
+    """
+
+    def __init__(self, directory, segment_rows=65_536, cache_segments=16):
+        self.np = _import_numpy()
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self._cache_segments = cache_segments
+        self._cache = OrderedDict()  # segment file -> column arrays, least recently used first
+        self._lock = threading.Lock()
+        self._index = None
+        self._stamp = None
+        os.makedirs(directory, exist_ok=True)
+
+    def snapshot(self):
+        """
+        Return the current `ArchiveIndex`, reloading the manifest if another process replaced it.
+
+        Returns:
+            ArchiveIndex: The index to use for one query.
+        """
+        path = os.path.join(self.directory, MANIFEST)
+        try:
+            stat = os.stat(path)
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        with self._lock:
+            if self._index is None or stamp != self._stamp:
+                manifest = {}
+                if stamp is not None:
+                    with open(path) as f:
+                        manifest = json.load(f)
+                self._index, self._stamp = ArchiveIndex(self.np, manifest), stamp
+            return self._index
+
+    def _segment(self, name):
+        """Load a segment's column arrays, keeping recently used segments in memory."""
+        with self._lock:
+            columns = self._cache.get(name)
+            if columns is not None:
+                self._cache.move_to_end(name)
+                return columns
+        with self.np.load(os.path.join(self.directory, name)) as data:
+            columns = {key: data[key] for key in data.files}
+        with self._lock:
+            self._cache[name] = columns
+            while len(self._cache) > self._cache_segments:
+                self._cache.popitem(last=False)
+        return columns
+
+    def _month_totals(self, index):
+        """Return the (month, account id) signed sums of `index`, memory-mapped from its totals file."""
+        if index.month_totals is None:
+            name = index.manifest.get("totals")
+            if name:
+                index.month_totals = self.np.load(os.path.join(self.directory, name), mmap_mode="r")
+            else:
+                index.month_totals = self.np.zeros((0, 0), dtype=self.np.int64)
+        return index.month_totals
+
+    def _account_slices(self, index, account_id, start=None, end=None, newest_first=False):
+        """
+        Yield (columns, first, stop) row ranges holding an account's rows in [start, end).
+
+        Segments are opened one at a time as the caller asks for more, oldest
+        first, or newest first for history pages.
+
+        Args:
+            index (ArchiveIndex): The snapshot to read.
+            account_id (int): The account's primary key.
+            start (datetime | None): Inclusive lower bound.
+            end (datetime | None): Exclusive upper bound.
+            newest_first (bool): Visit the newest segments first.
+        """
+        np = self.np
+        start = to_micros(start) if start is not None else None
+        end = to_micros(end) if end is not None else None
+        positions = index.candidates(np, account_id, start, end)
+        for position in positions[::-1] if newest_first else positions:
+            columns = self._segment(index.segments[position]["file"])
+            accounts = columns["account_id"]
+            first = int(np.searchsorted(accounts, account_id, "left"))
+            stop = int(np.searchsorted(accounts, account_id, "right"))
+            if first == stop:
+                continue
+            timestamps = columns["timestamp"][first:stop]  # Sorted within the account
+            if end is not None:
+                stop = first + int(np.searchsorted(timestamps, end, "left"))
+            if start is not None:
+                first += int(np.searchsorted(timestamps, start, "left"))
+            if first < stop:
+                yield columns, first, stop
+
+    def rows(self, index, account_id, start=None, end=None):
+        """
+        Yield an account's archived rows in [start, end), oldest first.
+
+        Yields:
+            tuple: (id, timestamp, type, amount in cents, transfer id), the shape
+            of `stream_statement` rows.
+        """
+        for columns, first, stop in self._account_slices(index, account_id, start, end):
+            ids = columns["id"][first:stop].tolist()
+            timestamps = columns["timestamp"][first:stop].tolist()
+            types = columns["type"][first:stop].tolist()
+            amounts = columns["amount_cents"][first:stop].tolist()
+            transfers = columns["transfer_id"][first:stop].tolist()
+            for row in zip(ids, timestamps, types, amounts, transfers):
+                yield row[0], from_micros(row[1]), TYPE_CODES[row[2]], row[3], row[4].decode() or None
+
+    def signed_sum(self, index, account_id, start=None, end=None):
+        """
+        Sum an account's archived balance changes in [start, end).
+
+        Months wholly inside the range come from the totals file; only the
+        months holding `start` or `end` are read from their segments.
+
+        Returns:
+            int: The signed sum in cents.
+        """
+        np = self.np
+        totals = self._month_totals(index)
+        signs = np.array(SIGNS, dtype=np.int64)
+        total = 0
+        for row, month in enumerate(index.months):
+            low, high = month_bounds(month)
+            if (end is not None and low >= end) or (start is not None and high <= start):
+                continue
+            if (start is None or start <= low) and (end is None or high <= end):
+                if account_id < totals.shape[1]:
+                    total += int(totals[row, account_id])
+                continue
+            low, high = max(low, start) if start is not None else low, min(high, end) if end is not None else high
+            for columns, first, stop in self._account_slices(index, account_id, low, high):
+                total += int((signs[columns["type"][first:stop]] * columns["amount_cents"][first:stop]).sum())
+        return total
+
+    def history(self, index, account_id, limit, after=None, types=None, start=None, end=None):
+        """
+        Return up to `limit` of an account's archived rows, newest first.
+
+        Args:
+            index (ArchiveIndex): The snapshot to read.
+            account_id (int): The account's primary key.
+            limit (int): Maximum number of rows.
+            after (tuple | None): (timestamp, id) keyset position to continue after.
+            types (list[str] | None): Only return these transaction types.
+            start (datetime | None): Only return rows at or after this time.
+            end (datetime | None): Only return rows before this time.
+
+        Returns:
+            list[ArchivedTransaction]: The rows.
+        """
+        np = self.np
+        if after is not None and (end is None or after[0] < end):
+            end = after[0] + timedelta(microseconds=1)  # Rows at after's timestamp are cut by id below
+        codes = np.array([TYPE_CODES.index(t) for t in types], dtype=np.int8) if types else None
+        found = []
+        for columns, first, stop in self._account_slices(index, account_id, start, end, newest_first=True):
+            if after is not None:
+                after_micros = to_micros(after[0])
+                timestamps, ids = columns["timestamp"], columns["id"]
+                while stop > first and (timestamps[stop - 1], ids[stop - 1]) >= (after_micros, after[1]):
+                    stop -= 1
+            positions = np.arange(stop - 1, first - 1, -1)
+            if codes is not None:
+                positions = positions[np.isin(columns["type"][positions], codes)]
+            for position in positions[:limit - len(found)].tolist():
+                found.append(ArchivedTransaction(
+                    int(columns["id"][position]), account_id, TYPE_CODES[columns["type"][position]],
+                    int(columns["amount_cents"][position]), from_micros(columns["timestamp"][position]),
+                    columns["transfer_id"][position].decode() or None,
+                ))
+            if len(found) >= limit:
+                break
+        return found
+
+    def totals(self, index, after_id=0):
+        """
+        Sum every account's archived balance changes, optionally only of ids above `after_id`.
+
+        Without `after_id` the totals file written by the last run is summed; with
+        it only segments holding higher ids are opened.
+
+        Returns:
+            ndarray: int64 signed sums indexed by account id.
+        """
+        np = self.np
+        if not after_id:
+            return self._month_totals(index).sum(axis=0, dtype=np.int64)
+        totals = np.zeros(0, dtype=np.int64)
+        signs = np.array(SIGNS, dtype=np.int64)
+        for position in np.nonzero(index.max_id > after_id)[0]:
+            columns = self._segment(index.segments[position]["file"])
+            newer = columns["id"] > after_id
+            accounts = columns["account_id"][newer]
+            size = int(accounts.max()) + 1
+            if size > len(totals):
+                totals = np.concatenate([totals, np.zeros(size - len(totals), dtype=np.int64)])
+            np.add.at(totals, accounts, signs[columns["type"][newer]] * columns["amount_cents"][newer])
+        return totals
+
+    def writer(self, index):
+        """Start appending segments to the archive described by `index`."""
+        return ArchiveWriter(self, index)
+
+    def stats(self):
+        """Return the watermark, segment and row counts of the current manifest."""
+        index = self.snapshot()
+        return {
+            "watermark": index.watermark.isoformat() if index.watermark else None,
+            "segments": len(index.segments),
+            "rows": sum(segment["rows"] for segment in index.segments),
+            "generation": index.generation,
+        }
+
+
+class ArchiveWriter:
+    """
+    Cuts rows into segments, one month at a time, and commits them with a new manifest.
+
+    Rows must be added in (account id, timestamp, id) order, so that each
+    month's rows, and so each segment, come out in that order.
+
+    Attributes:
+        rows (int): Rows added.
+        segments (int): Segments written.
+        max_id (int): Highest transaction id added.
+    """
+
+    def __init__(self, store, index):
+        self._store = store
+        self._np = store.np
+        self._index = index
+        self._buffers = {}  # month "YYYY-MM" -> list of column dicts
+        self._buffered = {}  # month -> buffered rows
+        self._segments = []
+        self._next = index.manifest.get("next_segment", 0)
+        self._month_sums = {}  # month -> int64 signed sums indexed by account id
+        self.rows = 0
+        self.segments = 0
+        self.max_id = index.manifest.get("max_id", 0)
+
+    def add(self, columns):
+        """
+        Add a chunk of rows.
+
+        Args:
+            columns (dict): Equal-length arrays `id`, `account_id` (int64), `type` (int8 code),
+                `amount_cents` (int64), `timestamp` (int64 microseconds) and `transfer_id` (S32).
+        """
+        np = self._np
+        count = len(columns["id"])
+        if not count:
+            return
+        signs = np.array(SIGNS, dtype=np.int64)
+        months = columns["timestamp"].astype("datetime64[us]").astype("datetime64[M]")
+        for month in np.unique(months):
+            selected = months == month
+            key = str(month)
+            chunk = {name: values[selected] for name, values in columns.items()}
+            self._buffers.setdefault(key, []).append(chunk)
+            self._buffered[key] = self._buffered.get(key, 0) + len(chunk["id"])
+
+            sums = self._month_sums.get(key, np.zeros(0, dtype=np.int64))
+            size = int(chunk["account_id"].max()) + 1
+            if size > len(sums):
+                sums = np.concatenate([sums, np.zeros(size - len(sums), dtype=np.int64)])
+            np.add.at(sums, chunk["account_id"], signs[chunk["type"]] * chunk["amount_cents"])
+            self._month_sums[key] = sums
+
+            while self._buffered[key] >= self._store.segment_rows:
+                self._flush(key, self._store.segment_rows)
+        self.rows += count
+        self.max_id = max(self.max_id, int(columns["id"].max()))
+
+    def _flush(self, month, count):
+        """Write the first `count` buffered rows of `month` as one segment."""
+        np = self._np
+        merged = {name: np.concatenate([chunk[name] for chunk in self._buffers[month]]) for name in self._buffers[month][0]}
+        segment = {name: values[:count] for name, values in merged.items()}
+        rest = {name: values[count:] for name, values in merged.items()}
+        self._buffers[month] = [rest] if len(rest["id"]) else []
+        self._buffered[month] -= count
+
+        name = f"segment-{month}-{self._next:06d}.npz"
+        self._next += 1
+        self.segments += 1
+        path = os.path.join(self._store.directory, name)
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, **segment)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._segments.append({
+            "file": name,
+            "month": month,
+            "rows": count,
+            "min_account": int(segment["account_id"][0]),
+            "max_account": int(segment["account_id"][-1]),
+            "min_time": int(segment["timestamp"].min()),
+            "max_time": int(segment["timestamp"].max()),
+            "min_id": int(segment["id"].min()),
+            "max_id": int(segment["id"].max()),
+        })
+
+    def commit(self, watermark):
+        """
+        Write the remaining rows and publish them with a new manifest.
+
+        Args:
+            watermark (datetime): Every transaction before it is now archived.
+
+        Returns:
+            ArchiveIndex: The committed index.
+        """
+        np = self._np
+        for month in sorted(self._buffers):
+            if self._buffered[month]:
+                self._flush(month, self._buffered[month])
+
+        # New months always follow the archived ones, so their rows are appended below
+        previous = self._store._month_totals(self._index)
+        new_months = sorted(self._month_sums)
+        width = max([previous.shape[1]] + [len(sums) for sums in self._month_sums.values()])
+        totals = np.zeros((len(previous) + len(new_months), width), dtype=np.int64)
+        totals[:len(previous), :previous.shape[1]] = previous
+        for row, month in enumerate(new_months, len(previous)):
+            totals[row, :len(self._month_sums[month])] = self._month_sums[month]
+
+        directory = self._store.directory
+        generation = self._index.generation + 1
+        totals_name = f"totals-{generation:06d}.npy"
+        with open(os.path.join(directory, totals_name), "wb") as f:
+            np.save(f, totals)
+            f.flush()
+            os.fsync(f.fileno())
+
+        manifest = {
+            "version": 1,
+            "generation": generation,
+            "watermark": watermark.isoformat(),
+            "max_id": self.max_id,
+            "next_segment": self._next,
+            "totals": totals_name,
+            "months": self._index.months + new_months,
+            "segments": self._index.segments + sorted(self._segments, key=lambda s: (s["month"], s["file"])),
+        }
+        path = os.path.join(directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)  # The commit point
+        _fsync_directory(directory)
+
+        # Keep the previous totals file for readers still holding the previous manifest
+        for entry in os.scandir(directory):
+            if entry.name.startswith("totals-") and entry.name < f"totals-{generation - 1:06d}.npy":
+                os.remove(entry.path)
+        return self._store.snapshot()
+
+
+def _columns(np, chunk):
+    """Convert fetched (id, account_id, type, amount_cents, timestamp, transfer_id) tuples to column arrays."""
+    ids, accounts, types, amounts, timestamps, transfers = zip(*chunk)
+    codes = {name: code for code, name in enumerate(TYPE_CODES)}
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "account_id": np.array(accounts, dtype=np.int64),
+        "type": np.array([codes[t] for t in types], dtype=np.int8),
+        "amount_cents": np.array(amounts, dtype=np.int64),
+        # SQLite returns ISO strings and other drivers datetimes; NumPy parses either
+        "timestamp": np.array(timestamps, dtype="datetime64[us]").astype(np.int64),
+        "transfer_id": np.array([t or "" for t in transfers], dtype="S32"),
+    }
+
+
+def archive_transactions(store, before=None, hot_months=1, chunk_size=100_000, batch_size=5000):
+    """
+    Move every transaction of the closed months before `before` into the archive.
+
+    Must be called inside an app context.
+
+    Args:
+        store (ArchiveStore): The archive.
+        before (datetime | None): First day of the first month to keep in the database;
+            defaults to `hot_months` months back from the current month.
+        hot_months (int): Months kept in the database, counting the current one.
+        chunk_size (int): Rows fetched per round trip.
+        batch_size (int): Rows deleted from the table per transaction.
+
+    Returns:
+        dict: `archived` rows, new `segments`, rows `deleted` from the table,
+        the `watermark` and `seconds`.
+    """
+    from app.data_access.account_repository import purge_archived_transactions
+
+    np = store.np
+    started = time.perf_counter()
+    latest = month_start(datetime.utcnow() - ARCHIVE_GRACE, max(hot_months, 1) - 1)
+    cutoff = min(month_start(before), latest) if before is not None else latest
+    index = store.snapshot()
+    archived = segments = 0
+
+    if index.watermark is None or cutoff > index.watermark:
+        writer = store.writer(index)
+        query = (
+            select(Transaction.id, Transaction.account_id, Transaction.type, Transaction.amount_cents,
+                   Transaction.timestamp, Transaction.transfer_id)
+            .where(Transaction.timestamp < cutoff)
+            .order_by(Transaction.account_id, Transaction.timestamp, Transaction.id)
+        )
+        if index.watermark is not None:
+            query = query.where(Transaction.timestamp >= index.watermark)
+        # Rows before the cutoff are no longer written, so the read needs no lock or snapshot
+        with db.engine.connect() as conn:
+            rows = conn.execute(query)
+            while True:
+                chunk = rows.cursor.fetchmany(chunk_size)  # Plain tuples, as in reconciliation
+                if not chunk:
+                    break
+                writer.add(_columns(np, chunk))
+            rows.close()
+        index = writer.commit(cutoff)
+        archived, segments = writer.rows, writer.segments
+        logger.info("Archived %s transactions before %s into %s segments", archived, cutoff.date(), segments)
+
+    deleted = 0
+    if index.watermark is not None:
+        deleted = purge_archived_transactions(index.watermark, index.manifest["max_id"], batch_size)
+    return {
+        "archived": archived,
+        "segments": segments,
+        "deleted": deleted,
+        "watermark": index.watermark,
+        "seconds": time.perf_counter() - started,
+    }
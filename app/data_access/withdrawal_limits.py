@@ -0,0 +1,328 @@
+"""
+Withdrawal Limits Module
+
+This module enforces per-account daily withdrawal caps and per-minute velocity
+limits without querying the ledger on the withdrawal path.
+
+Each account keeps two in-memory sliding windows: the amount withdrawn over the
+last day and the number of withdrawals over the last minute. A window sums
+fixed-width time buckets, so adding a withdrawal and reading a total are O(1)
+(expired buckets are dropped from the front as time passes). A bucket is
+dropped only once it lies wholly outside the window, so a withdrawal counts for
+at least the window and at most one bucket longer. Accounts are kept in
+least-recently-used order, and the least recent one is forgotten once its
+windows are empty, so memory follows the accounts active in the last day.
+
+A withdrawal reserves its amount before its database transaction starts and
+releases it if the transaction does not commit, so concurrent withdrawals can
+never pass the limits together. Withdrawals in a batch and the debit side of a
+transfer are reserved the same way. At startup the windows are rebuilt from
+the last day of 'withdraw' and 'transfer_out' rows in the `transactions`
+table, and per-account limits are loaded from the `accounts` table. The windows belong to one process: with
+several workers each enforces the limits on its own withdrawals only.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select
+from app import db, metrics
+from app.models import Account, Transaction
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86_400
+MINUTE_SECONDS = 60
+DAY_BUCKET_SECONDS = 300
+MINUTE_BUCKET_SECONDS = 5
+REBUILD_MARGIN = timedelta(hours=1)  # Slack for ids committed out of timestamp order
+
+
+class SlidingWindow:
+    """
+    Running sum of the values added during the last `span` seconds.
+
+    Attributes:
+        span (int): Window length in seconds.
+        width (int): Bucket width in seconds.
+    """
+
+    __slots__ = ("span", "width", "_buckets", "_total")
+
+    def __init__(self, span, width):
+        self.span = span
+        self.width = width
+        self._buckets = deque()  # [bucket index, sum], oldest first
+        self._total = 0
+
+    def _expire(self, now):
+        oldest = int(now // self.width) - self.span // self.width
+        while self._buckets and self._buckets[0][0] < oldest:
+            self._total -= self._buckets.popleft()[1]
+
+    def total(self, now):
+        """
+        Sum of the values in the window ending at `now`.
+
+        Args:
+            now (float): Epoch seconds.
+
+        Returns:
+            int: The windowed sum.
+        """
+        self._expire(now)
+        return self._total
+
+    def add(self, when, value):
+        """
+        Add `value` at time `when`.
+
+        Times are expected in order; one earlier than the newest bucket is
+        counted in that bucket, so a clock step back never drops a value.
+
+        Args:
+            when (float): Epoch seconds.
+            value (int): The amount to add; negative to take back an earlier add.
+        """
+        index = int(when // self.width)
+        if self._buckets and self._buckets[-1][0] >= index:
+            self._buckets[-1][1] += value
+        else:
+            self._buckets.append([index, value])
+        self._total += value
+
+    def remove(self, when, value):
+        """Take back a value added at `when`, unless its bucket has already expired."""
+        index = int(when // self.width)
+        for bucket in reversed(self._buckets):
+            if bucket[0] <= index:
+                bucket[1] -= value
+                self._total -= value
+                return
+
+    def empty(self, now):
+        """Whether no bucket remains in the window ending at `now`."""
+        self._expire(now)
+        return not self._buckets
+
+
+class WithdrawalLimits:
+    """
+    Thread-safe per-account daily caps and per-minute velocity limits.
+
+    A limit of 0 means unlimited. Per-account limits replace the defaults; an
+    account's limit of None falls back to the default.
+
+    Attributes:
+        daily_limit_cents (int): Default cap on the amount withdrawn per day, in cents.
+        per_minute (int): Default cap on the number of withdrawals per minute.
+        rejections (int): Withdrawals refused by either limit.
+    """
+
+    def __init__(self, daily_limit_cents=0, per_minute=0, clock=time.time):
+        self.daily_limit_cents = daily_limit_cents
+        self.per_minute = per_minute
+        self._clock = clock
+        self._windows = OrderedDict()  # account_number -> (daily amount window, per-minute count window), least recent first
+        self._limits = {}  # account_number -> (daily_limit_cents | None, per_minute | None)
+        self._lock = threading.Lock()
+        self.rejections = 0
+
+    def _windows_for(self, account_number):
+        """Return an account's windows, marked most recently used. Runs under the lock."""
+        windows = self._windows.get(account_number)
+        if windows is None:
+            windows = self._windows[account_number] = (
+                SlidingWindow(DAY_SECONDS, DAY_BUCKET_SECONDS),
+                SlidingWindow(MINUTE_SECONDS, MINUTE_BUCKET_SECONDS),
+            )
+        else:
+            self._windows.move_to_end(account_number)
+        return windows
+
+    def limits_for(self, account_number):
+        """
+        Return the limits that apply to an account.
+
+        Returns:
+            tuple: (daily limit in cents, withdrawals per minute), 0 meaning unlimited.
+        """
+        daily, per_minute = self._limits.get(account_number, (None, None))
+        return (
+            self.daily_limit_cents if daily is None else daily,
+            self.per_minute if per_minute is None else per_minute,
+        )
+
+    def set_limits(self, account_number, daily_limit_cents=None, per_minute=None):
+        """
+        Set an account's own limits; None restores the default for that limit.
+
+        Args:
+            account_number (str): The account number.
+            daily_limit_cents (int | None): Daily withdrawal cap in cents.
+            per_minute (int | None): Withdrawals allowed per minute.
+        """
+        with self._lock:
+            if daily_limit_cents is None and per_minute is None:
+                self._limits.pop(account_number, None)
+            else:
+                self._limits[account_number] = (daily_limit_cents, per_minute)
+
+    def reserve(self, account_number, amount_cents):
+        """
+        Count a withdrawal against the limits if it fits within both.
+
+        Args:
+            account_number (str): The account number.
+            amount_cents (int): The amount withdrawn, in cents.
+
+        Returns:
+            tuple: (reservation, None) if allowed, to be passed to `release` if the
+            withdrawal does not commit, or (None, error dict) if a limit is reached.
+        """
+        now = self._clock()
+        with self._lock:
+            daily_limit, per_minute = self.limits_for(account_number)
+            daily, minute = self._windows_for(account_number)
+            # The least recently used account has nothing left once a day has passed
+            oldest = next(iter(self._windows))
+            if oldest != account_number and self._windows[oldest][0].empty(now):
+                del self._windows[oldest]
+            if per_minute and minute.total(now) >= per_minute:
+                self.rejections += 1
+                metrics.VELOCITY_LIMIT_REJECTIONS.inc()
+                return None, {"error": "Withdrawal velocity limit exceeded", "code": 429}
+            if daily_limit and daily.total(now) + amount_cents > daily_limit:
+                self.rejections += 1
+                metrics.DAILY_LIMIT_REJECTIONS.inc()
+                return None, {"error": "Daily withdrawal limit exceeded", "code": 403}
+            daily.add(now, amount_cents)
+            minute.add(now, 1)
+        return (account_number, now, amount_cents), None
+
+    def release(self, reservation):
+        """Take back a reservation whose withdrawal failed or was not applied."""
+        account_number, when, amount_cents = reservation
+        with self._lock:
+            windows = self._windows.get(account_number)
+            if windows is not None:
+                windows[0].remove(when, amount_cents)
+                windows[1].remove(when, 1)
+
+    def record(self, withdrawals):
+        """
+        Count committed withdrawals without checking the limits; used when rebuilding.
+
+        Args:
+            withdrawals (Iterable[tuple]): (account number, amount in cents, epoch seconds),
+                oldest first.
+
+        Returns:
+            int: The number of withdrawals counted.
+        """
+        count = 0
+        with self._lock:
+            now = self._clock()
+            recent = now - MINUTE_SECONDS - MINUTE_BUCKET_SECONDS
+            for account_number, amount_cents, when in withdrawals:
+                daily, minute = self._windows_for(account_number)
+                daily.add(when, amount_cents)
+                if when >= recent:
+                    minute.add(when, 1)
+                count += 1
+        return count
+
+    def usage(self, account_number):
+        """
+        Report an account's limits and what it has used of them.
+
+        Returns:
+            dict: `daily_limit_cents`, `withdrawn_today_cents`, `per_minute` and
+            `withdrawals_last_minute`.
+        """
+        now = self._clock()
+        with self._lock:
+            daily_limit, per_minute = self.limits_for(account_number)
+            windows = self._windows.get(account_number)
+            return {
+                "daily_limit_cents": daily_limit,
+                "withdrawn_today_cents": windows[0].total(now) if windows else 0,
+                "per_minute": per_minute,
+                "withdrawals_last_minute": windows[1].total(now) if windows else 0,
+            }
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch_seconds(dialect_name):
+    """SQL expression for `Transaction.timestamp` (naive UTC) as epoch seconds."""
+    if dialect_name == "sqlite":
+        return (func.julianday(Transaction.timestamp) - 2440587.5) * 86400.0
+    return func.extract("epoch", Transaction.timestamp)
+
+
+def _first_id_since(conn, cutoff):
+    """
+    Find the lowest transaction id whose timestamp is at or after `cutoff`.
+
+    Ids and timestamps are both assigned at insert, so they rise together; a
+    binary search over primary-key lookups avoids scanning the table, which has
+    no index on `timestamp` alone.
+
+    Returns:
+        int: The id, or one past the highest id if every row is older.
+    """
+    low = conn.scalar(select(func.min(Transaction.id))) or 0
+    high = (conn.scalar(select(func.max(Transaction.id))) or 0) + 1
+    while low < high:
+        middle = (low + high) // 2
+        timestamp = conn.scalar(
+            select(Transaction.timestamp).where(Transaction.id >= middle).order_by(Transaction.id).limit(1)
+        )
+        if timestamp is None or timestamp >= cutoff:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def rebuild_limits(limits):
+    """
+    Load per-account limits and the last day of withdrawals into `limits`.
+
+    Must be called inside an app context.
+
+    Args:
+        limits (WithdrawalLimits): The engine to fill.
+
+    Returns:
+        int: The number of withdrawals counted.
+    """
+    started = time.perf_counter()
+    now = limits._clock()
+    cutoff = EPOCH + timedelta(seconds=now - DAY_SECONDS - DAY_BUCKET_SECONDS)
+    with db.engine.connect() as conn:
+        for number, daily, per_minute in conn.execute(
+            select(Account.account_number, Account.daily_withdrawal_limit_cents, Account.withdrawals_per_minute)
+            .where(or_(Account.daily_withdrawal_limit_cents.isnot(None), Account.withdrawals_per_minute.isnot(None)))
+        ):
+            limits.set_limits(number, daily, per_minute)
+
+        first_id = _first_id_since(conn, cutoff - REBUILD_MARGIN)
+        # In id order, which follows time closely enough for the windows and needs no sort. Epoch
+        # seconds are computed by the database and read as plain tuples from the DBAPI cursor,
+        # since building Row and datetime objects would cost more than filling the windows
+        rows = conn.execute(
+            select(Account.account_number, Transaction.amount_cents, _epoch_seconds(conn.dialect.name))
+            .join(Account, Account.id == Transaction.account_id)
+            .where(Transaction.id >= first_id, Transaction.type.in_(("withdraw", "transfer_out")), Transaction.timestamp >= cutoff)
+            .order_by(Transaction.id)
+        )
+        counted = limits.record(rows.cursor)
+        rows.close()
+    logger.info("Rebuilt withdrawal limits from %s withdrawals in %.3fs", counted, time.perf_counter() - started)
+    return counted
@@ -0,0 +1,158 @@
+"""
+Write Combiner Module
+
+This module combines concurrent withdrawals and deposits on hot accounts.
+Requests for one account join a per-account queue, and a single writer at a
+time drains it in micro-batches: one row lock, one balance update, one ledger
+insert per operation and one commit for the whole batch. Funds are still
+checked operation by operation, in queue order, and every caller gets its own
+result.
+
+There is no dedicated writer thread. The caller that finds an account's queue
+idle becomes its writer; after committing a batch it hands the role to the
+oldest caller still waiting, so no request writes for longer than one batch.
+"""
+
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class _Pending:
+    """A queued operation and the event its caller waits on."""
+
+    __slots__ = ("amount", "transaction_type", "result", "ready")
+
+    def __init__(self, amount, transaction_type):
+        self.amount = amount
+        self.transaction_type = transaction_type
+        self.result = None  # Stays None when the caller is promoted to writer
+        self.ready = threading.Event()
+
+
+class WriteCombiner:
+    """
+    Per-account single-writer queues for hot accounts.
+
+    An account is combined when it is listed in `accounts` or, with a
+    non-zero `threshold`, when at least that many writers in this process
+    are working on it at once.
+
+    Attributes:
+        accounts (set[str]): Accounts that are always combined.
+        threshold (int): Concurrent writers on one account that switch it to combining; 0 disables.
+        max_batch (int): Most operations committed together.
+        batches (int): Micro-batches committed.
+        operations (int): Operations applied through the combiner.
+    """
+
+    def __init__(self, accounts=(), threshold=0, max_batch=256):
+        self.accounts = set(accounts)
+        self.threshold = threshold
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queues = {}  # account_number -> deque of _Pending, present while a writer is active
+        self._inflight = defaultdict(int)
+        self.batches = 0
+        self.operations = 0
+
+    @contextmanager
+    def tracking(self, account_number):
+        """
+        Count the caller as an in-flight writer of `account_number` for the threshold.
+
+        Args:
+            account_number (str): The account being written.
+        """
+        if not self.threshold:
+            yield
+            return
+        with self._lock:
+            self._inflight[account_number] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight[account_number] -= 1
+                if not self._inflight[account_number]:
+                    del self._inflight[account_number]
+
+    def should_combine(self, account_number):
+        """
+        Decide whether a write to `account_number` goes through the combiner.
+
+        Args:
+            account_number (str): The account being written.
+
+        Returns:
+            bool: True to combine.
+        """
+        if account_number in self.accounts:
+            return True
+        return bool(self.threshold) and self._inflight.get(account_number, 0) >= self.threshold
+
+    def submit(self, account_number, amount, transaction_type, apply_batch):
+        """
+        Queue one operation and wait for its result.
+
+        Args:
+            account_number (str): The account number.
+            amount (int): The signed amount in cents.
+            transaction_type (str): 'withdraw' or 'deposit'.
+            apply_batch (callable): `apply_batch(account_number, [(amount, type), ...])` commits
+                a micro-batch and returns one result per operation, in order.
+
+        Returns:
+            dict: The operation's result.
+        """
+        pending = _Pending(amount, transaction_type)
+        with self._lock:
+            queue = self._queues.get(account_number)
+            writer = queue is None
+            if writer:
+                queue = self._queues[account_number] = deque()
+            queue.append(pending)
+        if not writer:
+            pending.ready.wait()
+        if pending.result is None:  # Idle queue or promoted by the previous writer
+            self._write_batch(account_number, apply_batch)
+        return pending.result
+
+    def _write_batch(self, account_number, apply_batch):
+        """Commit the oldest queued operations, then hand the writer role on."""
+        with self._lock:
+            queue = self._queues[account_number]
+            batch = [queue.popleft() for _ in range(min(len(queue), self.max_batch))]
+        try:
+            results = apply_batch(account_number, [(p.amount, p.transaction_type) for p in batch])
+        except Exception as e:  # Every waiter must be released, whatever happened
+            results = [{"error": f"Transaction failed: {e}"}] * len(batch)
+
+        with self._lock:
+            self.batches += 1
+            self.operations += len(batch)
+            queue = self._queues[account_number]
+            successor = queue[0] if queue else None
+            if successor is None:
+                del self._queues[account_number]
+        for pending, result in zip(batch, results):
+            pending.result = result
+            pending.ready.set()
+        if successor is not None:
+            successor.ready.set()
+
+    def stats(self):
+        """
+        Snapshot of the combiner counters.
+
+        Returns:
+            dict: Combined accounts, threshold, batches, operations and mean batch size.
+        """
+        with self._lock:
+            return {
+                "accounts": sorted(self.accounts),
+                "threshold": self.threshold,
+                "batches": self.batches,
+                "operations": self.operations,
+                "mean_batch": self.operations / self.batches if self.batches else 0.0,
+            }
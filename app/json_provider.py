@@ -0,0 +1,86 @@
+"""
+JSON Provider Module
+
+Flask encodes every JSON response with the standard library's `json`. This
+module provides a drop-in provider that encodes responses with orjson
+instead, when it is installed. Output is the same JSON, with keys sorted and
+the same encoding of dates, UUIDs and dataclasses. The only difference is that
+non-ASCII text is written as UTF-8 rather than as `\\u` escapes. Request bodies
+are still decoded by the standard library, so what the API accepts does not
+change.
+
+`JSON_ENCODER` selects the encoder: 'auto' (the default) uses orjson when it
+can be imported, 'orjson' requires it, and 'json' keeps Flask's provider.
+"""
+
+import logging
+from flask.json.provider import DefaultJSONProvider
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson and decodes with the standard library.
+
+    Values orjson cannot encode natively (integers wider than 64 bits, or types
+    handled by Flask's `default`) still encode the way they would under Flask's provider.
+    """
+
+    def __init__(self, app, orjson):
+        super().__init__(app)
+        self._orjson = orjson
+        # Datetimes go through Flask's `default`, so they keep the HTTP date format
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            self._options |= orjson.OPT_SORT_KEYS
+
+    def _encode(self, obj, options):
+        """Encode `obj` to bytes, falling back to the standard library for what orjson rejects."""
+        try:
+            return self._orjson.dumps(obj, default=self.default, option=options)
+        except self._orjson.JSONEncodeError:
+            indent = 2 if options & self._orjson.OPT_INDENT_2 else None
+            text = super().dumps(obj, indent=indent, separators=None if indent else (",", ":"))
+            return (text + "\n" if options & self._orjson.OPT_APPEND_NEWLINE else text).encode()
+
+    def dumps(self, obj, **kwargs):
+        """Serialize `obj` to a JSON string; keyword arguments select the standard library."""
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, self._options).decode()
+
+    def response(self, *args, **kwargs):
+        """Serialize the arguments into a JSON response, as `flask.jsonify` does."""
+        obj = self._prepare_response_obj(args, kwargs)
+        options = self._options | self._orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            options |= self._orjson.OPT_INDENT_2
+        return self._app.response_class(self._encode(obj, options), mimetype=self.mimetype)
+
+
+def configure_json(app):
+    """
+    Install the JSON provider selected by `JSON_ENCODER`.
+
+    Args:
+        app (Flask): The application.
+
+    Raises:
+        RuntimeError: If `JSON_ENCODER` is 'orjson' and orjson is not installed.
+        ValueError: If `JSON_ENCODER` is not 'auto', 'orjson' or 'json'.
+    """
+    setting = str(app.config.get("JSON_ENCODER", "auto")).lower()
+    if setting not in ("auto", "orjson", "json"):
+        raise ValueError(f"Invalid JSON_ENCODER: {setting!r}")
+    if setting == "json":
+        return
+    try:
+        import orjson
+    except ImportError:
+        if setting == "orjson":
+            raise RuntimeError("JSON_ENCODER=orjson requires orjson: pip install orjson") from None
+        logger.debug("orjson is not installed; encoding responses with the standard library")
+        return
+    app.json = OrjsonProvider(app, orjson)
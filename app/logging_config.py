@@ -0,0 +1,164 @@
+"""
+Logging Configuration Module
+
+This module configures application logging from `Config`.
+
+- `LOG_FORMAT=text` (the default) keeps the console handler set up in
+  `app.utils`, which writes each record synchronously as it is logged.
+- `LOG_FORMAT=json` writes one JSON object per line. Request threads only put
+  records on a bounded queue; a `QueueListener` thread formats and writes
+  them, so building the message and the stream write both leave the request
+  path. When the queue is full, records are dropped and counted rather than
+  blocking a request.
+
+INFO and DEBUG records can be sampled with `LOG_SUCCESS_SAMPLE_RATE`; warnings
+and errors are always kept. `LOG_LEVEL=OFF` silences the application loggers.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from app import metrics, utils  # utils installs the text-mode console handler on import
+
+APP_LOGGER = "app"
+# The one application logger with its own console handler in text mode
+UTILS_LOGGER = "app.utils"
+
+# Attributes every LogRecord has; anything else was passed with `extra=` and is emitted as a field
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_text_handlers = None
+
+
+class SuccessSampler(logging.Filter):
+    """
+    Keeps a random fraction of records below WARNING.
+
+    Attributes:
+        rate (float): Fraction of INFO/DEBUG records kept, from 0.0 to 1.0.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON, including any fields passed with `extra=`."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queues records unformatted, leaving `msg % args` to the listener thread.
+
+    The stock `QueueHandler.prepare` formats every record in the calling
+    thread so it can be pickled; these records stay in-process, so only
+    exception tracebacks are rendered up front. Arguments must not be mutated
+    after they are logged.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+
+def _level(name):
+    name = str(name).upper()
+    if name == "OFF":
+        return logging.CRITICAL + 1
+    return logging.getLevelName(name)
+
+
+def stop_logging():
+    """Stop the background writer, if running, after it has written every queued record."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def configure_logging(config):
+    """
+    Apply the logging settings of an app's config to the process's application loggers.
+
+    Calling it again (e.g. for another app in the same process) replaces the
+    previous configuration.
+
+    Args:
+        config (dict): The Flask application config.
+    """
+    global _listener, _text_handlers
+    app_logger = logging.getLogger(APP_LOGGER)
+    utils_logger = utils.logger
+    if _text_handlers is None:
+        _text_handlers = list(utils_logger.handlers)
+    stop_logging()
+
+    level = _level(config.get("LOG_LEVEL", "INFO"))
+    sampler = SuccessSampler(float(config.get("LOG_SUCCESS_SAMPLE_RATE", 1.0)))
+    for handler in _text_handlers:
+        for old in [f for f in handler.filters if isinstance(f, SuccessSampler)]:
+            handler.removeFilter(old)
+
+    if str(config.get("LOG_FORMAT", "text")).lower() == "json":
+        log_file = config.get("LOG_FILE")
+        target = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+        target.setFormatter(JsonFormatter())
+        records = queue.Queue(int(config.get("LOG_QUEUE_SIZE", 10000)))
+        handler = LazyQueueHandler(records)
+        handler.addFilter(sampler)
+        _listener = QueueListener(records, target)
+        _listener.start()
+        app_logger.handlers = [handler]
+        app_logger.propagate = False
+        app_logger.setLevel(level)
+        utils_logger.handlers = []
+        utils_logger.setLevel(logging.NOTSET)
+    else:
+        app_logger.handlers = []
+        app_logger.propagate = True
+        app_logger.setLevel(logging.NOTSET)
+        utils_logger.handlers = list(_text_handlers)
+        utils_logger.setLevel(level)
+        for handler in _text_handlers:
+            handler.addFilter(sampler)
+
+
+atexit.register(stop_logging)
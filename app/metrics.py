@@ -0,0 +1,374 @@
+"""
+Metrics Module
+
+This module provides the process-wide counters and histograms behind the
+`/metrics` endpoint, rendered in the Prometheus text exposition format.
+
+Recording a sample takes no lock: every thread increments its own shard of
+each metric, and a scrape sums the shards. Shards of threads that have exited
+are folded into a retired total on the next scrape, so servers that start a
+thread per request do not accumulate them.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# Bucket upper bounds in seconds, from 50µs (a cached read) to 10s (a write stuck behind retries)
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Every metric defined below; `render` exposes whatever is registered here
+REGISTRY = []
+_registry_lock = threading.Lock()
+
+
+class _Sharded:
+    """
+    Per-thread cells of a fixed length, summed on demand.
+
+    Each thread's first sample allocates its cells and registers them under a
+    lock; every later sample only touches the calling thread's own list.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self.local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = [0] * size
+
+    def allocate(self):
+        """Create and register the calling thread's cells; samples then read `local.cells`."""
+        cells = self.local.cells = [0] * self._size
+        with self._lock:
+            self._shards.append((threading.current_thread(), cells))
+        return cells
+
+    def totals(self):
+        """
+        Sum every shard, retiring those whose thread has exited.
+
+        Returns:
+            list: The summed cells.
+        """
+        with self._lock:
+            live = []
+            for thread, cells in self._shards:
+                if thread.is_alive():
+                    live.append((thread, cells))
+                else:
+                    self._retired = [a + b for a, b in zip(self._retired, cells)]
+            self._shards = live
+            totals = list(self._retired)
+            for _, cells in live:
+                totals = [a + b for a, b in zip(totals, cells)]
+        return totals
+
+
+class _Metric:
+    """
+    Base class for registered metrics, optionally split by label values.
+
+    An unlabelled metric records directly; a labelled one records through the
+    children returned by `labels`.
+
+    Attributes:
+        name (str): The exposition name.
+        documentation (str): The HELP text.
+        labelnames (tuple[str]): Label names.
+    """
+
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        if registry is not None:
+            with _registry_lock:
+                registry.append(self)
+
+    def labels(self, *values):
+        """
+        Return the child for one combination of label values.
+
+        Callers on hot paths should keep the child rather than look it up per sample.
+
+        Args:
+            *values (str): One value per label name.
+
+        Returns:
+            The child, with the same recording methods as an unlabelled metric.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._children_lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self):
+        """
+        Render the metric in the Prometheus text format.
+
+        Returns:
+            list[str]: Exposition lines.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._children_lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterValue:
+    def __init__(self):
+        self._shards = _Sharded(1)
+        self._local = self._shards.local
+
+    def inc(self, amount=1):
+        """Add `amount` to the counter."""
+        try:
+            self._local.cells[0] += amount
+        except AttributeError:
+            self._shards.allocate()[0] += amount
+
+    def value(self):
+        """Return the current total."""
+        return self._shards.totals()[0]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        if not self.labelnames:
+            default = self._children[()]
+            self.inc, self.value = default.inc, default.value
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{self._label_text(values)} {_number(child.value())}"
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One cell per bucket, one for +Inf, then the running sum
+        self._shards = _Sharded(len(buckets) + 2)
+        self._local = self._shards.local
+
+    def observe(self, value):
+        """Record one value."""
+        try:
+            cells = self._local.cells
+        except AttributeError:
+            cells = self._shards.allocate()
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def snapshot(self):
+        """
+        Return the current distribution.
+
+        Returns:
+            dict: Cumulative `buckets` as (upper bound, count) pairs ending with +Inf, `count` and `sum`.
+        """
+        totals = self._shards.totals()
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), totals[:-1]):
+            running += count
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "count": running, "sum": totals[-1]}
+
+
+class Histogram(_Metric):
+    """
+    A distribution of observed values over fixed cumulative buckets.
+
+    Attributes:
+        buckets (tuple[float]): Bucket upper bounds, excluding +Inf.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+        if not self.labelnames:
+            default = self._children[()]
+            self.observe, self.snapshot = default.observe, default.snapshot
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, values, child):
+        snapshot = child.snapshot()
+        for bound, count in snapshot["buckets"]:
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            yield f"{self.name}_bucket{self._label_text(values, [('le', le)])} {count}"
+        yield f"{self.name}_sum{self._label_text(values)} {_number(snapshot['sum'])}"
+        yield f"{self.name}_count{self._label_text(values)} {snapshot['count']}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(registry=REGISTRY):
+    """
+    Render every metric in a registry.
+
+    Args:
+        registry (list): The metrics to render; the process-wide registry by default.
+
+    Returns:
+        str: The Prometheus text exposition.
+    """
+    with _registry_lock:
+        metrics = list(registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Time SQLite spent in BEGIN IMMEDIATE on this thread, so the repository can
+# report it as lock wait rather than as session acquisition
+_begin_wait = threading.local()
+
+
+def note_begin_wait(seconds):
+    """Record a database lock wait taken while beginning this thread's transaction."""
+    DATABASE_LOCK_WAIT.observe(seconds)
+    _begin_wait.seconds = seconds
+
+
+def take_begin_wait():
+    """
+    Return and reset this thread's pending BEGIN wait.
+
+    Returns:
+        float: Seconds, 0.0 if the last BEGIN did not wait for a lock.
+    """
+    seconds = getattr(_begin_wait, "seconds", 0.0)
+    _begin_wait.seconds = 0.0
+    return seconds
+
+
+REQUEST_DURATION = Histogram(
+    "atm_request_duration_seconds", "Time spent handling an HTTP request, by endpoint.", ("endpoint",),
+)
+VALIDATION_DURATION = Histogram(
+    "atm_validation_duration_seconds", "Time spent validating a request in the service layer, by operation.", ("operation",),
+)
+SESSION_ACQUIRE = Histogram(
+    "atm_session_acquire_seconds", "Time to check out a pooled connection and begin a write transaction.",
+)
+LOCK_WAIT = Histogram(
+    "atm_lock_wait_seconds", "Time a write waited for a lock: 'account' stripes in-process, or the 'database' write lock.", ("lock",),
+)
+COMMIT_DURATION = Histogram(
+    "atm_commit_duration_seconds", "Time spent committing a write transaction.",
+)
+WRITE_RETRIES = Counter(
+    "atm_write_retries_total", "Write transactions retried after database lock contention.",
+)
+DATABASE_LOCKED = Counter(
+    "atm_database_locked_total", "'database is locked' errors raised by write transactions.",
+)
+INSUFFICIENT_FUNDS = Counter(
+    "atm_insufficient_funds_total", "Withdrawals, transfers and batch operations rejected for insufficient funds.",
+)
+POOL_CHECKOUTS = Counter(
+    "atm_pool_checkouts_total", "Connections checked out of the database pool.",
+)
+LOG_RECORDS_DROPPED = Counter(
+    "atm_log_records_dropped_total", "Log records dropped because the JSON log queue was full.",
+)
+LEDGER_FLUSH_DURATION = Histogram(
+    "atm_ledger_flush_seconds", "Time to write and fsync one group commit of the ledger journal.",
+)
+LEDGER_ENTRIES = Counter(
+    "atm_ledger_entries_total", "Balance changes written to the ledger journal.",
+)
+WITHDRAWAL_LIMIT_REJECTIONS = Counter(
+    "atm_withdrawal_limit_rejections_total", "Withdrawals refused by the 'daily' cap or the 'velocity' limit.", ("limit",),
+)
+REQUESTS_SHED = Counter(
+    "atm_requests_shed_total", "Requests refused by admission control: 'rate_limit', 'queue_full' or 'queue_timeout'.", ("reason",),
+)
+REPLICA_READS = Counter(
+    "atm_replica_reads_total", "Reads routed by the replica router, by 'replica' index, or 'primary' when none had caught up.", ("replica",),
+)
+
+ACCOUNT_LOCK_WAIT = LOCK_WAIT.labels("account")
+DATABASE_LOCK_WAIT = LOCK_WAIT.labels("database")
+DAILY_LIMIT_REJECTIONS = WITHDRAWAL_LIMIT_REJECTIONS.labels("daily")
+VELOCITY_LIMIT_REJECTIONS = WITHDRAWAL_LIMIT_REJECTIONS.labels("velocity")
+RATE_LIMITED = REQUESTS_SHED.labels("rate_limit")
+WRITE_QUEUE_FULL = REQUESTS_SHED.labels("queue_full")
+WRITE_QUEUE_TIMEOUT = REQUESTS_SHED.labels("queue_timeout")
+
+
+def instrument_app(app):
+    """
+    Time every request an app handles, labelled by its endpoint.
+
+    Requests that match no route are reported as 'unmatched', so probes for
+    arbitrary paths cannot grow the number of series.
+
+    Args:
+        app (Flask): The application.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.teardown_request
+    def observe_request(exception=None):
+        started = g.pop("request_started", None)
+        if started is not None:
+            REQUEST_DURATION.labels(request.endpoint or "unmatched").observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """
+    Count pool checkouts on an engine.
+
+    Args:
+        engine (Engine): A synchronous engine, or an async engine's `sync_engine`.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKOUTS.inc()
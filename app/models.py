@@ -3,13 +3,31 @@ Database Models for the ATM System
 
 This module defines the database models for the ATM system, including:
 - `Account`: Represents a bank account with an account number and balance.
-- `Transaction`: Represents a deposit or withdrawal transaction linked to an account.
+- `Transaction`: Represents a deposit, withdrawal or transfer leg linked to an account.
+- `IdempotencyKey`: Records the outcome of a withdrawal or deposit made with an `Idempotency-Key`.
+- `CommitPosition`: Counts write requests, so SQLite read replicas can tell how far they have caught up.
 
-These models are managed by SQLAlchemy.
+These models are managed by SQLAlchemy. Money is stored as integer cents in
+`BigInteger` columns; the `balance` and `amount` properties expose it in
+currency units for display and for constructing objects.
 """
 
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_property
 from app import db
+from app.utils import parse_cents, format_cents
+
+
+def _to_cents(value):
+    """Convert a currency-unit value to cents, rejecting anything that is not a valid amount."""
+    cents = parse_cents(value)
+    if cents is None:
+        raise ValueError(f"Invalid money amount: {value!r}")
+    return cents
+
+def _opening_balance(context):
+    """Default an account's opening balance to the balance it is created with."""
+    return context.get_current_parameters().get("balance_cents") or 0
 
 class Account(db.Model):
     """
@@ -18,7 +36,15 @@ class Account(db.Model):
     Attributes:
         id (int): Primary key for the account.
         account_number (str): Unique account identifier.
-        balance (float): Current balance of the account.
+        balance_cents (int): Current balance of the account in cents.
+        balance (float): Current balance in currency units (derived from `balance_cents`).
+        version (int): Incremented with every balance change; used to validate cached balances.
+        opening_balance_cents (int): The balance the account was created with; the balance minus
+            this must equal the sum of its transactions.
+        daily_withdrawal_limit_cents (int | None): The account's own daily withdrawal cap in cents;
+            None uses `WITHDRAWAL_DAILY_LIMIT`.
+        withdrawals_per_minute (int | None): The account's own velocity limit; None uses
+            `WITHDRAWAL_PER_MINUTE_LIMIT`.
         transactions (relationship): One-to-many relationship to `Transaction`.
 
     Methods:
@@ -28,36 +54,123 @@ class Account(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     account_number = db.Column(db.String(20), unique=True, nullable=False)
-    balance = db.Column(db.Float, nullable=False, default=0.0)
+    balance_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    version = db.Column(db.BigInteger, nullable=False, default=0)  # Incremented on every balance change
+    opening_balance_cents = db.Column(db.BigInteger, nullable=False, default=_opening_balance)
+    daily_withdrawal_limit_cents = db.Column(db.BigInteger, nullable=True)
+    withdrawals_per_minute = db.Column(db.Integer, nullable=True)
 
     # Relationship to transactions
     transactions = db.relationship('Transaction', backref='account', lazy=True)
 
+    @hybrid_property
+    def balance(self):
+        return format_cents(self.balance_cents)
+
+    @balance.setter
+    def balance(self, value):
+        self.balance_cents = _to_cents(value)
+
+    @balance.expression
+    def balance(cls):
+        return cls.balance_cents / 100.0
+
     def __repr__(self):
         return f'<Account {self.account_number} - Balance: {self.balance}>'
 
 
 class Transaction(db.Model):
     """
-    Represents a financial transaction (deposit or withdrawal) associated with an account.
+    Represents a financial transaction (deposit, withdrawal or transfer leg) associated with an account.
 
     Attributes:
         id (int): Primary key for the transaction.
         account_id (int): Foreign key linking to an account.
-        type (str): Indicates the transaction type ('deposit' or 'withdraw').
-        amount (float): The amount involved in the transaction.
+        type (str): Indicates the transaction type ('deposit', 'withdraw', 'transfer_out' or 'transfer_in').
+        amount_cents (int): The amount involved in the transaction, in cents.
+        amount (float): The amount in currency units (derived from `amount_cents`).
         timestamp (datetime): The time when the transaction was created.
+        transfer_id (str | None): Shared by both legs of an account-to-account transfer.
 
     Methods:
         __repr__(): Returns a string representation of the transaction.
     """
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Backs keyset pagination of an account's history, newest first
+        db.Index('ix_transactions_account_time', 'account_id', 'timestamp', 'id'),
+        # Ids of archived and deleted rows are never handed out again
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=False)
-    type = db.Column(db.String(10), nullable=False)  # 'deposit' or 'withdraw'
-    amount = db.Column(db.Float, nullable=False)
+    type = db.Column(db.String(20), nullable=False)  # 'deposit', 'withdraw', 'transfer_out' or 'transfer_in'
+    amount_cents = db.Column(db.BigInteger, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    transfer_id = db.Column(db.String(32), nullable=True, index=True)  # Links the two legs of a transfer
+
+    @hybrid_property
+    def amount(self):
+        return format_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = _to_cents(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_cents / 100.0
 
     def __repr__(self):
         return f'<Transaction {self.id} - {self.type} {self.amount} on {self.timestamp}>'
+
+
+class IdempotencyKey(db.Model):
+    """
+    Records the result of a withdrawal or deposit submitted with an `Idempotency-Key` header.
+
+    The row is written in the same commit as the ledger row it describes, so a
+    retried request either finds it and replays the result or runs for the first time.
+
+    Attributes:
+        key (str): The client-supplied idempotency key (primary key, hence unique).
+        account_number (str): The account the request targeted.
+        type (str): 'withdraw' or 'deposit'.
+        amount_cents (int): The requested amount, in cents.
+        new_balance_cents (int): The balance returned to the original request, in cents.
+        transaction_id (int): The ledger row created by the original request.
+        created_at (datetime): When the key was stored; used to expire it.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    key = db.Column(db.String(64), primary_key=True)
+    account_number = db.Column(db.String(20), nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    new_balance_cents = db.Column(db.BigInteger, nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} - {self.type} {self.amount_cents} on {self.account_number}>'
+
+
+class CommitPosition(db.Model):
+    """
+    One-row counter bumped after every write request while SQLite read replicas are configured.
+
+    A replica copy holding a value of at least a client's last position holds
+    that client's writes; see `app.data_access.replicas`.
+
+    Attributes:
+        id (int): Always 1.
+        position (int): Write requests counted so far.
+    """
+    __tablename__ = 'commit_position'
+
+    id = db.Column(db.Integer, primary_key=True)
+    position = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f'<CommitPosition {self.position}>'
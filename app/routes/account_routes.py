@@ -2,16 +2,31 @@
 Account Routes Module
 
 This module defines the API routes for account-related operations,
-including retrieving balances, processing deposits, and withdrawals.
+including retrieving balances, transaction history and statements, processing
+deposits, withdrawals, transfers, batches, and bulk account provisioning.
 
 It ensures proper request validation, structured error handling,
-and logging of incoming HTTP requests.
+and logging of incoming HTTP requests. Requests pass admission control first:
+clients over their rate are refused with 429, and writes that cannot get a
+slot in time with 503, both with a `Retry-After` header.
+
+With read replicas, responses to every request that may write carry the
+primary's commit position in the `X-Commit-Position` header and cookie, and
+reads route by the position the client sends back.
 """
 
-from flask import Blueprint, request, jsonify
-from app.services.account_service import get_balance_service, withdraw_service, deposit_service
-from app.utils import validate_account_number, validate_amount, format_error, format_response, log_request
+from flask import Blueprint, Response, request, jsonify, current_app, g, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
+from app.services.account_service import get_balance_service, transaction_history_service, statement_service, balance_change_service, transfer_service, batch_service, provision_service, limits_service, set_limits_service
+from app import metrics
+from app.data_access.replicas import COMMIT_POSITION_COOKIE, COMMIT_POSITION_HEADER, parse_position
+from app.utils import validate_account_number, parse_balance_change, format_error, format_response, log_request
+import functools
+import io
 import logging
+import shutil
+import tempfile
+import time
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -19,6 +34,99 @@ logger = logging.getLogger(__name__)
 # Define the blueprint for account-related routes
 bp = Blueprint('account', __name__)
 
+# Health checks and metrics scrapes are never rate limited
+RATE_LIMIT_EXEMPT = {"account.home", "account.metrics_endpoint"}
+
+# Requests that never write, so they need no commit position
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def shed_response(error):
+    """
+    Build the response for a request refused by admission control.
+
+    Args:
+        error (dict): The limiter's error, carrying `code` and `retry_after`.
+
+    Returns:
+        tuple: The JSON response, status code and `Retry-After` header.
+    """
+    code = error["code"]
+    return jsonify(format_response(format_error(error["error"], code), success=False, code=code)), code, {"Retry-After": str(error["retry_after"])}
+
+@bp.before_request
+def rate_limit():
+    """
+    Refuse the request with 429 if its client has used up its token bucket.
+
+    The client is named by the `RATE_LIMIT_CLIENT_HEADER` header (an ATM ID),
+    or by its remote address.
+    """
+    if request.endpoint in RATE_LIMIT_EXEMPT:
+        return None
+    client_id = request.headers.get(current_app.config["RATE_LIMIT_CLIENT_HEADER"]) or request.remote_addr or ""
+    error = current_app.extensions["rate_limiter"].check(client_id[:64])
+    if error is not None:
+        logger.warning("Rate limited client %s on %s", client_id[:64], request.path)
+        return shed_response(error)
+    return None
+
+@bp.before_request
+def read_commit_position():
+    """
+    Note the commit position of the client's last write, from its header or cookie.
+    """
+    if current_app.extensions.get("replica_router") is not None:
+        g.read_position = parse_position(
+            request.headers.get(COMMIT_POSITION_HEADER) or request.cookies.get(COMMIT_POSITION_COOKIE)
+        )
+
+@bp.after_request
+def send_commit_position(response):
+    """
+    Hand the client the primary's commit position after a request that may have written.
+
+    Every write endpoint is covered this way, whichever path its writes took
+    (including writes committed for it by the write combiner), so the client's
+    next read sees them. Error responses, including requests shed by admission
+    control, wrote nothing and are skipped, so they cost the primary no extra
+    commit.
+    """
+    router = current_app.extensions.get("replica_router")
+    if router is None or request.method in READ_METHODS or response.status_code >= 400:
+        return response
+    try:
+        position = router.commit_position()
+    except SQLAlchemyError as e:
+        logger.error("Could not record the commit position after %s %s: %s", request.method, request.path, e)
+        return response
+    response.headers[COMMIT_POSITION_HEADER] = str(position)
+    response.set_cookie(COMMIT_POSITION_COOKIE, str(position), httponly=True, samesite="Lax")
+    return response
+
+def limit_writes(view):
+    """
+    Run a write endpoint only while holding a slot of the write concurrency limiter.
+
+    When the slots and the queue are full, or the queue wait times out, the
+    request is refused with 503 instead of reaching the database. Reads of a
+    view that also serves writes pass straight through.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in READ_METHODS:
+            return view(*args, **kwargs)
+        limiter = current_app.extensions["write_limiter"]
+        error = limiter.acquire()
+        if error is not None:
+            logger.warning("Shed write request %s: %s", request.path, error["error"])
+            return shed_response(error)
+        started = time.perf_counter()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            limiter.release(time.perf_counter() - started)
+    return wrapper
+
 @bp.app_errorhandler(405)
 def method_not_allowed(error):
     """
@@ -67,41 +175,204 @@ def get_balance(account_number):
 
     return jsonify(format_response(result)), 200
 
-@bp.route('/accounts/<account_number>/withdraw', methods=['POST'])
-def withdraw(account_number):
+@bp.route('/accounts/<account_number>/transactions', methods=['GET'])
+def get_transactions(account_number):
     """
-    Process a withdrawal request.
+    Retrieve an account's transaction history, newest first, one page at a time.
+
+    Query parameters:
+        limit: Page size.
+        cursor: `next_cursor` from the previous page.
+        type: Transaction type filter; may be repeated or comma-separated.
+        from / to: ISO 8601 date range (`from` inclusive, `to` exclusive).
 
     Args:
         account_number (str): The unique identifier of the account.
 
     Returns:
-        Response: A JSON response confirming the withdrawal or an error message.
+        Response: A JSON response with the page of transactions or an error message.
     """
     log_request(request)
 
     if not validate_account_number(account_number):
         return jsonify(format_response(format_error("Invalid account number format", 400), success=False, code=400)), 400
 
-    if not request.is_json:
-        return format_response(format_error("Missing JSON body or incorrect Content-Type", 415), success=False, code=415)
+    types = [t for value in request.args.getlist("type") for t in value.split(",") if t]
+    result = transaction_history_service(
+        account_number,
+        limit=request.args.get("limit"),
+        cursor=request.args.get("cursor"),
+        types=types or None,
+        start=request.args.get("from"),
+        end=request.args.get("to"),
+    )
+
+    if "error" in result:
+        code = result.get("code", 400)
+        return jsonify(format_response(format_error(result["error"], code), success=False, code=code)), code
+
+    return jsonify(format_response(result)), 200
+
+@bp.route('/accounts/<account_number>/statement', methods=['GET'])
+def export_statement(account_number):
+    """
+    Stream an account statement with a running balance, oldest first.
 
-    data = request.get_json()
-    if not data or "amount" not in data:
-        return jsonify(format_response(format_error("Missing 'amount' in request body", 400), success=False, code=400)), 400
+    Query parameters:
+        format: 'ndjson' (default) or 'csv'.
+        from / to: ISO 8601 date range (`from` inclusive, `to` exclusive).
 
-    valid, amount = validate_amount(data["amount"])
-    if not valid:
-        return jsonify(format_response(format_error("Invalid amount format or must be greater than zero", 400), success=False, code=400)), 400
+    Args:
+        account_number (str): The unique identifier of the account.
+
+    Returns:
+        Response: A streamed NDJSON or CSV body, or a JSON error message.
+    """
+    log_request(request)
+
+    if not validate_account_number(account_number):
+        return jsonify(format_response(format_error("Invalid account number format", 400), success=False, code=400)), 400
 
-    result = withdraw_service(account_number, amount)
+    fmt = request.args.get("format", "ndjson")
+    result = statement_service(account_number, fmt=fmt, start=request.args.get("from"), end=request.args.get("to"))
 
     if "error" in result:
-        return jsonify(format_response(format_error(result["error"], 400), success=False, code=400)), 400
+        code = result.get("code", 400)
+        return jsonify(format_response(format_error(result["error"], code), success=False, code=code)), code
+
+    headers = {"Content-Disposition": f"attachment; filename=statement-{account_number}.{fmt}"}
+    return Response(stream_with_context(result["chunks"]), mimetype=result["mimetype"], headers=headers)
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Report balance cache counters.
+
+    Returns:
+        Response: A JSON response with hit/miss/eviction counters, or `enabled: false`.
+    """
+    cache = current_app.extensions.get("balance_cache")
+    if cache is None:
+        return jsonify(format_response({"enabled": False})), 200
+    return jsonify(format_response({"enabled": True, **cache.stats()})), 200
+
+@bp.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    """
+    Report the admission limits in force and the limiters' counters.
 
+    Returns:
+        Response: A JSON response with the rate limiter and write limiter counters.
+    """
+    config = current_app.config
+    return jsonify(format_response({
+        "rate_limit_per_second": config["RATE_LIMIT_PER_SECOND"],
+        "write_concurrency_limit": config["WRITE_CONCURRENCY_LIMIT"],
+        "write_queue_size": config["WRITE_QUEUE_SIZE"],
+        "rate_limiter": current_app.extensions["rate_limiter"].stats(),
+        "write_limiter": current_app.extensions["write_limiter"].stats(),
+    })), 200
+
+@bp.route('/replicas/stats', methods=['GET'])
+def replica_stats():
+    """
+    Report how many reads each read replica served and how far it has replicated.
+
+    Returns:
+        Response: A JSON response with per-replica reads and positions, or `enabled: false`.
+    """
+    router = current_app.extensions.get("replica_router")
+    if router is None:
+        return jsonify(format_response({"enabled": False})), 200
+    return jsonify(format_response({"enabled": True, **router.stats()})), 200
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Expose the process's request timings and contention counters.
+
+    Returns:
+        Response: The metrics in the Prometheus text format, or 404 when metrics are disabled.
+    """
+    if not current_app.config.get("METRICS_ENABLED"):
+        return jsonify(format_response(format_error("Metrics are disabled", 404), success=False, code=404)), 404
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@bp.route('/accounts/<account_number>/limits', methods=['GET', 'PUT'])
+@limit_writes
+def withdrawal_limits(account_number):
+    """
+    Retrieve or set an account's withdrawal limits.
+
+    A PUT body may carry `daily_limit` (currency units) and `per_minute`; a
+    missing or null value restores the application default for that limit.
+
+    Args:
+        account_number (str): The unique identifier of the account.
+
+    Returns:
+        Response: A JSON response with the limits and current usage, or an error message.
+    """
+    log_request(request)
+
+    if request.method == "GET":
+        result = limits_service(account_number)
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify(format_response(format_error("Missing JSON body or incorrect Content-Type", 415), success=False, code=415)), 415
+        result = set_limits_service(account_number, data.get("daily_limit"), data.get("per_minute"))
+
+    if "error" in result:
+        code = result.get("code", 400)
+        return jsonify(format_response(format_error(result["error"], code), success=False, code=code)), code
     return jsonify(format_response(result)), 200
 
+def change_balance(operation, account_number):
+    """
+    Parse a withdrawal or deposit once into a `BalanceChange` and apply it.
+
+    Args:
+        operation (str): 'withdraw' or 'deposit'.
+        account_number (str): The unique identifier of the account.
+
+    Returns:
+        Response: A JSON response with the new balance or an error message.
+    """
+    log_request(request)
+
+    if not request.is_json:
+        return jsonify(format_response(format_error("Missing JSON body or incorrect Content-Type", 415), success=False, code=415)), 415
+
+    command, error = parse_balance_change(operation, account_number, request.get_json(silent=True), request.headers.get("Idempotency-Key"))
+    if error is None:
+        result = balance_change_service(command)
+        if "error" not in result:
+            headers = {"Idempotent-Replayed": "true"} if result.pop("replayed", False) else {}
+            return jsonify(format_response(result)), 200, headers
+        error = result
+
+    code = error.get("code", 400)
+    return jsonify(format_response(format_error(error["error"], code), success=False, code=code)), code
+
+@bp.route('/accounts/<account_number>/withdraw', methods=['POST'])
+@limit_writes
+def withdraw(account_number):
+    """
+    Process a withdrawal request.
+
+    Args:
+        account_number (str): The unique identifier of the account.
+
+    Returns:
+        Response: A JSON response confirming the withdrawal or an error message.
+        A retry with the same `Idempotency-Key` header returns the original
+        response with an `Idempotent-Replayed: true` header.
+    """
+    return change_balance("withdraw", account_number)
+
 @bp.route('/accounts/<account_number>/deposit', methods=['POST'])
+@limit_writes
 def deposit(account_number):
     """
     Process a deposit request.
@@ -111,26 +382,119 @@ def deposit(account_number):
 
     Returns:
         Response: A JSON response confirming the deposit or an error message.
+        A retry with the same `Idempotency-Key` header returns the original
+        response with an `Idempotent-Replayed: true` header.
+    """
+    return change_balance("deposit", account_number)
+
+@bp.route('/transfers', methods=['POST'])
+@limit_writes
+def transfer():
+    """
+    Transfer money between two accounts.
+
+    The JSON body carries `from_account`, `to_account` and `amount`.
+
+    Returns:
+        Response: A JSON response with both updated balances or an error message.
     """
     log_request(request)
 
-    if not validate_account_number(account_number):
+    if not request.is_json:
+        return jsonify(format_response(format_error("Missing JSON body or incorrect Content-Type", 415), success=False, code=415)), 415
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or any(key not in data for key in ("from_account", "to_account", "amount")):
+        return jsonify(format_response(format_error("Missing 'from_account', 'to_account' or 'amount' in request body", 400), success=False, code=400)), 400
+
+    from_account, to_account = data["from_account"], data["to_account"]
+    if not isinstance(from_account, str) or not isinstance(to_account, str):
         return jsonify(format_response(format_error("Invalid account number format", 400), success=False, code=400)), 400
 
+    result = transfer_service(from_account, to_account, data["amount"])
+
+    if "error" in result:
+        code = result.get("code", 400)
+        return jsonify(format_response(format_error(result["error"], code), success=False, code=code)), code
+
+    return jsonify(format_response(result)), 200
+
+@bp.route('/accounts/batch', methods=['POST'])
+@limit_writes
+def batch():
+    """
+    Process a batch of withdrawals and deposits.
+
+    The JSON body carries `operations`, a list of
+    `{"account_number", "type", "amount"}` objects, and an optional `atomic`
+    flag. With `atomic` true the batch is all-or-nothing; otherwise each
+    operation succeeds or fails on its own.
+
+    Returns:
+        Response: A JSON response with one result per operation, or an error message.
+    """
+    log_request(request)
+
     if not request.is_json:
-        return format_response(format_error("Missing JSON body or incorrect Content-Type", 415), success=False, code=415)
+        return jsonify(format_response(format_error("Missing JSON body or incorrect Content-Type", 415), success=False, code=415)), 415
+
+    data = request.get_json(silent=True)
+    operations = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify(format_response(format_error("Missing 'operations' list in request body", 400), success=False, code=400)), 400
+
+    max_operations = current_app.config.get("BATCH_MAX_OPERATIONS", 10000)
+    if len(operations) > max_operations:
+        return jsonify(format_response(format_error(f"Batch exceeds {max_operations} operations", 400), success=False, code=400)), 400
+
+    atomic = data.get("atomic", False)
+    if not isinstance(atomic, bool):
+        return jsonify(format_response(format_error("'atomic' must be a boolean", 400), success=False, code=400)), 400
+
+    result = batch_service(operations, atomic=atomic)
+
+    if "error" in result:
+        return jsonify(format_response(format_error(result["error"], 500), success=False, code=500)), 500
+
+    if atomic and not result["committed"]:
+        error = format_error("Batch rolled back", 400)
+        error["results"] = result["results"]
+        return jsonify(format_response(error, success=False, code=400)), 400
 
-    data = request.get_json()
-    if not data or "amount" not in data:
-        return jsonify(format_response(format_error("Missing 'amount' in request body", 400), success=False, code=400)), 400
+    return jsonify(format_response(result)), 200
+
+@bp.route('/accounts/provision', methods=['POST'])
+@limit_writes
+def provision():
+    """
+    Bulk-create accounts from an uploaded file.
+
+    The body is CSV (`Content-Type: text/csv`) or Parquet
+    (`application/vnd.apache.parquet`) with `account_number` and `balance`
+    columns. CSV is read from the request stream as it arrives; Parquet is
+    spooled to a temporary file first, since its footer is read before the rows.
+
+    Returns:
+        Response: A JSON response with the numbers of rows read, inserted, already
+        existing and invalid, or 404 when the endpoint is disabled.
+    """
+    log_request(request)
 
-    valid, amount = validate_amount(data["amount"])
-    if not valid:
-        return jsonify(format_response(format_error("Invalid amount format or must be greater than zero", 400), success=False, code=400)), 400
+    if not current_app.config.get("PROVISIONING_API_ENABLED"):
+        return jsonify(format_response(format_error("Provisioning API is disabled", 404), success=False, code=404)), 404
 
-    result = deposit_service(account_number, amount)
+    if request.mimetype == "text/csv":
+        result = provision_service(io.TextIOWrapper(request.stream, encoding="utf-8", newline=""), fmt="csv")
+    elif request.mimetype in ("application/vnd.apache.parquet", "application/x-parquet"):
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as upload:
+            shutil.copyfileobj(request.stream, upload)
+            upload.seek(0)
+            result = provision_service(upload, fmt="parquet")
+    else:
+        return jsonify(format_response(format_error("Body must be text/csv or application/vnd.apache.parquet", 415), success=False, code=415)), 415
 
     if "error" in result:
-        return jsonify(format_response(format_error(result["error"], 400), success=False, code=400)), 400
+        code = result.get("code", 400)
+        return jsonify(format_response(format_error(result["error"], code), success=False, code=code)), code
 
     return jsonify(format_response(result)), 200
@@ -2,16 +2,29 @@
 Account Service Module
 
 This module handles business logic for account-related operations,
-including retrieving balances, processing withdrawals, and deposits.
+including retrieving balances, transaction history and statements, processing
+withdrawals, deposits, transfers, batches of operations, withdrawal limits,
+and bulk account provisioning.
 
 It interacts with the `account_repository.py` to perform database
 transactions and ensures validation, error handling, and logging.
 """
 
+import csv
+import io
+import json
 import logging
-from app.data_access.account_repository import update_account_balance, create_transaction, get_account
+from datetime import datetime
+from flask import current_app
+from app.data_access.account_repository import (
+    SIGNED_TYPES, get_balance, get_transactions, perform_transaction, perform_batch, perform_transfer, set_withdrawal_limits,
+    stream_statement,
+)
 from sqlalchemy.exc import SQLAlchemyError
-from app.utils import validate_account_number, validate_amount, format_error
+from app.utils import (
+    balance_change_failure, balance_change_response, build_balance_change, validate_account_number, parse_cents, format_cents,
+    format_error, encode_cursor, decode_cursor,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -26,78 +39,433 @@ def get_balance_service(account_number):
     Returns:
         dict: A dictionary containing the account number and balance, or an error message.
     """
-    logger.info(f"Fetching balance for account {account_number}")
+    logger.info("Fetching balance for account %s", account_number)
 
     if not validate_account_number(account_number):
         return format_error("Invalid account number format", 400)
 
     try:
-        account = get_account(account_number)  # Fetch account from repository
-        if not account:
+        balance_cents = get_balance(account_number)  # Served from the balance cache when enabled
+        if balance_cents is None:
             return format_error("Account not found", 404)
 
-        return {"success": True, "account_number": account_number, "balance": account.balance}
+        return {"success": True, "account_number": account_number, "balance": format_cents(balance_cents)}
 
     except SQLAlchemyError as e:
-        logger.error(f"Database error while fetching balance for account {account_number}: {e}")
+        logger.error("Database error while fetching balance for account %s: %s", account_number, e)
         return format_error("A database error occurred", 500)
 
-def withdraw_service(account_number, amount):
+TRANSACTION_TYPES = ("withdraw", "deposit", "transfer_out", "transfer_in")
+
+
+def serialize_transaction(transaction):
     """
-    Process a withdrawal request with validation and proper handling.
-    
+    Convert a `Transaction` row to its API representation.
+
     Args:
-        account_number (str): The unique account number.
-        amount (float): Amount to withdraw.
-    
+        transaction (Transaction): The ledger row.
+
     Returns:
-        dict: A success message with the updated balance or an error message.
+        dict: The transaction with its amount in currency units.
     """
-    logger.info(f"Processing withdrawal for account {account_number}, amount: {amount}")
+    return {
+        "id": transaction.id,
+        "type": transaction.type,
+        "amount": format_cents(transaction.amount_cents),
+        "timestamp": transaction.timestamp.isoformat(),
+        "transfer_id": transaction.transfer_id,
+    }
+
+
+def transaction_history_service(account_number, limit=None, cursor=None, types=None, start=None, end=None):
+    """
+    Retrieve one page of an account's transaction history, newest first.
+
+    Args:
+        account_number (str): Unique identifier for the account.
+        limit (str | int | None): Page size; defaults to `HISTORY_PAGE_SIZE`.
+        cursor (str | None): `next_cursor` from the previous page.
+        types (list[str] | None): Only include these transaction types.
+        start (str | None): ISO date/time; only include transactions at or after it.
+        end (str | None): ISO date/time; only include transactions before it.
+
+    Returns:
+        dict: The page of transactions and the cursor for the next page, or an error message.
+    """
+    logger.info("Fetching transaction history for account %s", account_number)
     if not validate_account_number(account_number):
         return format_error("Invalid account number format", 400)
-    valid, amount = validate_amount(amount)
-    if not valid:
-        return format_error("Invalid amount format or must be greater than zero", 400)
+
+    max_limit = current_app.config.get("HISTORY_MAX_PAGE_SIZE", 500)
     try:
-        result = perform_transaction(account_number, -amount, 'withdraw')
-        if "error" in result:
-            return result
-        logger.info(f"Withdrawal successful for account {account_number}, new_balance: {result['new_balance']}")
-        return result
+        limit = int(limit) if limit is not None else current_app.config.get("HISTORY_PAGE_SIZE", 50)
+    except ValueError:
+        return format_error("'limit' must be an integer", 400)
+    if not 1 <= limit <= max_limit:
+        return format_error(f"'limit' must be between 1 and {max_limit}", 400)
+
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            return format_error("Invalid cursor", 400)
+
+    if types and any(t not in TRANSACTION_TYPES for t in types):
+        return format_error(f"'type' must be one of {', '.join(TRANSACTION_TYPES)}", 400)
+
+    try:
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        return format_error("'from' and 'to' must be ISO 8601 dates", 400)
+
+    try:
+        rows = get_transactions(account_number, limit + 1, after=after, types=types, start=start, end=end)
+    except SQLAlchemyError as e:
+        logger.error("Database error while fetching history for account %s: %s", account_number, e)
+        return format_error("A database error occurred", 500)
+    if rows is None:
+        return format_error("Account not found", 404)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+    return {
+        "success": True,
+        "account_number": account_number,
+        "transactions": [serialize_transaction(row) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+STATEMENT_COLUMNS = ("account_number", "id", "timestamp", "type", "amount", "balance", "transfer_id")
+STATEMENT_CHUNK_ROWS = 1000
+
+
+def _statement_chunks(account_number, opening_cents, rows, fmt, header):
+    """
+    Render ledger rows as NDJSON or CSV text chunks with a running balance.
+
+    Rows are buffered `STATEMENT_CHUNK_ROWS` at a time, so memory stays
+    constant however long the statement is.
+    """
+    balance = opening_cents
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if fmt == "csv" else None
+    if writer and header:
+        writer.writerow(STATEMENT_COLUMNS)
+    pending = 0
+    for row_id, timestamp, tx_type, amount_cents, transfer_id in rows:
+        balance += SIGNED_TYPES.get(tx_type, 0) * amount_cents
+        values = (account_number, row_id, timestamp.isoformat(), tx_type,
+                  format_cents(amount_cents), format_cents(balance), transfer_id)
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(STATEMENT_COLUMNS, values))))
+            buffer.write("\n")
+        pending += 1
+        if pending == STATEMENT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def statement_service(account_number, fmt="ndjson", start=None, end=None, header=True):
+    """
+    Prepare a streaming statement export for an account.
+
+    Args:
+        account_number (str): Unique identifier for the account.
+        fmt (str): 'ndjson' or 'csv'.
+        start (str | None): ISO date/time; only include transactions at or after it.
+        end (str | None): ISO date/time; only include transactions before it.
+        header (bool): Write the CSV header row.
+
+    Returns:
+        dict: `mimetype` and `chunks`, a generator of text chunks, or an error message.
+    """
+    logger.info("Exporting %s statement for account %s", fmt, account_number)
+    if not validate_account_number(account_number):
+        return format_error("Invalid account number format", 400)
+    if fmt not in ("ndjson", "csv"):
+        return format_error("'format' must be 'ndjson' or 'csv'", 400)
+    try:
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        return format_error("'from' and 'to' must be ISO 8601 dates", 400)
+
+    try:
+        statement = stream_statement(account_number, start=start, end=end)
     except SQLAlchemyError as e:
-        logger.error(f"Database error during withdrawal for account {account_number}: {e}")
-        return format_error("A database error occurred during withdrawal", 500)
+        logger.error("Database error while exporting statement for account %s: %s", account_number, e)
+        return format_error("A database error occurred", 500)
+    if statement is None:
+        return format_error("Account not found", 404)
+
+    opening_cents, rows = statement
+    return {
+        "success": True,
+        "mimetype": "text/csv" if fmt == "csv" else "application/x-ndjson",
+        "chunks": _statement_chunks(account_number, opening_cents, rows, fmt, header),
+    }
+
+
+def balance_change_service(command):
+    """
+    Apply a withdrawal or deposit that has already been validated.
+
+    Args:
+        command (BalanceChange): The parsed request, from `parse_balance_change`.
+
+    Returns:
+        dict: A success message with the updated balance or an error message.
+        Replayed results carry `replayed: True`.
+    """
+    try:
+        result = perform_transaction(command.account_number, command.signed_cents, command.operation, idempotency_key=command.idempotency_key)
     except Exception as e:
-        logger.error(f"Unexpected error during withdrawal for account {account_number}: {e}")
-        return format_error("An unexpected error occurred", 500)
+        return balance_change_failure(command, e, logger)
+    return balance_change_response(command, result, logger)
 
-def deposit_service(account_number, amount):
+def withdraw_service(account_number, amount, idempotency_key=None):
+    """
+    Process a withdrawal request with validation and proper handling.
+    
+    Args:
+        account_number (str): The unique account number.
+        amount (int | float | str): Amount to withdraw, in currency units.
+        idempotency_key (str | None): Makes client retries replay the first result.
+    
+    Returns:
+        dict: A success message with the updated balance or an error message.
+        Replayed results carry `replayed: True`.
+    """
+    logger.info("Processing withdrawal for account %s, amount: %s", account_number, amount)
+    command, error = build_balance_change("withdraw", account_number, amount, idempotency_key)
+    if error is not None:
+        return error
+    return balance_change_service(command)
+
+def deposit_service(account_number, amount, idempotency_key=None):
     """
     Process a deposit with validation and proper handling.
     
     Args:
         account_number (str): The unique account number.
-        amount (float): Amount to deposit.
+        amount (int | float | str): Amount to deposit, in currency units.
+        idempotency_key (str | None): Makes client retries replay the first result.
     
     Returns:
         dict: A success message with the updated balance or an error message.
+        Replayed results carry `replayed: True`.
     """
-    logger.info(f"Processing deposit for account {account_number}, amount: {amount}")
+    logger.info("Processing deposit for account %s, amount: %s", account_number, amount)
+    command, error = build_balance_change("deposit", account_number, amount, idempotency_key)
+    if error is not None:
+        return error
+    return balance_change_service(command)
+
+def limits_service(account_number):
+    """
+    Report an account's withdrawal limits and how much of them it has used.
+
+    Args:
+        account_number (str): The unique account number.
+
+    Returns:
+        dict: The daily limit and amount withdrawn in the last day, the per-minute limit and
+        withdrawals in the last minute (limits of 0 mean unlimited), or an error message.
+    """
+    limits = current_app.extensions.get("withdrawal_limits")
+    if limits is None:
+        return format_error("Withdrawal limits are disabled", 404)
     if not validate_account_number(account_number):
         return format_error("Invalid account number format", 400)
-    valid, amount = validate_amount(amount)
-    if not valid:
+    try:
+        if get_balance(account_number) is None:
+            return format_error("Account not found", 404)
+    except SQLAlchemyError as e:
+        logger.error("Database error while fetching limits for account %s: %s", account_number, e)
+        return format_error("A database error occurred", 500)
+    usage = limits.usage(account_number)
+    return {
+        "success": True,
+        "account_number": account_number,
+        "daily_limit": format_cents(usage["daily_limit_cents"]),
+        "withdrawn_today": format_cents(usage["withdrawn_today_cents"]),
+        "per_minute": usage["per_minute"],
+        "withdrawals_last_minute": usage["withdrawals_last_minute"],
+    }
+
+def set_limits_service(account_number, daily_limit=None, per_minute=None):
+    """
+    Set an account's own withdrawal limits.
+
+    Args:
+        account_number (str): The unique account number.
+        daily_limit (int | float | str | None): Daily cap in currency units, 0 for none, or
+            None for the `WITHDRAWAL_DAILY_LIMIT` default.
+        per_minute (int | None): Withdrawals per minute, 0 for no limit, or None for the
+            `WITHDRAWAL_PER_MINUTE_LIMIT` default.
+
+    Returns:
+        dict: The account's limits and usage, or an error message.
+    """
+    logger.info("Setting withdrawal limits for account %s", account_number)
+    if current_app.extensions.get("withdrawal_limits") is None:
+        return format_error("Withdrawal limits are disabled", 404)
+    if not validate_account_number(account_number):
+        return format_error("Invalid account number format", 400)
+    daily_limit_cents = None
+    if daily_limit is not None:
+        daily_limit_cents = parse_cents(daily_limit)
+        if daily_limit_cents is None:
+            return format_error("'daily_limit' must be a non-negative amount or null", 400)
+    if per_minute is not None and (isinstance(per_minute, bool) or not isinstance(per_minute, int) or per_minute < 0):
+        return format_error("'per_minute' must be a non-negative integer or null", 400)
+    try:
+        result = set_withdrawal_limits(account_number, daily_limit_cents, per_minute)
+    except SQLAlchemyError as e:
+        logger.error("Database error while setting limits for account %s: %s", account_number, e)
+        return format_error("A database error occurred", 500)
+    if "error" in result:
+        return format_error(result["error"], 404 if result["error"] == "Account not found" else 500)
+    return limits_service(account_number)
+
+def transfer_service(from_account, to_account, amount):
+    """
+    Transfer money from one account to another.
+
+    Args:
+        from_account (str): The account to debit.
+        to_account (str): The account to credit.
+        amount (int | float | str): Amount to transfer, in currency units.
+
+    Returns:
+        dict: A success message with both updated balances or an error message.
+    """
+    logger.info("Processing transfer from %s to %s, amount: %s", from_account, to_account, amount)
+    if not validate_account_number(from_account) or not validate_account_number(to_account):
+        return format_error("Invalid account number format", 400)
+    if from_account == to_account:
+        return format_error("Cannot transfer to the same account", 400)
+    cents = parse_cents(amount)
+    if cents is None or cents <= 0:
         return format_error("Invalid amount format or must be greater than zero", 400)
     try:
-        result = perform_transaction(account_number, amount, 'deposit')
+        result = perform_transfer(from_account, to_account, cents)
         if "error" in result:
             return result
-        logger.info(f"Deposit successful for account {account_number}, new_balance: {result['new_balance']}")
-        return result
+        logger.info("Transfer %s successful, from_balance: %s", result['transfer_id'], result['from_balance_cents'])
+        return {
+            "success": True,
+            "transfer_id": result["transfer_id"],
+            "from_account": from_account,
+            "to_account": to_account,
+            "amount": format_cents(cents),
+            "from_balance": format_cents(result["from_balance_cents"]),
+            "to_balance": format_cents(result["to_balance_cents"]),
+        }
     except SQLAlchemyError as e:
-        logger.error(f"Database error during deposit for account {account_number}: {e}")
-        return format_error("A database error occurred during deposit", 500)
+        logger.error("Database error during transfer from %s to %s: %s", from_account, to_account, e)
+        return format_error("A database error occurred during transfer", 500)
     except Exception as e:
-        logger.error(f"Unexpected error during deposit for account {account_number}: {e}")
+        logger.error("Unexpected error during transfer from %s to %s: %s", from_account, to_account, e)
         return format_error("An unexpected error occurred", 500)
+
+def batch_service(operations, atomic=False):
+    """
+    Validate and apply a batch of withdrawals and deposits.
+
+    Each operation is a dict with `account_number`, `type` ('withdraw' or
+    'deposit') and `amount`. Invalid operations get their own error result; in
+    atomic mode any invalid operation rejects the whole batch before the
+    database is touched.
+
+    Args:
+        operations (list[dict]): The operations to apply, in order.
+        atomic (bool): If True, apply all operations or none of them.
+
+    Returns:
+        dict: `committed` flag and one result per operation, or an error message.
+    """
+    logger.info("Processing batch of %s operations, atomic=%s", len(operations), atomic)
+    results = [None] * len(operations)
+    valid_ops = []
+    positions = []
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            results[index] = {"index": index, "error": "Operation must be an object"}
+            continue
+        account_number = op.get("account_number")
+        op_type = op.get("type")
+        cents = parse_cents(op.get("amount"))
+        if not isinstance(account_number, str) or not validate_account_number(account_number):
+            error = "Invalid account number format"
+        elif op_type not in ("withdraw", "deposit"):
+            error = "Operation type must be 'withdraw' or 'deposit'"
+        elif cents is None or cents <= 0:
+            error = "Invalid amount format or must be greater than zero"
+        else:
+            valid_ops.append((account_number, -cents if op_type == "withdraw" else cents, op_type))
+            positions.append(index)
+            continue
+        results[index] = {"index": index, "error": error}
+
+    if atomic and len(valid_ops) < len(operations):
+        return {"committed": False, "results": [r or {"index": i, "error": "Batch rolled back"} for i, r in enumerate(results)]}
+
+    try:
+        outcome = perform_batch(valid_ops, atomic=atomic, chunk_size=current_app.config.get("BATCH_CHUNK_SIZE", 500))
+    except SQLAlchemyError as e:
+        logger.error("Database error during batch: %s", e)
+        return format_error("A database error occurred during batch processing", 500)
+
+    for index, result in zip(positions, outcome["results"]):
+        if "error" in result:
+            results[index] = {"index": index, "error": result["error"]}
+        else:
+            results[index] = {
+                "index": index,
+                "success": True,
+                "account_number": result["account_number"],
+                "type": operations[index]["type"],
+                "new_balance": format_cents(result["new_balance_cents"]),
+            }
+    return {"committed": outcome["committed"], "results": results}
+
+def provision_service(source, fmt="csv", chunk_size=None):
+    """
+    Bulk-load accounts from CSV or Parquet input.
+
+    Args:
+        source (TextIO | str | BinaryIO): CSV text stream, or Parquet path or seekable file.
+        fmt (str): 'csv' or 'parquet'.
+        chunk_size (int | None): Rows validated and inserted at a time; defaults to `PROVISIONING_CHUNK_SIZE`.
+
+    Returns:
+        dict: Row counts, the first invalid rows and the load rate, or an error message.
+    """
+    from app.data_access.provisioning import ProvisioningError, provision_accounts, read_csv_chunks, read_parquet_chunks
+
+    if fmt not in ("csv", "parquet"):
+        return format_error("'format' must be 'csv' or 'parquet'", 400)
+    chunk_size = chunk_size or current_app.config.get("PROVISIONING_CHUNK_SIZE", 100_000)
+    reader = read_csv_chunks if fmt == "csv" else read_parquet_chunks
+    logger.info("Provisioning accounts from %s input", fmt)
+    try:
+        summary = provision_accounts(reader(source, chunk_size))
+    except ProvisioningError as e:
+        return format_error(str(e), 400)
+    except (csv.Error, UnicodeDecodeError) as e:
+        return format_error(f"Invalid {fmt.upper()} input: {e}", 400)
+    except RuntimeError as e:
+        return format_error(str(e), 501)
+    except SQLAlchemyError as e:
+        logger.error("Database error during provisioning: %s", e)
+        return format_error("A database error occurred during provisioning", 500)
+    return {"success": True, **summary}
@@ -0,0 +1,105 @@
+"""
+Async Account Service Module
+
+This module provides the asyncio versions of the balance, withdrawal and
+deposit services for the ASGI serving mode. Validation and response shapes
+are shared with `account_service` through `app.utils`; database work goes
+through `async_account_repository`.
+"""
+
+import logging
+from sqlalchemy.exc import SQLAlchemyError
+from app.data_access.async_account_repository import get_balance, perform_transaction
+from app.utils import (
+    balance_change_failure, balance_change_response, build_balance_change, validate_account_number, format_cents, format_error,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+async def get_balance_service(account_number):
+    """
+    Retrieve the current balance for the given account number.
+
+    Args:
+        account_number (str): Unique identifier for the account.
+
+    Returns:
+        dict: A dictionary containing the account number and balance, or an error message.
+    """
+    logger.info("Fetching balance for account %s", account_number)
+
+    if not validate_account_number(account_number):
+        return format_error("Invalid account number format", 400)
+
+    try:
+        balance_cents = await get_balance(account_number)
+        if balance_cents is None:
+            return format_error("Account not found", 404)
+
+        return {"success": True, "account_number": account_number, "balance": format_cents(balance_cents)}
+
+    except SQLAlchemyError as e:
+        logger.error("Database error while fetching balance for account %s: %s", account_number, e)
+        return format_error("A database error occurred", 500)
+
+async def balance_change_service(command):
+    """
+    Apply a withdrawal or deposit that has already been validated.
+
+    Args:
+        command (BalanceChange): The parsed request, from `parse_balance_change`.
+
+    Returns:
+        dict: A success message with the updated balance or an error message.
+    """
+    try:
+        result = await perform_transaction(command.account_number, command.signed_cents, command.operation)
+    except Exception as e:
+        return balance_change_failure(command, e, logger)
+    return balance_change_response(command, result, logger)
+
+async def _change_balance(account_number, amount, transaction_type):
+    """
+    Validate and apply a withdrawal or deposit.
+
+    Args:
+        account_number (str): The unique account number.
+        amount (int | float | str): Amount in currency units.
+        transaction_type (str): 'withdraw' or 'deposit'.
+
+    Returns:
+        dict: A success message with the updated balance or an error message.
+    """
+    command, error = build_balance_change(transaction_type, account_number, amount)
+    if error is not None:
+        return error
+    return await balance_change_service(command)
+
+async def withdraw_service(account_number, amount):
+    """
+    Process a withdrawal request with validation and proper handling.
+
+    Args:
+        account_number (str): The unique account number.
+        amount (int | float | str): Amount to withdraw, in currency units.
+
+    Returns:
+        dict: A success message with the updated balance or an error message.
+    """
+    logger.info("Processing withdrawal for account %s, amount: %s", account_number, amount)
+    return await _change_balance(account_number, amount, "withdraw")
+
+async def deposit_service(account_number, amount):
+    """
+    Process a deposit with validation and proper handling.
+
+    Args:
+        account_number (str): The unique account number.
+        amount (int | float | str): Amount to deposit, in currency units.
+
+    Returns:
+        dict: A success message with the updated balance or an error message.
+    """
+    logger.info("Processing deposit for account %s, amount: %s", account_number, amount)
+    return await _change_balance(account_number, amount, "deposit")
@@ -2,14 +2,24 @@
 Utility Functions for the ATM System
 
 This module provides helper functions for:
-- Validating account numbers and transaction amounts
+- Validating account numbers, transaction amounts and idempotency keys
+- Parsing withdrawals and deposits once into validated `BalanceChange` commands
+- Building the responses to withdrawals and deposits, for the sync and async services
+- Timing the validation of withdrawals and deposits
+- Converting amounts to and from integer cents
+- Encoding pagination cursors
 - Formatting API responses
 - Logging incoming requests and errors
 """
 
 import re
+import time
+import base64
 import logging
+from datetime import datetime
 from flask import request
+from sqlalchemy.exc import SQLAlchemyError
+from app import metrics
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -22,6 +32,10 @@ if not logger.handlers:
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
 
+ACCOUNT_NUMBER_PATTERN = re.compile(r'\d+')
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'[\x21-\x7e]{1,64}')
+MAX_WHOLE_DIGITS = 16  # Keeps amounts, and balances built from them, in cents within BIGINT
+
 
 def validate_account_number(account_number):
     """
@@ -40,18 +54,242 @@ def validate_account_number(account_number):
     if not account_number:
         logger.warning("Empty account number provided.")
         return False
-    if not re.fullmatch(r'\d+', account_number):
-        logger.warning(f"Invalid account number format: {account_number}")
+    if not ACCOUNT_NUMBER_PATTERN.fullmatch(account_number):
+        logger.warning("Invalid account number format: %s", account_number)
+        return False
+    return True
+
+
+def validate_idempotency_key(key):
+    """
+    Validates an `Idempotency-Key` header value.
+
+    A valid key is 1 to 64 printable ASCII characters without spaces, which
+    covers UUIDs and most client-generated request ids.
+
+    Args:
+        key (str): The header value.
+
+    Returns:
+        bool: True if valid, False otherwise.
+    """
+    if not key or not IDEMPOTENCY_KEY_PATTERN.fullmatch(key):
+        logger.warning("Invalid idempotency key: %r", key)
         return False
     return True
 
 
+def parse_cents(amount):
+    """
+    Parses a non-negative money amount into integer cents.
+
+    Accepts what a JSON body can carry: an int, a float, or a decimal string
+    such as "12", "12.5" or "12.50". Strings are split on the decimal point and
+    converted digit-wise, so no regex or float arithmetic is involved. Floats use
+    their shortest round-tripping `repr`, which is the decimal the client sent.
+    Amounts with more than two significant decimal places, or more than
+    `MAX_WHOLE_DIGITS` digits before the point, are rejected.
+
+    Args:
+        amount (any): The amount value to parse.
+
+    Returns:
+        int | None: The amount in cents, or None if it is not a valid amount.
+    """
+    if isinstance(amount, bool):
+        return None
+    if isinstance(amount, int):
+        return amount * 100 if 0 <= amount < 10 ** MAX_WHOLE_DIGITS else None
+    if isinstance(amount, float):
+        amount = repr(amount)
+    elif not isinstance(amount, str):
+        return None
+
+    whole, dot, fraction = amount.strip().partition(".")
+    if not whole.isascii() or not whole.isdigit() or len(whole.lstrip("0")) > MAX_WHOLE_DIGITS:
+        return None
+    if not dot:
+        return int(whole) * 100
+    if not fraction.isascii() or not fraction.isdigit():
+        return None
+    fraction = fraction.rstrip("0")
+    if len(fraction) > 2:
+        return None
+    return int(whole) * 100 + int(fraction.ljust(2, "0"))
+
+
+def format_cents(cents):
+    """
+    Converts integer cents to the decimal amount shown in API responses.
+
+    Args:
+        cents (int): The amount in cents.
+
+    Returns:
+        float: The amount in currency units.
+    """
+    return cents / 100
+
+
+_VALIDATION_TIMERS = {operation: metrics.VALIDATION_DURATION.labels(operation) for operation in ("withdraw", "deposit")}
+
+# How each balance change is named in logs and error messages
+OPERATION_NAMES = {"withdraw": "withdrawal", "deposit": "deposit"}
+
+
+def validate_balance_change(operation, account_number, amount):
+    """
+    Validates the account number and amount of a withdrawal or deposit.
+
+    The time spent is recorded in the validation histogram of the app metrics.
+
+    Args:
+        operation (str): 'withdraw' or 'deposit'.
+        account_number (str): The account number to validate.
+        amount (int | float | str): The amount in currency units.
+
+    Returns:
+        tuple: (amount in cents, None) if valid, otherwise (None, error dict).
+    """
+    started = time.perf_counter()
+    try:
+        if not validate_account_number(account_number):
+            return None, format_error("Invalid account number format", 400)
+        cents = parse_cents(amount)
+        if cents is None or cents <= 0:
+            return None, format_error("Invalid amount format or must be greater than zero", 400)
+        return cents, None
+    finally:
+        _VALIDATION_TIMERS[operation].observe(time.perf_counter() - started)
+
+
+class BalanceChange:
+    """
+    A withdrawal or deposit whose fields have already been validated.
+
+    Routes build one with `parse_balance_change` and hand it to the service
+    layer, which then does not validate again.
+
+    Attributes:
+        operation (str): 'withdraw' or 'deposit'.
+        account_number (str): The account number.
+        cents (int): The amount in cents, greater than zero.
+        idempotency_key (str | None): The request's `Idempotency-Key`, if any.
+    """
+
+    __slots__ = ("operation", "account_number", "cents", "idempotency_key")
+
+    def __init__(self, operation, account_number, cents, idempotency_key=None):
+        self.operation = operation
+        self.account_number = account_number
+        self.cents = cents
+        self.idempotency_key = idempotency_key
+
+    @property
+    def signed_cents(self):
+        """The amount to add to the balance: negative for a withdrawal."""
+        return -self.cents if self.operation == "withdraw" else self.cents
+
+
+def build_balance_change(operation, account_number, amount, idempotency_key=None):
+    """
+    Validates a withdrawal or deposit passed as arguments and wraps it in a `BalanceChange`.
+
+    Args:
+        operation (str): 'withdraw' or 'deposit'.
+        account_number (str): The account number.
+        amount (int | float | str): The amount in currency units.
+        idempotency_key (str | None): Key that makes client retries safe.
+
+    Returns:
+        tuple: (BalanceChange, None) if valid, otherwise (None, error dict).
+    """
+    cents, error = validate_balance_change(operation, account_number, amount)
+    if error is not None:
+        return None, error
+    return BalanceChange(operation, account_number, cents, idempotency_key), None
+
+
+def balance_change_response(command, result, log):
+    """
+    Builds the response to an applied withdrawal or deposit and logs its outcome.
+
+    Args:
+        command (BalanceChange): The applied request.
+        result (dict): The repository's result.
+        log (Logger): The calling service's logger.
+
+    Returns:
+        dict: A success message with the updated balance, or the repository's error.
+        Replayed results carry `replayed: True`.
+    """
+    if "error" in result:
+        return result
+    response = {"success": True, "account_number": command.account_number, "new_balance": format_cents(result["new_balance_cents"])}
+    if result.get("replayed"):
+        response["replayed"] = True
+    log.info("%s successful for account %s, new_balance: %s",
+             OPERATION_NAMES[command.operation].capitalize(), command.account_number, response["new_balance"])
+    return response
+
+
+def balance_change_failure(command, error, log):
+    """
+    Logs an exception raised while applying a withdrawal or deposit and builds its error response.
+
+    Args:
+        command (BalanceChange): The request that failed.
+        error (Exception): The exception raised.
+        log (Logger): The calling service's logger.
+
+    Returns:
+        dict: A 500 error message.
+    """
+    name = OPERATION_NAMES[command.operation]
+    if isinstance(error, SQLAlchemyError):
+        log.error("Database error during %s for account %s: %s", name, command.account_number, error)
+        return format_error(f"A database error occurred during {name}", 500)
+    log.error("Unexpected error during %s for account %s: %s", name, command.account_number, error)
+    return format_error("An unexpected error occurred", 500)
+
+
+def parse_balance_change(operation, account_number, body, idempotency_key=None):
+    """
+    Validates a withdrawal or deposit request in one pass.
+
+    The time spent is recorded in the validation histogram of the app metrics.
+
+    Args:
+        operation (str): 'withdraw' or 'deposit'.
+        account_number (str): The account number from the URL.
+        body (any): The decoded JSON body, or None if it could not be decoded.
+        idempotency_key (str | None): The `Idempotency-Key` header.
+
+    Returns:
+        tuple: (BalanceChange, None) if valid, otherwise (None, error dict).
+    """
+    started = time.perf_counter()
+    try:
+        if not validate_account_number(account_number):
+            return None, format_error("Invalid account number format", 400)
+        if not isinstance(body, dict) or "amount" not in body:
+            return None, format_error("Missing 'amount' in request body", 400)
+        cents = parse_cents(body["amount"])
+        if cents is None or cents <= 0:
+            return None, format_error("Invalid amount format or must be greater than zero", 400)
+        if idempotency_key is not None and not validate_idempotency_key(idempotency_key):
+            return None, format_error("Invalid Idempotency-Key header", 400)
+        return BalanceChange(operation, account_number, cents, idempotency_key), None
+    finally:
+        _VALIDATION_TIMERS[operation].observe(time.perf_counter() - started)
+
+
 def validate_amount(amount):
     """
-    Validates if the amount is a valid positive float.
+    Validates if the amount is a valid positive amount.
 
     A valid amount:
-    - Is a numeric value (integer or decimal)
+    - Is a numeric value (integer or decimal with at most two decimal places)
     - Must be greater than zero
 
     Args:
@@ -60,34 +298,56 @@ def validate_amount(amount):
     Returns:
         tuple: (bool, float) -> True if valid, False otherwise, along with the parsed amount.
     """
-    try:
-        # Convert input to string and strip spaces
-        raw_value = str(amount).strip()
+    cents = parse_cents(amount)
+    if cents is None:
+        logger.warning("Invalid amount format: '%s' (Must be a valid number)", amount)
+        return False, None
+    if cents <= 0:
+        logger.warning("Invalid amount: %s (Must be greater than zero)", amount)
+        return False, None
+    return True, format_cents(cents)
+
+
+def encode_cursor(timestamp, row_id):
+    """
+    Encodes a (timestamp, id) keyset position as an opaque URL-safe cursor.
 
-        # Check if input is a valid numeric value
-        if not re.match(r'^\d+(\.\d+)?$', raw_value):
-            logger.warning(f"Invalid amount format: '{raw_value}' (Must be a valid number)")
-            return False, None
+    Args:
+        timestamp (datetime): Timestamp of the last row on the page.
+        row_id (int): Id of the last row on the page.
 
-        # Convert to float
-        amount = float(raw_value)
+    Returns:
+        str: The cursor string.
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-        # Ensure the amount is positive
-        if amount <= 0:
-            logger.warning(f"Invalid amount: {amount} (Must be greater than zero)")
-            return False, None
 
-        return True, amount
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by `encode_cursor`.
 
-    except Exception as e:
-        logger.error(f"Unexpected error in validate_amount: {e}")
-        return False, None
+    Args:
+        cursor (str): The cursor string.
+
+    Returns:
+        tuple | None: (timestamp, id), or None if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        logger.warning("Invalid pagination cursor: %s", cursor)
+        return None
 
 
 def format_error(message, code=400):
     """
     Creates a standardized error response dictionary.
 
+    Client errors (4xx) are logged as warnings and server errors as errors.
+
     Args:
         message (str): Error message.
         code (int): HTTP status code associated with the error.
@@ -95,7 +355,7 @@ def format_error(message, code=400):
     Returns:
         dict: JSON-formatted error response.
     """
-    logger.error(f"Error: {message} (Status Code: {code})")
+    logger.log(logging.ERROR if code >= 500 else logging.WARNING, "Error: %s (Status Code: %s)", message, code)
     return {"error": message, "code": code}
 
 
@@ -112,7 +372,7 @@ def format_response(data, success=True, code=200):
         dict: JSON-formatted response.
     """
     response = {"success": success, "data": data, "code": code}
-    logger.info(f"Success Response: {response}")
+    logger.info("Success Response: %s", response)
     return response
 
 
@@ -126,7 +386,9 @@ def log_request(req):
     Returns:
         None
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return  # Skip building the URL
     try:
-        logger.info(f"Received {req.method} request for {req.url} from {req.remote_addr}")
+        logger.info("Received %s request for %s from %s", req.method, req.url, req.remote_addr)
     except Exception as e:
-        logger.error(f"Error logging request: {e}")
+        logger.error("Error logging request: %s", e)
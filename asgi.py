@@ -0,0 +1,13 @@
+"""
+ASGI entry point for the ATM System.
+
+Serves balance reads, withdrawals and deposits on the event loop through the
+async service layer and everything else through the Flask application, e.g.:
+
+    DB_BACKEND=sqlite uvicorn asgi:app --workers 4
+"""
+
+from app import app as flask_app
+from app.asgi import create_asgi_app
+
+app = create_asgi_app(flask_app)
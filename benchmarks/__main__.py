@@ -0,0 +1,7 @@
+"""Run the benchmark suite: `python -m benchmarks --help`."""
+
+import sys
+
+from benchmarks.suite import main
+
+sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Transaction Archive Benchmark
+
+Builds a ledger of `--total-rows` transactions over `--accounts` accounts: the
+current month's `--hot-rows` in the database and every earlier month (of
+`--months`) in the archive, written straight through `ArchiveWriter` from
+NumPy-generated rows so the load does not dominate. Then reports:
+
+- hot writes: concurrent deposits against the hot table, next to the same
+  writes against one table holding `--reference-rows` unarchived rows
+  (100M by default, as if nothing had been archived)
+- history: the newest page of a random account (table plus archive), and a
+  page from a random closed month through a keyset cursor (archive only)
+- statement: one closed month of a random account, streamed
+- segments: files opened per query through the min/max index
+
+Archive queries run cold (random accounts, so segments are rarely cached)
+and warm (the same few accounts again).
+
+Usage:
+    python -m benchmarks.bench_archive --total-rows 100000000 --hot-rows 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from app.data_access.account_repository import perform_transaction, stream_statement
+from app.data_access.transaction_archive import TYPE_CODES, month_start, to_micros
+from app.models import Transaction
+from app.services.account_service import transaction_history_service
+from app.utils import encode_cursor
+from benchmarks.common import bench_app, report, run_concurrently
+
+
+def load_accounts(conn, accounts):
+    conn.execute(text("DELETE FROM accounts"))
+    conn.execute(text(
+        "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :accounts) "
+        "INSERT INTO accounts (id, account_number, balance_cents, opening_balance_cents, version) "
+        "SELECT n, printf('%010d', n), 100000000, 100000000, 0 FROM seq"
+    ), {"accounts": accounts})
+
+
+def load_transactions(conn, rows, accounts, first_id, start, seconds, batch=1_000_000):
+    """Insert `rows` random transactions from `first_id`, spread evenly over `seconds` from `start`."""
+    step = seconds * 1_000_000 // max(rows, 1)
+    for low in range(first_id, first_id + rows, batch):
+        high = min(low + batch, first_id + rows)
+        conn.execute(text(
+            "WITH RECURSIVE seq(n) AS (SELECT :low UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < :high) "
+            "INSERT INTO transactions (id, account_id, type, amount_cents, timestamp) "
+            "SELECT n, abs(random()) % :accounts + 1, "
+            "CASE abs(random()) % 4 WHEN 0 THEN 'deposit' WHEN 1 THEN 'withdraw' WHEN 2 THEN 'transfer_in' ELSE 'transfer_out' END, "
+            "abs(random()) % 100000 + 1, "
+            "strftime('%Y-%m-%d %H:%M:%S', :start, '+' || ((n - :first) * :step / 1000000) || ' seconds') "
+            "|| printf('.%06d', (n - :first) * :step % 1000000) FROM seq"
+        ), {"low": low, "high": high, "accounts": accounts, "first": first_id, "step": step, "start": start.isoformat(" ")})
+
+
+def load_table(app, rows, accounts, first_id, start, seconds):
+    """Load accounts and `rows` transactions, building the indexes once afterwards."""
+    with app.app_context(), db.engine.begin() as conn:
+        load_accounts(conn, accounts)
+        for index in Transaction.__table__.indexes:
+            index.drop(conn)
+        load_transactions(conn, rows, accounts, first_id, start, seconds)
+        for index in Transaction.__table__.indexes:
+            index.create(conn)
+
+
+def write_archive(np, store, rows, accounts, months, now, chunk=1_000_000):
+    """Write `rows` random transactions over the `months` closed months before `now` into the archive."""
+    rng = np.random.default_rng(7)
+    writer = store.writer(store.snapshot())
+    next_id = 1
+    for back in range(months, 0, -1):
+        first, last = month_start(now, back), month_start(now, back - 1)
+        count = rows // months + (1 if back <= rows % months else 0)
+        # Ids follow time, as they do when rows are inserted as they happen
+        timestamps = np.sort(rng.integers(to_micros(first), to_micros(last), count, dtype=np.int64))
+        ids = np.arange(next_id, next_id + count, dtype=np.int64)
+        account_ids = rng.integers(1, accounts + 1, count, dtype=np.int64)
+        order = np.lexsort((ids, timestamps, account_ids))
+        types = rng.integers(0, len(TYPE_CODES), count, dtype=np.int8)
+        amounts = rng.integers(1, 100_001, count, dtype=np.int64)
+        for low in range(0, count, chunk):
+            part = order[low:low + chunk]
+            writer.add({
+                "id": ids[part],
+                "account_id": account_ids[part],
+                "type": types[part],
+                "amount_cents": amounts[part],
+                "timestamp": timestamps[part],
+                "transfer_id": np.zeros(len(part), dtype="S32"),
+            })
+        next_id += count
+        del timestamps, ids, account_ids, order, types, amounts
+    writer.commit(month_start(now))
+    return next_id
+
+
+def timed(operation, samples):
+    latencies = []
+    for sample in samples:
+        started = time.perf_counter()
+        operation(sample)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return latencies
+
+
+def count_opened(store, operation, samples):
+    """Average segment files read from disk per call, with an empty cache."""
+    loads = 0
+    real_load = store.np.load
+
+    def counting_load(*args, **kwargs):
+        nonlocal loads
+        loads += 1
+        return real_load(*args, **kwargs)
+
+    store.np.load = counting_load
+    try:
+        for sample in samples:
+            store._cache.clear()
+            operation(sample)
+    finally:
+        store.np.load = real_load
+    return loads / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-table writes and archive query latency")
+    parser.add_argument("--total-rows", type=int, default=100_000_000)
+    parser.add_argument("--hot-rows", type=int, default=1_000_000)
+    parser.add_argument("--reference-rows", type=int, default=100_000_000, help="Unarchived table for the write comparison; 0 skips it")
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=12, help="Closed months in the archive")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=2_000, help="Deposits per thread")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--dir", help="Where to build the databases and archive (default: a temporary directory)")
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    watermark = month_start(now)
+    archived_rows = args.total_rows - args.hot_rows
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        archive_dir = os.path.join(tmp, "archive")
+        hot_app = bench_app(tmp, IDEMPOTENCY_SWEEP_INTERVAL=0, LOG_LEVEL="WARNING", METRICS_ENABLED=False, ARCHIVE_DIR=archive_dir)
+        store = hot_app.extensions["transaction_archive"]
+        np = store.np
+
+        started = time.perf_counter()
+        next_id = write_archive(np, store, archived_rows, args.accounts, args.months, now)
+        stats = store.stats()
+        size = sum(entry.stat().st_size for entry in os.scandir(archive_dir))
+        print(
+            f"archived {stats['rows']:,} rows into {stats['segments']:,} segments ({size / 2 ** 20:,.0f} MiB, "
+            f"{size / max(stats['rows'], 1):.1f} B/row) in {time.perf_counter() - started:.1f}s"
+        )
+
+        started = time.perf_counter()
+        elapsed = (now - watermark).total_seconds()
+        load_table(hot_app, args.hot_rows, args.accounts, next_id, watermark, int(elapsed))
+        print(f"loaded {args.hot_rows:,} hot rows in {time.perf_counter() - started:.1f}s")
+
+        def deposit(thread, i):
+            perform_transaction(f"{rng.randint(1, args.accounts):010d}", 100, "deposit")
+
+        latencies, elapsed = run_concurrently(hot_app, args.threads, args.writes, deposit)
+        report(f"writes, {args.hot_rows / 1e6:g}M hot", latencies, elapsed)
+
+        if args.reference_rows:
+            reference_dir = os.path.join(tmp, "reference")
+            os.makedirs(reference_dir)
+            reference_app = bench_app(reference_dir, IDEMPOTENCY_SWEEP_INTERVAL=0, LOG_LEVEL="WARNING", METRICS_ENABLED=False)
+            started = time.perf_counter()
+            first = month_start(now, args.months)
+            load_table(reference_app, args.reference_rows, args.accounts, 1, first, int((now - first).total_seconds()))
+            print(f"loaded {args.reference_rows:,} reference rows in {time.perf_counter() - started:.1f}s")
+            latencies, elapsed = run_concurrently(reference_app, args.threads, args.writes, deposit)
+            report(f"writes, {args.reference_rows / 1e6:g}M in table", latencies, elapsed)
+            with reference_app.app_context():
+                db.engine.dispose()
+
+        accounts = [f"{rng.randint(1, args.accounts):010d}" for _ in range(args.queries)]
+        months = [rng.randint(1, args.months) for _ in range(args.queries)]
+        warm = accounts[:5] * (args.queries // 5)
+
+        def newest_page(number):
+            assert transaction_history_service(number, limit=50)["success"]
+
+        def archived_page(position):
+            number, back = position
+            end = month_start(now, back - 1)
+            cursor = encode_cursor(end, 0)
+            assert transaction_history_service(number, limit=50, cursor=cursor)["success"]
+
+        def closed_month_statement(position):
+            number, back = position
+            opening, rows = stream_statement(number, start=month_start(now, back), end=month_start(now, back - 1))
+            for _ in rows:
+                pass
+
+        with hot_app.app_context():
+            positions = list(zip(accounts, months))
+            warm_positions = positions[:5] * (args.queries // 5)
+            for label, operation, cold, hot in (
+                ("history, newest page", newest_page, accounts, warm),
+                ("history, closed month", archived_page, positions, warm_positions),
+                ("statement, closed month", closed_month_statement, positions, warm_positions),
+            ):
+                store._cache.clear()
+                report(f"{label} cold", timed(operation, cold))
+                report(f"{label} warm", timed(operation, hot))
+                print(f"{label:<24} {count_opened(store, operation, cold[:50]):.1f} segments opened per query")
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
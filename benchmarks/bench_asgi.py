@@ -0,0 +1,90 @@
+"""
+ASGI Serving Benchmark
+
+Load-tests one worker of each serving mode against the same file-backed SQLite
+database: gunicorn with a sync worker (`run:app`) and uvicorn with the ASGI
+entry point (`asgi:app`). Clients alternate balance reads and deposits over
+the sample accounts.
+
+Each mode is measured twice per connection count:
+- steady state: latency and throughput;
+- writer stall: half the connections only read and half only deposit while
+  another process holds the database write lock for `--stall` seconds. A sync
+  worker is stuck inside the first blocked deposit, while the async worker
+  keeps serving the readers; the report counts the reads answered during the stall.
+
+Usage:
+    python -m benchmarks.bench_asgi --connections 2,16,64 --duration 5 --stall 1
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app import db
+from benchmarks.common import bench_app, free_port, http_load, live_server, percentile
+
+MODES = {
+    "gunicorn sync": lambda port: ["gunicorn", "-w", "1", "-k", "sync", "-b", f"127.0.0.1:{port}", "run:app"],
+    "uvicorn asgi": lambda port: ["uvicorn", "asgi:app", "--workers", "1", "--port", str(port), "--log-level", "warning"],
+}
+
+
+def stalled_reads(port, connections, db_path, stall, request):
+    """Count balance reads completed while another connection holds the write lock."""
+    completed = []
+    split = lambda index, i: request(index, 2 * i + index % 2)  # Even connections read, odd ones deposit
+    load = threading.Thread(target=http_load, args=(port, max(connections, 2), stall + 1.0, split, completed))
+    load.start()
+    time.sleep(0.5)  # Let the clients get going first
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    stall_start = time.perf_counter()
+    time.sleep(stall)
+    stall_end = time.perf_counter()
+    blocker.execute("COMMIT")
+    blocker.close()
+    load.join()
+    return sum(1 for method, finished in completed if method == "GET" and stall_start <= finished < stall_end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent connections per worker: sync WSGI vs ASGI")
+    parser.add_argument("--connections", default="2,16,64")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--stall", type=float, default=1.0)
+    args = parser.parse_args()
+    accounts = [f"1000{i}" for i in range(1, 10)]
+    deposit = json.dumps({"amount": "1.00"})
+
+    def request(index, i):
+        account = accounts[(index + i) % len(accounts)]
+        if i % 2:
+            return "POST", f"/accounts/{account}/deposit", deposit
+        return "GET", f"/accounts/{account}/balance", None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp)  # Creates and seeds bench.db
+        with app.app_context():
+            db.engine.dispose()
+        db_path = os.path.join(tmp, "bench.db")
+
+        for mode, command in MODES.items():
+            port = free_port()
+            with live_server(command(port), db_path, port, env={"IDEMPOTENCY_SWEEP_INTERVAL": "0"}):
+                for connections in (int(c) for c in args.connections.split(",")):
+                    latencies, elapsed, errors = http_load(port, connections, args.duration, request)
+                    reads = stalled_reads(port, connections, db_path, args.stall, request)
+                    print(
+                        f"{mode:<14} connections={connections:<4} p50={percentile(latencies, 50):.2f}ms "
+                        f"p99={percentile(latencies, 99):.2f}ms rps={len(latencies) / elapsed:,.0f} errors={errors} "
+                        f"reads-during-{args.stall:g}s-stall={reads}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
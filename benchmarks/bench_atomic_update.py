@@ -0,0 +1,54 @@
+"""
+Atomic Update Benchmark
+
+Compares withdraw/deposit throughput between the single-statement conditional
+UPDATE ... RETURNING path and the SELECT ... FOR UPDATE path, on one hot
+account and spread across many accounts.
+
+Usage:
+    python -m benchmarks.bench_atomic_update --threads 8 --ops 300 --accounts 1000
+"""
+
+import argparse
+import tempfile
+
+from app import db
+from app.data_access.account_repository import perform_transaction
+from app.models import Account
+from benchmarks.common import bench_app, report, run_concurrently
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the atomic vs. row-locking balance update")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300, help="operations per thread")
+    parser.add_argument("--accounts", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp)
+        with app.app_context():
+            db.session.bulk_save_objects(
+                [Account(account_number=f"9{n:08d}", balance_cents=100_000_000) for n in range(args.accounts)]
+            )
+            db.session.commit()
+
+        def hot(index, i):
+            perform_transaction("10001", 100 if i % 2 else -100, "deposit" if i % 2 else "withdraw")
+
+        def spread(index, i):
+            account_number = f"9{(index * args.ops + i) % args.accounts:08d}"
+            perform_transaction(account_number, 100 if i % 2 else -100, "deposit" if i % 2 else "withdraw")
+
+        for atomic in (False, True):
+            app.extensions["atomic_update"] = atomic
+            label = "atomic" if atomic else "for-update"
+            report(f"{label} hot account", *run_concurrently(app, args.threads, args.ops, hot))
+            report(f"{label} many accounts", *run_concurrently(app, args.threads, args.ops, spread))
+
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Balance Cache Benchmark
+
+Reports balance-read p50/p99 latency through `get_balance_service` with the
+in-process balance cache disabled and enabled, under concurrent readers.
+
+Usage:
+    python -m benchmarks.bench_balance_cache --threads 8 --reads 2000
+"""
+
+import argparse
+import tempfile
+
+from app import db
+from app.data_access.balance_cache import BalanceCache
+from app.services.account_service import get_balance_service
+from benchmarks.common import bench_app, report, run_concurrently
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance-read latency with and without the balance cache")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp)
+        accounts = [f"1000{i}" for i in range(1, 10)]
+
+        def read(index, i):
+            get_balance_service(accounts[(index + i) % len(accounts)])
+
+        app.extensions["balance_cache"] = None
+        report("cache off", *run_concurrently(app, args.threads, args.reads, read))
+
+        cache = BalanceCache(app.config["BALANCE_CACHE_SIZE"], app.config["BALANCE_CACHE_TTL"])
+        app.extensions["balance_cache"] = cache
+        report("cache on", *run_concurrently(app, args.threads, args.reads, read))
+        print(f"cache stats: {cache.stats()}")
+
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Batch Endpoint Benchmark
+
+Reports operations per second for `POST /accounts/batch` against looping over
+the single-operation withdraw/deposit endpoints, through the Flask test client.
+
+Usage:
+    python -m benchmarks.bench_batch --ops 5000
+"""
+
+import argparse
+import tempfile
+import time
+
+from app import db
+from benchmarks.common import bench_app
+
+
+def make_operations(count):
+    accounts = [f"1000{i}" for i in range(1, 10)]
+    return [
+        {"account_number": accounts[i % len(accounts)], "type": "deposit" if i % 2 else "withdraw", "amount": "1.25"}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch endpoint throughput vs. single-op requests")
+    parser.add_argument("--ops", type=int, default=5000)
+    args = parser.parse_args()
+
+    operations = make_operations(args.ops)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp)
+        client = app.test_client()
+
+        start = time.perf_counter()
+        for op in operations:
+            client.post(f"/accounts/{op['account_number']}/{op['type']}", json={"amount": op["amount"]})
+        single = time.perf_counter() - start
+        print(f"single-op loop  {args.ops / single:,.0f} ops/s")
+
+        for atomic in (False, True):
+            start = time.perf_counter()
+            response = client.post("/accounts/batch", json={"atomic": atomic, "operations": operations})
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.get_json()
+            label = "batch atomic" if atomic else "batch chunked"
+            print(f"{label:<15} {args.ops / elapsed:,.0f} ops/s ({single / elapsed:.1f}x)")
+
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Transaction History Benchmark
+
+Seeds one account with millions of ledger rows, then times fetching a page of
+history at increasing depths with keyset cursors, next to the equivalent
+OFFSET query. Keyset page latency should stay flat as the depth grows.
+
+Usage:
+    python -m benchmarks.bench_history --rows 2000000 --page 50
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app import db
+from app.models import Account, Transaction
+from app.services.account_service import transaction_history_service
+from app.utils import encode_cursor
+from benchmarks.common import bench_app
+
+
+def seed(account_id, rows, chunk=50_000):
+    base = datetime(2020, 1, 1)
+    for offset in range(0, rows, chunk):
+        db.session.execute(insert(Transaction), [
+            {"account_id": account_id, "type": "deposit", "amount_cents": 100, "timestamp": base + timedelta(seconds=n)}
+            for n in range(offset, min(rows, offset + chunk))
+        ])
+    db.session.commit()
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History page latency at increasing depths")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--page", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp)
+        with app.app_context():
+            account_id = db.session.execute(select(Account.id).where(Account.account_number == "10001")).scalar()
+            start = time.perf_counter()
+            seed(account_id, args.rows)
+            print(f"seeded {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+            newest_first = (
+                select(Transaction.timestamp, Transaction.id)
+                .where(Transaction.account_id == account_id)
+                .order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+            )
+            for fraction in (0, 0.01, 0.1, 0.5, 0.99):
+                depth = int(args.rows * fraction)
+                cursor = None
+                if depth:
+                    ts, row_id = db.session.execute(newest_first.offset(depth - 1).limit(1)).first()
+                    cursor = encode_cursor(ts, row_id)
+                keyset = timed(lambda: transaction_history_service("10001", limit=args.page, cursor=cursor))
+                offset = timed(lambda: db.session.execute(
+                    select(Transaction).where(Transaction.account_id == account_id)
+                    .order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+                    .offset(depth).limit(args.page)
+                ).scalars().all(), repeat=3)
+                print(f"depth {depth:>10,}  keyset {keyset:7.3f}ms  offset {offset:9.3f}ms")
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Ledger Recovery Benchmark
+
+Writes `--entries` balance changes spread over `--accounts` accounts to a
+ledger journal, with a snapshot taken `--tail` entries before the end, then
+times `LedgerJournal.recover`:
+
+- snapshot + tail: the normal startup path, replaying only the tail
+- full replay: the same journal with its snapshots moved aside
+
+Both recoveries must produce the same balances.
+
+Usage:
+    python -m benchmarks.bench_ledger_recovery --entries 10000000 --accounts 100000 --tail 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.data_access.ledger_journal import LedgerJournal
+
+
+def write_journal(directory, entries, accounts, tail, batch):
+    """
+    Fill a journal with random deposits and withdrawals.
+
+    Returns:
+        float: Entries written per second.
+    """
+    journal = LedgerJournal(directory, fsync=False, snapshot_every=entries + 1)
+    journal.recover()
+    rng = random.Random(42)
+    balances = [0] * accounts
+    numbers = [f"{100000 + i}" for i in range(accounts)]
+    started = time.perf_counter()
+    written = 0
+    while written < entries:
+        if written <= entries - tail < written + batch:
+            journal.snapshot()
+        size = min(batch, entries - written)
+        chunk = []
+        for _ in range(size):
+            i = rng.randrange(accounts)
+            amount = rng.randint(-5000, 5000)
+            balances[i] += amount
+            chunk.append((numbers[i], "deposit" if amount >= 0 else "withdraw", amount, balances[i]))
+        journal.wait(journal.append(chunk))
+        written += size
+    journal.close()
+    return entries / (time.perf_counter() - started)
+
+
+def timed_recovery(directory):
+    """Recover a journal; returns (seconds, recovered state)."""
+    journal = LedgerJournal(directory)
+    started = time.perf_counter()
+    state = journal.recover()
+    seconds = time.perf_counter() - started
+    journal.close()
+    return seconds, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup recovery time of the ledger journal")
+    parser.add_argument("--entries", type=int, default=10_000_000)
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--tail", type=int, default=100_000, help="Entries written after the last snapshot")
+    parser.add_argument("--batch", type=int, default=10_000, help="Entries per append")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rate = write_journal(tmp, args.entries, args.accounts, args.tail, args.batch)
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        print(f"wrote {args.entries:,} entries ({size / 1e6:,.0f}MB) at {rate:,.0f} entries/s")
+
+        seconds, with_snapshot = timed_recovery(tmp)
+        print(
+            f"snapshot + tail   {seconds:8.3f}s  snapshot at {with_snapshot['snapshot_seq']:,}, "
+            f"{with_snapshot['replayed']:,} entries replayed"
+        )
+
+        aside = os.path.join(tmp, "aside")
+        os.mkdir(aside)
+        for name in os.listdir(tmp):
+            if name.startswith("snapshot-"):
+                os.rename(os.path.join(tmp, name), os.path.join(aside, name))
+        seconds, full = timed_recovery(tmp)
+        print(f"full replay       {seconds:8.3f}s  {full['replayed']:,} entries replayed")
+
+        assert with_snapshot["balances"] == full["balances"]
+        assert with_snapshot["seq"] == full["seq"] == args.entries
+
+
+if __name__ == "__main__":
+    main()
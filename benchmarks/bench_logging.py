@@ -0,0 +1,87 @@
+"""
+Logging Overhead Benchmark
+
+Reports requests per second for the `read_heavy` scenario driven through the
+Flask test client with the balance cache on (so logging is a visible share of
+each request), under each logging mode:
+
+- text: the default synchronous console handler
+- json: every record, formatted and written by the background listener
+- json sampled: INFO records kept at `--sample-rate`
+- off: `LOG_LEVEL=OFF`
+
+Logs are written to a file in a temporary directory (the text handler's
+stream is pointed at it too), so terminal speed does not skew the results.
+Modes are run in interleaved rounds and the median run of each is reported.
+
+Usage:
+    python -m benchmarks.bench_logging --connections 8 --duration 3 --rounds 3
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+from app import db
+from app.logging_config import UTILS_LOGGER, stop_logging
+from benchmarks.common import bench_app, percentile
+from benchmarks.scenarios import ReadHeavy
+from benchmarks.suite import drive_client
+
+
+def run_mode(settings, connections, duration):
+    """
+    Drive one read_heavy run with the given logging settings.
+
+    Returns:
+        tuple: (requests per second, sorted latencies in milliseconds, errors, bytes logged)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "app.log")
+        app = bench_app(tmp, IDEMPOTENCY_SWEEP_INTERVAL=0, BALANCE_CACHE_ENABLED=True, LOG_FILE=log_path, **settings)
+        with open(log_path, "a") as text_log:
+            text_handlers = logging.getLogger(UTILS_LOGGER).handlers
+            for handler in text_handlers:
+                handler.setStream(text_log)
+            scenario = ReadHeavy()
+            scenario.setup(app)
+            latencies, elapsed, errors = drive_client(app, scenario, connections, duration)
+            stop_logging()  # Count the writer's backlog as part of the run
+            for handler in text_handlers:
+                handler.setStream(sys.stderr)
+        with app.app_context():
+            db.engine.dispose()
+        return len(latencies) / elapsed, latencies, errors, os.path.getsize(log_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests per second with logging on, sampled and off")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per run")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per mode, interleaved; the median is reported")
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    modes = {
+        "text": {"LOG_FORMAT": "text"},
+        "json": {"LOG_FORMAT": "json"},
+        f"json sampled {args.sample_rate:g}": {"LOG_FORMAT": "json", "LOG_SUCCESS_SAMPLE_RATE": args.sample_rate},
+        "off": {"LOG_FORMAT": "json", "LOG_LEVEL": "OFF"},
+    }
+    runs = {label: [] for label in modes}
+    for _ in range(args.rounds):
+        for label, settings in modes.items():
+            runs[label].append(run_mode(settings, args.connections, args.duration))
+
+    for label, results in runs.items():
+        rps, latencies, errors, log_bytes = sorted(results, key=lambda r: r[0])[len(results) // 2]
+        print(
+            f"{label:<20} rps={rps:>9,.1f} p50={percentile(latencies, 50):.3f}ms "
+            f"p99={percentile(latencies, 99):.3f}ms errors={errors} log={log_bytes / 1e6:.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
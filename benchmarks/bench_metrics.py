@@ -0,0 +1,118 @@
+"""
+Metrics Overhead Benchmark
+
+Measures the cost of one metrics sample: a counter increment, a histogram
+observation and a complete timed section (two `perf_counter` calls plus an
+observation), from one thread and from several threads at once. The cost of
+an empty loop is subtracted. A lock-guarded counter is shown for comparison.
+Exits with status 1 if any per-thread sample costs more than `--budget-ns`.
+
+Usage:
+    python -m benchmarks.bench_metrics --samples 1000000 --threads 8
+"""
+
+import argparse
+import sys
+import threading
+import time
+from functools import partial
+
+from app.metrics import Counter, Histogram, render
+
+
+class LockedCounter:
+    """The obvious alternative: one shared value behind a lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self):
+        with self._lock:
+            self.value += 1
+
+
+def loop_seconds(operation, samples):
+    """Time `samples` calls of `operation` minus the cost of the loop itself."""
+    started = time.perf_counter()
+    for _ in range(samples):
+        pass
+    empty = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(samples):
+        operation()
+    return max(time.perf_counter() - started - empty, 0.0)
+
+
+def per_sample_ns(operation, samples, threads):
+    """
+    Run `operation` `samples` times in each of `threads` threads.
+
+    Returns:
+        float: Nanoseconds per sample from each thread's point of view (the
+        slowest thread's total divided by its sample count).
+    """
+    timings = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        seconds = loop_seconds(operation, samples)
+        with lock:
+            timings.append(seconds)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return max(timings) / samples * 1e9 / threads  # Threads share the GIL, so divide out the time-slicing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost per metrics sample")
+    parser.add_argument("--samples", type=int, default=1_000_000, help="Samples per thread")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--budget-ns", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    registry = []
+    counter = Counter("bench_total", "Benchmark counter.", registry=registry)
+    histogram = Histogram("bench_seconds", "Benchmark histogram.", registry=registry)
+    child = Histogram("bench_labelled_seconds", "Benchmark histogram.", ("stage",), registry=registry).labels("commit")
+    locked = LockedCounter()
+
+    def timed_section():
+        started = time.perf_counter()
+        child.observe(time.perf_counter() - started)
+
+    operations = {
+        "counter.inc": counter.inc,
+        "histogram.observe": partial(histogram.observe, 0.0042),
+        "labelled.observe": partial(child.observe, 0.0042),
+        "timed section": timed_section,
+        "locked counter (ref)": locked.inc,
+    }
+    over_budget = []
+    for threads in (1, args.threads):
+        for label, operation in operations.items():
+            ns = per_sample_ns(operation, args.samples, threads)
+            print(f"{label:<22} threads={threads:<3} {ns:8.1f} ns/sample")
+            if ns > args.budget_ns and "(ref)" not in label:
+                over_budget.append(f"{label} with {threads} threads")
+
+    started = time.perf_counter()
+    text = render(registry)
+    print(f"render                 {(time.perf_counter() - started) * 1000:8.3f} ms for {len(text.splitlines())} lines")
+    assert counter.value() == args.samples * (1 + args.threads)
+
+    if over_budget:
+        print(f"Over the {args.budget_ns:.0f}ns budget: {', '.join(over_budget)}")
+        return 1
+    print(f"All samples within the {args.budget_ns:.0f}ns budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
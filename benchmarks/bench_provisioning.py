@@ -0,0 +1,105 @@
+"""
+Bulk Provisioning Benchmark
+
+Writes a CSV (and, with pyarrow installed, a Parquet file) of `--rows`
+accounts, then loads each into a fresh SQLite database with
+`provision_service` and reports rows per second. For reference, the ORM
+`bulk_save_objects` approach of `db_setup` is timed on `--reference-rows`
+accounts.
+
+Usage:
+    python -m benchmarks.bench_provisioning --rows 10000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app import db
+from app.models import Account
+from app.services.account_service import provision_service
+from benchmarks.common import bench_app
+
+
+def write_csv(path, rows):
+    """Write `rows` accounts with random balances, in shuffled blocks so inserts are not fully sequential."""
+    rng = random.Random(7)
+    blocks = list(range(0, rows, 100_000))
+    rng.shuffle(blocks)
+    with open(path, "w") as f:
+        f.write("account_number,balance\n")
+        for start in blocks:
+            f.write("".join(
+                f"{7_000_000_000 + n},{rng.randint(0, 10_000_000) / 100:.2f}\n" for n in range(start, min(start + 100_000, rows))
+            ))
+
+
+def write_parquet(csv_path, path):
+    """Convert the CSV to Parquet with numeric balances; returns False without pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+    except ImportError:
+        return False
+    table = pacsv.read_csv(csv_path, convert_options=pacsv.ConvertOptions(column_types={"account_number": pa.string()}))
+    pq.write_table(table, path, row_group_size=1_000_000)
+    return True
+
+
+def load(tmp, label, source, fmt, chunk_size):
+    app = bench_app(os.path.join(tmp, label), IDEMPOTENCY_SWEEP_INTERVAL=0)
+    with app.app_context():
+        if fmt == "csv":
+            with open(source, newline="") as stream:
+                result = provision_service(stream, fmt="csv", chunk_size=chunk_size)
+        else:
+            result = provision_service(source, fmt="parquet", chunk_size=chunk_size)
+        db.engine.dispose()
+    assert result.get("invalid") == 0, result
+    print(f"{label:<18} {result['seconds']:8.2f}s  {result['rows_per_second']:>12,.0f} rows/s  {result['inserted']:,} inserted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk account provisioning throughput")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--reference-rows", type=int, default=100_000, help="Accounts for the ORM reference")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "accounts.csv")
+        parquet_path = os.path.join(tmp, "accounts.parquet")
+        started = time.perf_counter()
+        write_csv(csv_path, args.rows)
+        print(f"wrote {args.rows:,} rows ({os.path.getsize(csv_path) / 1e6:,.0f}MB CSV) in {time.perf_counter() - started:.1f}s")
+
+        for label in ("csv", "parquet"):
+            os.mkdir(os.path.join(tmp, label))
+        load(tmp, "csv", csv_path, "csv", args.chunk_size)
+        if write_parquet(csv_path, parquet_path):
+            load(tmp, "parquet", parquet_path, "parquet", args.chunk_size)
+        else:
+            print("parquet            skipped (pyarrow is not installed)")
+
+        reference_dir = os.path.join(tmp, "reference")
+        os.mkdir(reference_dir)
+        app = bench_app(reference_dir, IDEMPOTENCY_SWEEP_INTERVAL=0)
+        with app.app_context():
+            started = time.perf_counter()
+            for start in range(0, args.reference_rows, 10_000):
+                db.session.bulk_save_objects([
+                    Account(account_number=str(8_000_000_000 + n), balance_cents=n)
+                    for n in range(start, min(start + 10_000, args.reference_rows))
+                ])
+                db.session.commit()
+            seconds = time.perf_counter() - started
+            db.session.remove()
+            db.engine.dispose()
+        print(f"{'orm (ref)':<18} {seconds:8.2f}s  {args.reference_rows / seconds:>12,.0f} rows/s  {args.reference_rows:,} inserted")
+
+
+if __name__ == "__main__":
+    main()
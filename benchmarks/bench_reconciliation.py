@@ -0,0 +1,125 @@
+"""
+Reconciliation Benchmark
+
+Loads `--rows` transactions spread over `--accounts` accounts into a SQLite
+file (generated in SQL, so loading does not dominate), sets every balance to
+match its ledger, then tampers with `--tampered` balances and reports:
+
+- full run: `reconcile()` streaming every transaction into NumPy
+- incremental run: after `--new-rows` more transactions, from a checkpoint
+- per account (ref): one ORM SUM query per account, the approach being
+  replaced, timed on `--sample` accounts and extrapolated to all of them
+
+Both runs must report exactly the tampered accounts.
+
+Usage:
+    python -m benchmarks.bench_reconciliation --rows 50000000 --accounts 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import case, func, text
+
+from app import db
+from app.data_access.account_repository import SIGNED_TYPES
+from app.data_access.reconciliation import reconcile
+from app.models import Account, Transaction
+from benchmarks.common import bench_app
+
+SIGNED_SQL = "CASE WHEN type IN ('withdraw', 'transfer_out') THEN -amount_cents ELSE amount_cents END"
+
+
+def load_transactions(conn, rows, accounts, first_id, batch=1_000_000):
+    """Insert `rows` random transactions with ids from `first_id`, one INSERT ... SELECT per batch."""
+    for start in range(first_id, first_id + rows, batch):
+        end = min(start + batch, first_id + rows)
+        conn.execute(text(
+            "WITH RECURSIVE seq(n) AS (SELECT :start UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < :end) "
+            "INSERT INTO transactions (id, account_id, type, amount_cents, timestamp) "
+            "SELECT n, abs(random()) % :accounts + 1, "
+            "CASE abs(random()) % 4 WHEN 0 THEN 'deposit' WHEN 1 THEN 'withdraw' WHEN 2 THEN 'transfer_in' ELSE 'transfer_out' END, "
+            "abs(random()) % 100000 + 1, CURRENT_TIMESTAMP FROM seq"
+        ), {"start": start, "end": end, "accounts": accounts})
+
+
+def settle_balances(conn, after_id=0):
+    """Apply the signed sum of transactions past `after_id` to each balance."""
+    conn.execute(text("DROP TABLE IF EXISTS sums"))
+    conn.execute(text("CREATE TEMP TABLE sums (account_id INTEGER PRIMARY KEY, cents INTEGER)"))
+    conn.execute(text(
+        f"INSERT INTO sums SELECT account_id, SUM({SIGNED_SQL}) FROM transactions WHERE id > :after GROUP BY account_id"
+    ), {"after": after_id})
+    conn.execute(text(
+        "UPDATE accounts SET balance_cents = balance_cents + COALESCE((SELECT cents FROM sums WHERE sums.account_id = accounts.id), 0)"
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized balance reconciliation")
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--accounts", type=int, default=1_000_000)
+    parser.add_argument("--new-rows", type=int, default=500_000, help="Transactions added before the incremental run")
+    parser.add_argument("--tampered", type=int, default=25)
+    parser.add_argument("--sample", type=int, default=200, help="Accounts timed for the per-account reference")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp, IDEMPOTENCY_SWEEP_INTERVAL=0)
+        checkpoint = os.path.join(tmp, "reconcile.npz")
+        with app.app_context():
+            started = time.perf_counter()
+            with db.engine.begin() as conn:
+                conn.execute(text("DELETE FROM accounts"))
+                conn.execute(text(
+                    "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :accounts) "
+                    "INSERT INTO accounts (id, account_number, balance_cents, opening_balance_cents, version) "
+                    "SELECT n, printf('%010d', n), 1000000, 1000000, 0 FROM seq"
+                ), {"accounts": args.accounts})
+                for index in Transaction.__table__.indexes:  # Rebuilt once after the load
+                    index.drop(conn)
+                load_transactions(conn, args.rows, args.accounts, 1)
+                settle_balances(conn)
+                for index in Transaction.__table__.indexes:
+                    index.create(conn)
+            print(f"loaded {args.rows:,} transactions over {args.accounts:,} accounts in {time.perf_counter() - started:.1f}s")
+
+            tampered = {f"{n:010d}" for n in range(1, args.accounts + 1, max(1, args.accounts // args.tampered))}
+            with db.engine.begin() as conn:
+                conn.execute(Account.__table__.update().where(Account.account_number.in_(tampered)).values(
+                    balance_cents=Account.balance_cents + 1
+                ))
+
+            full = reconcile(checkpoint=checkpoint, chunk_size=args.chunk_size)
+            print(
+                f"full run          {full['seconds']:8.2f}s  {full['transactions'] / full['seconds']:>12,.0f} rows/s  "
+                f"{len(full['mismatches'])} mismatched"
+            )
+            assert {m["account_number"] for m in full["mismatches"]} == tampered
+
+            with db.engine.begin() as conn:
+                load_transactions(conn, args.new_rows, args.accounts, args.rows + 1)
+                settle_balances(conn, after_id=args.rows)
+            incremental = reconcile(checkpoint=checkpoint, chunk_size=args.chunk_size)
+            print(
+                f"incremental run   {incremental['seconds']:8.2f}s  {incremental['transactions']:,} new rows  "
+                f"{len(incremental['mismatches'])} mismatched"
+            )
+            assert {m["account_number"] for m in incremental["mismatches"]} == tampered
+
+            signed = case(SIGNED_TYPES, value=Transaction.type, else_=0) * Transaction.amount_cents
+            started = time.perf_counter()
+            for account in Account.query.limit(args.sample):
+                ledger = db.session.query(func.coalesce(func.sum(signed), 0)).filter(Transaction.account_id == account.id).scalar()
+                _ = account.balance_cents == account.opening_balance_cents + ledger
+            per_account = (time.perf_counter() - started) / args.sample
+            print(f"per account (ref) {per_account * args.accounts:8.2f}s  extrapolated from {args.sample} accounts")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Read Replica Benchmark
+
+Measures balance-read throughput with 0, 1, 2, ... `--max-replicas` SQLite
+file replicas, while one thread keeps depositing into the primary and a
+`ReplicaSyncer` copies it into the replicas every `--sync-interval` seconds.
+For each replica count it reports:
+
+- reads: `--threads` threads reading random balances with no commit position,
+  so any replica may serve them
+- read-your-writes: each thread withdraws, then reads the same balance back
+  through its commit position, so the read waits for a caught-up replica or
+  falls back to the primary; the share served by the primary is printed
+
+Every database is a file on the same machine, so a replica adds connections
+and files, not CPUs or disks: the gain shown here is what routing alone buys
+(less contention with the writer on the primary file), and a deployment with
+replicas on their own hosts adds their capacity on top.
+
+Usage:
+    python -m benchmarks.bench_replicas --max-replicas 3 --threads 4
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+
+from flask import g
+
+from app import db
+from app.data_access.account_repository import get_balance, perform_transaction
+from benchmarks.common import bench_app, report, run_concurrently
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance read throughput as read replicas are added")
+    parser.add_argument("--max-replicas", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--reads", type=int, default=2_000, help="Reads per thread")
+    parser.add_argument("--sync-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    accounts = ["10001", "10002", "10003", "10004", "10005", "10006", "10007", "10008", "10009", "100010"]
+    for count in range(args.max_replicas + 1):
+        with tempfile.TemporaryDirectory() as tmp:
+            urls = [f"sqlite:///{os.path.join(tmp, f'replica-{n}.db')}" for n in range(count)]
+            app = bench_app(
+                tmp, IDEMPOTENCY_SWEEP_INTERVAL=0, LOG_LEVEL="WARNING", METRICS_ENABLED=False,
+                READ_REPLICA_URLS=urls, READ_REPLICA_SYNC_INTERVAL=args.sync_interval if count else 0.0,
+            )
+            stopped = threading.Event()
+
+            def write_load():
+                with app.app_context():
+                    while not stopped.is_set():
+                        perform_transaction(random.choice(accounts), 1, "deposit")
+
+            writer = threading.Thread(target=write_load)
+            writer.start()
+
+            def read(thread, i):
+                get_balance(random.choice(accounts))
+
+            router = app.extensions["replica_router"]
+
+            def read_own_write(thread, i):
+                number = accounts[thread % len(accounts)]
+                perform_transaction(number, 1, "withdraw")
+                # The position the route hands back after a write, and the client returns
+                g.read_position = router.commit_position() if router else 0
+                get_balance(number)
+
+            try:
+                latencies, elapsed = run_concurrently(app, args.threads, args.reads, read)
+                report(f"reads, {count} replicas", latencies, elapsed)
+                before = router.stats()["primary_reads"] if router else 0
+                latencies, elapsed = run_concurrently(app, args.threads, args.reads // 10, read_own_write)
+                report(f"read-your-writes, {count}", latencies, elapsed)
+                if router:
+                    served = router.stats()["primary_reads"] - before
+                    print(f"{'':<24} {served / len(latencies):.0%} of read-backs served by the primary")
+            finally:
+                stopped.set()
+                writer.join()
+                syncer = app.extensions.get("replica_syncer")
+                if syncer:
+                    syncer.stop()
+                    syncer.join()
+                if router:
+                    router.dispose()
+                with app.app_context():
+                    db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Request CPU Benchmark
+
+Measures the CPU time a withdrawal spends outside the database, in thread
+CPU time (`time.thread_time`), so waiting is not counted:
+
+- validation: the two passes a withdrawal used to make (route checks, then
+  `validate_balance_change` in the service) against one `parse_balance_change`
+- encoding: the response envelope through Flask's standard-library provider
+  against the orjson provider
+- request: a whole withdrawal through the WSGI application, from a prebuilt
+  environ (so the test client's own work is not counted), with the repository
+  call replaced by a stub returning a fixed balance, under each `JSON_ENCODER`,
+  and once more with Flask's cookie session interface, which looks for a
+  session cookie on every request
+
+Usage:
+    python -m benchmarks.bench_request_cpu --requests 20000
+"""
+
+import argparse
+import io
+import tempfile
+import time
+
+from flask.sessions import SecureCookieSessionInterface
+from werkzeug.test import EnvironBuilder
+
+import app.services.account_service as account_service
+from app.utils import (
+    format_response, parse_balance_change, validate_account_number, validate_amount, validate_balance_change,
+    validate_idempotency_key,
+)
+from benchmarks.common import bench_app
+
+BODY = {"amount": "12.50"}
+KEY = "atm-17-req-123456"
+
+
+def cpu_micros(operation, count):
+    """Thread CPU microseconds per call of `operation`, best of three runs."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.thread_time()
+        for _ in range(count):
+            operation()
+        best = min(best, time.thread_time() - started)
+    return best / count * 1e6
+
+
+def two_pass_validation():
+    """What the route and the service each checked before the command object."""
+    if validate_account_number("10001") and "amount" in BODY:
+        valid, amount = validate_amount(BODY["amount"])
+        if valid and validate_idempotency_key(KEY):
+            validate_balance_change("withdraw", "10001", amount)
+
+
+def wsgi_withdrawal(app):
+    """Build a callable that sends one withdrawal through `app` without the test client."""
+    builder = EnvironBuilder(path="/accounts/10001/withdraw", method="POST", json=BODY, headers={"Idempotency-Key": KEY})
+    environ = builder.get_environ()
+    body = environ["wsgi.input"].read()
+    builder.close()
+
+    def start_response(status, headers, exc_info=None):
+        assert status.startswith("200"), status
+
+    def withdraw():
+        request_environ = dict(environ, **{"wsgi.input": io.BytesIO(body)})
+        b"".join(app(request_environ, start_response))
+
+    return withdraw
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU time per withdrawal outside the database")
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+    count = args.requests
+
+    print(f"{'validation: two passes':<32} {cpu_micros(two_pass_validation, count):8.2f}us")
+    print(f"{'validation: one pass':<32} {cpu_micros(lambda: parse_balance_change('withdraw', '10001', BODY, KEY), count):8.2f}us")
+
+    envelope = {"account_number": "10001", "new_balance": 987.5, "success": True}
+    real_transaction = account_service.perform_transaction
+    account_service.perform_transaction = lambda *args, **kwargs: {"new_balance_cents": 98750}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for encoder in ("json", "orjson"):
+                app = bench_app(tmp, IDEMPOTENCY_SWEEP_INTERVAL=0, LOG_LEVEL="WARNING", JSON_ENCODER=encoder)
+                with app.app_context():
+                    micros = cpu_micros(lambda: app.json.response(format_response(envelope)), count)
+                print(f"{'encoding: ' + encoder:<32} {micros:8.2f}us")
+
+                micros = cpu_micros(wsgi_withdrawal(app), count // 10)
+                print(f"{'request: ' + encoder:<32} {micros:8.2f}us")
+            app.session_interface = SecureCookieSessionInterface()
+            micros = cpu_micros(wsgi_withdrawal(app), count // 10)
+            print(f"{'request: orjson, cookie sessions':<32} {micros:8.2f}us")
+    finally:
+        account_service.perform_transaction = real_transaction
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Session Factory Benchmark
+
+Compares balance-read latency under concurrent load between the legacy
+per-call `sessionmaker` construction and the app-scoped pooled session factory.
+
+Usage:
+    python -m benchmarks.bench_session_factory --threads 8 --reads 500
+"""
+
+import argparse
+import tempfile
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app import db
+from app.data_access import account_repository
+from benchmarks.common import bench_app, report, run_concurrently
+
+
+def legacy_get_session():
+    """Per-call factory construction, as `get_session` did before the pooled factory."""
+    return scoped_session(sessionmaker(bind=db.engine))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance-read latency with and without the pooled session factory")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp)
+
+        def read(index, i):
+            account_repository.get_account("10001")
+
+        pooled = account_repository.get_session
+        try:
+            account_repository.get_session = legacy_get_session
+            report("before", *run_concurrently(app, args.threads, args.reads, read))
+        finally:
+            account_repository.get_session = pooled
+        report("after", *run_concurrently(app, args.threads, args.reads, read))
+
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Startup Benchmark
+
+Times a cold start the way a gunicorn worker boots: each run is a fresh
+interpreter that imports `app`, builds the default application with
+`from app import app`, and serves its first request with the test client.
+Scenarios:
+
+- memory: the default in-memory database, created and seeded on every start
+- new file: a file-backed SQLite database that does not exist yet
+- existing file: a database created on an earlier start, so the schema-version
+  marker lets the start skip table creation and seeding
+- unmarked file: the same database without the marker (as before the marker
+  existed), so every table is checked and the seed query runs
+
+Medians over `--runs` are printed. `--output` writes them as JSON so startup
+can be tracked across releases.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ("import", "create_app", "first_request")
+
+# Runs in a fresh interpreter; prints the seconds spent in each phase as JSON
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app as package
+imported = time.perf_counter()
+from app import app
+created = time.perf_counter()
+response = app.test_client().get("/accounts/10001/balance")
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({"import": imported - started, "create_app": created - imported, "first_request": served - created}))
+"""
+
+
+def start(env):
+    """Start one interpreter; returns the seconds per phase."""
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def scenario(runs, env, before_run=None):
+    """Start `runs` interpreters; returns the median seconds per phase and in total."""
+    samples = []
+    for run in range(runs):
+        if before_run:
+            before_run(run)
+        samples.append(start(env))
+    medians = {phase: statistics.median(sample[phase] for sample in samples) for phase in PHASES}
+    medians["total"] = statistics.median(sum(sample[phase] for phase in PHASES) for sample in samples)
+    return medians
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and first-request time of a fresh process")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="Write the medians as JSON")
+    args = parser.parse_args()
+
+    base_env = {key: value for key, value in os.environ.items() if key not in ("DB_BACKEND", "SQLITE_PATH", "FLASK_RUN_FROM_CLI")}
+    base_env["IDEMPOTENCY_SWEEP_INTERVAL"] = "0"
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        results["memory"] = scenario(args.runs, base_env)
+
+        def file_env(name):
+            return dict(base_env, DB_BACKEND="sqlite", SQLITE_PATH=os.path.join(tmp, name))
+
+        def remove_new_db(run):
+            for entry in os.scandir(tmp):
+                if entry.name.startswith("new.db"):  # Includes the -wal and -shm files
+                    os.remove(entry.path)
+
+        results["new file"] = scenario(args.runs, file_env("new.db"), before_run=remove_new_db)
+
+        existing = file_env("existing.db")
+        start(existing)
+        results["existing file"] = scenario(args.runs, existing)
+
+        with sqlite3.connect(existing["SQLITE_PATH"]) as conn:
+            conn.execute("DROP TABLE IF EXISTS alembic_version")
+        results["unmarked file"] = scenario(args.runs, existing)
+
+    print(f"{'scenario':<15} " + " ".join(f"{phase:>14}" for phase in (*PHASES, "total")))
+    for name, medians in results.items():
+        print(f"{name:<15} " + " ".join(f"{medians[phase] * 1000:>12.1f}ms" for phase in (*PHASES, "total")))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
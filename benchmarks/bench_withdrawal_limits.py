@@ -0,0 +1,118 @@
+"""
+Withdrawal Limits Benchmark
+
+Seeds `--history` withdrawals from the last day over `--accounts` accounts,
+then compares withdrawal latency:
+
+- no limits: limits disabled
+- in-memory limits: the sliding-window engine, with limits high enough that
+  nothing is refused
+- SQL check (ref): limits disabled, but every withdrawal first sums the
+  account's last day of withdrawals with a query, the approach the engine avoids
+
+It also times `rebuild_limits`, the startup pass that loads the history into
+the engine.
+
+Usage:
+    python -m benchmarks.bench_withdrawal_limits --history 1000000 --accounts 10000 --rounds 5
+"""
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import db
+from app.data_access.account_repository import get_session, perform_transaction
+from app.data_access.withdrawal_limits import WithdrawalLimits, rebuild_limits
+from app.models import Account, Transaction
+from benchmarks.common import bench_app, report, run_concurrently
+
+
+def seed(db_path, accounts, history):
+    """Insert accounts and `history` withdrawals spread over the last 23 hours."""
+    start = datetime.utcnow() - timedelta(hours=23)
+    step = timedelta(hours=23) / max(history, 1)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO accounts (account_number, balance_cents, opening_balance_cents, version) VALUES (?, ?, ?, 0)",
+            ((f"9{n:08d}", 10**12, 10**12) for n in range(accounts)),
+        )
+        first_id = conn.execute("SELECT MIN(id) FROM accounts WHERE account_number LIKE '9%'").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO transactions (account_id, type, amount_cents, timestamp) VALUES (?, 'withdraw', 100, ?)",
+            ((first_id + i % accounts, (start + i * step).isoformat(sep=" ")) for i in range(history)),
+        )
+
+
+def sql_daily_total(account_number):
+    """Sum an account's withdrawals over the last day with one query."""
+    session = get_session()
+    try:
+        return session.execute(
+            select(func.coalesce(func.sum(Transaction.amount_cents), 0))
+            .join(Account, Account.id == Transaction.account_id)
+            .where(
+                Account.account_number == account_number,
+                Transaction.type == "withdraw",
+                Transaction.timestamp >= datetime.utcnow() - timedelta(days=1),
+            )
+        ).scalar()
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Withdrawal latency with and without limit checks")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=200, help="withdrawals per thread and round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--history", type=int, default=1_000_000, help="withdrawals already in the last day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = bench_app(tmp, IDEMPOTENCY_SWEEP_INTERVAL=0)
+        seed(f"{tmp}/bench.db", args.accounts, args.history)
+
+        def withdraw(index, i):
+            perform_transaction(f"9{(index * args.ops + i) * 7919 % args.accounts:08d}", -1, "withdraw")
+
+        def withdraw_after_sql_check(index, i):
+            account_number = f"9{(index * args.ops + i) * 7919 % args.accounts:08d}"
+            sql_daily_total(account_number)
+            perform_transaction(account_number, -1, "withdraw")
+
+        limits = WithdrawalLimits(daily_limit_cents=10**15, per_minute=10**9)
+        with app.app_context():
+            started = time.perf_counter()
+            counted = rebuild_limits(limits)
+            seconds = time.perf_counter() - started
+        print(f"{'rebuild':<24} {seconds:.2f}s for {counted:,} withdrawals ({counted / seconds:,.0f}/s)")
+
+        # Rounds alternate, so WAL growth and checkpoints land on every scenario alike
+        scenarios = {
+            "no limits": (None, withdraw),
+            "in-memory limits": (limits, withdraw),
+            "SQL check (ref)": (None, withdraw_after_sql_check),
+        }
+        latencies = {label: [] for label in scenarios}
+        elapsed = dict.fromkeys(scenarios, 0.0)
+        for _ in range(args.rounds):
+            for label, (engine, operation) in scenarios.items():
+                app.extensions["withdrawal_limits"] = engine
+                round_latencies, seconds = run_concurrently(app, args.threads, args.ops, operation)
+                latencies[label].extend(round_latencies)
+                elapsed[label] += seconds
+        for label in scenarios:
+            report(label, sorted(latencies[label]), elapsed[label])
+
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
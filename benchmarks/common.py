@@ -0,0 +1,182 @@
+"""
+Shared helpers for the ATM benchmarks.
+
+Benchmarks run against a throwaway file-backed SQLite database so that the
+connection pool, WAL journaling and real row locking are exercised.
+"""
+
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from app import create_app
+from config.config import Config
+
+
+def bench_app(tmp_dir, **overrides):
+    """
+    Create an app bound to a fresh SQLite file inside `tmp_dir`.
+
+    Args:
+        tmp_dir (str): Directory for the database file.
+        **overrides: Extra config attributes.
+
+    Returns:
+        Flask: The configured application.
+    """
+    attrs = {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"}
+    attrs.update(overrides)
+    return create_app(type("BenchConfig", (Config,), attrs))
+
+
+def percentile(sorted_values, pct):
+    """Return the `pct` percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_concurrently(app, threads, iterations, operation):
+    """
+    Call `operation(thread_index, iteration)` from several threads inside app contexts.
+
+    Returns:
+        tuple: (sorted latencies in milliseconds, elapsed wall-clock seconds)
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        local = []
+        with app.app_context():
+            for i in range(iterations):
+                start = time.perf_counter()
+                operation(index, i)
+                local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return latencies, elapsed
+
+
+def report(label, latencies, elapsed=None):
+    """Print p50/p99 latency and, when `elapsed` is given, throughput."""
+    line = f"{label:<24} p50={percentile(latencies, 50):.3f}ms p99={percentile(latencies, 99):.3f}ms n={len(latencies)}"
+    if elapsed:
+        line += f" ops/s={len(latencies) / elapsed:,.0f}"
+    print(line)
+
+
+def free_port():
+    """Return a TCP port that is currently free on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def live_server(args, db_path, port, env=None, timeout=30):
+    """
+    Run a server process (`python -m <args>`) against a SQLite file until the block exits.
+
+    Args:
+        args (list[str]): Module and arguments, e.g. ["gunicorn", "-w", "1", "run:app"].
+        db_path (str): SQLite file shared by the server's workers.
+        port (int): Port the server listens on; `GET /` must answer before the block runs.
+        env (dict | None): Extra environment variables.
+        timeout (float): Seconds to wait for the port to accept connections.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server_env = dict(os.environ, DB_BACKEND="sqlite", SQLITE_PATH=db_path, **(env or {}))
+    process = subprocess.Popen(
+        [sys.executable, "-m", *args], cwd=root, env=server_env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:  # The port is bound before workers finish booting, so wait for a real response
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/")
+                conn.getresponse().read()
+                conn.close()
+                break
+            except (OSError, http.client.HTTPException):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"Server {' '.join(args)} did not start")
+                time.sleep(0.1)
+        yield process
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def http_load(port, connections, duration, request, completed=None):
+    """
+    Drive a live server from `connections` keep-alive clients for `duration` seconds.
+
+    Args:
+        port (int): The server port.
+        connections (int): Concurrent client connections.
+        duration (float): Seconds to run.
+        request (callable): `request(connection_index, i)` returning (method, path, JSON body or None).
+        completed (list | None): If given, receives (method, perf_counter at completion) per response.
+
+    Returns:
+        tuple: (sorted latencies in milliseconds, elapsed seconds, error count)
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        local, failed, i = [], 0, 0
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while time.perf_counter() < stop_at:
+            method, path, body = request(index, i)
+            i += 1
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                continue
+            finished = time.perf_counter()
+            local.append((finished - start) * 1000)
+            if completed is not None:
+                completed.append((method, finished))
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(connections)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    latencies.sort()
+    return latencies, time.perf_counter() - started, errors[0]
@@ -0,0 +1,142 @@
+"""
+Benchmark Scenarios
+
+Each scenario seeds its own accounts and describes the request mix one client
+connection sends. Requests are (method, path, JSON body or None) tuples, so the
+same scenario can be driven through the Flask test client or over HTTP
+against a live server.
+"""
+
+import json
+import random
+
+from sqlalchemy import insert
+
+from app import db
+from app.models import Account
+
+OPENING_BALANCE_CENTS = 10_000_000  # 100,000.00 per account, so withdrawals rarely hit insufficient funds
+
+
+def seed_accounts(app, prefix, count):
+    """
+    Insert `count` accounts numbered `prefix` followed by a zero-padded index.
+
+    Args:
+        app (Flask): The application whose database is seeded.
+        prefix (str): Leading digits that keep scenario accounts apart from the samples.
+        count (int): Number of accounts.
+
+    Returns:
+        list[str]: The new account numbers.
+    """
+    numbers = [f"{prefix}{n:06d}" for n in range(count)]
+    with app.app_context():
+        for start in range(0, count, 10_000):
+            db.session.execute(
+                insert(Account),
+                [{"account_number": number, "balance_cents": OPENING_BALANCE_CENTS, "version": 0} for number in numbers[start:start + 10_000]],
+            )
+        db.session.commit()
+    return numbers
+
+
+def _amount(rng):
+    return json.dumps({"amount": f"{rng.randint(1, 5000) / 100:.2f}"})
+
+
+class Scenario:
+    """
+    A named workload.
+
+    Attributes:
+        name (str): Identifier used on the command line and in results.
+        description (str): One-line summary for `--list`.
+    """
+
+    name = ""
+    description = ""
+
+    def __init__(self, accounts=None):
+        self.accounts = accounts
+
+    def setup(self, app):
+        """Seed the accounts the scenario needs."""
+
+    def requests(self, index):
+        """
+        Return an endless iterator of requests for client connection `index`.
+
+        Args:
+            index (int): The connection index, used to seed its random stream.
+
+        Returns:
+            Iterator[tuple]: (method, path, JSON body or None) tuples.
+        """
+        raise NotImplementedError
+
+
+class ReadHeavy(Scenario):
+    name = "read_heavy"
+    description = "95% balance reads, 5% deposits, spread over 1,000 accounts"
+
+    def setup(self, app):
+        self.numbers = seed_accounts(app, "31", self.accounts or 1_000)
+
+    def requests(self, index):
+        rng = random.Random(index)
+        while True:
+            account = rng.choice(self.numbers)
+            if rng.random() < 0.95:
+                yield "GET", f"/accounts/{account}/balance", None
+            else:
+                yield "POST", f"/accounts/{account}/deposit", _amount(rng)
+
+
+class HotAccount(Scenario):
+    name = "hot_account"
+    description = "Alternating deposits and withdrawals on a single account"
+
+    def setup(self, app):
+        self.account = seed_accounts(app, "32", 1)[0]
+
+    def requests(self, index):
+        rng = random.Random(index)
+        while True:
+            yield "POST", f"/accounts/{self.account}/deposit", _amount(rng)
+            yield "POST", f"/accounts/{self.account}/withdraw", _amount(rng)
+
+
+class UniformWrites(Scenario):
+    name = "uniform_writes"
+    description = "Deposits and withdrawals spread uniformly over 100,000 accounts"
+
+    def setup(self, app):
+        self.numbers = seed_accounts(app, "33", self.accounts or 100_000)
+
+    def requests(self, index):
+        rng = random.Random(index)
+        while True:
+            kind = "deposit" if rng.random() < 0.5 else "withdraw"
+            yield "POST", f"/accounts/{rng.choice(self.numbers)}/{kind}", _amount(rng)
+
+
+class MixedTransfers(Scenario):
+    name = "mixed_transfers"
+    description = "80% transfers between random pairs of 1,000 accounts, 20% balance reads"
+
+    def setup(self, app):
+        self.numbers = seed_accounts(app, "34", self.accounts or 1_000)
+
+    def requests(self, index):
+        rng = random.Random(index)
+        while True:
+            if rng.random() < 0.2:
+                yield "GET", f"/accounts/{rng.choice(self.numbers)}/balance", None
+                continue
+            source, destination = rng.sample(self.numbers, 2)
+            body = json.dumps({"from_account": source, "to_account": destination, "amount": f"{rng.randint(1, 5000) / 100:.2f}"})
+            yield "POST", "/transfers", body
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (ReadHeavy, HotAccount, UniformWrites, MixedTransfers)}
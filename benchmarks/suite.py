@@ -0,0 +1,229 @@
+"""
+ATM Benchmark Suite
+
+Runs the scenarios in `benchmarks.scenarios` through the Flask test client
+and/or against a live local gunicorn, reports throughput and p50/p95/p99
+latency, saves the results as JSON and compares them with a stored baseline.
+The exit status is 1 when any result regresses by more than `--threshold`.
+
+Usage:
+    python -m benchmarks --list
+    python -m benchmarks --driver client,gunicorn --duration 10 --output results.json
+    python -m benchmarks --scenarios hot_account --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from app import db
+from benchmarks.common import bench_app, free_port, http_load, live_server, percentile
+from benchmarks.scenarios import SCENARIOS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def drive_client(app, scenario, connections, duration):
+    """
+    Run a scenario through Flask test clients, one per thread.
+
+    Returns:
+        tuple: (sorted latencies in milliseconds, elapsed seconds, error count)
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(index):
+        client = app.test_client()
+        requests = scenario.requests(index)
+        local, failed = [], 0
+        while time.perf_counter() < stop_at:
+            method, path, body = next(requests)
+            start = time.perf_counter()
+            response = client.open(path, method=method, data=body, content_type="application/json" if body else None)
+            local.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 500:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(connections)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    return latencies, time.perf_counter() - started, errors[0]
+
+
+def drive_gunicorn(db_path, scenario, connections, duration, workers):
+    """
+    Run a scenario over HTTP against a local gunicorn serving `run:app` on `db_path`.
+
+    Returns:
+        tuple: (sorted latencies in milliseconds, elapsed seconds, error count)
+    """
+    port = free_port()
+    streams = {}
+
+    def request(index, i):
+        if index not in streams:
+            streams[index] = scenario.requests(index)
+        return next(streams[index])
+
+    command = ["gunicorn", "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "run:app"]
+    with live_server(command, db_path, port, env={"IDEMPOTENCY_SWEEP_INTERVAL": "0"}):
+        return http_load(port, connections, duration, request)
+
+
+def summarize(latencies, elapsed, errors):
+    """Reduce raw latencies to the figures stored in results and baselines."""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+def run_suite(scenarios, drivers, connections=8, duration=5.0, workers=4, accounts=None, log=print):
+    """
+    Run each scenario under each driver on a freshly seeded database.
+
+    Args:
+        scenarios (list[str]): Scenario names from `SCENARIOS`.
+        drivers (list[str]): 'client' and/or 'gunicorn'.
+        connections (int): Concurrent client threads or connections.
+        duration (float): Seconds per run.
+        workers (int): gunicorn worker processes.
+        accounts (int | None): Override the number of accounts scenarios seed.
+        log (callable): Receives one summary line per run.
+
+    Returns:
+        dict: Summaries keyed by "<driver>/<scenario>".
+    """
+    results = {}
+    for driver in drivers:
+        for name in scenarios:
+            scenario = SCENARIOS[name](accounts)
+            with tempfile.TemporaryDirectory() as tmp:
+                app = bench_app(tmp, IDEMPOTENCY_SWEEP_INTERVAL=0)
+                scenario.setup(app)
+                if driver == "client":
+                    raw = drive_client(app, scenario, connections, duration)
+                with app.app_context():
+                    db.engine.dispose()
+                if driver == "gunicorn":
+                    raw = drive_gunicorn(os.path.join(tmp, "bench.db"), scenario, connections, duration, workers)
+            summary = results[f"{driver}/{name}"] = summarize(*raw)
+            log(
+                f"{driver + '/' + name:<26} rps={summary['throughput']:>9,.1f} p50={summary['p50_ms']:.2f}ms "
+                f"p95={summary['p95_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms n={summary['requests']} errors={summary['errors']}"
+            )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    List the results that regressed against a baseline.
+
+    A run regresses when its throughput falls, or its p99 latency rises, by more
+    than `threshold` (a fraction) relative to the baseline run of the same key.
+    Keys missing from either side are ignored.
+
+    Args:
+        results (dict): Summaries from `run_suite`.
+        baseline (dict): Stored summaries.
+        threshold (float): Allowed relative change, e.g. 0.25 for 25%.
+
+    Returns:
+        list[str]: One message per regression.
+    """
+    regressions = []
+    for key, current in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current["throughput"] < previous["throughput"] * (1 - threshold):
+            regressions.append(f"{key}: throughput {current['throughput']:,.1f} < baseline {previous['throughput']:,.1f}")
+        if current["p99_ms"] > previous["p99_ms"] * (1 + threshold):
+            regressions.append(f"{key}: p99 {current['p99_ms']:.2f}ms > baseline {previous['p99_ms']:.2f}ms")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{key}: {current['errors']} errors > baseline {previous['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="ATM API benchmark suite")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--driver", default="client", help="Comma-separated drivers: client, gunicorn")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per scenario and driver")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument("--accounts", type=int, default=None, help="Override the number of seeded accounts")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<16} {scenario.description}")
+        return 0
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    drivers = [d for d in args.driver.split(",") if d]
+    unknown = [s for s in scenarios if s not in SCENARIOS] + [d for d in drivers if d not in ("client", "gunicorn")]
+    if unknown:
+        parser.error(f"Unknown scenario or driver: {', '.join(unknown)}")
+
+    results = run_suite(scenarios, drivers, args.connections, args.duration, args.workers, args.accounts)
+    document = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "connections": args.connections,
+            "duration": args.duration,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        baseline = {"meta": document["meta"], "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline["results"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 1 if regressions else 0
@@ -12,6 +12,29 @@ import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
+def database_uri():
+    """
+    Resolve the database URI from the environment.
+
+    - `DATABASE_URL` selects PostgreSQL (or any SQLAlchemy URL) when set.
+    - `DB_BACKEND=sqlite` selects a shared file-backed SQLite database at `SQLITE_PATH`.
+    - Otherwise a private in-memory SQLite database is used.
+
+    Returns:
+        str: The SQLAlchemy database URI.
+    """
+    url = os.environ.get('DATABASE_URL')
+    if url:
+        # Heroku still hands out the legacy 'postgres://' scheme
+        if url.startswith('postgres://'):
+            url = 'postgresql://' + url[len('postgres://'):]
+        return url
+    if os.environ.get('DB_BACKEND', 'memory').lower() == 'sqlite':
+        path = os.environ.get('SQLITE_PATH', os.path.join(basedir, '..', 'instance', 'atm.db'))
+        return f"sqlite:///{os.path.abspath(path)}"
+    return "sqlite:///:memory:"
+
+
 class Config:
     """
     Base configuration class that holds default settings for the application.
@@ -19,15 +42,185 @@ class Config:
     Attributes:
         DEBUG (bool): Whether debug mode is enabled.
         SECRET_KEY (str): Secret key for session management and security.
-        SQLALCHEMY_DATABASE_URI (str): Database connection URI.
+        SQLALCHEMY_DATABASE_URI (str): Database connection URI, resolved by `database_uri()`.
         SQLALCHEMY_TRACK_MODIFICATIONS (bool): Controls SQLAlchemy event system.
+        DB_POOL_SIZE (int): Number of connections kept open in the engine pool.
+        DB_MAX_OVERFLOW (int): Extra connections allowed above the pool size under load.
+        DB_POOL_PRE_PING (bool): Test connections for liveness before handing them out.
+        DB_POOL_RECYCLE (int): Seconds after which pooled connections are replaced.
+        SQLITE_JOURNAL_MODE (str): Journal mode for file-backed SQLite.
+        SQLITE_BUSY_TIMEOUT_MS (int): How long SQLite waits on a locked database before failing.
+        SQLITE_SYNCHRONOUS (str): SQLite fsync level ('FULL', 'NORMAL' or 'OFF').
+        HISTORY_PAGE_SIZE (int): Default page size of `/accounts/<n>/transactions`.
+        HISTORY_MAX_PAGE_SIZE (int): Largest page size a client may request.
+        BALANCE_CACHE_ENABLED (bool): Serve balance reads from an in-process cache.
+        BALANCE_CACHE_SIZE (int): Maximum number of cached accounts.
+        BALANCE_CACHE_TTL (float): Seconds a cached balance is served before revalidation.
+        BALANCE_CACHE_VALIDATION (str): 'ttl' reloads expired entries; 'version' first checks
+            the account's version column and keeps the entry if it has not changed.
+        AUTO_INIT_DB (bool): Create tables and seed sample accounts when the app starts.
+            Disable it when running `flask db upgrade` against an existing database.
+        BATCH_MAX_OPERATIONS (int): Largest number of operations accepted by `/accounts/batch`.
+        BATCH_CHUNK_SIZE (int): Operations committed per transaction in independent batch mode.
+        ATOMIC_BALANCE_UPDATE (str): 'auto', 'true' or 'false'; whether balance changes use
+            a single conditional UPDATE ... RETURNING instead of SELECT ... FOR UPDATE.
+        LOCK_MANAGER_ENABLED (bool): Queue writers to the same account on in-process striped
+            locks instead of letting them collide on the database lock.
+        LOCK_MANAGER_STRIPES (int): Number of striped locks.
+        WRITE_COMBINING_ACCOUNTS (list[str]): Hot accounts whose withdrawals and deposits are
+            always committed in micro-batches.
+        WRITE_COMBINING_THRESHOLD (int): Concurrent writers on one account that switch it to
+            micro-batching; 0 disables the threshold.
+        WRITE_COMBINING_MAX_BATCH (int): Most operations committed in one micro-batch.
+        IDEMPOTENCY_CACHE_SIZE (int): Idempotency keys whose results are kept in memory.
+        IDEMPOTENCY_KEY_TTL (float): Seconds an idempotency key is honoured before it expires.
+        IDEMPOTENCY_SWEEP_INTERVAL (float): Seconds between background deletions of expired
+            keys; 0 disables the sweeper.
+        METRICS_ENABLED (bool): Time requests and serve Prometheus metrics at `/metrics`.
+        LOG_FORMAT (str): 'text' writes to the console as each record is logged; 'json' writes
+            one JSON object per line from a background thread.
+        LOG_LEVEL (str): Level of the application loggers, or 'OFF'.
+        LOG_SUCCESS_SAMPLE_RATE (float): Fraction of INFO records kept; warnings and errors
+            are always kept.
+        LOG_QUEUE_SIZE (int): Records buffered for the JSON writer before new ones are dropped.
+        LOG_FILE (str): File the JSON log is appended to; empty for stderr.
+        LEDGER_DIR (str): Directory of the ledger journal and balance snapshots, replayed
+            at startup; empty disables the journal.
+        LEDGER_FSYNC (bool): Fsync journal entries before a write returns; false relies on
+            the OS page cache.
+        LEDGER_GROUP_COMMIT_MS (float): How long a journal flush waits for more entries to
+            share its fsync; 0 flushes at once.
+        LEDGER_SNAPSHOT_EVERY (int): Journal entries between balance snapshots, each of which
+            starts a new journal segment.
+        PROVISIONING_API_ENABLED (bool): Accept bulk account uploads at
+            `POST /accounts/provision`; `flask provision-accounts` works either way.
+        PROVISIONING_CHUNK_SIZE (int): Rows validated and inserted per transaction when
+            provisioning accounts.
+        WITHDRAWAL_LIMITS_ENABLED (bool): Enforce daily withdrawal caps and velocity limits.
+        WITHDRAWAL_DAILY_LIMIT (str): Default amount, in currency units, an account may
+            withdraw per day; 0 for no cap.
+        WITHDRAWAL_PER_MINUTE_LIMIT (int): Default number of withdrawals an account may make
+            per minute; 0 for no limit.
+        RATE_LIMIT_PER_SECOND (float): Requests per second each client may make; 0 disables
+            rate limiting. Read on every request, like the other admission settings.
+        RATE_LIMIT_BURST (float): Requests a client may make at once after being idle; 0 for
+            one second's worth.
+        RATE_LIMIT_CLIENT_HEADER (str): Request header identifying the ATM; the remote
+            address is used when it is missing.
+        RATE_LIMIT_MAX_CLIENTS (int): Clients whose buckets are kept in memory.
+        WRITE_CONCURRENCY_LIMIT (int): Writes served at once; 0 for no limit.
+        WRITE_QUEUE_SIZE (int): Writes that may wait for a slot before new ones are refused.
+        WRITE_QUEUE_TIMEOUT_MS (float): How long a write waits for a slot before it is refused.
+        JSON_ENCODER (str): 'auto' encodes responses with orjson when it is installed,
+            'orjson' requires it, 'json' uses the standard library.
+        ARCHIVE_DIR (str): Directory of the transaction archive; empty disables it.
+        ARCHIVE_HOT_MONTHS (int): Months of transactions kept in the database, counting the
+            current one; older closed months are moved by `flask archive-transactions`.
+        ARCHIVE_SEGMENT_ROWS (int): Most transactions written to one segment file.
+        ARCHIVE_CACHE_SEGMENTS (int): Decompressed segments kept in memory per process.
+        READ_REPLICA_URLS (list[str]): Database URLs of read replicas for balance and account
+            reads; empty sends every read to the primary.
+        READ_REPLICA_SYNC_INTERVAL (float): Seconds between copies of a SQLite primary into
+            SQLite replica files, for local testing; 0 leaves replication to the database.
     """
 
     DEBUG = False  # Disable debug mode by default
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')  # Default secret key
-    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"  # Use an in-memory SQLite database
+    SQLALCHEMY_DATABASE_URI = database_uri()  # In-memory SQLite unless the environment selects a shared backend
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disable modification tracking to improve performance
 
+    # Connection pool settings (ignored by in-memory SQLite, which uses a single shared connection)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    # File-backed SQLite tuning so several worker processes can share one database
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', 10000))
+    BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 500))
+
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 500))
+
+    # Balance read cache. Writes through this app update it, so a single worker is always
+    # consistent; with several workers the TTL bounds how stale another worker's view can be.
+    BALANCE_CACHE_ENABLED = os.environ.get('BALANCE_CACHE_ENABLED', 'false').lower() == 'true'
+    BALANCE_CACHE_SIZE = int(os.environ.get('BALANCE_CACHE_SIZE', 100000))
+    BALANCE_CACHE_TTL = float(os.environ.get('BALANCE_CACHE_TTL', 5.0))
+    BALANCE_CACHE_VALIDATION = os.environ.get('BALANCE_CACHE_VALIDATION', 'ttl')
+
+    AUTO_INIT_DB = os.environ.get('AUTO_INIT_DB', 'true').lower() == 'true'
+
+    # 'auto' enables the single-statement update on SQLite 3.35+ and PostgreSQL
+    ATOMIC_BALANCE_UPDATE = os.environ.get('ATOMIC_BALANCE_UPDATE', 'auto')
+
+    # Same-account writers in one process wait on a striped lock rather than retrying "database is locked"
+    LOCK_MANAGER_ENABLED = os.environ.get('LOCK_MANAGER_ENABLED', 'true').lower() == 'true'
+    LOCK_MANAGER_STRIPES = int(os.environ.get('LOCK_MANAGER_STRIPES', 1024))
+
+    # Optional write combining for hot accounts, by explicit list and/or by concurrent-writer threshold
+    WRITE_COMBINING_ACCOUNTS = [n for n in os.environ.get('WRITE_COMBINING_ACCOUNTS', '').split(',') if n]
+    WRITE_COMBINING_THRESHOLD = int(os.environ.get('WRITE_COMBINING_THRESHOLD', 0))
+    WRITE_COMBINING_MAX_BATCH = int(os.environ.get('WRITE_COMBINING_MAX_BATCH', 256))
+
+    # Retried withdrawals and deposits carrying the same Idempotency-Key are replayed, not re-applied
+    IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000))
+    IDEMPOTENCY_KEY_TTL = float(os.environ.get('IDEMPOTENCY_KEY_TTL', 86400))
+    IDEMPOTENCY_SWEEP_INTERVAL = float(os.environ.get('IDEMPOTENCY_SWEEP_INTERVAL', 300))
+
+    # Request, validation, lock, session and commit timings plus contention counters
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+    # Structured JSON logs are formatted and written off the request path; INFO can be sampled
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_SUCCESS_SAMPLE_RATE = float(os.environ.get('LOG_SUCCESS_SAMPLE_RATE', 1.0))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_FILE = os.environ.get('LOG_FILE', '')
+
+    # Durable ledger journal and balance snapshots, replayed at startup; empty disables it
+    LEDGER_DIR = os.environ.get('LEDGER_DIR', '')
+    LEDGER_FSYNC = os.environ.get('LEDGER_FSYNC', 'true').lower() == 'true'
+    LEDGER_GROUP_COMMIT_MS = float(os.environ.get('LEDGER_GROUP_COMMIT_MS', 0))
+    LEDGER_SNAPSHOT_EVERY = int(os.environ.get('LEDGER_SNAPSHOT_EVERY', 100000))
+
+    # Bulk account provisioning; the HTTP endpoint is off unless enabled
+    PROVISIONING_API_ENABLED = os.environ.get('PROVISIONING_API_ENABLED', 'false').lower() == 'true'
+    PROVISIONING_CHUNK_SIZE = int(os.environ.get('PROVISIONING_CHUNK_SIZE', 100000))
+
+    # Per-account withdrawal limits, kept in memory and rebuilt from the ledger at startup;
+    # accounts can override either default
+    WITHDRAWAL_LIMITS_ENABLED = os.environ.get('WITHDRAWAL_LIMITS_ENABLED', 'false').lower() == 'true'
+    WITHDRAWAL_DAILY_LIMIT = os.environ.get('WITHDRAWAL_DAILY_LIMIT', '1000')
+    WITHDRAWAL_PER_MINUTE_LIMIT = int(os.environ.get('WITHDRAWAL_PER_MINUTE_LIMIT', 5))
+
+    # Admission control: per-client rate limits and a bounded write queue, off unless set;
+    # app.config changes take effect on the next request
+    RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', 0))
+    RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 0))
+    RATE_LIMIT_CLIENT_HEADER = os.environ.get('RATE_LIMIT_CLIENT_HEADER', 'X-ATM-ID')
+    RATE_LIMIT_MAX_CLIENTS = int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', 100000))
+    WRITE_CONCURRENCY_LIMIT = int(os.environ.get('WRITE_CONCURRENCY_LIMIT', 0))
+    WRITE_QUEUE_SIZE = int(os.environ.get('WRITE_QUEUE_SIZE', 64))
+    WRITE_QUEUE_TIMEOUT_MS = float(os.environ.get('WRITE_QUEUE_TIMEOUT_MS', 1000))
+
+    # Response encoder; orjson is optional
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+
+    # Closed months of transactions moved to compressed columnar segment files; off unless set
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', '')
+    ARCHIVE_HOT_MONTHS = int(os.environ.get('ARCHIVE_HOT_MONTHS', 1))
+    ARCHIVE_SEGMENT_ROWS = int(os.environ.get('ARCHIVE_SEGMENT_ROWS', 65536))
+    ARCHIVE_CACHE_SEGMENTS = int(os.environ.get('ARCHIVE_CACHE_SEGMENTS', 16))
+
+    # Read replicas; clients get their commit position back so they always read their own writes
+    READ_REPLICA_URLS = [u for u in os.environ.get('READ_REPLICA_URLS', '').split(',') if u]
+    READ_REPLICA_SYNC_INTERVAL = float(os.environ.get('READ_REPLICA_SYNC_INTERVAL', 0))
+
 
 class DevelopmentConfig(Config):
     """
@@ -3,34 +3,126 @@ Database Setup and Initialization
 
 This module is responsible for ensuring that the database is properly set up.
 It creates the necessary tables and populates sample data if the database is empty.
+
+A database whose tables were created here is stamped with the current migration
+revision in Alembic's `alembic_version` table. On later starts that marker is
+read with one query, and table creation and seeding are skipped.
+
+Status lines go to stderr, so commands that write to stdout, such as
+`flask export-statement`, produce clean output.
 """
 
+import sys
+from sqlalchemy import Column, MetaData, PrimaryKeyConstraint, String, Table, inspect, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from app import db
 from app.models import Account
 
-def initialize_database():
+# Latest revision in migrations/versions; update it with every new migration
+SCHEMA_VERSION = "0010_commit_position"
+
+# Alembic's own version table, kept out of `db.metadata` so create_all and drop_all leave it alone
+schema_version_table = Table(
+    "alembic_version",
+    MetaData(),
+    Column("version_num", String(32), nullable=False),
+    PrimaryKeyConstraint("version_num", name="alembic_version_pkc"),
+)
+
+
+def status(message):
+    """Print a bootstrap status line to stderr."""
+    print(message, file=sys.stderr)
+
+
+def schema_is_current(conn):
+    """
+    Check whether the database is marked with the current schema version.
+
+    Args:
+        conn (Connection): A database connection.
+
+    Returns:
+        bool: True if `alembic_version` holds `SCHEMA_VERSION`.
+    """
+    try:
+        return conn.scalar(select(schema_version_table.c.version_num)) == SCHEMA_VERSION
+    except SQLAlchemyError:
+        conn.rollback()  # No version table yet
+        return False
+
+
+def stamp_schema_version(conn):
+    """Mark the database as created at `SCHEMA_VERSION`, like `flask db stamp head`."""
+    schema_version_table.create(conn, checkfirst=True)
+    conn.execute(schema_version_table.delete())
+    conn.execute(schema_version_table.insert().values(version_num=SCHEMA_VERSION))
+
+
+def initialize_database(seed=True):
     """
     Ensures the database schema is created and initializes it with sample data if empty.
 
     This function:
+    - Returns at once if the database is marked with the current schema version.
     - Creates all necessary database tables.
     - Checks if sample accounts exist.
     - If no accounts are found, it populates the database with 10 sample accounts.
+    - Marks a database whose tables it created with the current schema version.
+
+    The function is designed to be called during application startup. When several
+    worker processes share one database, each step takes the write lock up front
+    (`BEGIN IMMEDIATE` on SQLite), so only the first worker creates and seeds it.
 
-    The function is designed to be called during application startup.
+    Args:
+        seed (bool): Add the sample accounts to an empty database; off when the
+            ledger journal is about to restore the accounts instead.
     """
-    with db.session.begin():  # Ensures atomic database transactions
-        db.create_all()  # Creates tables if they do not already exist
-
-        # Check if the database already contains accounts
-        if not Account.query.first():
-            print("Populating the database with sample accounts...")
-            accounts = [
-                Account(account_number=f"1000{i}", balance=1000.0 * i)
-                for i in range(1, 11)
-            ]
-            db.session.bulk_save_objects(accounts)  # Efficient bulk insert
-            db.session.commit()
-            print("10 sample accounts created successfully!")
-        else:
-            print("Database already initialized. No new accounts added.")
+    with db.engine.connect() as conn:
+        if schema_is_current(conn):
+            status("Database schema is current. Skipping table creation and seeding.")
+            return
+
+    created = False
+    try:
+        with db.engine.connect() as conn:
+            conn.execution_options(sqlite_begin_immediate=True)
+            with conn.begin():
+                created = not inspect(conn).has_table(Account.__tablename__)
+                db.metadata.create_all(conn)  # Creates tables if they do not already exist
+    except SQLAlchemyError:
+        # Another worker created the tables between our existence check and CREATE TABLE
+        db.create_all()
+
+    if seed:
+        seed_sample_accounts()
+    else:
+        status("Balances will be restored from the ledger journal. No sample accounts added.")
+
+    # Stamped after seeding, so no worker skips seeding a database that is still empty
+    if created:
+        with db.engine.connect() as conn:
+            conn.execution_options(sqlite_begin_immediate=True)
+            with conn.begin():
+                stamp_schema_version(conn)
+
+
+def seed_sample_accounts():
+    """Add the 10 sample accounts to a database that has no accounts."""
+    try:
+        with db.session.begin():  # Ensures atomic database transactions
+            db.session.connection(execution_options={"sqlite_begin_immediate": True})
+            # Check if the database already contains accounts
+            if not Account.query.first():
+                status("Populating the database with sample accounts...")
+                accounts = [
+                    Account(account_number=f"1000{i}", balance_cents=100_000 * i)
+                    for i in range(1, 11)
+                ]
+                db.session.bulk_save_objects(accounts)  # Efficient bulk insert
+                status("10 sample accounts created successfully!")
+            else:
+                status("Database already initialized. No new accounts added.")
+    except IntegrityError:
+        db.session.rollback()
+        status("Database was seeded by another worker. No new accounts added.")
@@ -0,0 +1,48 @@
+"""Store balances and transaction amounts as integer cents
+
+Revision ID: 0002_integer_cents
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 00:00:01
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_integer_cents'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.add_column(sa.Column('balance_cents', sa.BigInteger(), nullable=False, server_default='0'))
+    op.execute('UPDATE accounts SET balance_cents = CAST(ROUND(balance * 100) AS BIGINT)')
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.alter_column('balance_cents', server_default=None)
+        batch_op.drop_column('balance')
+
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('amount_cents', sa.BigInteger(), nullable=False, server_default='0'))
+    op.execute('UPDATE transactions SET amount_cents = CAST(ROUND(amount * 100) AS BIGINT)')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.alter_column('amount_cents', server_default=None)
+        batch_op.drop_column('amount')
+
+
+def downgrade():
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('amount', sa.Float(), nullable=False, server_default='0'))
+    op.execute('UPDATE transactions SET amount = amount_cents / 100.0')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.alter_column('amount', server_default=None)
+        batch_op.drop_column('amount_cents')
+
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.add_column(sa.Column('balance', sa.Float(), nullable=False, server_default='0'))
+    op.execute('UPDATE accounts SET balance = balance_cents / 100.0')
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.alter_column('balance', server_default=None)
+        batch_op.drop_column('balance_cents')
@@ -0,0 +1,30 @@
+"""Link transfer legs and widen the transaction type column
+
+Revision ID: 0003_transfers
+Revises: 0002_integer_cents
+Create Date: 2026-10-18 00:00:02
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_transfers'
+down_revision = '0002_integer_cents'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.alter_column('type', existing_type=sa.String(length=10), type_=sa.String(length=20), existing_nullable=False)
+        batch_op.add_column(sa.Column('transfer_id', sa.String(length=32), nullable=True))
+        batch_op.create_index('ix_transactions_transfer_id', ['transfer_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_index('ix_transactions_transfer_id')
+        batch_op.drop_column('transfer_id')
+        batch_op.alter_column('type', existing_type=sa.String(length=20), type_=sa.String(length=10), existing_nullable=False)
@@ -0,0 +1,26 @@
+"""Add a version counter to accounts for balance cache validation
+
+Revision ID: 0004_account_version
+Revises: 0003_transfers
+Create Date: 2026-10-18 00:00:03
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_account_version'
+down_revision = '0003_transfers'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.drop_column('version')
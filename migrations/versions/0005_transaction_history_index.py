@@ -0,0 +1,23 @@
+"""Index transactions by account, time and id for history pagination
+
+Revision ID: 0005_transaction_history_index
+Revises: 0004_account_version
+Create Date: 2026-10-18 00:00:04
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_transaction_history_index'
+down_revision = '0004_account_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transactions_account_time', 'transactions', ['account_id', 'timestamp', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_transactions_account_time', table_name='transactions')
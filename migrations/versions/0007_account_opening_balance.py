@@ -0,0 +1,34 @@
+"""Record each account's opening balance for ledger reconciliation
+
+Existing accounts are backfilled with their balance minus their ledger, so
+they reconcile as of the upgrade.
+
+Revision ID: 0007_account_opening_balance
+Revises: 0006_idempotency_keys
+Create Date: 2026-10-18 00:00:06
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_account_opening_balance'
+down_revision = '0006_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.add_column(sa.Column('opening_balance_cents', sa.BigInteger(), nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE accounts SET opening_balance_cents = balance_cents - ("
+        "SELECT COALESCE(SUM(CASE WHEN type IN ('withdraw', 'transfer_out') THEN -amount_cents ELSE amount_cents END), 0) "
+        "FROM transactions WHERE transactions.account_id = accounts.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.drop_column('opening_balance_cents')
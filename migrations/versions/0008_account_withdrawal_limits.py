@@ -0,0 +1,31 @@
+"""Per-account withdrawal limits
+
+NULL keeps the application-wide defaults (`WITHDRAWAL_DAILY_LIMIT` and
+`WITHDRAWAL_PER_MINUTE_LIMIT`).
+
+Revision ID: 0008_account_withdrawal_limits
+Revises: 0007_account_opening_balance
+Create Date: 2026-10-18 00:00:07
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_account_withdrawal_limits'
+down_revision = '0007_account_opening_balance'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.add_column(sa.Column('daily_withdrawal_limit_cents', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('withdrawals_per_minute', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.drop_column('withdrawals_per_minute')
+        batch_op.drop_column('daily_withdrawal_limit_cents')
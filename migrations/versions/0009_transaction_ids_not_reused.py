@@ -0,0 +1,33 @@
+"""Never reuse transaction ids on SQLite
+
+SQLite hands out the highest remaining rowid plus one, so deleting the newest
+transactions (as archiving an idle database can) would reissue ids that the
+archive and reconciliation checkpoints already hold. AUTOINCREMENT keeps the
+high-water mark in `sqlite_sequence` instead. The table is rebuilt on SQLite;
+other databases already never reuse sequence values, so nothing changes there.
+
+Revision ID: 0009_transaction_ids_not_reused
+Revises: 0008_account_withdrawal_limits
+Create Date: 2026-10-18 00:00:08
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_transaction_ids_not_reused'
+down_revision = '0008_account_withdrawal_limits'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('transactions', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('transactions', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
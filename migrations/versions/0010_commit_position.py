@@ -0,0 +1,33 @@
+"""Add a commit counter for read-your-writes on SQLite read replicas
+
+SQLite has no WAL position a replica copy can be compared by, so every
+write request bumps this one-row counter. A replica whose counter has
+reached the value handed to a client holds that client's writes.
+
+Revision ID: 0010_commit_position
+Revises: 0009_transaction_ids_not_reused
+Create Date: 2026-10-18 00:00:09
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_commit_position'
+down_revision = '0009_transaction_ids_not_reused'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'commit_position',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('commit_position')
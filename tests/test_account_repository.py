@@ -25,3 +25,62 @@ def test_create_transaction(db_session, sample_account):
     # Ensure transaction was successfully created
     assert result == {"success": True}, f"Expected success message, got {result}"
 
+
+def test_get_session_uses_app_factory(app, db_session):
+    """
+    Sessions come from the factory created once in `create_app`.
+    """
+    from app.data_access.account_repository import get_session
+    session = get_session()
+    assert session is app.extensions["session_factory"]()
+    session.close()
+
+def test_build_engine_options():
+    from app import build_engine_options
+    memory = build_engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    assert "pool_size" not in memory
+
+    pooled = build_engine_options({
+        "SQLALCHEMY_DATABASE_URI": "postgresql://atm@localhost/atm",
+        "DB_POOL_SIZE": 5, "DB_MAX_OVERFLOW": 2, "DB_POOL_PRE_PING": True, "DB_POOL_RECYCLE": 60,
+    })
+    assert pooled == {"pool_size": 5, "max_overflow": 2, "pool_pre_ping": True, "pool_recycle": 60}
+
+@pytest.mark.parametrize("atomic", [True, False])
+def test_perform_transaction_paths(app, db_session, sample_account, monkeypatch, atomic):
+    """
+    Test that the single-statement and row-locking paths behave the same.
+    """
+    from app.data_access.account_repository import perform_transaction
+    from app.models import Transaction
+    monkeypatch.setitem(app.extensions, "atomic_update", atomic)
+
+    result = perform_transaction("123456", -20000, "withdraw")
+    assert result == {"success": True, "account_number": "123456", "new_balance_cents": 30000}
+
+    assert perform_transaction("123456", -40000, "withdraw") == {"error": "Insufficient funds"}
+    assert perform_transaction("999999", 5000, "deposit") == {"error": "Account not found"}
+
+    ledger = db_session.query(Transaction).filter_by(account_id=sample_account.id).all()
+    assert [(t.type, t.amount_cents) for t in ledger] == [("withdraw", 20000)]
+
+def test_atomic_update_enabled_by_default(app):
+    """
+    The bundled SQLite supports RETURNING, so the fast path is the default.
+    """
+    import sqlite3
+    assert app.extensions["atomic_update"] is (sqlite3.sqlite_version_info >= (3, 35, 0))
+
+def test_perform_batch_in_chunks(db_session, sample_account):
+    """
+    Test that independent batches commit in chunks and keep per-account order.
+    """
+    from app.data_access.account_repository import perform_batch
+    operations = [("123456", -10000, "withdraw")] * 6 + [("000001", 100, "deposit")]
+    outcome = perform_batch(operations, chunk_size=2)
+
+    assert outcome["committed"] is True
+    balances = [r.get("new_balance_cents") for r in outcome["results"]]
+    assert balances == [40000, 30000, 20000, 10000, 0, None, None]
+    assert outcome["results"][5] == {"error": "Insufficient funds"}
+    assert outcome["results"][6] == {"error": "Account not found"}
@@ -32,3 +32,148 @@ def test_deposit(client, sample_account):
 
     assert response.status_code == 200
     assert json_data["data"]["new_balance"] == 700.0  # 500 + 200
+
+def test_batch_independent(client, sample_account, db_session):
+    """
+    Test that independent batch operations succeed or fail on their own.
+    """
+    db_session.add(Account(account_number="654321", balance=100.0))
+    db_session.commit()
+    response = client.post("/accounts/batch", json={"operations": [
+        {"account_number": "654321", "type": "withdraw", "amount": 30},
+        {"account_number": "123456", "type": "deposit", "amount": "0.10"},
+        {"account_number": "654321", "type": "withdraw", "amount": 80},  # Insufficient after the first
+        {"account_number": "999999", "type": "deposit", "amount": 5},
+        {"account_number": "123456", "type": "transfer", "amount": 5},
+    ]})
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    results = json_data["data"]["results"]
+    assert [r.get("success", False) for r in results] == [True, True, False, False, False]
+    assert results[0]["new_balance"] == 70.0
+    assert results[1]["new_balance"] == 500.1
+    assert results[2]["error"] == "Insufficient funds"
+    assert results[3]["error"] == "Account not found"
+    assert client.get("/accounts/654321/balance").get_json()["data"]["balance"] == 70.0
+
+def test_batch_atomic_rolls_back(client, sample_account):
+    """
+    Test that an atomic batch with a failing operation changes nothing.
+    """
+    response = client.post("/accounts/batch", json={"atomic": True, "operations": [
+        {"account_number": "123456", "type": "withdraw", "amount": 100},
+        {"account_number": "123456", "type": "withdraw", "amount": 1000},
+    ]})
+    json_data = response.get_json()
+
+    assert response.status_code == 400
+    assert [r["error"] for r in json_data["data"]["results"]] == ["Batch rolled back", "Insufficient funds"]
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 500.0
+
+    response = client.post("/accounts/batch", json={"atomic": True, "operations": [
+        {"account_number": "123456", "type": "withdraw", "amount": 100},
+        {"account_number": "123456", "type": "deposit", "amount": 25.5},
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()["data"]["committed"] is True
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 425.5
+
+def test_batch_rejects_bad_body(client):
+    assert client.post("/accounts/batch", json={"operations": []}).status_code == 400
+    assert client.post("/accounts/batch", json={"operations": [{}], "atomic": "yes"}).status_code == 400
+    response = client.post("/accounts/batch", data="operations", content_type="text/plain")
+    assert response.status_code == 415
+    assert response.get_json()["data"]["code"] == 415
+    response = client.post("/accounts/batch", data="{", content_type="application/json")
+    assert response.status_code == 400
+    assert response.get_json()["data"]["error"] == "Missing 'operations' list in request body"
+
+def test_transfer(client, sample_account, db_session):
+    """
+    Test transferring money between accounts writes two linked ledger rows.
+    """
+    from app.models import Transaction
+    db_session.add(Account(account_number="654321", balance=100.0))
+    db_session.commit()
+
+    response = client.post("/transfers", json={"from_account": "123456", "to_account": "654321", "amount": "150.25"})
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["data"]["from_balance"] == 349.75
+    assert json_data["data"]["to_balance"] == 250.25
+    legs = db_session.query(Transaction).filter_by(transfer_id=json_data["data"]["transfer_id"]).all()
+    assert sorted((leg.type, leg.amount_cents) for leg in legs) == [("transfer_in", 15025), ("transfer_out", 15025)]
+
+    response = client.post("/transfers", json={"from_account": "654321", "to_account": "123456", "amount": 1000})
+    assert response.status_code == 400
+    assert response.get_json()["data"]["error"] == "Insufficient funds"
+
+    response = client.post("/transfers", json={"from_account": "123456", "to_account": "123456", "amount": 1})
+    assert response.status_code == 400
+
+def test_transfer_rejects_bad_bodies(client):
+    """
+    Test that non-JSON and malformed transfer bodies get JSON errors, not Flask's HTML pages.
+    """
+    response = client.post("/transfers", data="from_account=123456", content_type="text/plain")
+    assert response.status_code == 415
+    assert response.get_json()["data"]["code"] == 415
+    response = client.post("/transfers", data="{", content_type="application/json")
+    assert response.status_code == 400
+    assert response.get_json()["data"]["error"] == "Missing 'from_account', 'to_account' or 'amount' in request body"
+
+def test_transaction_history_pagination(client, sample_account, db_session):
+    """
+    Test walking an account's history with cursors and filters.
+    """
+    from datetime import datetime, timedelta
+    from app.models import Transaction
+    base = datetime(2026, 1, 1)
+    for i in range(7):
+        db_session.add(Transaction(account_id=sample_account.id, type="deposit" if i % 2 else "withdraw",
+                                   amount_cents=100 * (i + 1), timestamp=base + timedelta(days=i)))
+    db_session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/accounts/123456/transactions?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        seen.extend(t["amount"] for t in data["transactions"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [7.0, 6.0, 5.0, 4.0, 3.0, 2.0, 1.0]
+
+    data = client.get("/accounts/123456/transactions?type=deposit&from=2026-01-02&to=2026-01-06").get_json()["data"]
+    assert [t["amount"] for t in data["transactions"]] == [4.0, 2.0]
+
+def test_transaction_history_errors(client, sample_account):
+    assert client.get("/accounts/999999/transactions").status_code == 404
+    assert client.get("/accounts/123456/transactions?cursor=not-a-cursor").status_code == 400
+    assert client.get("/accounts/123456/transactions?limit=0").status_code == 400
+    assert client.get("/accounts/123456/transactions?type=refund").status_code == 400
+    assert client.get("/accounts/123456/transactions?from=yesterday").status_code == 400
+
+def test_deposit_rejects_oversized_amounts(client, sample_account):
+    """
+    Test that amounts too large for the database are refused with 400, not a 500 from the driver.
+    """
+    for amount in (10 ** 20, "9" * 30):
+        response = client.post(f"/accounts/{sample_account.account_number}/deposit", json={"amount": amount})
+        assert response.status_code == 400
+        assert response.get_json()["data"]["error"] == "Invalid amount format or must be greater than zero"
+
+def test_withdraw_rejects_bad_bodies(client, sample_account):
+    """
+    Test that non-JSON and malformed bodies get JSON errors, not Flask's HTML pages.
+    """
+    response = client.post(f"/accounts/{sample_account.account_number}/withdraw", data="amount=5")
+    assert response.status_code == 415
+    response = client.post(f"/accounts/{sample_account.account_number}/withdraw", data="{", content_type="application/json")
+    assert response.status_code == 400
+    assert response.get_json()["data"]["error"] == "Missing 'amount' in request body"
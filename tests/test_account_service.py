@@ -1,3 +1,5 @@
+import random
+from decimal import Decimal
 import pytest
 from app.services.account_service import get_balance_service, withdraw_service, deposit_service
 
@@ -19,3 +21,25 @@ def test_deposit_service(db_session, sample_account):
     result = deposit_service("123456", 100)
     assert result["success"] is True
     assert result["new_balance"] == 600.0
+
+def test_no_drift_through_services(db_session, sample_account):
+    """
+    Property: random deposits and withdrawals through the service layer keep
+    the stored balance exact to the cent.
+    """
+    rng = random.Random(4)
+    expected = Decimal("500")
+    for _ in range(2000):
+        amount = f"{rng.randint(0, 50)}.{rng.randint(1, 99):02d}"
+        if rng.random() < 0.5:
+            result = deposit_service("123456", amount)
+            expected += Decimal(amount)
+        else:
+            result = withdraw_service("123456", float(amount))
+            if expected >= Decimal(amount):
+                expected -= Decimal(amount)
+            else:
+                assert result["error"] == "Insufficient funds"
+                continue
+        assert result["new_balance"] == float(expected)
+    assert get_balance_service("123456")["balance"] == float(expected)
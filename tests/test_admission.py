@@ -0,0 +1,182 @@
+import threading
+import time
+import pytest
+from sqlalchemy import event
+from app.admission import ConcurrencyLimiter, RateLimiter
+
+SLOW_WRITE_SECONDS = 0.02
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def admission_app(tmp_path):
+    """
+    App on a file-backed database with admission control configured but switched off.
+    """
+    from app import create_app, db
+    from config.config import Config
+
+    class AdmissionConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'admission.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        RATE_LIMIT_BURST = 3
+        WRITE_QUEUE_SIZE = 2
+        WRITE_QUEUE_TIMEOUT_MS = 100
+
+    app = create_app(AdmissionConfig)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_rate_limit_per_client(admission_app):
+    """
+    Test that each ATM has its own token bucket and that the rate can be changed at runtime.
+    """
+    clock = FakeClock()
+    admission_app.extensions["rate_limiter"] = RateLimiter(admission_app.config, clock=clock)
+    http = admission_app.test_client()
+
+    def balance(atm_id):
+        return http.get("/accounts/10001/balance", headers={"X-ATM-ID": atm_id})
+
+    assert all(balance("atm-1").status_code == 200 for _ in range(5))  # Disabled by default
+    admission_app.config["RATE_LIMIT_PER_SECOND"] = 2
+
+    assert [balance("atm-1").status_code for _ in range(4)] == [200, 200, 200, 429]
+    response = balance("atm-1")
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+    assert response.json["data"]["error"] == "Rate limit exceeded"
+    assert balance("atm-2").status_code == 200
+    assert http.get("/metrics").status_code == 200  # Exempt
+
+    clock.now += 0.5
+    assert [balance("atm-1").status_code for _ in range(2)] == [200, 429]
+
+    admission_app.config["RATE_LIMIT_PER_SECOND"] = 0
+    assert balance("atm-1").status_code == 200
+    assert http.get("/admission/stats").json["data"]["rate_limiter"] == {"clients": 2, "rejections": 3}
+
+
+def test_write_queue_hands_over_and_sheds():
+    """
+    Test that a freed slot passes to the queued write, and that a full queue or a
+    timed-out wait is refused with 503.
+    """
+    config = {"WRITE_CONCURRENCY_LIMIT": 1, "WRITE_QUEUE_SIZE": 1, "WRITE_QUEUE_TIMEOUT_MS": 2000}
+    limiter = ConcurrencyLimiter(config)
+    assert limiter.acquire() is None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+    waiter.start()
+    while limiter.stats()["waiting"] == 0:
+        time.sleep(0.001)
+    error = limiter.acquire()
+    assert (error["code"], error["retry_after"]) == (503, 1)  # Queue full
+
+    limiter.release(0.01)
+    waiter.join()
+    assert results == [None]
+    assert limiter.stats()["active"] == 1
+
+    config["WRITE_QUEUE_TIMEOUT_MS"] = 20
+    assert limiter.acquire()["code"] == 503  # Timed out in the queue
+    limiter.release(0.01)
+    assert limiter.stats() == {
+        "active": 0, "waiting": 0, "admitted": 2, "queued": 1, "shed": 2, "average_write_ms": 1.9,
+    }
+
+
+def test_overload_keeps_admitted_latency_bounded(admission_app):
+    """
+    Test that at five times the write capacity, admitted writes wait no longer than the
+    queue timeout plus the writes ahead of them, and the excess is shed with Retry-After.
+    """
+    from app import db
+
+    admission_app.config["WRITE_CONCURRENCY_LIMIT"] = 1  # Writes are serialized by SQLite anyway
+    with admission_app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def slow_database(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE accounts"):
+            time.sleep(SLOW_WRITE_SECONDS)
+
+    clients = 5
+    latencies, shed, retry_after = [], [], set()
+    lock = threading.Lock()
+
+    def atm(index):
+        http = admission_app.test_client()
+        for _ in range(15):
+            started = time.perf_counter()
+            response = http.post(f"/accounts/1000{index + 1}/deposit", json={"amount": 1})
+            elapsed = time.perf_counter() - started
+            with lock:
+                if response.status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    shed.append(response.status_code)
+                    retry_after.add(response.headers.get("Retry-After"))
+            if response.status_code != 200:
+                time.sleep(SLOW_WRITE_SECONDS)  # A real ATM would honour Retry-After
+
+    try:
+        threads = [threading.Thread(target=atm, args=(n,)) for n in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        event.remove(engine, "before_cursor_execute", slow_database)
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    stats = admission_app.extensions["write_limiter"].stats()
+    print(f"✅ Overload: {len(latencies)} admitted, p99={p99 * 1000:.0f}ms, {len(shed)} shed")
+    assert shed and set(shed) == {503} and retry_after == {"1"}
+    assert stats["queued"] > 0 and stats["active"] == 0
+    # Queue timeout plus the write itself, with slack for a busy test machine
+    assert p99 < admission_app.config["WRITE_QUEUE_TIMEOUT_MS"] / 1000 + 2 * SLOW_WRITE_SECONDS + 0.25
+
+
+def test_every_write_endpoint_takes_a_slot(tmp_path):
+    """
+    Test that limit changes and provisioning wait for a write slot like balance
+    changes do, while reading the limits does not.
+    """
+    from app import create_app, db
+    from config.config import Config
+
+    class WritesConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'writes.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        WRITE_CONCURRENCY_LIMIT = 1
+        WRITE_QUEUE_TIMEOUT_MS = 20
+        WITHDRAWAL_LIMITS_ENABLED = True
+        PROVISIONING_API_ENABLED = True
+
+    app = create_app(WritesConfig)
+    limiter = app.extensions["write_limiter"]
+    http = app.test_client()
+    assert limiter.acquire() is None  # A long write holds the only slot
+
+    assert http.put("/accounts/10001/limits", json={"per_minute": 5}).status_code == 503
+    upload = http.post("/accounts/provision", data="account_number,balance\n55555,1.00\n", content_type="text/csv")
+    assert upload.status_code == 503 and upload.headers["Retry-After"]
+    assert http.get("/accounts/10001/limits").status_code == 200
+
+    limiter.release(0.01)
+    assert http.put("/accounts/10001/limits", json={"per_minute": 5}).status_code == 200
+    assert http.post("/accounts/provision", data="account_number,balance\n55555,1.00\n", content_type="text/csv").status_code == 200
+    with app.app_context():
+        db.engine.dispose()
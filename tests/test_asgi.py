@@ -0,0 +1,109 @@
+import asyncio
+import json
+import pytest
+from app import create_app, db
+from app.asgi import create_asgi_app
+from app.models import Account
+from config.config import Config
+
+
+async def call(asgi_app, method, path, body=None, headers=None):
+    """
+    Send one HTTP request to an ASGI app in-process.
+
+    Returns:
+        tuple: (status, response headers, parsed JSON body)
+    """
+    raw = json.dumps(body).encode() if body is not None else b""
+    header_list = [(b"content-type", b"application/json"), (b"content-length", str(len(raw)).encode())] if body is not None else []
+    header_list += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": header_list,
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": raw, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app(scope, receive, send)
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    payload = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], {k.decode().lower(): v.decode() for k, v in start["headers"]}, json.loads(payload)
+
+
+@pytest.fixture(scope="function", params=["true", "false"], ids=["atomic-update", "locked-update"])
+def asgi_app(tmp_path, request):
+    """
+    ASGI app on a file-backed SQLite database, with account 123456 holding 500.
+    """
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'asgi.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        ATOMIC_BALANCE_UPDATE = request.param
+
+    flask_app = create_app(FileConfig)
+    with flask_app.app_context():
+        db.session.add(Account(account_number="123456", balance=500.0))
+        db.session.commit()
+    asgi_app = create_asgi_app(flask_app)
+    assert asgi_app.async_enabled
+    yield asgi_app
+    asyncio.run(flask_app.extensions["async_session_factory"].kw["bind"].dispose())
+    with flask_app.app_context():
+        db.engine.dispose()
+
+
+def test_async_endpoints(asgi_app):
+    async def scenario():
+        status, _, body = await call(asgi_app, "GET", "/accounts/123456/balance")
+        assert (status, body["data"]["balance"]) == (200, 500.0)
+
+        status, _, body = await call(asgi_app, "POST", "/accounts/123456/withdraw", {"amount": "120.50"})
+        assert (status, body["data"]["new_balance"]) == (200, 379.5)
+
+        status, _, body = await call(asgi_app, "POST", "/accounts/123456/deposit", {"amount": 20})
+        assert (status, body["data"]["new_balance"]) == (200, 399.5)
+
+        status, _, body = await call(asgi_app, "POST", "/accounts/123456/withdraw", {"amount": 1000})
+        assert (status, body["data"]["error"]) == (400, "Insufficient funds")
+
+        assert (await call(asgi_app, "GET", "/accounts/999999/balance"))[0] == 404
+        assert (await call(asgi_app, "GET", "/accounts/12ab/balance"))[0] == 400
+        assert (await call(asgi_app, "POST", "/accounts/123456/deposit", {"amount": -5}))[0] == 400
+        assert (await call(asgi_app, "POST", "/accounts/123456/deposit", {}))[0] == 400
+
+    asyncio.run(scenario())
+
+def test_other_requests_fall_through_to_flask(asgi_app):
+    async def scenario():
+        status, _, body = await call(asgi_app, "GET", "/")
+        assert (status, body) == (200, {"message": "Welcome to the ATM System!"})
+
+        headers = {"Idempotency-Key": "asgi-1"}
+        await call(asgi_app, "POST", "/accounts/123456/withdraw", {"amount": 10}, headers)
+        status, response_headers, body = await call(asgi_app, "POST", "/accounts/123456/withdraw", {"amount": 10}, headers)
+        assert response_headers["idempotent-replayed"] == "true"
+        assert body["data"]["new_balance"] == 490.0
+
+    asyncio.run(scenario())
+
+def test_concurrent_async_withdrawals(asgi_app):
+    """
+    Test that concurrent withdrawals on the event loop never overdraw the account.
+    """
+    async def scenario():
+        return await asyncio.gather(*(
+            call(asgi_app, "POST", "/accounts/123456/withdraw", {"amount": 100}) for _ in range(10)
+        ))
+
+    statuses = [status for status, _, _ in asyncio.run(scenario())]
+    assert statuses.count(200) == 5
+    assert statuses.count(400) == 5
+    with asgi_app.flask_app.app_context():
+        assert db.session.query(Account.balance_cents).filter_by(account_number="123456").scalar() == 0
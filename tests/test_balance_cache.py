@@ -0,0 +1,84 @@
+import pytest
+from app.data_access.balance_cache import BalanceCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_counters():
+    cache = BalanceCache(max_size=2, ttl=10)
+    cache.put("1", 100, 1)
+    cache.put("2", 200, 1)
+    assert cache.get("1") == (100, 1, True)  # "1" becomes most recently used
+    cache.put("3", 300, 1)  # Evicts "2"
+
+    assert cache.get("2") is None
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 1, "misses": 1, "evictions": 1, "revalidations": 0}
+
+def test_ttl_and_renew():
+    clock = FakeClock()
+    cache = BalanceCache(ttl=5, clock=clock)
+    cache.put("1", 100, 3)
+    clock.now = 6
+    assert cache.get("1") == (100, 3, False)
+    assert cache.renew("1", 4) is False  # Row changed since it was cached
+    assert cache.renew("1", 3) is True
+    assert cache.get("1") == (100, 3, True)
+
+def test_older_version_does_not_overwrite():
+    cache = BalanceCache()
+    cache.put("1", 300, 6)
+    cache.put("1", 200, 5)  # A slower writer finishing after a newer commit
+    assert cache.get("1") == (300, 6, True)
+
+
+@pytest.fixture
+def cache(app, monkeypatch):
+    cache = BalanceCache(ttl=60)
+    monkeypatch.setitem(app.extensions, "balance_cache", cache)
+    return cache
+
+def test_reads_are_cached_and_writes_go_through(client, sample_account, cache, db_session):
+    """
+    Test that balance reads fill the cache and committed writes update it.
+    """
+    from app.models import Account
+    db_session.add(Account(account_number="654321", balance=0))
+    db_session.commit()
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 500.0
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 500.0
+    assert cache.stats()["hits"] == 1
+
+    client.post("/accounts/123456/withdraw", json={"amount": 120})
+    client.post("/transfers", json={"from_account": "123456", "to_account": "654321", "amount": 30})
+    client.post("/accounts/batch", json={"operations": [{"account_number": "123456", "type": "deposit", "amount": 5}]})
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 355.0
+    assert cache.stats()["hits"] == 2
+
+    stats = client.get("/cache/stats").get_json()["data"]
+    assert stats["enabled"] is True and stats["hits"] == 2
+
+def test_version_revalidation(app, client, sample_account, cache, db_session, monkeypatch):
+    """
+    Test that an expired entry is kept when the version column is unchanged
+    and reloaded when another worker changed the row.
+    """
+    from app.models import Account
+    monkeypatch.setitem(app.config, "BALANCE_CACHE_VALIDATION", "version")
+    client.get("/accounts/123456/balance")
+    cache.ttl = 0  # Every entry is now expired
+    cache.put("123456", 50000, 0)
+
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 500.0
+    assert cache.stats()["revalidations"] == 1
+
+    # Simulate a write from another worker
+    account = db_session.query(Account).filter_by(account_number="123456").one()
+    account.balance_cents, account.version = 10000, account.version + 1
+    db_session.commit()
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 100.0
@@ -0,0 +1,39 @@
+import json
+from benchmarks.suite import compare, main, run_suite
+
+
+def test_compare_flags_regressions():
+    baseline = {
+        "client/read_heavy": {"throughput": 1000.0, "p99_ms": 10.0, "errors": 0},
+        "client/hot_account": {"throughput": 500.0, "p99_ms": 20.0, "errors": 0},
+    }
+    results = {
+        "client/read_heavy": {"throughput": 800.0, "p99_ms": 12.0, "errors": 0},  # Within 25%
+        "client/hot_account": {"throughput": 300.0, "p99_ms": 40.0, "errors": 2},
+        "gunicorn/read_heavy": {"throughput": 1.0, "p99_ms": 999.0, "errors": 0},  # No baseline entry
+    }
+
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 3
+    assert all(message.startswith("client/hot_account") for message in regressions)
+
+def test_suite_runs_through_test_client(tmp_path):
+    """
+    Test a short run of every scenario through the Flask test client, and that
+    the CLI saves results and fails against an unreachable baseline.
+    """
+    results = run_suite(["read_heavy", "hot_account", "uniform_writes", "mixed_transfers"], ["client"],
+                        connections=2, duration=0.2, accounts=50, log=lambda line: None)
+    assert set(results) == {"client/read_heavy", "client/hot_account", "client/uniform_writes", "client/mixed_transfers"}
+    for summary in results.values():
+        assert summary["requests"] > 0
+        assert summary["errors"] == 0
+        assert summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"]
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"client/hot_account": {"throughput": 1e9, "p99_ms": 1e-6, "errors": 0}}}))
+    output = tmp_path / "results.json"
+    argv = ["--scenarios", "hot_account", "--duration", "0.2", "--connections", "2",
+            "--baseline", str(baseline), "--output", str(output)]
+    assert main(argv) == 1
+    assert "client/hot_account" in json.loads(output.read_text())["results"]
@@ -0,0 +1,125 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, update
+from app import create_app, db
+from app.data_access.account_repository import purge_idempotency_keys
+from app.data_access.idempotency_cache import IdempotencyCache
+from app.models import Account, IdempotencyKey, Transaction
+from app.services.account_service import withdraw_service
+from config.config import Config
+
+NUM_THREADS = 8
+
+
+def test_retry_replays_original_response(client, sample_account):
+    """
+    Test that a retried withdrawal returns the first response and debits once.
+    """
+    headers = {"Idempotency-Key": "atm-7-req-1"}
+    first = client.post("/accounts/123456/withdraw", json={"amount": 100}, headers=headers)
+    second = client.post("/accounts/123456/withdraw", json={"amount": 100}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert first.get_json()["data"]["new_balance"] == 400.0
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert client.get("/accounts/123456/balance").get_json()["data"]["balance"] == 400.0
+
+def test_replay_from_table_after_cache_loss(app, client, sample_account):
+    """
+    Test that replays are served from the idempotency table once the cache no longer holds the key.
+    """
+    headers = {"Idempotency-Key": "atm-7-req-2"}
+    client.post("/accounts/123456/deposit", json={"amount": "12.34"}, headers=headers)
+    app.extensions["idempotency_cache"].clear()
+
+    response = client.post("/accounts/123456/deposit", json={"amount": "12.34"}, headers=headers)
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.get_json()["data"]["new_balance"] == 512.34
+
+def test_key_reuse_and_invalid_key(client, sample_account):
+    headers = {"Idempotency-Key": "atm-7-req-3"}
+    client.post("/accounts/123456/withdraw", json={"amount": 10}, headers=headers)
+
+    response = client.post("/accounts/123456/withdraw", json={"amount": 20}, headers=headers)
+    assert response.status_code == 422
+
+    response = client.post("/accounts/123456/withdraw", json={"amount": 10}, headers={"Idempotency-Key": "has space"})
+    assert response.status_code == 400
+
+def test_failed_request_does_not_store_key(client, sample_account):
+    """
+    Test that a rejected request leaves the key free, so a later retry is applied.
+    """
+    headers = {"Idempotency-Key": "atm-7-req-4"}
+    assert client.post("/accounts/123456/withdraw", json={"amount": 900}, headers=headers).status_code == 400
+    client.post("/accounts/123456/deposit", json={"amount": 500})
+
+    response = client.post("/accounts/123456/withdraw", json={"amount": 900}, headers=headers)
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+
+def test_purge_expired_keys(app, client, sample_account):
+    for n in range(5):
+        client.post("/accounts/123456/deposit", json={"amount": 1}, headers={"Idempotency-Key": f"old-{n}"})
+    client.post("/accounts/123456/deposit", json={"amount": 1}, headers={"Idempotency-Key": "new"})
+    with app.app_context():
+        db.session.execute(
+            update(IdempotencyKey).where(IdempotencyKey.key.like("old-%")).values(created_at=datetime.utcnow() - timedelta(days=2))
+        )
+        db.session.commit()
+
+        assert purge_idempotency_keys(ttl=86400, batch_size=2) == 5
+        assert [key for (key,) in db.session.query(IdempotencyKey.key)] == ["new"]
+
+def test_cache_lru_and_ttl():
+    now = [0.0]
+    cache = IdempotencyCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3})  # Evicts "b"
+    assert cache.get("b") is None
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 1, "max_size": 2, "hits": 1, "misses": 2, "evictions": 1}
+
+
+@pytest.mark.parametrize("atomic", ["true", "false"])
+def test_concurrent_retries_debit_once(tmp_path, atomic):
+    """
+    Test that many simultaneous requests with one key, racing past the cache,
+    apply a single withdrawal and all report the same balance.
+    """
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'idempotency.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        ATOMIC_BALANCE_UPDATE = atomic
+
+    app = create_app(FileConfig)
+    barrier = threading.Barrier(NUM_THREADS)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            barrier.wait(timeout=10)
+            result = withdraw_service("10001", 25, idempotency_key="atm-9-req-1")
+        with lock:
+            results.append(result)
+
+    threads = [threading.Thread(target=worker) for _ in range(NUM_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert all(r.get("success") for r in results), results
+    assert {r["new_balance"] for r in results} == {975.0}
+    with app.app_context():
+        assert db.session.query(Account.balance_cents).filter_by(account_number="10001").scalar() == 97_500
+        assert db.session.query(func.count(Transaction.id)).scalar() == 1
+        db.engine.dispose()
@@ -0,0 +1,41 @@
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.json_provider import OrjsonProvider, configure_json
+
+orjson = pytest.importorskip("orjson")
+
+
+def test_orjson_matches_flask_output():
+    """
+    Test that orjson-encoded responses are byte-for-byte what Flask's provider writes.
+    """
+    app = Flask(__name__)
+    app.config["JSON_ENCODER"] = "auto"
+    configure_json(app)
+    assert isinstance(app.json, OrjsonProvider)
+
+    payload = {
+        "success": True, "code": 200,
+        "data": {"new_balance": 1234.56, "account_number": "10001", "at": datetime(2026, 10, 18, 8, 30),
+                 "amount": Decimal("12.50"), "ids": [1, 2, None], "wide": 2 ** 70},
+    }
+    reference = DefaultJSONProvider(app)
+    with app.app_context():
+        assert app.json.response(payload).get_data() == reference.response(payload).get_data()
+        assert app.json.loads(app.json.dumps(payload)) == reference.loads(reference.dumps(payload))
+
+
+def test_json_encoder_setting():
+    """
+    Test that 'json' keeps Flask's provider and unknown settings are refused.
+    """
+    app = Flask(__name__)
+    app.config["JSON_ENCODER"] = "json"
+    configure_json(app)
+    assert type(app.json) is DefaultJSONProvider
+    app.config["JSON_ENCODER"] = "simdjson"
+    with pytest.raises(ValueError):
+        configure_json(app)
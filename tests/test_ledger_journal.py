@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+import random
+import threading
+from collections import defaultdict
+import pytest
+from app.data_access.ledger_journal import LedgerJournal, iter_entries
+from config.config import Config
+
+ACCOUNTS = [f"1000{i}" for i in range(1, 11)]
+ACKS_BEFORE_KILL = 300
+
+
+def ledger_config(ledger_dir, **settings):
+    class LedgerConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+        LEDGER_DIR = str(ledger_dir)
+        LEDGER_SNAPSHOT_EVERY = 50
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+
+    for key, value in settings.items():
+        setattr(LedgerConfig, key, value)
+    return LedgerConfig
+
+
+def load_process(ledger_dir, acks):
+    """
+    Boot the app on an in-memory database and apply random withdrawals,
+    deposits and transfers from several threads until killed, reporting
+    every acknowledged balance.
+    """
+    from app import create_app
+    from app.data_access.account_repository import perform_transaction, perform_transfer
+
+    app = create_app(ledger_config(ledger_dir))
+
+    def worker(seed):
+        rng = random.Random(seed)
+        with app.app_context():
+            while True:
+                account = rng.choice(ACCOUNTS)
+                cents = rng.randint(1, 5000)
+                if rng.random() < 0.2:
+                    other = rng.choice([a for a in ACCOUNTS if a != account])
+                    result = perform_transfer(account, other, cents)
+                    if "error" not in result:
+                        acks.put((account, result["from_balance_cents"]))
+                        acks.put((other, result["to_balance_cents"]))
+                    continue
+                if rng.random() < 0.5:
+                    result = perform_transaction(account, -cents, "withdraw")
+                else:
+                    result = perform_transaction(account, cents, "deposit")
+                if "error" not in result:
+                    acks.put((account, result["new_balance_cents"]))
+
+    threads = [threading.Thread(target=worker, args=(seed,), daemon=True) for seed in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_recovery_after_kill_mid_load(tmp_path):
+    """
+    Test that after the process is killed mid-load, a restarted app restores
+    every account to the end of its journaled history, and that every balance
+    acknowledged before the kill is in that history.
+    """
+    from app import create_app, db
+    from app.models import Account
+
+    ledger_dir = tmp_path / "ledger"
+    ctx = multiprocessing.get_context("spawn")
+    acks = ctx.Queue()
+    process = ctx.Process(target=load_process, args=(str(ledger_dir), acks))
+    process.start()
+    acknowledged = [acks.get(timeout=60) for _ in range(ACKS_BEFORE_KILL)]
+    process.kill()
+    process.join(timeout=30)
+    while not acks.empty():
+        acknowledged.append(acks.get())
+
+    history = defaultdict(list)
+    for _, account, transaction_type, amount, balance in iter_entries(str(ledger_dir)):
+        history[account].append((transaction_type, amount, balance))
+    for account, entries in history.items():
+        assert entries[0][0] == "open", account
+        for (_, _, before), (_, amount, after) in zip(entries, entries[1:]):
+            assert before + amount == after, f"Broken balance chain for {account}"
+    for account, balance in acknowledged:
+        assert balance in {b for _, _, b in history[account]}, f"Acknowledged balance {balance} of {account} was lost"
+    assert any(name.startswith("snapshot-") for name in os.listdir(ledger_dir))
+
+    app = create_app(ledger_config(ledger_dir))
+    with app.app_context():
+        restored = dict(db.session.query(Account.account_number, Account.balance_cents).all())
+    assert restored == {account: entries[-1][2] for account, entries in history.items()}
+    app.extensions["ledger_journal"].close()
+    print("✅ Balances recovered after kill:", restored)
+
+
+def test_torn_tail_is_discarded(tmp_path):
+    """
+    Test that a partially written frame at the end of the journal is cut off
+    and the entries before it are recovered.
+    """
+    journal = LedgerJournal(str(tmp_path), snapshot_every=1000)
+    journal.recover()
+    journal.wait(journal.append([("10001", "open", 1000, 1000)]))
+    journal.wait(journal.append([("10001", "withdraw", -300, 700)]))
+    journal.close()
+    segment = tmp_path / sorted(n for n in os.listdir(tmp_path) if n.startswith("ledger-"))[0]
+    intact_size = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(b"ATML\x02\x00\x00\x00garbage")  # Header and half a record, as if the process died mid-write
+
+    journal = LedgerJournal(str(tmp_path))
+    state = journal.recover()
+    journal.close()
+    assert state["balances"] == {"10001": 700}
+    assert state["seq"] == 2
+    assert segment.stat().st_size == intact_size
+
+
+def test_recovery_replays_only_the_tail(tmp_path):
+    """
+    Test that recovery starts from the newest snapshot and replays only the
+    entries written after it.
+    """
+    journal = LedgerJournal(str(tmp_path), snapshot_every=100)
+    journal.recover()
+    for i in range(250):
+        journal.wait(journal.append([(f"{20000 + i % 7}", "deposit", 1, i)]))
+    journal.close()
+
+    journal = LedgerJournal(str(tmp_path))
+    state = journal.recover()
+    journal.close()
+    assert state["snapshot_seq"] == 200
+    assert state["replayed"] == 50
+    assert state["balances"] == {f"{20000 + i % 7}": i for i in range(243, 250)}
+
+
+def test_rolled_back_batch_is_not_journaled(tmp_path):
+    """
+    Test that only committed balance changes reach the journal.
+    """
+    from app import create_app
+    from app.data_access.account_repository import perform_batch
+
+    app = create_app(ledger_config(tmp_path))
+    with app.app_context():
+        result = perform_batch([("10001", -100, "withdraw"), ("10002", -10**9, "withdraw")], atomic=True)
+        assert result["committed"] is False
+        perform_batch([("10003", 250, "deposit")])
+    app.extensions["ledger_journal"].close()
+
+    changes = [(account, t, amount) for _, account, t, amount, _ in iter_entries(str(tmp_path)) if t != "open"]
+    assert changes == [("10003", "deposit", 250)]
+
+
+def test_restore_bumps_versions(tmp_path):
+    """
+    Test that restored accounts move to a newer version, so version-checked
+    balance caches take the restored balance, and that new accounts start at 0.
+    """
+    from sqlalchemy import text
+    from app import create_app, db
+    from app.data_access.ledger_journal import restore_balances
+
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'restore.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.session.execute(text("UPDATE accounts SET version = 5 WHERE account_number = '10001'"))
+        db.session.commit()
+        restore_balances({"10001": 70_000, "20001": 500})
+        versions = dict(db.session.execute(text(
+            "SELECT account_number, version || ':' || balance_cents FROM accounts WHERE account_number IN ('10001', '20001')"
+        )).all())
+        db.session.remove()
+        db.engine.dispose()
+    assert versions == {"10001": "6:70000", "20001": "0:500"}
@@ -0,0 +1,63 @@
+import threading
+import time
+from app.data_access.lock_manager import FairLock, StripedLockManager
+
+
+def test_fair_lock_hands_off_in_arrival_order():
+    lock = FairLock()
+    order = []
+    lock.acquire()
+
+    def waiter(n):
+        lock.acquire()
+        order.append(n)
+        lock.release()
+
+    threads = []
+    for n in range(5):
+        thread = threading.Thread(target=waiter, args=(n,))
+        thread.start()
+        threads.append(thread)
+        while len(lock._waiters) <= n:  # Make sure waiter n is queued before starting n + 1
+            time.sleep(0.001)
+    lock.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == [0, 1, 2, 3, 4]
+
+def test_different_accounts_do_not_block():
+    manager = StripedLockManager(stripes=64)
+    first, second = "10001", next(str(n) for n in range(10002, 20000) if manager.stripe(str(n)) != manager.stripe("10001"))
+    entered = threading.Event()
+
+    def other_writer():
+        with manager.hold(second):
+            entered.set()
+
+    with manager.hold(first):
+        thread = threading.Thread(target=other_writer)
+        thread.start()
+        assert entered.wait(timeout=5), "Writer to a different stripe was blocked"
+    thread.join(timeout=5)
+
+def test_same_account_waits_and_counts_contention():
+    manager = StripedLockManager(stripes=8)
+    released = threading.Event()
+
+    def holder():
+        with manager.hold("10001", "10002"):
+            released.wait(timeout=5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    while manager.stats()["acquisitions"] == 0:
+        time.sleep(0.001)
+    threading.Timer(0.05, released.set).start()
+    with manager.hold("10001"):
+        pass
+    thread.join(timeout=5)
+
+    stats = manager.stats()
+    assert stats["contended"] == 1
+    assert stats["wait_seconds"] > 0
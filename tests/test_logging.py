@@ -0,0 +1,83 @@
+import json
+import logging
+import threading
+import pytest
+from app.logging_config import configure_logging, stop_logging
+from config.config import Config
+
+
+class CountingArg:
+    """A log argument that records which thread formatted it."""
+
+    def __init__(self):
+        self.formatted_in = []
+
+    def __str__(self):
+        self.formatted_in.append(threading.current_thread().name)
+        return "counted"
+
+
+@pytest.fixture
+def json_logging(tmp_path):
+    """
+    Switch the application loggers to JSON mode writing to a temporary file, and back to text afterwards.
+    """
+    log_file = tmp_path / "app.log"
+
+    def configure(**settings):
+        configure_logging({"LOG_FORMAT": "json", "LOG_FILE": str(log_file), **settings})
+
+    def read():
+        stop_logging()  # Drains the queue and closes the file
+        return [json.loads(line) for line in log_file.read_text().splitlines()]
+
+    yield configure, read
+    configure_logging(vars(Config))
+
+def test_json_records_are_formatted_on_the_listener_thread(json_logging):
+    configure, read = json_logging
+    configure(LOG_LEVEL="INFO")
+    arg = CountingArg()
+    logging.getLogger("app.services.account_service").info("Withdrawal for %s", arg, extra={"account_number": "10001"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("app.utils").exception("Failed")
+
+    records = read()
+    assert [r["message"] for r in records] == ["Withdrawal for counted", "Failed"]
+    assert records[0]["level"] == "INFO" and records[0]["account_number"] == "10001"
+    assert records[0]["logger"] == "app.services.account_service"
+    assert "ValueError: boom" in records[1]["exception"]
+    assert arg.formatted_in and threading.current_thread().name not in arg.formatted_in
+
+def test_sampling_drops_info_but_keeps_warnings(json_logging):
+    configure, read = json_logging
+    configure(LOG_SUCCESS_SAMPLE_RATE=0.0)
+    arg = CountingArg()
+    logger = logging.getLogger("app.utils")
+    for _ in range(100):
+        logger.info("Success Response: %s", arg)
+    logger.warning("Error: %s (Status Code: %s)", "Insufficient funds", 400)
+
+    assert [r["level"] for r in read()] == ["WARNING"]
+    assert arg.formatted_in == []  # Sampled-out records are never formatted
+
+def test_off_level_silences_requests(json_logging, tmp_path):
+    configure, read = json_logging
+    configure(LOG_LEVEL="OFF")
+    from app import create_app, db
+
+    class QuietConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'quiet.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        LOG_FORMAT = "json"
+        LOG_FILE = str(tmp_path / "app.log")
+        LOG_LEVEL = "OFF"
+
+    app = create_app(QuietConfig)
+    assert app.test_client().get("/accounts/10001/balance").status_code == 200
+    assert app.test_client().get("/accounts/999999/balance").status_code == 404
+    assert read() == []
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,98 @@
+import re
+import threading
+from app import create_app, db
+from app.metrics import Counter, Histogram, render
+from app.models import Account
+from config.config import Config
+
+
+def sample(text, name, **labels):
+    """
+    Read one sample from a Prometheus text exposition.
+
+    Returns:
+        float: The sample value, 0.0 if the series is absent.
+    """
+    label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    series = f"{name}{{{label_text}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+def test_shards_from_many_threads_are_summed():
+    registry = []
+    counter = Counter("test_events_total", "Events.", registry=registry)
+    histogram = Histogram("test_latency_seconds", "Latency.", ("stage",), buckets=(0.01, 0.1), registry=registry)
+    fast = histogram.labels("fast")
+
+    def record():
+        for _ in range(1000):
+            counter.inc()
+            fast.observe(0.005)
+        histogram.labels("slow").observe(0.5)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.inc()  # The main thread keeps a live shard next to the retired ones
+
+    text = render(registry)
+    assert counter.value() == 8001
+    assert sample(text, "test_events_total") == 8001
+    assert sample(text, "test_latency_seconds_bucket", stage="fast", le="0.01") == 8000
+    assert sample(text, "test_latency_seconds_bucket", stage="slow", le="0.1") == 0
+    assert sample(text, "test_latency_seconds_bucket", stage="slow", le="+Inf") == 8
+    assert sample(text, "test_latency_seconds_count", stage="slow") == 8
+    assert abs(sample(text, "test_latency_seconds_sum", stage="fast") - 40.0) < 1e-6
+    assert "# TYPE test_latency_seconds histogram" in text
+
+def test_metrics_endpoint_reports_write_path(tmp_path):
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'metrics.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        ATOMIC_BALANCE_UPDATE = "false"  # Locked path, so BEGIN IMMEDIATE is timed too
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.session.add(Account(account_number="123456", balance=500.0))
+        db.session.commit()
+    client = app.test_client()
+    before = client.get("/metrics").get_data(as_text=True)
+
+    assert client.post("/accounts/123456/withdraw", json={"amount": 100}).status_code == 200
+    assert client.post("/accounts/123456/withdraw", json={"amount": 1000}).status_code == 400
+    assert client.post("/accounts/123456/deposit", json={"amount": 50}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    after = response.get_data(as_text=True)
+
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    assert delta("atm_request_duration_seconds_count", endpoint="account.withdraw") == 2
+    assert delta("atm_validation_duration_seconds_count", operation="withdraw") == 2
+    assert delta("atm_validation_duration_seconds_count", operation="deposit") == 1
+    assert delta("atm_session_acquire_seconds_count") == 3
+    assert delta("atm_lock_wait_seconds_count", lock="account") == 3
+    assert delta("atm_lock_wait_seconds_count", lock="database") == 3
+    assert delta("atm_commit_duration_seconds_count") == 3
+    assert delta("atm_insufficient_funds_total") == 1
+    assert delta("atm_pool_checkouts_total") >= 3
+    assert "atm_database_locked_total" in after and "atm_write_retries_total" in after
+    print(f"✅ /metrics reported {len(after.splitlines())} lines")
+    with app.app_context():
+        db.engine.dispose()
+
+def test_metrics_endpoint_can_be_disabled(tmp_path):
+    class NoMetricsConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'nometrics.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        METRICS_ENABLED = False
+
+    app = create_app(NoMetricsConfig)
+    assert app.test_client().get("/metrics").status_code == 404
+    with app.app_context():
+        db.engine.dispose()
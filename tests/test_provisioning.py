@@ -0,0 +1,144 @@
+import io
+import pytest
+
+np = pytest.importorskip("numpy")
+
+CSV_INPUT = """account_number,balance
+500001,100
+500002,12.5
+500003, 0.10
+abc123,50
+500004,-5
+500005,1.005
+500006,12.
+500002,99
+10001,1
+500007,7.00
+"""
+
+
+@pytest.fixture
+def provisioning_app(tmp_path):
+    """
+    App on a file-backed database with the provisioning endpoint enabled.
+    """
+    from app import create_app, db
+    from config.config import Config
+
+    class ProvisioningConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'provision.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        PROVISIONING_API_ENABLED = True
+
+    app = create_app(ProvisioningConfig)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def balances(app, prefix):
+    from app import db
+    from app.models import Account
+
+    with app.app_context():
+        return {
+            a.account_number: (a.balance_cents, a.opening_balance_cents)
+            for a in db.session.query(Account).filter(Account.account_number.startswith(prefix))
+        }
+
+
+def test_csv_rows_are_validated_and_loaded(provisioning_app):
+    """
+    Test that valid rows are inserted, invalid and repeated rows are reported
+    with their row numbers, and existing accounts are left unchanged.
+    """
+    from app.data_access.reconciliation import reconcile
+    from app.services.account_service import provision_service
+
+    with provisioning_app.app_context():
+        result = provision_service(io.StringIO(CSV_INPUT), chunk_size=4)
+        assert reconcile()["mismatches"] == []
+
+    assert (result["rows"], result["inserted"], result["existing"], result["invalid"]) == (10, 4, 2, 4)
+    assert result["errors"] == [
+        {"row": 4, "reason": "Invalid account number"},
+        {"row": 5, "reason": "Invalid balance"},
+        {"row": 6, "reason": "Invalid balance"},
+        {"row": 7, "reason": "Invalid balance"},
+    ]
+    # Row 8 repeats 500002 from an earlier chunk, so the existing account is kept
+    assert balances(provisioning_app, "5") == {
+        "500001": (10_000, 10_000),
+        "500002": (1_250, 1_250),
+        "500003": (10, 10),
+        "500007": (700, 700),
+    }
+    print("✅ Provisioned:", result)
+
+
+def test_repeats_within_a_chunk_are_reported(provisioning_app):
+    """
+    Test that an account number repeated inside one chunk is rejected after its first occurrence.
+    """
+    from app.services.account_service import provision_service
+
+    with provisioning_app.app_context():
+        result = provision_service(io.StringIO("balance,account_number\n1,600001\n2,600001\n"))
+    assert result["inserted"] == 1
+    assert result["errors"] == [{"row": 2, "reason": "Duplicate account number in input"}]
+
+
+def test_provision_endpoint(provisioning_app, client):
+    """
+    Test the HTTP endpoint for CSV uploads, unsupported bodies and the disabled state.
+    """
+    http = provisioning_app.test_client()
+    response = http.post("/accounts/provision", data="account_number,balance\n700001,5\n", content_type="text/csv")
+    assert response.status_code == 200
+    assert response.json["data"]["inserted"] == 1
+    assert http.get("/accounts/700001/balance").json["data"]["balance"] == 5.0
+
+    assert http.post("/accounts/provision", data="balance\n5\n", content_type="text/csv").status_code == 400
+    assert http.post("/accounts/provision", json={"accounts": []}).status_code == 415
+    assert client.post("/accounts/provision", data="account_number,balance\n", content_type="text/csv").status_code == 404
+
+
+def test_parquet_input(provisioning_app, tmp_path):
+    """
+    Test that Parquet files with numeric balances are loaded like CSV.
+    """
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "accounts.parquet"
+    pq.write_table(pa.table({"account_number": ["800001", "800002", "8x"], "balance": [12.5, 0.07, 1.0]}), path)
+    runner = provisioning_app.test_cli_runner()
+    result = runner.invoke(args=["provision-accounts", str(path)])
+    assert result.exit_code == 1
+    assert "INVALID row 3: Invalid account number" in result.output
+    assert balances(provisioning_app, "8") == {"800001": (1_250, 1_250), "800002": (7, 7)}
+
+
+def test_provisioned_accounts_survive_restart(tmp_path):
+    """
+    Test that accounts provisioned with the ledger journal enabled are restored on restart.
+    """
+    from app import create_app
+    from app.services.account_service import get_balance_service, provision_service
+    from config.config import Config
+
+    class JournalConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+        LEDGER_DIR = str(tmp_path / "ledger")
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+
+    app = create_app(JournalConfig)
+    with app.app_context():
+        assert provision_service(io.StringIO("account_number,balance\n900001,42\n10001,1\n"))["inserted"] == 1
+    app.extensions["ledger_journal"].close()
+
+    restarted = create_app(JournalConfig)
+    with restarted.app_context():
+        assert get_balance_service("900001")["balance"] == 42.0
+        assert get_balance_service("10001")["balance"] == 1000.0
+    restarted.extensions["ledger_journal"].close()
@@ -52,3 +52,73 @@ def test_race_condition(setup_account):
 
     assert 4 <= success_count <= 6, f"Expected ~5 successful withdrawals, got {success_count}"
     assert 4 <= failure_count <= 6, f"Expected ~5 failed withdrawals, got {failure_count}"
+
+
+CONTENTION_THREADS = 16
+WITHDRAWALS_PER_THREAD = 25
+
+
+@pytest.mark.parametrize("lock_manager", [False, True], ids=["without-lock-manager", "with-lock-manager"])
+def test_race_condition_contention(tmp_path, lock_manager):
+    """
+    Benchmark many threads withdrawing from one account on a file-backed database.
+    Reports p99 latency and "database is locked" retries with and without the
+    striped lock manager; a short busy timeout makes SQLite's own waiting give up
+    quickly, as it would under heavier load. With the manager, same-account
+    writers queue in-process, so no retries are needed and none fail.
+    """
+    import time
+    from app import create_app
+    from app.data_access.account_repository import write_retries
+    from config.config import Config
+
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'contention.db'}"
+        SQLITE_BUSY_TIMEOUT_MS = 10
+        LOCK_MANAGER_ENABLED = lock_manager
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+
+    file_app = create_app(FileConfig)
+    with file_app.app_context():
+        db.session.add(Account(account_number="123456", balance=CONTENTION_THREADS * WITHDRAWALS_PER_THREAD / 2))
+        db.session.commit()
+
+    latencies = []
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        with file_app.app_context():
+            for _ in range(WITHDRAWALS_PER_THREAD):
+                start = time.perf_counter()
+                result = withdraw_service("123456", 1)
+                local.append(((time.perf_counter() - start) * 1000, result))
+        with lock:
+            latencies.extend(ms for ms, _ in local)
+            results.extend(result for _, result in local)
+
+    retries_before = write_retries()
+    threads = [threading.Thread(target=worker) for _ in range(CONTENTION_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    retries = write_retries() - retries_before
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    successes = sum(1 for r in results if r.get("success"))
+    errors = [r["error"] for r in results if "error" in r and r["error"] != "Insufficient funds"]
+    label = "with lock manager" if lock_manager else "without lock manager"
+    print(f"\n✅ {label}: p99={p99:.1f}ms retries={retries} successes={successes} errors={len(errors)}")
+
+    with file_app.app_context():
+        balance = db.session.query(Account.balance_cents).filter_by(account_number="123456").scalar()
+        db.engine.dispose()
+    assert balance >= 0
+    assert balance == (CONTENTION_THREADS * WITHDRAWALS_PER_THREAD // 2 - successes) * 100
+    if lock_manager:
+        assert retries == 0
+        assert not errors, errors
+        assert successes == CONTENTION_THREADS * WITHDRAWALS_PER_THREAD // 2
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import text
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def ledger_app(tmp_path):
+    """
+    App on a file-backed database seeded with the sample accounts and some activity.
+    """
+    from app import create_app, db
+    from app.services.account_service import deposit_service, transfer_service, withdraw_service
+    from config.config import Config
+
+    class ReconcileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'reconcile.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+
+    app = create_app(ReconcileConfig)
+    with app.app_context():
+        for i in range(1, 11):
+            deposit_service(f"1000{i}", 25.5)
+            withdraw_service(f"1000{i}", 10)
+        transfer_service("10001", "10002", 100)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def execute(app, statement):
+    from app import db
+
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(text(statement))
+
+
+def test_full_run_reports_tampered_balance(ledger_app):
+    """
+    Test that a consistent ledger reconciles and a balance changed without a
+    transaction is reported with its difference.
+    """
+    from app.data_access.reconciliation import reconcile
+
+    with ledger_app.app_context():
+        clean = reconcile()
+        assert clean["accounts"] == 10 and clean["transactions"] == 22
+        assert clean["mismatches"] == []
+
+        execute(ledger_app, "UPDATE accounts SET balance_cents = balance_cents + 700 WHERE account_number = '10003'")
+        result = reconcile()
+    assert result["mismatches"] == [{
+        "account_number": "10003",
+        "balance_cents": 300_000 + 1_550 + 700,
+        "expected_cents": 300_000 + 1_550,
+        "difference_cents": 700,
+    }]
+    print("✅ Tampered balance detected:", result["mismatches"])
+
+
+def test_incremental_runs_read_only_new_transactions(ledger_app, tmp_path):
+    """
+    Test that runs with a checkpoint read only transactions past the
+    high-water mark, and that a row committed late with a lower id is found
+    by the recheck instead of being reported.
+    """
+    from app.data_access.reconciliation import reconcile
+    from app.services.account_service import deposit_service
+
+    checkpoint = str(tmp_path / "reconcile.npz")
+    with ledger_app.app_context():
+        first = reconcile(checkpoint=checkpoint)
+        assert first["incremental"] is False and first["transactions"] == 22
+
+        deposit_service("10005", 1)
+        second = reconcile(checkpoint=checkpoint)
+        assert second["incremental"] is True and second["transactions"] == 1
+        assert second["mismatches"] == []
+
+        high_water = second["high_water"]
+        execute(ledger_app, f"INSERT INTO transactions (id, account_id, type, amount_cents, timestamp) "
+                            f"SELECT {high_water + 10}, id, 'deposit', 400, CURRENT_TIMESTAMP FROM accounts WHERE account_number = '10006'")
+        execute(ledger_app, "UPDATE accounts SET balance_cents = balance_cents + 400 WHERE account_number = '10006'")
+        assert reconcile(checkpoint=checkpoint)["mismatches"] == []
+
+        # Commits after the run above, with an id below its high-water mark
+        execute(ledger_app, f"INSERT INTO transactions (id, account_id, type, amount_cents, timestamp) "
+                            f"SELECT {high_water + 5}, id, 'withdraw', 300, CURRENT_TIMESTAMP FROM accounts WHERE account_number = '10007'")
+        execute(ledger_app, "UPDATE accounts SET balance_cents = balance_cents - 300 WHERE account_number = '10007'")
+        late = reconcile(checkpoint=checkpoint)
+        assert late["transactions"] == 0 and late["mismatches"] == []
+        assert reconcile(checkpoint=checkpoint)["mismatches"] == []
+
+
+def test_reconcile_command_exit_status(ledger_app):
+    """
+    Test that the CLI lists mismatched accounts and exits with status 1.
+    """
+    runner = ledger_app.test_cli_runner()
+    assert runner.invoke(args=["reconcile"]).exit_code == 0
+
+    execute(ledger_app, "UPDATE accounts SET balance_cents = balance_cents - 1 WHERE account_number = '10009'")
+    result = runner.invoke(args=["reconcile"])
+    assert result.exit_code == 1
+    assert "MISMATCH 10009" in result.output and "difference -0.01" in result.output
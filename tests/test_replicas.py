@@ -0,0 +1,112 @@
+import pytest
+from app.data_access.replicas import parse_position
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """
+    App on a file-backed primary with two SQLite file replicas, copied on demand.
+    """
+    from app import create_app, db
+    from config.config import Config
+
+    class ReplicaConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        READ_REPLICA_URLS = [f"sqlite:///{tmp_path / 'replica-1.db'}", f"sqlite:///{tmp_path / 'replica-2.db'}"]
+        PROVISIONING_API_ENABLED = True
+
+    app = create_app(ReplicaConfig)
+    app.extensions["replica_router"].sync()
+    yield app
+    app.extensions["replica_router"].dispose()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def balance(http, number="10001", **kwargs):
+    return http.get(f"/accounts/{number}/balance", **kwargs).json["data"]["balance"]
+
+
+def test_clients_read_their_own_writes(replica_app):
+    """
+    Test that a client reads from a replica until it writes, then from wherever has its
+    write, while other clients may still see the replica's older data.
+    """
+    router = replica_app.extensions["replica_router"]
+    atm, other = replica_app.test_client(), replica_app.test_client()
+    assert balance(atm) == 1000.0
+    assert router.stats()["primary_reads"] == 0
+
+    rejected = atm.post("/accounts/10001/withdraw", json={"amount": -5})
+    assert rejected.status_code == 400 and "X-Commit-Position" not in rejected.headers
+
+    response = atm.post("/accounts/10001/withdraw", json={"amount": 10})
+    position = response.headers["X-Commit-Position"]
+    assert int(position) > 0 and f"atm_commit_position={position}" in response.headers["Set-Cookie"]
+
+    assert balance(atm) == 990.0  # Replicas are behind, so the primary serves the cookie's read
+    assert balance(other) == 1000.0  # No position: any replica, however stale
+    assert balance(replica_app.test_client(), headers={"X-Commit-Position": position}) == 990.0
+    assert router.stats()["primary_reads"] == 2
+
+    router.sync()
+    assert balance(atm) == 990.0
+    stats = atm.get("/replicas/stats").json["data"]
+    assert stats["primary_reads"] == 2
+    assert [replica["position"] for replica in stats["replicas"]] == [int(position)] * 2
+    assert sum(replica["reads"] for replica in stats["replicas"]) == 3
+    print("✅ Read-your-writes:", stats)
+
+
+def test_writes_without_ledger_rows_move_the_position(replica_app):
+    """
+    Test that a write adding no transaction row, such as provisioning an account,
+    still hands the client a position that routes its next read to the write.
+    """
+    atm, other = replica_app.test_client(), replica_app.test_client()
+    response = atm.post("/accounts/provision", data="account_number,balance\n55555,25.00\n", content_type="text/csv")
+    assert response.status_code == 200 and int(response.headers["X-Commit-Position"]) > 0
+
+    response = atm.get("/accounts/55555/balance")
+    assert response.status_code == 200 and response.json["data"]["balance"] == 25.0
+    assert "X-Commit-Position" not in response.headers  # Reads do not move the position
+    assert other.get("/accounts/55555/balance").status_code == 404  # The replicas have not copied it yet
+
+    replica_app.extensions["replica_router"].sync()
+    assert other.get("/accounts/55555/balance").status_code == 200
+
+
+def test_account_reads_route_by_lock(replica_app):
+    """
+    Test that plain account reads alternate between replicas, that locked reads use the
+    primary, and that malformed positions are ignored.
+    """
+    from app import db
+    from app.data_access.account_repository import get_account
+
+    router = replica_app.extensions["replica_router"]
+    with replica_app.app_context(), db.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE accounts SET balance_cents = 1 WHERE account_number = '10002'")
+    with replica_app.app_context():
+        assert [get_account("10002").balance_cents for _ in range(4)] == [200_000] * 4
+        assert get_account("10002", for_update=True).balance_cents == 1
+    assert [replica["reads"] for replica in router.stats()["replicas"]] == [2, 2]
+
+    assert [parse_position(value) for value in ("42", "", None, "-1", "1e9", "9" * 21)] == [42, 0, 0, 0, 0, 0]
+
+
+def test_replicas_need_a_shared_primary(tmp_path):
+    """
+    Test that replicas of a private in-memory database are refused at startup.
+    """
+    from app import create_app
+    from config.config import Config
+
+    class MemoryConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        READ_REPLICA_URLS = [f"sqlite:///{tmp_path / 'replica.db'}"]
+
+    with pytest.raises(ValueError):
+        create_app(MemoryConfig)
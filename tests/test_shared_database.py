@@ -0,0 +1,82 @@
+import multiprocessing
+import pytest
+from sqlalchemy import text
+
+NUM_WORKERS = 4
+
+
+def worker_process(db_path, barrier, results):
+    """
+    Simulates one gunicorn worker: boot the app against the shared database,
+    deposit once, wait for every worker to finish writing, then read the balance.
+    """
+    from app import create_app
+    from app.services.account_service import deposit_service, get_balance_service
+    from config.config import Config
+
+    class SharedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+
+    app = create_app(SharedConfig)
+    with app.app_context():
+        deposit_result = deposit_service("10001", 10)
+        barrier.wait(timeout=30)
+        balance_result = get_balance_service("10001")
+    results.put((deposit_result.get("success"), balance_result.get("balance")))
+
+
+def test_workers_share_balances(tmp_path):
+    """
+    Test that separate worker processes seed the shared database once and all
+    read the same balance after each of them has deposited.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(NUM_WORKERS)
+    results = ctx.Queue()
+    db_path = tmp_path / "shared.db"
+
+    processes = [ctx.Process(target=worker_process, args=(str(db_path), barrier, results)) for _ in range(NUM_WORKERS)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=60) for _ in range(NUM_WORKERS)]
+    for process in processes:
+        process.join(timeout=60)
+
+    assert all(success for success, _ in outcomes), outcomes
+    balances = {balance for _, balance in outcomes}
+    assert balances == {1000.0 + 10 * NUM_WORKERS}, f"Workers diverged: {outcomes}"
+
+
+def test_file_sqlite_uses_wal(tmp_path):
+    """
+    Test that file-backed SQLite connections are tuned for multi-process access,
+    in a directory created on first use.
+    """
+    from app import create_app, db
+    from config.config import Config
+
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'instance' / 'wal.db'}"
+        SQLITE_BUSY_TIMEOUT_MS = 1234
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+        db.engine.dispose()
+
+
+def test_database_uri_from_environment(monkeypatch):
+    from config.config import database_uri
+
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("DB_BACKEND", raising=False)
+    assert database_uri() == "sqlite:///:memory:"
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", "/var/lib/atm/atm.db")
+    assert database_uri() == "sqlite:////var/lib/atm/atm.db"
+
+    monkeypatch.setenv("DATABASE_URL", "postgres://atm:secret@db:5432/atm")
+    assert database_uri() == "postgresql://atm:secret@db:5432/atm"
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from sqlalchemy import text
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_builds_no_app():
+    """
+    Test that importing the package builds no application and imports no routes,
+    models or Flask-Migrate, and that `from app import app` builds the default app once.
+    """
+    script = (
+        "import sys, app\n"
+        "assert 'app' not in vars(app)\n"
+        "assert not {'app.models', 'app.routes.account_routes', 'flask_migrate'} & set(sys.modules)\n"
+        "from app import app as first\n"
+        "from app import app as second\n"
+        "assert first is second and 'app.routes.account_routes' in sys.modules\n"
+    )
+    env = dict(os.environ)
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    result = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stderr.count("Populating the database") == 1 and not result.stdout
+
+
+def test_schema_marker_skips_bootstrap(tmp_path, capsys):
+    """
+    Test that a database created by the app is stamped with the schema version and
+    that the next start skips table creation and seeding, keeping existing data.
+    """
+    from app import create_app, db
+    from app.services.account_service import deposit_service, get_balance_service
+    from config.config import Config
+    from db_setup import SCHEMA_VERSION
+
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'startup.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        assert db.session.execute(text("SELECT version_num FROM alembic_version")).scalar() == SCHEMA_VERSION
+        deposit_service("10001", 5)
+        db.session.remove()
+        db.engine.dispose()
+    capsys.readouterr()
+
+    restarted = create_app(FileConfig)
+    assert "Skipping table creation and seeding" in capsys.readouterr().err
+    with restarted.app_context():
+        assert get_balance_service("10001")["balance"] == 1005.0
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_schema_version_is_migration_head():
+    """
+    Test that the stamped schema version is the newest migration, so stamped
+    databases upgrade cleanly with `flask db upgrade`.
+    """
+    from alembic.config import Config as AlembicConfig
+    from alembic.script import ScriptDirectory
+    from db_setup import SCHEMA_VERSION
+
+    config = AlembicConfig()
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "migrations"))
+    scripts = ScriptDirectory.from_config(config)
+    assert scripts.get_heads() == [SCHEMA_VERSION]
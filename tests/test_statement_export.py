@@ -0,0 +1,104 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timedelta
+import pytest
+from app import create_app, db
+from config.config import Config
+
+STATEMENT_EXPORT_ROWS = int(os.environ.get("STATEMENT_EXPORT_ROWS", 5_000_000))
+PEAK_RSS_LIMIT_MB = 128
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A forked child starts with its parent's peak RSS, so the export is started from a
+# small launcher that reports the export's own peak (in KB) to the file in argv[1]
+PEAK_RSS_LAUNCHER = (
+    "import os, subprocess, sys; process = subprocess.Popen(sys.argv[2:]); "
+    "_, status, usage = os.wait4(process.pid, 0); open(sys.argv[1], 'w').write(str(usage.ru_maxrss)); "
+    "sys.exit(os.waitstatus_to_exitcode(status))"
+)
+
+
+def test_statement_running_balance(client, sample_account, db_session):
+    """
+    Test that NDJSON and CSV statements carry a correct running balance.
+    """
+    from app.models import Transaction
+    base = datetime(2026, 1, 1)
+    ledger = [("deposit", 10000), ("withdraw", 2550), ("transfer_out", 1000), ("transfer_in", 5)]
+    for day, (tx_type, cents) in enumerate(ledger):
+        db_session.add(Transaction(account_id=sample_account.id, type=tx_type, amount_cents=cents,
+                                   timestamp=base + timedelta(days=day)))
+    sample_account.balance_cents += 10000 - 2550 - 1000 + 5
+    db_session.commit()
+
+    response = client.get("/accounts/123456/statement")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row["balance"] for row in rows] == [600.0, 574.5, 564.5, 564.55]
+
+    response = client.get("/accounts/123456/statement?format=csv&from=2026-01-02&to=2026-01-04")
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row["type"], row["amount"], row["balance"]) for row in rows] == [
+        ("withdraw", "25.5", "574.5"), ("transfer_out", "10.0", "564.5"),
+    ]
+
+def test_statement_errors(client, sample_account):
+    assert client.get("/accounts/999999/statement").status_code == 404
+    assert client.get("/accounts/123456/statement?format=xml").status_code == 400
+
+
+def test_statement_export_constant_memory(tmp_path):
+    """
+    Test that exporting a multi-million-row statement through the CLI keeps
+    peak RSS under a fixed bound, i.e. rows are streamed, not materialized.
+    Set STATEMENT_EXPORT_ROWS to run a smaller export locally.
+    """
+    db_path = tmp_path / "statement.db"
+
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.engine.dispose()
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO transactions (account_id, type, amount_cents, timestamp)
+            WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+            SELECT 1, CASE n % 2 WHEN 0 THEN 'deposit' ELSE 'withdraw' END, 100,
+                   datetime('2020-01-01', '+' || n || ' seconds')
+            FROM seq
+            """,
+            (STATEMENT_EXPORT_ROWS - 1,),
+        )
+
+    env = dict(os.environ, DB_BACKEND="sqlite", SQLITE_PATH=str(db_path))
+    rss_path = tmp_path / "peak_rss"
+    process = subprocess.Popen(
+        [sys.executable, "-c", PEAK_RSS_LAUNCHER, str(rss_path), sys.executable, "-m", "flask", "--app", "run.py", "export-statement", "10001", "--format", "csv"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    # stdout must be exactly the CSV, so `> statement.csv` yields a valid file
+    expected = hashlib.sha256(b"account_number,id,timestamp,type,amount,balance,transfer_id\n")
+    start = datetime(2020, 1, 1)
+    for n in range(STATEMENT_EXPORT_ROWS):
+        tx_type, balance = ("deposit", "1001.0") if n % 2 == 0 else ("withdraw", "1000.0")
+        expected.update(f"10001,{n + 1},{(start + timedelta(seconds=n)).isoformat()},{tx_type},1.0,{balance},\n".encode())
+    exported = hashlib.sha256()
+    for chunk in iter(lambda: process.stdout.read(1 << 20), b""):
+        exported.update(chunk)
+    status = process.wait()
+
+    assert status == 0
+    assert exported.hexdigest() == expected.hexdigest()
+    peak_rss_mb = int(rss_path.read_text()) / 1024
+    print(f"✅ Exported {STATEMENT_EXPORT_ROWS:,} rows with peak RSS {peak_rss_mb:.0f} MB")
+    assert peak_rss_mb < PEAK_RSS_LIMIT_MB
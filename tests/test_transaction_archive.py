@@ -0,0 +1,158 @@
+import json
+import os
+from datetime import datetime, timedelta
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ACCOUNTS = ("10001", "10002", "10003")
+
+
+@pytest.fixture
+def archive_app(tmp_path):
+    """
+    App with an archive of tiny segments, and four months of history on three accounts.
+    """
+    from app import create_app, db
+    from app.data_access.transaction_archive import month_start
+    from app.models import Account, Transaction
+    from config.config import Config
+
+    class ArchiveConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'archive.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        ARCHIVE_DIR = str(tmp_path / "archive")
+        ARCHIVE_SEGMENT_ROWS = 8  # Accounts span several segments per month
+
+    app = create_app(ArchiveConfig)
+    with app.app_context():
+        first = month_start(datetime.utcnow(), 3)
+        types = ("deposit", "withdraw", "transfer_in", "transfer_out")
+        for position, number in enumerate(ACCOUNTS):
+            account = db.session.query(Account).filter_by(account_number=number).one()
+            for day in range(0, 110, 3):
+                tx_type = types[(day + position) % 4]
+                cents = 100 + day * 7 + position
+                db.session.add(Transaction(
+                    account_id=account.id, type=tx_type, amount_cents=cents,
+                    timestamp=first + timedelta(days=day, microseconds=day * 11),
+                    transfer_id=f"t{day:030d}" if tx_type.startswith("transfer") else None,
+                ))
+                account.balance_cents += cents if tx_type in ("deposit", "transfer_in") else -cents
+            # Two rows sharing a timestamp, to page through ties by id
+            for _ in range(2):
+                db.session.add(Transaction(account_id=account.id, type="deposit", amount_cents=1,
+                                           timestamp=first + timedelta(days=40)))
+                account.balance_cents += 1
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def snapshot_history(app, number, query=""):
+    """Walk an account's history three rows at a time and return every row and its statement."""
+    http = app.test_client()
+    rows, cursor = [], None
+    while True:
+        response = http.get(f"/accounts/{number}/transactions?limit=3{query}" + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        data = response.json["data"]
+        rows += data["transactions"]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    statement = http.get(f"/accounts/{number}/statement?format=csv" + query.replace("&type=withdraw", ""))
+    return rows, statement.get_data(as_text=True)
+
+
+def count_rows(app):
+    from app import db
+    from app.models import Transaction
+
+    with app.app_context():
+        return db.session.query(Transaction).count()
+
+
+def test_history_and_statements_span_the_archive(archive_app):
+    """
+    Test that after archiving, paged history, filters and statements return exactly
+    what they returned from the table, while only the current month stays in it.
+    """
+    from app.data_access.transaction_archive import archive_transactions, month_start
+
+    now = datetime.utcnow()
+    queries = ["", "&type=withdraw"] + [
+        f"&from={start.isoformat()}&to={end.isoformat()}" for start, end in (
+            (month_start(now, 2), month_start(now) + timedelta(days=2)),  # Whole months, then the table
+            (month_start(now, 3) + timedelta(days=10, hours=5), month_start(now, 1) + timedelta(days=3)),  # Part months
+        )
+    ]
+    before = {(n, q): snapshot_history(archive_app, n, q) for n in ACCOUNTS for q in queries}
+    total = count_rows(archive_app)
+
+    store = archive_app.extensions["transaction_archive"]
+    with archive_app.app_context():
+        result = archive_transactions(store)
+    assert result["watermark"] == month_start(now)
+    assert result["archived"] == result["deleted"] > 0
+    assert count_rows(archive_app) == total - result["archived"]
+    manifest = json.load(open(os.path.join(store.directory, "manifest.json")))
+    assert len(manifest["segments"]) == result["segments"] > len(ACCOUNTS) * 3
+    assert all(s["rows"] <= 8 and s["min_account"] <= s["max_account"] for s in manifest["segments"])
+
+    for (number, query), expected in before.items():
+        assert snapshot_history(archive_app, number, query) == expected, (number, query)
+    print(f"✅ {result['archived']} rows archived into {result['segments']} segments; history unchanged")
+
+
+def test_reconciliation_counts_archived_transactions(archive_app, tmp_path):
+    """
+    Test that full and incremental reconciliation add archived totals and still find tampering.
+    """
+    from app import db
+    from app.data_access.reconciliation import reconcile
+    from app.data_access.transaction_archive import archive_transactions
+    from app.services.account_service import deposit_service
+    from sqlalchemy import text
+
+    checkpoint = str(tmp_path / "reconcile.npz")
+    with archive_app.app_context():
+        assert reconcile(checkpoint=checkpoint)["mismatches"] == []
+        archive_transactions(archive_app.extensions["transaction_archive"])
+        deposit_service("10002", 5)
+        incremental = reconcile(checkpoint=checkpoint)
+        assert incremental["incremental"] and incremental["transactions"] == 1
+        assert incremental["mismatches"] == []
+
+        full = reconcile(full=True)
+        assert full["mismatches"] == [] and full["transactions"] == count_rows(archive_app)
+
+        with db.engine.begin() as conn:
+            conn.execute(text("UPDATE accounts SET balance_cents = balance_cents - 3 WHERE account_number = '10003'"))
+        assert [m["difference_cents"] for m in reconcile(full=True)["mismatches"]] == [-3]
+        assert [m["difference_cents"] for m in reconcile(checkpoint=checkpoint)["mismatches"]] == [-3]
+
+
+def test_interrupted_run_is_finished_by_the_next(archive_app, monkeypatch):
+    """
+    Test that rows left in the table after the manifest commits are neither shown twice
+    nor archived twice, and that the next run deletes them.
+    """
+    import app.data_access.account_repository as account_repository
+    from app.data_access.transaction_archive import archive_transactions
+
+    expected = snapshot_history(archive_app, "10001")
+    total = count_rows(archive_app)
+    store = archive_app.extensions["transaction_archive"]
+    with archive_app.app_context():
+        with monkeypatch.context() as patch:
+            patch.setattr(account_repository, "purge_archived_transactions", lambda *args: 0)
+            first = archive_transactions(store)
+        assert first["deleted"] == 0 and count_rows(archive_app) == total
+        assert snapshot_history(archive_app, "10001") == expected
+
+        second = archive_transactions(store)
+    assert (second["archived"], second["deleted"]) == (0, first["archived"])
+    assert store.stats()["rows"] == first["archived"] and store.stats()["generation"] == 1
+    assert snapshot_history(archive_app, "10001") == expected
@@ -0,0 +1,65 @@
+import threading
+import time
+import pytest
+from sqlalchemy import func
+from app import create_app, db
+from app.models import Account, Transaction
+from app.services.account_service import transfer_service
+from config.config import Config
+
+NUM_THREADS = 8
+TRANSFERS_PER_THREAD = 40
+
+
+@pytest.fixture(scope="function")
+def file_app(tmp_path):
+    """
+    App on a file-backed SQLite database, so transfers contend on real locks.
+    """
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'transfers.db'}"
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.session.add_all([Account(account_number="111", balance=1000.0), Account(account_number="222", balance=1000.0)])
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_opposing_transfers(file_app):
+    """
+    Test many threads transferring A->B and B->A at once: no deadlocks,
+    no lost money, and every transfer leaves two matching ledger rows.
+    """
+    results = []
+    lock = threading.Lock()
+
+    def worker(index):
+        source, destination = ("111", "222") if index % 2 else ("222", "111")
+        local = []
+        with file_app.app_context():
+            for _ in range(TRANSFERS_PER_THREAD):
+                local.append(transfer_service(source, destination, "7.35"))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(NUM_THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+    elapsed = time.perf_counter() - start
+
+    assert not any(thread.is_alive() for thread in threads), "Transfers deadlocked"
+    errors = [r["error"] for r in results if "error" in r]
+    assert not errors, errors
+    print(f"✅ {len(results)} transfers in {elapsed:.2f}s ({len(results) / elapsed:,.0f} transfers/s)")
+
+    with file_app.app_context():
+        total = db.session.query(func.sum(Account.balance_cents)).filter(Account.account_number.in_(["111", "222"])).scalar()
+        assert total == 200000
+        legs = db.session.query(Transaction.type, func.count(), func.sum(Transaction.amount_cents)).group_by(Transaction.type).all()
+        assert sorted(legs) == [("transfer_in", len(results), 735 * len(results)), ("transfer_out", len(results), 735 * len(results))]
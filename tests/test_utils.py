@@ -1,5 +1,10 @@
+import logging
+import random
+from decimal import Decimal
 import pytest
-from app.utils import validate_account_number, validate_amount, format_error, format_response
+from sqlalchemy.exc import OperationalError
+from app.utils import validate_account_number, validate_amount, format_error, format_response, parse_cents, format_cents, parse_balance_change
+from app.utils import balance_change_failure, balance_change_response, build_balance_change
 
 def test_validate_account_number():
     assert validate_account_number("12345") is True
@@ -12,6 +17,20 @@ def test_validate_amount():
     assert validate_amount("-10") == (False, None)
     assert validate_amount("invalid") == (False, None)
 
+def test_parse_balance_change():
+    command, error = parse_balance_change("withdraw", "10001", {"amount": "12.50"}, "atm-1-req-7")
+    assert error is None
+    assert (command.operation, command.account_number, command.cents, command.idempotency_key) == ("withdraw", "10001", 1250, "atm-1-req-7")
+    for account_number, body, key, message in (
+        ("10a01", {"amount": 5}, None, "Invalid account number format"),
+        ("10001", None, None, "Missing 'amount' in request body"),
+        ("10001", [5], None, "Missing 'amount' in request body"),
+        ("10001", {"amount": 0}, None, "Invalid amount format or must be greater than zero"),
+        ("10001", {"amount": 5}, "has space", "Invalid Idempotency-Key header"),
+    ):
+        command, error = parse_balance_change("deposit", account_number, body, key)
+        assert command is None and error == {"error": message, "code": 400}
+
 def test_format_error():
     response = format_error("Test Error", 400)
     assert response == {"error": "Test Error", "code": 400}
@@ -21,3 +40,65 @@ def test_format_response():
     assert response["success"] is True
     assert response["data"] == {"message": "Success"}
     assert response["code"] == 200
+
+def test_parse_cents():
+    assert parse_cents(100) == 10000
+    assert parse_cents(0.1) == 10
+    assert parse_cents(12.34) == 1234
+    assert parse_cents("50.5") == 5050
+    assert parse_cents(" 7.00 ") == 700
+    assert parse_cents("1.050") == 105
+    assert parse_cents("0") == 0
+    for invalid in ("1.005", "-10", "12.", ".5", "1e3", "abc", "", "١٢", True, None, [1], 1e16, -1):
+        assert parse_cents(invalid) is None, invalid
+
+def test_parse_cents_upper_bound():
+    """
+    Property: amounts are capped at 16 whole digits, so cents always fit a BIGINT column.
+    """
+    assert parse_cents(10 ** 16 - 1) == (10 ** 16 - 1) * 100 < 2 ** 63 - 1
+    assert parse_cents("0009999999999999999.99") == 999999999999999999
+    for invalid in (10 ** 16, 10 ** 20, "1" + "0" * 16, "9" * 40, "9" * 5000 + ".5"):
+        assert parse_cents(invalid) is None, invalid
+
+def test_format_cents():
+    assert format_cents(123456) == 1234.56
+    assert format_cents(0) == 0.0
+
+def test_no_drift_over_million_operations():
+    """
+    Property: applying a million random deposits and withdrawals parsed from
+    JSON-style inputs matches exact decimal arithmetic to the cent.
+    """
+    rng = random.Random(20261018)
+    balance_cents = 0
+    expected = Decimal("0")
+    for _ in range(1_000_000):
+        cents = rng.randint(1, 10_000_000)
+        text = f"{cents // 100}.{cents % 100:02d}"
+        value = text if rng.random() < 0.5 else float(text)
+        if rng.random() < 0.5 or balance_cents < cents:
+            balance_cents += parse_cents(value)
+            expected += Decimal(text)
+        else:
+            balance_cents -= parse_cents(value)
+            expected -= Decimal(text)
+    assert Decimal(balance_cents) / 100 == expected
+    assert float(expected) == format_cents(balance_cents)
+
+def test_balance_change_helpers():
+    """
+    Test the validation, response and failure helpers shared by the sync and async services.
+    """
+    command, error = build_balance_change("withdraw", "10001", "12.50")
+    assert error is None and (command.cents, command.signed_cents) == (1250, -1250)
+    assert build_balance_change("deposit", "10001", "-1")[1]["code"] == 400
+
+    log = logging.getLogger("test_utils")
+    assert balance_change_response(command, {"new_balance_cents": 98750, "replayed": True}, log) == {
+        "success": True, "account_number": "10001", "new_balance": 987.5, "replayed": True,
+    }
+    assert balance_change_response(command, {"error": "Insufficient funds"}, log) == {"error": "Insufficient funds"}
+    failure = balance_change_failure(command, OperationalError("UPDATE", {}, Exception("locked")), log)
+    assert (failure["error"], failure["code"]) == ("A database error occurred during withdrawal", 500)
+    assert balance_change_failure(command, RuntimeError("boom"), log)["error"] == "An unexpected error occurred"
@@ -0,0 +1,163 @@
+import threading
+import pytest
+from app.data_access.withdrawal_limits import SlidingWindow, WithdrawalLimits
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def limits_app(tmp_path):
+    """
+    App on a file-backed database with a daily cap of 300.00 and three withdrawals per minute.
+    """
+    from app import create_app, db
+    from config.config import Config
+
+    class LimitsConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'limits.db'}"
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+        WITHDRAWAL_LIMITS_ENABLED = True
+        WITHDRAWAL_DAILY_LIMIT = "300"
+        WITHDRAWAL_PER_MINUTE_LIMIT = 3
+
+    app = create_app(LimitsConfig)
+    app.config_class = LimitsConfig
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_sliding_window_expires_whole_buckets():
+    """
+    Test that a value counts for the whole window and is dropped within one bucket after it.
+    """
+    window = SlidingWindow(span=60, width=5)
+    window.add(1000.0, 7)
+    window.add(1003.0, 1)
+    assert window.total(1059.0) == 8
+    assert window.total(1064.0) == 8  # Bucket [1000, 1005) may outlive the window by one bucket
+    assert window.total(1065.0) == 0
+    window.add(1070.0, 2)
+    window.remove(1070.0, 2)
+    assert window.total(1070.0) == 0 and window.empty(1200.0)
+
+
+def test_limits_reject_and_release(limits_app):
+    """
+    Test the velocity limit, the daily cap, and that failed withdrawals release their reservation.
+    """
+    clock = FakeClock()
+    limits_app.extensions["withdrawal_limits"] = WithdrawalLimits(200_000, 3, clock=clock)
+    http = limits_app.test_client()
+
+    assert http.post("/accounts/10001/withdraw", json={"amount": 1500}).status_code == 400  # Insufficient funds
+    for _ in range(3):
+        assert http.post("/accounts/10001/withdraw", json={"amount": 80}).status_code == 200
+    response = http.post("/accounts/10001/withdraw", json={"amount": 10})
+    assert response.status_code == 429
+    assert response.json["data"]["error"] == "Withdrawal velocity limit exceeded"
+
+    clock.now += 65
+    assert http.post("/accounts/10001/withdraw", json={"amount": 1800}).status_code == 403
+    assert http.post("/accounts/10001/withdraw", json={"amount": 60}).status_code == 200
+    assert http.post("/accounts/10001/deposit", json={"amount": 500}).status_code == 200  # Deposits are not limited
+
+    usage = http.get("/accounts/10001/limits").json["data"]
+    assert (usage["withdrawn_today"], usage["withdrawals_last_minute"]) == (300.0, 1)
+
+    clock.now += 86_400 + 300
+    assert http.post("/accounts/10001/withdraw", json={"amount": 300}).status_code == 200
+
+
+def test_limits_survive_restart(limits_app):
+    """
+    Test that withdrawals and per-account limits are rebuilt from the database at startup.
+    """
+    from app import create_app, db
+
+    http = limits_app.test_client()
+    response = http.put("/accounts/10002/limits", json={"daily_limit": 150, "per_minute": None})
+    assert response.status_code == 200
+    assert (response.json["data"]["daily_limit"], response.json["data"]["per_minute"]) == (150.0, 3)
+    assert http.post("/accounts/10002/withdraw", json={"amount": 100}).status_code == 200
+    assert http.post("/accounts/10003/withdraw", json={"amount": 250}).status_code == 200
+    assert http.put("/accounts/99999/limits", json={"daily_limit": 1}).status_code == 404
+    assert http.put("/accounts/10002/limits", json={"per_minute": -1}).status_code == 400
+
+    restarted = create_app(limits_app.config_class)
+    http = restarted.test_client()
+    assert http.get("/accounts/10002/limits").json["data"]["withdrawn_today"] == 100.0
+    assert http.post("/accounts/10002/withdraw", json={"amount": 60}).status_code == 403
+    assert http.post("/accounts/10003/withdraw", json={"amount": 60}).status_code == 403
+    assert http.post("/accounts/10003/withdraw", json={"amount": 50}).status_code == 200
+    with restarted.app_context():
+        db.engine.dispose()
+
+
+def test_concurrent_withdrawals_stop_at_the_cap(limits_app):
+    """
+    Test that concurrent withdrawals cannot pass the daily cap together.
+    """
+    from app.services.account_service import withdraw_service
+
+    limits_app.extensions["withdrawal_limits"] = WithdrawalLimits(30_000, 0)
+    results = []
+
+    def withdraw():
+        with limits_app.app_context():
+            results.append(withdraw_service("10005", 40))
+
+    threads = [threading.Thread(target=withdraw) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(1 for result in results if result.get("success")) == 7  # 7 x 40 <= 300 < 8 x 40
+    assert {result.get("code") for result in results if not result.get("success")} == {403}
+    print("✅ Concurrent withdrawals:", sum(1 for result in results if result.get("success")), "of", len(results))
+
+
+def test_batches_and_transfers_count_against_limits(limits_app, monkeypatch):
+    """
+    Test that batch withdrawals and transfer debits are held to the daily cap, that
+    they are rebuilt at startup, and that a withdrawal that raises releases its reservation.
+    """
+    from app import create_app, db
+    from app.data_access import account_repository
+
+    limits_app.extensions["withdrawal_limits"] = WithdrawalLimits(20_000, 0)
+    http = limits_app.test_client()
+
+    assert http.post("/transfers", json={"from_account": "10004", "to_account": "10005", "amount": 150}).status_code == 200
+    assert http.post("/transfers", json={"from_account": "10004", "to_account": "10005", "amount": 60}).status_code == 403
+
+    batch = [
+        {"account_number": "10004", "type": "withdraw", "amount": 40},
+        {"account_number": "10004", "type": "withdraw", "amount": 20},
+        {"account_number": "10004", "type": "deposit", "amount": 20},
+    ]
+    data = http.post("/accounts/batch", json={"operations": batch}).json["data"]
+    assert [result.get("error") for result in data["results"]] == [None, "Daily withdrawal limit exceeded", None]
+    response = http.post("/accounts/batch", json={"operations": batch[1:], "atomic": True})
+    assert response.status_code == 400
+    assert [result["error"] for result in response.json["data"]["results"]] == ["Daily withdrawal limit exceeded", "Batch rolled back"]
+    assert http.get("/accounts/10004/balance").json["data"]["balance"] == 4000 - 150 - 40 + 20
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(account_repository, "_dispatch", fail)
+    assert http.post("/accounts/10004/withdraw", json={"amount": 5}).status_code == 500
+    assert http.get("/accounts/10004/limits").json["data"]["withdrawn_today"] == 190.0
+
+    restarted = create_app(limits_app.config_class)
+    assert restarted.test_client().get("/accounts/10004/limits").json["data"]["withdrawn_today"] == 190.0
+    with restarted.app_context():
+        db.engine.dispose()
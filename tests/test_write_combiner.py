@@ -0,0 +1,100 @@
+import threading
+import pytest
+from app import create_app, db
+from app.data_access.write_combiner import WriteCombiner
+from app.models import Account, Transaction
+from app.services.account_service import deposit_service, withdraw_service
+from config.config import Config
+
+NUM_THREADS = 12
+OPERATIONS_PER_THREAD = 30
+
+
+@pytest.fixture(scope="function")
+def hot_app(tmp_path):
+    """
+    App on a file-backed SQLite database with account 777 combined.
+    """
+    class HotConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'hot.db'}"
+        WRITE_COMBINING_ACCOUNTS = ["777"]
+        IDEMPOTENCY_SWEEP_INTERVAL = 0
+
+    app = create_app(HotConfig)
+    with app.app_context():
+        db.session.add(Account(account_number="777", balance=50.0))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_combined_writes_check_funds_in_order(hot_app):
+    """
+    Test that concurrent withdrawals and deposits on a combined account each get
+    their own result, the ledger never dips below zero, and several operations
+    shared a commit.
+    """
+    results = []
+    lock = threading.Lock()
+
+    def worker(index):
+        local = []
+        with hot_app.app_context():
+            for i in range(OPERATIONS_PER_THREAD):
+                if (index + i) % 2:
+                    local.append(("withdraw", withdraw_service("777", 3)))
+                else:
+                    local.append(("deposit", deposit_service("777", 1)))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(NUM_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert len(results) == NUM_THREADS * OPERATIONS_PER_THREAD
+    errors = [r["error"] for _, r in results if "error" in r]
+    assert set(errors) <= {"Insufficient funds"}, errors
+    deposits = sum(1 for kind, r in results if kind == "deposit" and r.get("success"))
+    withdrawals = sum(1 for kind, r in results if kind == "withdraw" and r.get("success"))
+    assert deposits == NUM_THREADS * OPERATIONS_PER_THREAD // 2
+
+    with hot_app.app_context():
+        balance = db.session.query(Account.balance_cents).filter_by(account_number="777").scalar()
+        ledger = db.session.query(Transaction.type, Transaction.amount_cents).order_by(Transaction.id).all()
+    assert balance == 5000 + deposits * 100 - withdrawals * 300
+    running = 5000
+    running_balances = []
+    for tx_type, cents in ledger:
+        running += cents if tx_type == "deposit" else -cents
+        assert running >= 0
+        running_balances.append(running)
+    assert running == balance
+    # Each successful caller was told the balance right after its own ledger row
+    assert sorted(running_balances) == sorted(round(r["new_balance"] * 100) for _, r in results if r.get("success"))
+
+    stats = hot_app.extensions["write_combiner"].stats()
+    assert stats["operations"] == NUM_THREADS * OPERATIONS_PER_THREAD
+    assert stats["batches"] < stats["operations"]
+
+def test_threshold_switches_on_concurrent_writers():
+    combiner = WriteCombiner(threshold=2)
+    assert not combiner.should_combine("10001")
+    with combiner.tracking("10001"):
+        assert not combiner.should_combine("10001")
+        with combiner.tracking("10001"):
+            assert combiner.should_combine("10001")
+            assert not combiner.should_combine("10002")
+    assert not combiner.should_combine("10001")
+
+def test_writer_failure_releases_every_caller():
+    combiner = WriteCombiner(accounts={"1"})
+
+    def failing_batch(account_number, ops):
+        raise RuntimeError("boom")
+
+    assert combiner.submit("1", 100, "deposit", failing_batch) == {"error": "Transaction failed: boom"}
+    assert combiner.stats()["batches"] == 1